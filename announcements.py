@@ -0,0 +1,191 @@
+"""
+Scoped announcements with fan-out-on-read
+An announcement is stored once, addressed to a single scope: the whole
+school, a grade, a class or a subject. Nothing is written per recipient;
+a user's feed is read by merging the scopes they belong to through the
+(scope_key, id) index.
+
+Unread counts come from one read cursor per user in announcement_reads
+(the highest announcement id they have seen), so a school-wide post is a
+single insert however many students there are.
+"""
+
+import notifications
+
+SCOPES = ('school', 'grade', 'class', 'subject')
+PRIORITIES = ('low', 'normal', 'high', 'urgent')
+
+FEED_COLUMNS = '''
+    a.id, a.title, a.content, a.scope, a.grade_level, a.class_id, a.subject_name,
+    a.priority, a.created_on, a.author_id, COALESCE(u.name, u.username), c.name
+'''
+
+
+def has_announcements_table(cur):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'announcements'")
+    return cur.fetchone() is not None
+
+
+def scope_key(scope, target=None):
+    """Key stored in announcements.scope_key, e.g. 'class:12'"""
+    if scope not in SCOPES:
+        raise ValueError(f'Unknown announcement scope: {scope}')
+    if scope == 'school':
+        return 'school'
+    if target is None or str(target).strip() == '':
+        raise ValueError(f'A {scope} announcement needs a target')
+    return f'{scope}:{str(target).strip()}'
+
+
+def user_scopes(conn, user_id, role):
+    """Every scope_key whose announcements reach this user"""
+    cur = conn.cursor()
+    keys = {'school'}
+
+    if role == 'student':
+        cur.execute('''
+            SELECT c.id, c.grade_level FROM classes c
+            JOIN student_class_map scm ON scm.class_id = c.id
+            WHERE scm.student_id = ? AND scm.status = 'active' AND c.status = 'active'
+        ''', (user_id,))
+        subject_query = 'SELECT subject_name FROM student_subjects WHERE student_id = ?'
+    elif role == 'teacher':
+        cur.execute('''
+            SELECT c.id, c.grade_level FROM classes c
+            JOIN teacher_class_map tcm ON tcm.class_id = c.id
+            WHERE tcm.teacher_id = ? AND c.status = 'active'
+        ''', (user_id,))
+        subject_query = 'SELECT subject_name FROM teacher_subjects WHERE teacher_id = ?'
+    else:
+        return keys
+
+    for class_id, grade_level in cur.fetchall():
+        keys.add(f'class:{class_id}')
+        if grade_level:
+            keys.add(f'grade:{grade_level}')
+    cur.execute(subject_query, (user_id,))
+    keys.update(f'subject:{subject}' for (subject,) in cur.fetchall())
+    return keys
+
+
+def _visible(scopes):
+    """WHERE clause and params for live announcements in the given scopes (None = all)"""
+    clause = "a.is_active = 1 AND (a.expires_on IS NULL OR a.expires_on > CURRENT_TIMESTAMP)"
+    if scopes is None:
+        return clause, []
+    scopes = sorted(scopes)
+    return f"a.scope_key IN ({', '.join('?' for _ in scopes)}) AND {clause}", scopes
+
+
+def feed(conn, scopes, limit=20, before_id=None):
+    """Newest announcements across the scopes; pass the last id seen as before_id for the next page"""
+    where, params = _visible(scopes)
+    if before_id is not None:
+        where += ' AND a.id < ?'
+        params.append(int(before_id))
+
+    cur = conn.cursor()
+    cur.execute(f'''
+        SELECT {FEED_COLUMNS}
+        FROM announcements a
+        LEFT JOIN users u ON u.id = a.author_id
+        LEFT JOIN classes c ON c.id = a.class_id
+        WHERE {where}
+        ORDER BY a.id DESC
+        LIMIT ?
+    ''', params + [int(limit)])
+    return [describe(row) for row in cur.fetchall()]
+
+
+def describe(row):
+    """Template-friendly dict for a feed row"""
+    (announcement_id, title, content, scope, grade_level, class_id, subject_name,
+     priority, created_on, author_id, author_name, class_name) = row
+    audience = {
+        'school': 'Everyone',
+        'grade': f'Grade {grade_level}',
+        'class': class_name or f'Class {class_id}',
+        'subject': subject_name,
+    }[scope]
+    return {
+        'id': announcement_id,
+        'title': title,
+        'content': content,
+        'scope': scope,
+        'audience': audience,
+        'priority': priority,
+        'created_on': created_on,
+        'author_id': author_id,
+        'author': author_name or '',
+    }
+
+
+def read_cursor(conn, user_id):
+    cur = conn.cursor()
+    cur.execute('SELECT last_read_id FROM announcement_reads WHERE user_id = ?', (user_id,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def unread_count(conn, user_id, scopes):
+    """Announcements in the user's scopes newer than their read cursor"""
+    where, params = _visible(scopes)
+    cur = conn.cursor()
+    cur.execute(f'SELECT COUNT(*) FROM announcements a WHERE {where} AND a.id > ?',
+                params + [read_cursor(conn, user_id)])
+    return cur.fetchone()[0]
+
+
+def mark_read(conn, user_id, up_to_id):
+    """Move the user's read cursor forward (never back); the caller commits"""
+    conn.execute('''
+        INSERT INTO announcement_reads (user_id, last_read_id) VALUES (?, ?)
+        ON CONFLICT(user_id) DO UPDATE
+        SET last_read_id = MAX(last_read_id, excluded.last_read_id), updated_on = CURRENT_TIMESTAMP
+    ''', (user_id, int(up_to_id)))
+
+
+def post_announcement(conn, author_id, title, content, scope='school', target=None,
+                      priority='normal', expires_on=None):
+    """Insert one announcement for a scope; the caller commits. Returns the new id"""
+    title, content = (title or '').strip(), (content or '').strip()
+    if not title or not content:
+        raise ValueError('Title and content are required')
+    if priority not in PRIORITIES:
+        raise ValueError(f'Unknown priority: {priority}')
+
+    key = scope_key(scope, target)
+    target = key.split(':', 1)[1] if scope != 'school' else None
+    cur = conn.cursor()
+    cur.execute('''
+        INSERT INTO announcements (title, content, author_id, scope, scope_key, grade_level, class_id,
+                                   subject_name, priority, expires_on)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (title, content, author_id, scope, key,
+          target if scope == 'grade' else None,
+          int(target) if scope == 'class' else None,
+          target if scope == 'subject' else None,
+          priority, expires_on or None))
+    return cur.lastrowid
+
+
+def notify(conn, announcement_id, author_id, title, scope, target=None):
+    """Push a posted announcement to connected users over the notification bus"""
+    cur = conn.cursor()
+    if scope == 'school':
+        topics = ['role:student', 'role:teacher']
+    elif scope == 'class':
+        topics = [f'class:{int(target)}']
+    elif scope == 'grade':
+        cur.execute("SELECT id FROM classes WHERE grade_level = ? AND status = 'active'", (str(target),))
+        topics = [f'class:{class_id}' for (class_id,) in cur.fetchall()]
+    else:
+        cur.execute('''
+            SELECT student_id FROM student_subjects WHERE subject_name = ?
+            UNION SELECT teacher_id FROM teacher_subjects WHERE subject_name = ?
+        ''', (target, target))
+        topics = [f'user:{user_id}' for (user_id,) in cur.fetchall()]
+
+    if topics:
+        notifications.publish(topics, 'announcement', f'Announcement: {title}',
+                              actor=author_id, announcement_id=announcement_id)
@@ -0,0 +1,314 @@
+"""
+Suggested answers from resolved doubts
+Doubts repeat from term to term, so the answers teachers have already
+written are searched with BM25 over each resolved doubt's question and
+response. The index is a term-major sparse matrix held in flat arrays:
+
+    indptr[t] .. indptr[t + 1]   slice of postings for term id t
+    indices                      document positions
+    data                         term frequencies
+
+plus per-document ids, lengths, subjects and a checksum of the response.
+A query touches only the posting slices of its own terms, so it costs the
+number of matching postings rather than the number of resolved doubts.
+Answering a cluster of near-duplicate doubts gives every member the same
+response, so search() returns one hit per distinct response.
+
+`python devtools.py build-answer-index` writes the index to INDEX_PATH.
+The app loads that file on first use, catches up on doubts resolved since
+it was written, and then adds each newly answered doubt to a small delta
+that is folded into the arrays once it reaches COMPACT_THRESHOLD documents.
+Without a built file the index is built from the database on first use.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import struct
+import threading
+import zlib
+from array import array
+from collections import Counter
+
+DATABASE = 'users.db'
+INDEX_PATH = os.path.join('instance', 'answer_index.bin')
+
+# BM25 term-frequency saturation and length normalisation
+K1 = 1.2
+B = 0.75
+TOP_K = 5
+COMPACT_THRESHOLD = 256
+
+_MAGIC = b'ANSIDX2\n'
+_MAX_TF = 0xFFFF
+STOPWORDS = frozenset('''
+    a an and are as at be but by can do does for from how i if in is it its me my
+    of on or so that the their then there these this to was what when where which
+    who why will with you your
+'''.split())
+
+
+def tokenize(text):
+    return [token for token in re.findall(r'[a-z0-9]+', (text or '').lower())
+            if len(token) > 1 and token not in STOPWORDS]
+
+
+class AnswerIndex:
+    """BM25 over resolved doubts, stored as a compressed sparse term-document matrix"""
+
+    def __init__(self):
+        self.terms = {}
+        self.indptr = array('I', [0])
+        self.indices = array('I')
+        self.data = array('H')
+        self.doc_ids = array('I')
+        self.doc_lengths = array('I')
+        self.doc_subjects = array('H')
+        self.doc_answers = array('I')
+        self.subjects = []
+        self.watermark = ''
+        self.delta = {}
+        self.delta_docs = 0
+        self._positions = {}
+        self._subject_ids = {}
+        self._total_length = 0
+        self._norms = None
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def add(self, doubt_id, subject, text, response, resolved_at=None):
+        """Index one resolved doubt; returns False if it is already indexed"""
+        if doubt_id in self._positions:
+            return False
+        tokens = tokenize(f'{text} {response}')
+        doc = len(self.doc_ids)
+        if subject not in self._subject_ids:
+            self._subject_ids[subject] = len(self.subjects)
+            self.subjects.append(subject)
+        self._positions[doubt_id] = doc
+        self.doc_ids.append(doubt_id)
+        self.doc_lengths.append(len(tokens))
+        self.doc_subjects.append(self._subject_ids[subject])
+        self.doc_answers.append(answer_key(response))
+        self._total_length += len(tokens)
+        self._norms = None
+        for term, tf in Counter(tokens).items():
+            self.delta.setdefault(term, []).append((doc, min(tf, _MAX_TF)))
+        self.delta_docs += 1
+        self.watermark = max(self.watermark, resolved_at or '')
+        if self.delta_docs >= COMPACT_THRESHOLD:
+            self.compact()
+        return True
+
+    def compact(self):
+        """Fold the delta postings into the sparse arrays"""
+        if not self.delta:
+            self.delta_docs = 0
+            return
+        for term in self.delta:
+            if term not in self.terms:
+                self.terms[term] = len(self.terms)
+        by_id = sorted(self.terms.items(), key=lambda item: item[1])
+        indptr, indices, data = array('I', [0]), array('I'), array('H')
+        old_terms = len(self.indptr) - 1
+        for term, term_id in by_id:
+            if term_id < old_terms:
+                start, end = self.indptr[term_id], self.indptr[term_id + 1]
+                indices.extend(self.indices[start:end])
+                data.extend(self.data[start:end])
+            for doc, tf in self.delta.get(term, ()):
+                indices.append(doc)
+                data.append(tf)
+            indptr.append(len(indices))
+        self.indptr, self.indices, self.data = indptr, indices, data
+        self.delta = {}
+        self.delta_docs = 0
+
+    def _postings(self, term):
+        term_id = self.terms.get(term)
+        if term_id is not None:
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            yield from zip(self.indices[start:end], self.data[start:end])
+        yield from self.delta.get(term, ())
+
+    def search(self, text, subject=None, k=TOP_K, exclude=()):
+        """Top-k (doubt_id, score) pairs for a query, best first, one per distinct response"""
+        count = len(self.doc_ids)
+        if not count:
+            return []
+        subject_id = self._subject_ids.get(subject) if subject else None
+        if subject and subject_id is None:
+            return []
+        norms = self._length_norms()
+        doc_subjects = self.doc_subjects
+        scores = {}
+        for term in set(tokenize(text)):
+            postings = list(self._postings(term))
+            if not postings:
+                continue
+            weight = (K1 + 1) * math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings:
+                if subject_id is None or doc_subjects[doc] == subject_id:
+                    scores[doc] = scores.get(doc, 0.0) + weight * tf / (tf + norms[doc])
+        excluded = {self._positions[doubt_id] for doubt_id in exclude if doubt_id in self._positions}
+        # Pop best-first until k distinct responses, without sorting every match
+        ranked = [(-score, doc) for doc, score in scores.items() if doc not in excluded]
+        heapq.heapify(ranked)
+        best, seen = [], set()
+        while ranked and len(best) < k:
+            score, doc = heapq.heappop(ranked)
+            if self.doc_answers[doc] not in seen:
+                seen.add(self.doc_answers[doc])
+                best.append((self.doc_ids[doc], -score))
+        return best
+
+    def _length_norms(self):
+        """BM25's per-document length term, recomputed only after documents are added"""
+        if self._norms is None:
+            average = self._total_length / len(self.doc_ids) or 1
+            self._norms = array('d', (K1 * (1 - B + B * length / average) for length in self.doc_lengths))
+        return self._norms
+
+    def save(self, path):
+        """Write the index atomically; the delta is compacted first"""
+        self.compact()
+        header = json.dumps({
+            'terms': [term for term, _ in sorted(self.terms.items(), key=lambda item: item[1])],
+            'subjects': self.subjects,
+            'watermark': self.watermark,
+        }).encode()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for values in self._arrays():
+                f.write(struct.pack('<I', len(values)))
+                f.write(values.tobytes())
+        os.replace(tmp_path, path)
+
+    def _arrays(self):
+        return (self.indptr, self.indices, self.data, self.doc_ids, self.doc_lengths, self.doc_subjects,
+                self.doc_answers)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        index.indptr = array('I')
+        with open(path, 'rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f'{path} is not an answer index')
+            (size,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(size))
+            for values in index._arrays():
+                (length,) = struct.unpack('<I', f.read(4))
+                values.frombytes(f.read(length * values.itemsize))
+        index.terms = {term: term_id for term_id, term in enumerate(header['terms'])}
+        index.subjects = header['subjects']
+        index._subject_ids = {subject: i for i, subject in enumerate(index.subjects)}
+        index.watermark = header['watermark']
+        index._positions = {doubt_id: doc for doc, doubt_id in enumerate(index.doc_ids)}
+        index._total_length = sum(index.doc_lengths)
+        return index
+
+
+def answer_key(response):
+    """Checksum of a response with case and whitespace normalised, to spot repeated answers"""
+    return zlib.crc32(' '.join((response or '').lower().split()).encode())
+
+
+def has_answers(cur):
+    cur.execute('PRAGMA table_info(doubts)')
+    return 'response' in {row[1] for row in cur.fetchall()}
+
+
+def resolved_doubts(conn, since='', doubt_ids=None):
+    """(id, subject, doubt_text, response, response_time) for answered doubts"""
+    query = '''
+        SELECT id, subject, doubt_text, response, response_time FROM doubts
+        WHERE status != 'open' AND response IS NOT NULL AND response != ''
+          AND COALESCE(response_time, '') >= ?
+    '''
+    params = [since]
+    if doubt_ids is not None:
+        query += f" AND id IN ({', '.join('?' * len(doubt_ids))})"
+        params += list(doubt_ids)
+    return conn.execute(query + ' ORDER BY id', params).fetchall()
+
+
+def build_index(conn, path=None):
+    """Index every resolved doubt and write the index to disk"""
+    index = AnswerIndex()
+    for row in resolved_doubts(conn):
+        index.add(*row)
+    index.save(path or INDEX_PATH)
+    return index
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_index():
+    """The process-wide index: loaded from INDEX_PATH and caught up with the database"""
+    global _index
+    with _lock:
+        if _index is None:
+            index = AnswerIndex()
+            if os.path.exists(INDEX_PATH):
+                try:
+                    index = AnswerIndex.load(INDEX_PATH)
+                except ValueError:
+                    # Written by an older version; rebuilt from the database below
+                    pass
+            conn = sqlite3.connect(DATABASE)
+            try:
+                if has_answers(conn.cursor()):
+                    for row in resolved_doubts(conn, since=index.watermark):
+                        index.add(*row)
+            finally:
+                conn.close()
+            _index = index
+        return _index
+
+
+def index_answers(conn, doubt_ids):
+    """Add just-answered doubts to the loaded index; an unloaded index picks them up when it loads"""
+    if _index is None or not doubt_ids:
+        return
+    rows = resolved_doubts(conn, doubt_ids=doubt_ids)
+    with _lock:
+        for row in rows:
+            _index.add(*row)
+
+
+def invalidate():
+    global _index
+    with _lock:
+        _index = None
+
+
+def suggest(conn, text, subject=None, k=TOP_K, exclude=()):
+    """Past answers most relevant to `text`, best first"""
+    index = get_index()
+    with _lock:
+        hits = index.search(text, subject, k, exclude)
+    if not hits:
+        return []
+    ids = [doubt_id for doubt_id, _ in hits]
+    cur = conn.execute(f'''
+        SELECT id, subject, doubt_text, response FROM doubts WHERE id IN ({', '.join('?' * len(ids))})
+    ''', ids)
+    rows = {row[0]: row for row in cur.fetchall()}
+    return [{
+        'id': doubt_id,
+        'subject': rows[doubt_id][1],
+        'doubt_text': rows[doubt_id][2],
+        'response': rows[doubt_id][3],
+        'score': round(score, 3),
+    } for doubt_id, score in hits if doubt_id in rows]
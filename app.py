@@ -50,6 +50,42 @@ def create_app():
     except ImportError:
         pass
 
+    # Fingerprinted static assets (asset_url() in templates)
+    import assets
+    assets.init_app(app)
+
+    # {% cache %} template fragments
+    import fragment_cache
+    fragment_cache.init_app(app)
+
+    # Subscribable .ics timetable feeds
+    import calendar_feeds
+    calendar_feeds.init_app(app)
+
+    # Server-Sent Events notification stream
+    import notifications
+    notifications.init_app(app)
+
+    # Chunked, resumable uploads for submissions and class resources
+    import uploads
+    uploads.init_app(app)
+
+    # Schedule, resource and submission downloads (Range, ETag, X-Sendfile)
+    import downloads
+    downloads.init_app(app)
+
+    # Anonymous student-teacher messaging (cursor-paged threads, long-poll)
+    import messaging
+    messaging.init_app(app)
+
+    # Class reminders from the timetable (timer wheel, notification bus / SMTP)
+    import reminders
+    reminders.init_app(app)
+
+    # gzip/brotli for large HTML and JSON responses
+    import compression
+    compression.init_app(app)
+
     return app
 
 if __name__ == '__main__':
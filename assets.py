@@ -0,0 +1,138 @@
+"""
+Static asset pipeline
+`python devtools.py build-assets` copies every .css/.js file under static/
+into static/dist/ with a content hash in its name, writes gzip (and brotli,
+when the brotli package is installed) variants next to it, and records the
+mapping in static/dist/manifest.json.
+
+Templates call asset_url('js/teacher_marks.js'), which returns the hashed
+URL when a build exists and falls back to the plain static URL otherwise.
+Hashed files never change, so they are served with immutable cache headers.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+from flask import abort, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = 'static'
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+ASSET_EXTENSIONS = ('.css', '.js')
+SKIP_DIRS = (DIST_DIR, 'uploads', 'images')
+
+# One year; hashed file names change whenever the content does
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+
+def _source_files(static_dir):
+    """Yield (logical_name, path) for every CSS/JS source file under static_dir"""
+    for root, dirs, files in os.walk(static_dir):
+        rel_root = os.path.relpath(root, static_dir)
+        if rel_root == '.':
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for filename in sorted(files):
+            if filename.endswith(ASSET_EXTENSIONS):
+                path = os.path.join(root, filename)
+                logical = os.path.relpath(path, static_dir).replace(os.sep, '/')
+                yield logical, path
+
+
+def build_assets(static_dir=STATIC_DIR):
+    """Fingerprint and precompress all CSS/JS assets; returns the manifest dict"""
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    os.makedirs(dist_dir, exist_ok=True)
+
+    manifest = {}
+    written = set()
+
+    for logical, path in _source_files(static_dir):
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        base, ext = os.path.splitext(logical)
+        hashed = f'{base}.{digest}{ext}'
+        target = os.path.join(dist_dir, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        with open(target, 'wb') as f:
+            f.write(content)
+        # mtime=0 keeps the gzip output byte-identical between builds
+        with open(target + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        written.update({hashed, hashed + '.gz'})
+
+        if brotli is not None:
+            with open(target + '.br', 'wb') as f:
+                f.write(brotli.compress(content, quality=11))
+            written.add(hashed + '.br')
+
+        manifest[logical] = hashed
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    written.add(MANIFEST_NAME)
+
+    # Remove outputs of previous builds
+    for root, _, files in os.walk(dist_dir):
+        for filename in files:
+            rel = os.path.relpath(os.path.join(root, filename), dist_dir).replace(os.sep, '/')
+            if rel not in written:
+                os.remove(os.path.join(root, filename))
+
+    return manifest
+
+
+def load_manifest(static_dir):
+    """Read the build manifest, or return an empty one if assets were never built"""
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_app(app):
+    """Register asset_url() for templates and the immutable /assets/ route"""
+    dist_dir = os.path.join(app.static_folder, DIST_DIR)
+    manifest = load_manifest(app.static_folder)
+    hashed_names = set(manifest.values())
+
+    def asset_url(filename):
+        """url_for wrapper that emits the fingerprinted file name when available"""
+        hashed = manifest.get(filename)
+        if hashed:
+            return url_for('asset', filename=hashed)
+        return url_for('static', filename=filename)
+
+    def asset(filename):
+        """Serve a fingerprinted asset, preferring a precompressed variant"""
+        if filename not in hashed_names:
+            abort(404)
+
+        accepted = request.accept_encodings
+        served_name, encoding = filename, None
+        for ext, name in (('.br', 'br'), ('.gz', 'gzip')):
+            if accepted[name] and os.path.exists(os.path.join(dist_dir, filename + ext)):
+                served_name, encoding = filename + ext, name
+                break
+
+        mimetype = 'text/css' if filename.endswith('.css') else 'application/javascript'
+        response = send_from_directory(dist_dir, served_name, mimetype=mimetype,
+                                       max_age=31536000, conditional=True)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.add_url_rule('/assets/<path:filename>', 'asset', asset)
+    app.jinja_env.globals['asset_url'] = asset_url
@@ -0,0 +1,144 @@
+"""
+Content-addressed blob store
+Uploaded files are stored once per distinct content, named by their SHA-256
+and sharded two levels deep by hash prefix:
+
+    uploads/blobs/3f/a2/3fa2c9...
+
+so no directory grows past a few hundred entries, and the same schedule PDF
+uploaded for six sections occupies disk once. The blobs table keeps a
+reference count that triggers maintain from classes.schedule_pdf_sha256 and
+resources.sha256 (see migrate_blobs.py); code that stores a file only needs
+to write the hash into the referencing row.
+
+Unreferenced blobs are removed by collect_garbage() once they have been
+unreferenced for GC_GRACE_SECONDS, which leaves time for a request that has
+stored a blob to insert the row that references it. The same pass removes
+files that have no blobs row at all (left behind when the transaction that
+stored them rolled back) and stale staging files, once they are older than
+the grace period.
+"""
+
+import hashlib
+import os
+import time
+
+BLOB_ROOT = os.path.join('uploads', 'blobs')
+# Blobs must have been unreferenced this long before garbage collection removes them
+GC_GRACE_SECONDS = 60 * 60
+BLOCK_SIZE = 64 * 1024
+
+
+def has_blobs_table(cur):
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'blobs'")
+    return cur.fetchone() is not None
+
+
+def blob_path(sha256):
+    return os.path.join(BLOB_ROOT, sha256[:2], sha256[2:4], sha256)
+
+
+def staging_directory():
+    """Where callers write files before handing them to store_file()"""
+    return os.path.join(BLOB_ROOT, 'staging')
+
+
+def hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def store_file(conn, source, sha256=None, content_type=None):
+    """Move a finished file into the store and return its blob path; the caller commits.
+
+    If the content is already stored, `source` is deleted instead. The blob row
+    is written before the file is checked, so a concurrent collect_garbage()
+    either runs first (and the file is rewritten) or waits for this transaction.
+    """
+    sha256 = sha256 or hash_file(source)
+    conn.execute('''
+        INSERT INTO blobs (sha256, size_bytes, content_type) VALUES (?, ?, ?)
+        ON CONFLICT(sha256) DO UPDATE SET updated_at = CURRENT_TIMESTAMP
+    ''', (sha256, os.path.getsize(source), content_type))
+
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.remove(source)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source, path)
+    # Garbage collection spares files for the grace period counted from their mtime
+    os.utime(path)
+    return path
+
+
+def reference_count(conn, sha256):
+    row = conn.execute('SELECT ref_count FROM blobs WHERE sha256 = ?', (sha256,)).fetchone()
+    return row[0] if row else 0
+
+
+def recount(conn):
+    """Recompute every reference count from the referencing tables; the caller commits"""
+    conn.execute('''
+        UPDATE blobs SET ref_count =
+            (SELECT COUNT(*) FROM classes WHERE schedule_pdf_sha256 = blobs.sha256) +
+            (SELECT COUNT(*) FROM resources WHERE sha256 = blobs.sha256)
+    ''')
+
+
+def _remove_empty_shards(path):
+    directory = os.path.dirname(path)
+    for _ in range(2):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return
+        directory = os.path.dirname(directory)
+
+
+def collect_garbage(conn, grace_seconds=GC_GRACE_SECONDS, now=None):
+    """Delete blobs nothing has referenced for grace_seconds, and orphaned files as old.
+
+    Returns (blobs removed, bytes freed); the caller commits.
+    """
+    now = now or time.time()
+    cutoff = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now - grace_seconds))
+    cur = conn.cursor()
+    cur.execute('SELECT sha256, size_bytes FROM blobs WHERE ref_count <= 0 AND updated_at <= ?', (cutoff,))
+    removed = freed = 0
+    for sha256, size_bytes in cur.fetchall():
+        cur.execute('DELETE FROM blobs WHERE sha256 = ? AND ref_count <= 0', (sha256,))
+        if cur.rowcount != 1:
+            continue
+        path = blob_path(sha256)
+        if os.path.exists(path):
+            os.remove(path)
+            _remove_empty_shards(path)
+        removed += 1
+        freed += size_bytes or 0
+
+    # Files with no row: stored by a transaction that rolled back, or staged and never stored
+    cutoff_time = now - grace_seconds
+    for directory, _, names in os.walk(BLOB_ROOT):
+        in_staging = os.path.abspath(directory) == os.path.abspath(staging_directory())
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff_time:
+                continue
+            if not in_staging:
+                cur.execute('SELECT 1 FROM blobs WHERE sha256 = ?', (name,))
+                if cur.fetchone() is not None or path != blob_path(name):
+                    continue
+            os.remove(path)
+            if not in_staging:
+                _remove_empty_shards(path)
+            removed += 1
+            freed += stat.st_size
+    return removed, freed
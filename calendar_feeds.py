@@ -0,0 +1,278 @@
+"""
+iCalendar (.ics) timetable feeds
+Every teacher, student and class gets a feed URL that phone and desktop
+calendars can subscribe to. Each class becomes weekly recurring events
+(one per distinct start/end time) carrying the meeting_link.
+
+Calendar clients poll every few minutes without a session cookie, so feed
+URLs carry an HMAC token derived from SECRET_KEY instead of requiring a
+login. Rendered feeds are cached per subject and tagged with the
+data_versions of the timetable tables; the ETag is a hash of the feed
+body, so a poll is one version lookup and usually a 304.
+"""
+
+import hashlib
+import hmac
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta, timezone
+
+from flask import Response, abort, current_app, request, url_for
+
+import data_versions
+import timetable
+
+DATABASE = 'users.db'
+
+# Tables a feed is built from
+CALENDAR_TABLES = ('classes', 'class_sessions', 'teacher_class_map', 'student_class_map', 'users')
+
+# Classes in each kind of feed, and the name shown as the calendar title
+FEED_QUERIES = {
+    'teacher': (
+        'SELECT class_id FROM teacher_class_map WHERE teacher_id = ?',
+        "SELECT COALESCE(name, username) FROM users WHERE id = ? AND role = 'teacher'",
+    ),
+    'student': (
+        "SELECT class_id FROM student_class_map WHERE student_id = ? AND status = 'active'",
+        "SELECT COALESCE(name, username) FROM users WHERE id = ? AND role = 'student'",
+    ),
+    'class': (
+        'SELECT id FROM classes WHERE id = ?',
+        'SELECT name FROM classes WHERE id = ?',
+    ),
+}
+
+ICAL_DAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+FEED_CACHE_CONTROL = 'private, no-cache'
+
+Feed = namedtuple('Feed', ['body', 'etag', 'last_modified'])
+
+
+def feed_token(kind, subject_id, secret=None):
+    """Unguessable token for a feed URL"""
+    secret = secret if secret is not None else current_app.config['SECRET_KEY']
+    message = f'{kind}:{int(subject_id)}'.encode()
+    return hmac.new(str(secret).encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def _escape(text):
+    return (str(text).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces (RFC 5545 section 3.1)"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return [line]
+    pieces, current = [], b''
+    for char in line:
+        size = len(char.encode('utf-8'))
+        if len(current) + size > (75 if not pieces else 74):
+            pieces.append(current.decode('utf-8'))
+            current = b''
+        current += char.encode('utf-8')
+    pieces.append(current.decode('utf-8'))
+    return [pieces[0]] + [' ' + piece for piece in pieces[1:]]
+
+
+def _stamp(value):
+    """SQLite CURRENT_TIMESTAMP (UTC) as an iCalendar UTC date-time"""
+    try:
+        moment = datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        moment = datetime(2000, 1, 1)
+    return moment.strftime('%Y%m%dT%H%M%SZ'), moment.date()
+
+
+def render_calendar(name, classes, sessions):
+    """Build the .ics text.
+
+    `classes` is a list of (id, name, grade_level, meeting_link, created_on,
+    updated_on) rows and `sessions` maps class_id to (weekday, start, end)
+    tuples. Output depends only on its inputs, so an unchanged timetable
+    always renders the same bytes.
+    """
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//SMCT LMS//Class Timetable//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+        'X-PUBLISHED-TTL:PT15M',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT15M',
+    ]
+
+    for class_id, class_name, grade_level, meeting_link, created_on, updated_on in classes:
+        by_time = {}
+        for weekday, start, end in sessions.get(class_id, ()):
+            by_time.setdefault((start, end), []).append(weekday)
+
+        dtstamp, _ = _stamp(updated_on or created_on)
+        _, created = _stamp(created_on)
+        for (start, end), weekdays in sorted(by_time.items()):
+            # First occurrence on or after the day the class was created
+            first = min(created + timedelta(days=(day - created.weekday()) % 7) for day in weekdays)
+            begins = datetime.combine(first, datetime.min.time()) + timedelta(minutes=start)
+            ends = datetime.combine(first, datetime.min.time()) + timedelta(minutes=end)
+
+            lines += [
+                'BEGIN:VEVENT',
+                f'UID:class-{class_id}-{start}-{end}@smct-lms',
+                f'DTSTAMP:{dtstamp}',
+                f"DTSTART:{begins.strftime('%Y%m%dT%H%M%S')}",
+                f"DTEND:{ends.strftime('%Y%m%dT%H%M%S')}",
+                f"RRULE:FREQ=WEEKLY;BYDAY={','.join(ICAL_DAYS[day] for day in sorted(weekdays))}",
+                f'SUMMARY:{_escape(class_name)}',
+            ]
+            description = f'Grade {grade_level}' if grade_level else ''
+            if meeting_link:
+                description = f'{description}\nJoin: {meeting_link}'.strip()
+                lines += [f'URL:{meeting_link}', f'LOCATION:{_escape(meeting_link)}']
+            if description:
+                lines.append(f'DESCRIPTION:{_escape(description)}')
+            lines.append('END:VEVENT')
+
+    lines.append('END:VCALENDAR')
+    return ''.join(piece + '\r\n' for line in lines for piece in _fold(line))
+
+
+def load_feed(conn, kind, subject_id):
+    """Render the feed for a teacher, student or class; None if the subject does not exist"""
+    class_query, name_query = FEED_QUERIES[kind]
+    cur = conn.cursor()
+    cur.execute(name_query, (subject_id,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    name = f'{row[0]} - Timetable'
+
+    cur.execute(class_query, (subject_id,))
+    class_ids = [r[0] for r in cur.fetchall()]
+    classes = []
+    if class_ids:
+        cur.execute(f'''
+            SELECT id, name, grade_level, meeting_link, created_on, updated_on
+            FROM classes
+            WHERE status = 'active' AND id IN ({', '.join('?' for _ in class_ids)})
+            ORDER BY id
+        ''', class_ids)
+        classes = cur.fetchall()
+
+    return render_calendar(name, classes, timetable.sessions_by_class(conn, [c[0] for c in classes]))
+
+
+class FeedCache:
+    """LRU cache of rendered feeds keyed by (kind, subject_id)"""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conn, kind, subject_id):
+        """Return the Feed for a subject, re-rendering it when the timetable tables change"""
+        key = (kind, int(subject_id))
+        versions = data_versions.versions_for(CALENDAR_TABLES, conn)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and versions is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        text = load_feed(conn, kind, subject_id)
+        if text is None:
+            return None
+        body = text.encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()[:20]
+
+        # Last-Modified only moves when the feed content actually changes
+        previous = entry[1] if entry is not None else None
+        if previous is not None and previous.etag == etag:
+            last_modified = previous.last_modified
+        else:
+            last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        feed = Feed(body, etag, last_modified)
+
+        if versions is not None:
+            with self._lock:
+                self._entries[key] = (versions, feed)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+        return feed
+
+    def clear(self):
+        """Drop every cached feed and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size
+            }
+
+
+feed_cache = FeedCache()
+
+
+def _is_fresh(feed):
+    """True if the client's conditional headers match the current feed"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(feed.etag)
+    since = request.if_modified_since
+    return since is not None and feed.last_modified <= since
+
+
+def serve_feed(kind, subject_id, token):
+    """View for /calendar/<kind>/<id>/<token>.ics"""
+    if kind not in FEED_QUERIES or not hmac.compare_digest(token, feed_token(kind, subject_id)):
+        abort(404)
+
+    conn = sqlite3.connect(DATABASE)
+    try:
+        feed = feed_cache.get(conn, kind, subject_id)
+    finally:
+        conn.close()
+    if feed is None:
+        abort(404)
+
+    if _is_fresh(feed):
+        response = Response(status=304)
+    else:
+        response = Response(feed.body, mimetype='text/calendar')
+        response.headers['Content-Disposition'] = f'inline; filename="{kind}-{subject_id}.ics"'
+    response.set_etag(feed.etag)
+    response.last_modified = feed.last_modified
+    response.headers['Cache-Control'] = FEED_CACHE_CONTROL
+    return response
+
+
+def calendar_feed_url(kind, subject_id):
+    """Absolute subscription URL for a feed (templates: calendar_feed_url('teacher', id))"""
+    return url_for('calendar_feed', kind=kind, subject_id=subject_id,
+                   token=feed_token(kind, subject_id), _external=True)
+
+
+def init_app(app):
+    """Register the feed endpoint and the calendar_feed_url() template helper"""
+    app.add_url_rule('/calendar/<kind>/<int:subject_id>/<token>.ics', 'calendar_feed', serve_feed)
+    app.jinja_env.globals['calendar_feed_url'] = calendar_feed_url
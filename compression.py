@@ -0,0 +1,287 @@
+"""
+Response compression middleware
+Wraps the WSGI app and compresses text responses (HTML, JSON, CSS, JS)
+with brotli or gzip depending on the client's Accept-Encoding. Small
+bodies, already-encoded responses and binary types such as the schedule
+PDFs pass through untouched. Streamed responses are compressed chunk by
+chunk and flushed so the browser still receives rows as they render.
+
+Per-endpoint compression ratio and CPU time are kept in memory; admins
+can read them from /admin/compression_stats to tune the levels.
+"""
+
+import threading
+import time
+import zlib
+
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth the CPU or the gzip header overhead
+MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+ENDPOINT_KEY = 'compression.endpoint'
+
+
+class CompressionStats:
+    """Thread-safe per-endpoint counters for compressed responses"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, encoding, bytes_in, bytes_out, cpu_seconds):
+        with self._lock:
+            entry = self._endpoints.setdefault(endpoint, {
+                'responses': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_seconds': 0.0, 'encodings': {},
+            })
+            entry['responses'] += 1
+            entry['bytes_in'] += bytes_in
+            entry['bytes_out'] += bytes_out
+            entry['cpu_seconds'] += cpu_seconds
+            entry['encodings'][encoding] = entry['encodings'].get(encoding, 0) + 1
+
+    def snapshot(self):
+        """Copy of the counters with ratio and average CPU time filled in"""
+        with self._lock:
+            result = {}
+            for endpoint, entry in self._endpoints.items():
+                data = dict(entry, encodings=dict(entry['encodings']))
+                data['ratio'] = round(entry['bytes_in'] / entry['bytes_out'], 2) if entry['bytes_out'] else 0
+                data['avg_cpu_ms'] = round(entry['cpu_seconds'] * 1000 / entry['responses'], 3)
+                result[endpoint] = data
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+class _Compressor:
+    """Common interface over zlib (gzip framing) and brotli stream compressors"""
+
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._obj = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def flush(self):
+        """Emit everything compressed so far without ending the stream"""
+        if self.encoding == 'br':
+            return self._obj.flush()
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._obj.finish()
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+def choose_encoding(accept_encoding):
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, or None"""
+    offered = {}
+    for part in (accept_encoding or '').split(','):
+        pieces = part.strip().split(';')
+        name = pieces[0].strip().lower()
+        quality = 1.0
+        for param in pieces[1:]:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            offered[name] = quality
+
+    if brotli is not None and offered.get('br', 0) > 0:
+        return 'br'
+    if offered.get('gzip', offered.get('*', 0)) > 0:
+        return 'gzip'
+    return None
+
+
+class CompressionMiddleware:
+    """WSGI middleware negotiating gzip/brotli compression for text responses"""
+
+    def __init__(self, app, min_size=MIN_SIZE, gzip_level=GZIP_LEVEL,
+                 brotli_quality=BROTLI_QUALITY, stats=None):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.stats = stats if stats is not None else CompressionStats()
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = choose_encoding(environ.get('HTTP_ACCEPT_ENCODING'))
+
+        captured = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            if exc_info is not None and captured.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            captured['status'] = status
+            captured['headers'] = headers
+            captured['exc_info'] = exc_info
+            return self._write_unsupported
+
+        app_iter = self.app(environ, capture_start_response)
+        callbacks = [app_iter.close] if hasattr(app_iter, 'close') else []
+        return ClosingIterator(self._respond(environ, start_response, app_iter, captured, encoding), callbacks)
+
+    @staticmethod
+    def _write_unsupported(data):
+        raise RuntimeError('CompressionMiddleware does not support the WSGI write() callable')
+
+    def _should_compress(self, status, headers):
+        """Decide from status and headers alone whether the body may be compressed"""
+        if not status.startswith('200'):
+            return False
+
+        names = {name.lower(): value for name, value in headers}
+        if 'content-encoding' in names or 'content-range' in names:
+            return False
+        if 'no-transform' in names.get('cache-control', '').lower():
+            return False
+
+        content_type = names.get('content-type', '').split(';')[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+
+        length = names.get('content-length')
+        if length is not None and length.isdigit() and int(length) < self.min_size:
+            return False
+        return True
+
+    def _respond(self, environ, start_response, app_iter, captured, encoding):
+        iterator = iter(app_iter)
+        # Flask calls start_response before producing the first chunk
+        first = next(iterator, None)
+        status, headers = captured['status'], captured['headers']
+
+        compressible = self._should_compress(status, headers)
+        if compressible:
+            headers = _add_vary(headers)
+
+        if not compressible or encoding is None:
+            captured['sent'] = True
+            start_response(status, headers, captured['exc_info'])
+            if first is not None:
+                yield first
+            yield from iterator
+            return
+
+        streaming = not any(name.lower() == 'content-length' for name, _ in headers)
+
+        # Buffer until we know the body is at least min_size bytes
+        buffered = [first] if first is not None else []
+        size = len(first or b'')
+        exhausted = first is None
+        while size < self.min_size and not exhausted:
+            chunk = next(iterator, None)
+            if chunk is None:
+                exhausted = True
+            else:
+                buffered.append(chunk)
+                size += len(chunk)
+
+        if size < self.min_size:
+            captured['sent'] = True
+            start_response(status, headers, captured['exc_info'])
+            yield b''.join(buffered)
+            return
+
+        compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+        headers = [(name, value) for name, value in headers if name.lower() != 'content-length']
+        headers = [(name, _weaken_etag(value) if name.lower() == 'etag' else value)
+                   for name, value in headers]
+        headers.append(('Content-Encoding', encoding))
+        captured['sent'] = True
+        start_response(status, headers, captured['exc_info'])
+
+        bytes_in, bytes_out, cpu = 0, 0, 0.0
+
+        def feed(data, flush):
+            nonlocal bytes_in, bytes_out, cpu
+            started = time.thread_time()
+            out = compressor.compress(data)
+            if flush:
+                out += compressor.flush()
+            cpu += time.thread_time() - started
+            bytes_in += len(data)
+            bytes_out += len(out)
+            return out
+
+        out = feed(b''.join(buffered), flush=streaming)
+        if out:
+            yield out
+        for chunk in iterator:
+            if not chunk:
+                continue
+            out = feed(chunk, flush=streaming)
+            if out:
+                yield out
+
+        started = time.thread_time()
+        tail = compressor.finish()
+        cpu += time.thread_time() - started
+        bytes_out += len(tail)
+
+        endpoint = environ.get(ENDPOINT_KEY) or environ.get('PATH_INFO', '')
+        self.stats.record(endpoint, encoding, bytes_in, bytes_out, cpu)
+        yield tail
+
+
+def _add_vary(headers):
+    """Add Accept-Encoding to the Vary header"""
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == 'vary':
+            if 'accept-encoding' in value.lower() or value.strip() == '*':
+                return headers
+            headers = list(headers)
+            headers[index] = (name, value + ', Accept-Encoding')
+            return headers
+    return list(headers) + [('Vary', 'Accept-Encoding')]
+
+
+def _weaken_etag(value):
+    """A compressed body is not byte-identical to the original, so its ETag is weak"""
+    return value if value.startswith('W/') else 'W/' + value
+
+
+def init_app(app, **options):
+    """Install the middleware and tag each request with its Flask endpoint for stats"""
+
+    @app.after_request
+    def remember_endpoint(response):
+        from flask import request
+        request.environ[ENDPOINT_KEY] = request.endpoint
+        return response
+
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, **options)
+    app.extensions['compression'] = app.wsgi_app
+    return app.wsgi_app
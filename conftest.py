@@ -0,0 +1,32 @@
+"""
+Shared pytest fixtures
+
+Tests work on a copy of the shipped users.db inside pytest's tmp_path, so the
+real database is never written and pytest cleans the copies up itself.
+"""
+
+import os
+import shutil
+
+import pytest
+
+SHIPPED_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'users.db')
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path of a fresh, unmigrated copy of users.db"""
+    path = tmp_path / 'users.db'
+    shutil.copy(SHIPPED_DB, path)
+    return str(path)
+
+
+@pytest.fixture
+def app_in_tmp(db_path, tmp_path, monkeypatch):
+    """The app running from tmp_path, so routes that open 'users.db' get the copy"""
+    from app import create_app
+
+    monkeypatch.chdir(tmp_path)
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
@@ -0,0 +1,79 @@
+"""
+Data version tracking for cache invalidation
+Each tracked table has a counter in data_versions that triggers bump on every
+INSERT, UPDATE and DELETE. Caches, ETags and client polling compare version
+tuples instead of re-running the queries they depend on.
+"""
+
+import sqlite3
+
+DATABASE = 'users.db'
+
+# Tables whose changes are tracked by triggers
+TRACKED_TABLES = [
+    'users', 'user_role_map', 'classes', 'subjects',
+    'student_class_map', 'teacher_class_map', 'student_subjects', 'teacher_subjects',
+    'attendance', 'assessments', 'marks', 'feedback', 'doubts', 'class_sessions'
+]
+
+
+def install(conn, tables=None):
+    """Create the data_versions table and version triggers (safe to run repeatedly)"""
+    tables = tables or TRACKED_TABLES
+    cur = conn.cursor()
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+
+    for table in tables:
+        cur.execute('INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)', (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cur.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS bump_version_{table}_{event.lower()}
+                    AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}';
+                END
+            ''')
+
+
+def versions_for(tables, conn=None):
+    """Return a tuple of version numbers for the given tables, in the same order.
+
+    Returns None when the data_versions table has not been created yet, so
+    callers can fall back to uncached behaviour instead of caching forever.
+    """
+    tables = list(tables)
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(DATABASE)
+
+    try:
+        cur = conn.cursor()
+        cur.execute(f'''
+            SELECT table_name, version FROM data_versions
+            WHERE table_name IN ({', '.join('?' for _ in tables)})
+        ''', tables)
+        found = dict(cur.fetchall())
+        return tuple(found.get(table, 0) for table in tables)
+
+    except sqlite3.OperationalError as e:
+        if 'no such table' in str(e):
+            return None
+        raise
+
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def bump(conn, *tables):
+    """Manually bump versions, for changes made outside the tracked tables"""
+    conn.executemany('''
+        INSERT INTO data_versions (table_name, version) VALUES (?, 1)
+        ON CONFLICT(table_name) DO UPDATE SET version = version + 1
+    ''', [(table,) for table in tables])
@@ -74,6 +74,7 @@ CREATE TABLE classes (
     schedule_time_start TEXT,  -- HH:MM format
     schedule_time_end TEXT,    -- HH:MM format
     schedule_pdf_path TEXT,    -- File path for uploaded PDF schedules
+    schedule_pdf_sha256 TEXT,  -- Blob holding the schedule PDF (see blobs)
     meeting_link TEXT,  -- Virtual meeting link for online classes (Zoom, Teams, etc.)
     max_students INTEGER DEFAULT 30,
     status TEXT DEFAULT 'active',  -- active, inactive, archived
@@ -85,6 +86,16 @@ CREATE TABLE classes (
     FOREIGN KEY (updated_by) REFERENCES users(id)
 );
 
+-- Normalized weekly timetable: one row per class meeting (weekday 0 = Monday)
+CREATE TABLE class_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    class_id INTEGER NOT NULL,
+    weekday INTEGER NOT NULL CHECK(weekday BETWEEN 0 AND 6),
+    start_minute INTEGER NOT NULL CHECK(start_minute BETWEEN 0 AND 1439),  -- minutes since midnight
+    end_minute INTEGER NOT NULL CHECK(end_minute > start_minute AND end_minute <= 1440),
+    FOREIGN KEY (class_id) REFERENCES classes(id) ON DELETE CASCADE
+);
+
 -- ============================================================================
 -- ASSIGNMENT AND MAPPING TABLES
 -- ============================================================================
@@ -195,8 +206,14 @@ CREATE TABLE doubts (
     resolved_by INTEGER,  -- Teacher/admin who resolved the doubt
     response TEXT,  -- Response text from teacher/admin
     response_time DATETIME,
+    class_id INTEGER,  -- Class whose subject teachers the doubt is routed to (NULL: all teachers of the subject)
+    priority INTEGER NOT NULL DEFAULT 0,  -- 0 normal, 1 high, 2 urgent
+    claimed_by INTEGER,  -- Teacher holding the answer lease
+    claim_expires DATETIME,  -- When the lease lapses (UTC)
     FOREIGN KEY (student_id) REFERENCES users(id) ON DELETE CASCADE,
-    FOREIGN KEY (resolved_by) REFERENCES users(id)
+    FOREIGN KEY (resolved_by) REFERENCES users(id),
+    FOREIGN KEY (class_id) REFERENCES classes(id),
+    FOREIGN KEY (claimed_by) REFERENCES users(id)
 );
 
 -- ============================================================================
@@ -276,6 +293,8 @@ CREATE INDEX idx_users_created_on ON users(created_on);
 CREATE INDEX idx_classes_status ON classes(status);
 CREATE INDEX idx_classes_grade_level ON classes(grade_level);
 CREATE INDEX idx_classes_created_on ON classes(created_on);
+CREATE INDEX idx_class_sessions_class ON class_sessions(class_id);
+CREATE INDEX idx_class_sessions_day_start ON class_sessions(weekday, start_minute);
 
 -- Student assignment indexes
 CREATE INDEX idx_student_class_map_student ON student_class_map(student_id);
@@ -299,6 +318,9 @@ CREATE INDEX idx_doubts_student ON doubts(student_id);
 CREATE INDEX idx_doubts_status ON doubts(status);
 CREATE INDEX idx_doubts_subject ON doubts(subject);
 CREATE INDEX idx_doubts_submitted ON doubts(submitted_on);
+-- Teacher doubt queues and open counts read only the open doubts
+CREATE INDEX idx_doubts_open ON doubts(subject, class_id, priority, submitted_on, status) WHERE status = 'open';
+CREATE INDEX idx_doubts_resolved_by ON doubts(resolved_by, response_time);
 
 -- Attendance system indexes
 CREATE INDEX idx_attendance_student ON attendance(student_id);
@@ -420,13 +442,19 @@ END;
 -- ============================================================================
 
 -- Announcements posted by teachers/admins
+-- Each announcement targets one scope: the whole school, a grade, a class
+-- or a subject. scope_key ('school', 'grade:10', 'class:12', 'subject:Math')
+-- is what feeds query, so a user's feed is a merge of index ranges.
 CREATE TABLE announcements (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     title TEXT NOT NULL,
     content TEXT NOT NULL,
     author_id INTEGER NOT NULL,
-    class_id INTEGER,  -- NULL means announcement for all classes
-    subject_name TEXT,  -- NULL means announcement for all subjects
+    scope TEXT NOT NULL DEFAULT 'school' CHECK(scope IN ('school', 'grade', 'class', 'subject')),
+    scope_key TEXT NOT NULL DEFAULT 'school',
+    grade_level TEXT,  -- set for grade scope
+    class_id INTEGER,  -- set for class scope
+    subject_name TEXT,  -- set for subject scope
     priority TEXT DEFAULT 'normal' CHECK(priority IN ('low', 'normal', 'high', 'urgent')),
     is_active BOOLEAN DEFAULT 1,
     created_on DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -436,7 +464,405 @@ CREATE TABLE announcements (
     FOREIGN KEY (class_id) REFERENCES classes(id) ON DELETE CASCADE
 );
 
+-- Per-user read cursor: everything in the user's feed with id <= last_read_id is read
+CREATE TABLE announcement_reads (
+    user_id INTEGER PRIMARY KEY,
+    last_read_id INTEGER NOT NULL DEFAULT 0,
+    updated_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
 -- Index for announcements
 CREATE INDEX idx_announcements_author ON announcements(author_id);
 CREATE INDEX idx_announcements_class ON announcements(class_id);
-CREATE INDEX idx_announcements_active ON announcements(is_active, created_on);
\ No newline at end of file
+CREATE INDEX idx_announcements_active ON announcements(is_active, created_on);
+CREATE INDEX idx_announcements_scope ON announcements(scope_key, id);
+
+-- ============================================================================
+-- HOMEWORK TABLES
+-- ============================================================================
+
+-- Homework set by a teacher for one class and subject.
+-- student_count, submission_count and graded_count are maintained by the
+-- triggers below so submission rates are read straight off the row.
+CREATE TABLE homework (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    class_id INTEGER NOT NULL,
+    subject_name TEXT NOT NULL,
+    teacher_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT,
+    homework_type TEXT DEFAULT 'homework' CHECK(homework_type IN ('homework', 'quiz', 'project', 'lab', 'exam')),
+    max_points REAL NOT NULL DEFAULT 100 CHECK(max_points > 0),
+    due_at DATETIME NOT NULL,
+    allow_late BOOLEAN DEFAULT 0,
+    status TEXT DEFAULT 'active' CHECK(status IN ('active', 'closed')),
+    student_count INTEGER NOT NULL DEFAULT 0,  -- active students in the class
+    submission_count INTEGER NOT NULL DEFAULT 0,
+    graded_count INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (class_id) REFERENCES classes(id) ON DELETE CASCADE,
+    FOREIGN KEY (teacher_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- One submission per student per homework (resubmitting replaces it)
+CREATE TABLE homework_submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    homework_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    content TEXT,
+    file_path TEXT,
+    submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    is_late BOOLEAN DEFAULT 0,
+    grade REAL CHECK(grade >= 0),
+    feedback TEXT,
+    graded_by INTEGER,
+    graded_at DATETIME,
+    FOREIGN KEY (homework_id) REFERENCES homework(id) ON DELETE CASCADE,
+    FOREIGN KEY (student_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (graded_by) REFERENCES users(id)
+);
+
+-- Indexes for homework: "due this week" is a range scan on (class_id, due_at)
+CREATE INDEX idx_homework_class_due ON homework(class_id, due_at);
+CREATE INDEX idx_homework_teacher_due ON homework(teacher_id, due_at);
+CREATE UNIQUE INDEX idx_submissions_homework_student ON homework_submissions(homework_id, student_id);
+CREATE INDEX idx_submissions_student ON homework_submissions(student_id);
+
+-- Counter triggers for submissions
+CREATE TRIGGER homework_submission_insert AFTER INSERT ON homework_submissions
+BEGIN
+    UPDATE homework
+    SET submission_count = submission_count + 1, graded_count = graded_count + (NEW.grade IS NOT NULL)
+    WHERE id = NEW.homework_id;
+END;
+
+CREATE TRIGGER homework_submission_delete AFTER DELETE ON homework_submissions
+BEGIN
+    UPDATE homework
+    SET submission_count = submission_count - 1, graded_count = graded_count - (OLD.grade IS NOT NULL)
+    WHERE id = OLD.homework_id;
+END;
+
+CREATE TRIGGER homework_submission_graded AFTER UPDATE OF grade ON homework_submissions
+BEGIN
+    UPDATE homework
+    SET graded_count = graded_count + (NEW.grade IS NOT NULL) - (OLD.grade IS NOT NULL)
+    WHERE id = NEW.homework_id;
+END;
+
+-- Counter triggers for class rosters (open homework only)
+CREATE TRIGGER homework_roster_insert AFTER INSERT ON student_class_map
+WHEN NEW.status = 'active'
+BEGIN
+    UPDATE homework SET student_count = student_count + 1 WHERE class_id = NEW.class_id AND status = 'active';
+END;
+
+CREATE TRIGGER homework_roster_delete AFTER DELETE ON student_class_map
+WHEN OLD.status = 'active'
+BEGIN
+    UPDATE homework SET student_count = student_count - 1 WHERE class_id = OLD.class_id AND status = 'active';
+END;
+
+CREATE TRIGGER homework_roster_update AFTER UPDATE OF status, class_id ON student_class_map
+BEGIN
+    UPDATE homework SET student_count = student_count - 1
+    WHERE class_id = OLD.class_id AND status = 'active' AND OLD.status = 'active';
+    UPDATE homework SET student_count = student_count + 1
+    WHERE class_id = NEW.class_id AND status = 'active' AND NEW.status = 'active';
+END;
+
+-- ============================================================================
+-- FILE UPLOAD TABLES
+-- ============================================================================
+
+-- In-progress chunked uploads; received is the byte offset the next chunk must start at
+CREATE TABLE uploads (
+    id TEXT PRIMARY KEY,  -- random hex id, also the partial file name
+    user_id INTEGER NOT NULL,
+    kind TEXT NOT NULL CHECK(kind IN ('submission', 'resource')),
+    target_id INTEGER NOT NULL,  -- homework id for submissions, class id for resources
+    filename TEXT NOT NULL,
+    content_type TEXT,
+    total_size INTEGER NOT NULL CHECK(total_size > 0),
+    received INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'complete', 'failed')),
+    sha256 TEXT,
+    file_path TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Files shared with a class (lecture recordings, notes, worksheets)
+CREATE TABLE resources (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    class_id INTEGER NOT NULL,
+    uploader_id INTEGER NOT NULL,
+    type TEXT NOT NULL DEFAULT 'other' CHECK(type IN ('document', 'video', 'audio', 'image', 'other')),
+    filename TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    content_type TEXT,
+    size_bytes INTEGER,
+    sha256 TEXT,
+    upload_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (class_id) REFERENCES classes(id) ON DELETE CASCADE,
+    FOREIGN KEY (uploader_id) REFERENCES users(id)
+);
+
+-- Indexes for uploads and resources
+CREATE INDEX idx_uploads_status_updated ON uploads(status, updated_at);
+CREATE INDEX idx_resources_class ON resources(class_id, upload_time);
+
+-- ============================================================================
+-- CONTENT-ADDRESSED BLOB STORE
+-- ============================================================================
+
+-- One row per distinct file content, stored at uploads/blobs/<sha[0:2]>/<sha[2:4]>/<sha>.
+-- ref_count is maintained by triggers on classes and resources; blobs at zero are
+-- garbage collected after a grace period.
+CREATE TABLE blobs (
+    sha256 TEXT PRIMARY KEY,
+    size_bytes INTEGER NOT NULL,
+    content_type TEXT,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_blobs_unreferenced ON blobs(updated_at) WHERE ref_count <= 0;
+
+-- Reference triggers for blobs
+CREATE TRIGGER blob_ref_class_insert AFTER INSERT ON classes
+WHEN NEW.schedule_pdf_sha256 IS NOT NULL
+BEGIN
+    UPDATE blobs SET ref_count = ref_count + 1, updated_at = CURRENT_TIMESTAMP WHERE sha256 = NEW.schedule_pdf_sha256;
+END;
+
+CREATE TRIGGER blob_ref_class_delete AFTER DELETE ON classes
+WHEN OLD.schedule_pdf_sha256 IS NOT NULL
+BEGIN
+    UPDATE blobs SET ref_count = ref_count - 1, updated_at = CURRENT_TIMESTAMP WHERE sha256 = OLD.schedule_pdf_sha256;
+END;
+
+CREATE TRIGGER blob_ref_class_update AFTER UPDATE OF schedule_pdf_sha256 ON classes
+WHEN OLD.schedule_pdf_sha256 IS NOT NEW.schedule_pdf_sha256
+BEGIN
+    UPDATE blobs SET ref_count = ref_count - 1, updated_at = CURRENT_TIMESTAMP WHERE sha256 = OLD.schedule_pdf_sha256;
+    UPDATE blobs SET ref_count = ref_count + 1, updated_at = CURRENT_TIMESTAMP WHERE sha256 = NEW.schedule_pdf_sha256;
+END;
+
+CREATE TRIGGER blob_ref_resource_insert AFTER INSERT ON resources
+WHEN NEW.sha256 IS NOT NULL
+BEGIN
+    UPDATE blobs SET ref_count = ref_count + 1, updated_at = CURRENT_TIMESTAMP WHERE sha256 = NEW.sha256;
+END;
+
+CREATE TRIGGER blob_ref_resource_delete AFTER DELETE ON resources
+WHEN OLD.sha256 IS NOT NULL
+BEGIN
+    UPDATE blobs SET ref_count = ref_count - 1, updated_at = CURRENT_TIMESTAMP WHERE sha256 = OLD.sha256;
+END;
+
+-- ============================================================================
+-- DOUBT CLUSTERS (MINHASH / LSH)
+-- ============================================================================
+
+-- MinHash signature of each doubt (64 x 32-bit values) and the cluster it joined;
+-- cluster_id is the id of the cluster's first doubt
+CREATE TABLE doubt_signatures (
+    doubt_id INTEGER PRIMARY KEY,
+    cluster_id INTEGER NOT NULL,
+    signature BLOB NOT NULL,
+    FOREIGN KEY (doubt_id) REFERENCES doubts(id) ON DELETE CASCADE
+);
+
+-- One row per (band hash, doubt); doubts sharing a bucket are near-duplicate candidates
+CREATE TABLE doubt_lsh_buckets (
+    bucket INTEGER NOT NULL,
+    doubt_id INTEGER NOT NULL,
+    PRIMARY KEY (bucket, doubt_id)
+) WITHOUT ROWID;
+
+CREATE INDEX idx_doubt_signatures_cluster ON doubt_signatures(cluster_id);
+CREATE INDEX idx_doubt_lsh_buckets_doubt ON doubt_lsh_buckets(doubt_id);
+
+CREATE TRIGGER doubt_signatures_delete AFTER DELETE ON doubts
+BEGIN
+    DELETE FROM doubt_lsh_buckets WHERE doubt_id = OLD.id;
+    DELETE FROM doubt_signatures WHERE doubt_id = OLD.id;
+END;
+
+-- ============================================================================
+-- ANONYMOUS MESSAGING
+-- ============================================================================
+
+-- A student-teacher conversation. Anonymous students are shown under a
+-- pseudonym derived from pseudonym_salt, which differs in every thread.
+CREATE TABLE message_threads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER NOT NULL,
+    teacher_id INTEGER NOT NULL,
+    subject TEXT,
+    anonymous INTEGER NOT NULL DEFAULT 1,
+    pseudonym_salt TEXT NOT NULL,
+    last_message_id INTEGER,
+    last_message_on DATETIME,
+    created_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (student_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (teacher_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    thread_id INTEGER NOT NULL,
+    sender_id INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    created_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (thread_id) REFERENCES message_threads(id) ON DELETE CASCADE,
+    FOREIGN KEY (sender_id) REFERENCES users(id)
+);
+
+-- Threads are paged by (thread_id, id) cursors; inboxes by latest message
+CREATE INDEX idx_messages_thread ON messages(thread_id, id);
+CREATE INDEX idx_message_threads_student ON message_threads(student_id, last_message_id);
+CREATE INDEX idx_message_threads_teacher ON message_threads(teacher_id, last_message_id);
+
+-- ============================================================================
+-- DATA VERSION TRACKING (CACHE INVALIDATION)
+-- ============================================================================
+
+-- One counter per tracked table, bumped by triggers on every write.
+-- Caches and ETags compare version tuples instead of re-running queries.
+CREATE TABLE data_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+INSERT INTO data_versions (table_name, version) VALUES 
+    ('users', 0),
+    ('user_role_map', 0),
+    ('classes', 0),
+    ('subjects', 0),
+    ('student_class_map', 0),
+    ('teacher_class_map', 0),
+    ('student_subjects', 0),
+    ('teacher_subjects', 0),
+    ('attendance', 0),
+    ('assessments', 0),
+    ('marks', 0),
+    ('feedback', 0),
+    ('doubts', 0),
+    ('class_sessions', 0);
+
+-- Version triggers for users
+CREATE TRIGGER bump_version_users_insert AFTER INSERT ON users
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'users'; END;
+CREATE TRIGGER bump_version_users_update AFTER UPDATE ON users
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'users'; END;
+CREATE TRIGGER bump_version_users_delete AFTER DELETE ON users
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'users'; END;
+
+-- Version triggers for user_role_map
+CREATE TRIGGER bump_version_user_role_map_insert AFTER INSERT ON user_role_map
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'user_role_map'; END;
+CREATE TRIGGER bump_version_user_role_map_update AFTER UPDATE ON user_role_map
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'user_role_map'; END;
+CREATE TRIGGER bump_version_user_role_map_delete AFTER DELETE ON user_role_map
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'user_role_map'; END;
+
+-- Version triggers for classes
+CREATE TRIGGER bump_version_classes_insert AFTER INSERT ON classes
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'classes'; END;
+CREATE TRIGGER bump_version_classes_update AFTER UPDATE ON classes
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'classes'; END;
+CREATE TRIGGER bump_version_classes_delete AFTER DELETE ON classes
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'classes'; END;
+
+-- Version triggers for subjects
+CREATE TRIGGER bump_version_subjects_insert AFTER INSERT ON subjects
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'subjects'; END;
+CREATE TRIGGER bump_version_subjects_update AFTER UPDATE ON subjects
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'subjects'; END;
+CREATE TRIGGER bump_version_subjects_delete AFTER DELETE ON subjects
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'subjects'; END;
+
+-- Version triggers for student_class_map
+CREATE TRIGGER bump_version_student_class_map_insert AFTER INSERT ON student_class_map
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'student_class_map'; END;
+CREATE TRIGGER bump_version_student_class_map_update AFTER UPDATE ON student_class_map
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'student_class_map'; END;
+CREATE TRIGGER bump_version_student_class_map_delete AFTER DELETE ON student_class_map
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'student_class_map'; END;
+
+-- Version triggers for teacher_class_map
+CREATE TRIGGER bump_version_teacher_class_map_insert AFTER INSERT ON teacher_class_map
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'teacher_class_map'; END;
+CREATE TRIGGER bump_version_teacher_class_map_update AFTER UPDATE ON teacher_class_map
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'teacher_class_map'; END;
+CREATE TRIGGER bump_version_teacher_class_map_delete AFTER DELETE ON teacher_class_map
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'teacher_class_map'; END;
+
+-- Version triggers for student_subjects
+CREATE TRIGGER bump_version_student_subjects_insert AFTER INSERT ON student_subjects
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'student_subjects'; END;
+CREATE TRIGGER bump_version_student_subjects_update AFTER UPDATE ON student_subjects
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'student_subjects'; END;
+CREATE TRIGGER bump_version_student_subjects_delete AFTER DELETE ON student_subjects
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'student_subjects'; END;
+
+-- Version triggers for teacher_subjects
+CREATE TRIGGER bump_version_teacher_subjects_insert AFTER INSERT ON teacher_subjects
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'teacher_subjects'; END;
+CREATE TRIGGER bump_version_teacher_subjects_update AFTER UPDATE ON teacher_subjects
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'teacher_subjects'; END;
+CREATE TRIGGER bump_version_teacher_subjects_delete AFTER DELETE ON teacher_subjects
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'teacher_subjects'; END;
+
+-- Version triggers for attendance
+CREATE TRIGGER bump_version_attendance_insert AFTER INSERT ON attendance
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'attendance'; END;
+CREATE TRIGGER bump_version_attendance_update AFTER UPDATE ON attendance
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'attendance'; END;
+CREATE TRIGGER bump_version_attendance_delete AFTER DELETE ON attendance
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'attendance'; END;
+
+-- Version triggers for assessments
+CREATE TRIGGER bump_version_assessments_insert AFTER INSERT ON assessments
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'assessments'; END;
+CREATE TRIGGER bump_version_assessments_update AFTER UPDATE ON assessments
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'assessments'; END;
+CREATE TRIGGER bump_version_assessments_delete AFTER DELETE ON assessments
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'assessments'; END;
+
+-- Version triggers for marks
+CREATE TRIGGER bump_version_marks_insert AFTER INSERT ON marks
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'marks'; END;
+CREATE TRIGGER bump_version_marks_update AFTER UPDATE ON marks
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'marks'; END;
+CREATE TRIGGER bump_version_marks_delete AFTER DELETE ON marks
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'marks'; END;
+
+-- Version triggers for feedback
+CREATE TRIGGER bump_version_feedback_insert AFTER INSERT ON feedback
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'feedback'; END;
+CREATE TRIGGER bump_version_feedback_update AFTER UPDATE ON feedback
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'feedback'; END;
+CREATE TRIGGER bump_version_feedback_delete AFTER DELETE ON feedback
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'feedback'; END;
+
+-- Version triggers for doubts
+CREATE TRIGGER bump_version_doubts_insert AFTER INSERT ON doubts
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'doubts'; END;
+CREATE TRIGGER bump_version_doubts_update AFTER UPDATE ON doubts
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'doubts'; END;
+CREATE TRIGGER bump_version_doubts_delete AFTER DELETE ON doubts
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'doubts'; END;
+
+-- Version triggers for class_sessions
+CREATE TRIGGER bump_version_class_sessions_insert AFTER INSERT ON class_sessions
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'class_sessions'; END;
+CREATE TRIGGER bump_version_class_sessions_update AFTER UPDATE ON class_sessions
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'class_sessions'; END;
+CREATE TRIGGER bump_version_class_sessions_delete AFTER DELETE ON class_sessions
+BEGIN UPDATE data_versions SET version = version + 1 WHERE table_name = 'class_sessions'; END;
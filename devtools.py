@@ -427,6 +427,143 @@ def verify_schema():
     finally:
         conn.close()
 
+def show_schedule_conflicts():
+    """Scan every teacher and student timetable for overlapping classes"""
+    import schedule_conflicts
+
+    conn = get_db()
+    try:
+        print("🔍 Checking schedules for conflicts...")
+        report = schedule_conflicts.school_conflicts(conn)
+        class_ids = {c.class_id for conflicts in report.values() for c in conflicts}
+        class_ids |= {c.other_class_id for conflicts in report.values() for c in conflicts}
+        names = schedule_conflicts.class_names(conn, class_ids)
+
+        cur = conn.cursor()
+        for role, conflicts in report.items():
+            if not conflicts:
+                print(f"  ✅ No {role} conflicts")
+                continue
+            print(f"  ❌ {len(conflicts)} {role} conflict(s):")
+            for conflict in conflicts:
+                cur.execute('SELECT COALESCE(name, username) FROM users WHERE id = ?', (conflict.person_id,))
+                person = cur.fetchone()
+                label = person[0] if person else f'{role} {conflict.person_id}'
+                print(f"    {label}: {schedule_conflicts.describe(conflict, names)}")
+        return report
+    finally:
+        conn.close()
+
+def generate_timetable(apply=False):
+    """Solve a conflict-free weekly timetable for all active classes"""
+    import timetable
+    import timetable_generator
+
+    conn = get_db()
+    try:
+        print("🗓️  Generating timetable...")
+        requests = timetable_generator.load_requests(conn)
+        solution = timetable_generator.generate_timetable(requests)
+        cur = conn.cursor()
+        for class_id, placement in sorted(solution.placements.items()):
+            cur.execute('SELECT name FROM classes WHERE id = ?', (class_id,))
+            days = ', '.join(timetable.WEEKDAYS[day][:3] for day in placement.weekdays)
+            print(f"  {cur.fetchone()[0]}: {days} "
+                  f"{timetable.format_minutes(placement.start_minute)}-{timetable.format_minutes(placement.end_minute)}")
+        for class_id in solution.unscheduled:
+            print(f"  ❌ Could not place class {class_id} without a clash")
+        print(f"  Placed {len(solution.placements)}/{len(requests)} classes in {solution.elapsed:.2f}s")
+
+        if apply and solution.unscheduled:
+            print("  ❌ Timetable not saved: every class must be placed")
+        elif apply:
+            timetable_generator.apply_timetable(conn, solution)
+            print("  ✅ Timetable saved")
+        else:
+            print("  Run with --apply to save it")
+        return solution
+    finally:
+        conn.close()
+
+def build_static_assets():
+    """Write fingerprinted, precompressed copies of static assets to static/dist"""
+    import assets
+
+    print("📦 Building static assets...")
+    manifest = assets.build_assets()
+    for source, hashed in sorted(manifest.items()):
+        print(f"  {source} -> dist/{hashed}")
+    if assets.brotli is None:
+        print("  ⚠️  brotli not installed; only gzip variants were written")
+    print(f"  ✅ Built {len(manifest)} assets")
+    return manifest
+
+def cleanup_uploads():
+    """Remove partial chunked uploads that have been idle past uploads.STALE_SECONDS"""
+    import uploads
+
+    print("🧹 Removing stale partial uploads...")
+    conn = sqlite3.connect('users.db')
+    try:
+        removed = uploads.cleanup_stale_uploads(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"  ✅ Removed {removed} stale uploads")
+    return removed
+
+def collect_blob_garbage():
+    """Recount blob references and delete blobs nothing has referenced for the grace period"""
+    import blobstore
+
+    print("🧹 Collecting unreferenced blobs...")
+    conn = sqlite3.connect('users.db')
+    try:
+        blobstore.recount(conn)
+        removed, freed = blobstore.collect_garbage(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"  ✅ Removed {removed} blobs ({freed / (1024 * 1024):.1f} MB)")
+    return removed
+
+def build_answer_index():
+    """Rebuild the BM25 index of resolved doubts used for suggested answers"""
+    import answer_index
+
+    print("🔎 Building answer index...")
+    conn = sqlite3.connect('users.db')
+    try:
+        if not answer_index.has_answers(conn.cursor()):
+            print("  ❌ doubts has no response column; run migrate_doubt_queue.py first")
+            return None
+        index = answer_index.build_index(conn)
+    finally:
+        conn.close()
+    size = os.path.getsize(answer_index.INDEX_PATH)
+    print(f"  ✅ Indexed {len(index)} resolved doubts, {len(index.terms)} terms ({size / 1024:.1f} KB)")
+    return index
+
+def show_reminders(limit=10):
+    """Rebuild the class reminder schedule from the database and list what fires next"""
+    import reminders
+
+    print(f"⏰ Next class reminders ({reminders.REMINDER_MINUTES} minutes before start):")
+    conn = sqlite3.connect('users.db')
+    try:
+        scheduler = reminders.ReminderScheduler()
+        scheduler.reload(conn)
+    finally:
+        conn.close()
+    upcoming = scheduler.upcoming(limit)
+    for reminder in upcoming:
+        details = scheduler.describe(reminder)
+        link = f" - {details['meeting_link']}" if details['meeting_link'] else ''
+        print(f"  {details['starts_at']}  {details['class_name']}{link}")
+    if not upcoming:
+        print("  No scheduled class sessions")
+    return upcoming
+
 def main():
     """Main function with command-line interface"""
     if len(sys.argv) < 2:
@@ -441,6 +578,13 @@ Commands:
   stats       - Show database statistics
   verify      - Verify database schema
   full-reset  - Reset and seed (complete refresh)
+  build-assets - Fingerprint and precompress static CSS/JS
+  conflicts   - Report teachers/students booked into overlapping classes
+  timetable   - Generate a conflict-free timetable (--apply to save it)
+  cleanup-uploads - Delete partial uploads idle for more than a day
+  gc-blobs    - Delete stored files no class or resource references
+  build-answer-index - Rebuild the suggested-answer index over resolved doubts
+  reminders   - List the next class reminders the scheduler will send
 
 Examples:
   python devtools.py reset
@@ -459,6 +603,20 @@ Examples:
         show_database_stats()
     elif command == 'verify':
         verify_schema()
+    elif command == 'conflicts':
+        show_schedule_conflicts()
+    elif command == 'timetable':
+        generate_timetable(apply='--apply' in sys.argv[2:])
+    elif command == 'build-assets':
+        build_static_assets()
+    elif command == 'cleanup-uploads':
+        cleanup_uploads()
+    elif command == 'gc-blobs':
+        collect_blob_garbage()
+    elif command == 'build-answer-index':
+        build_answer_index()
+    elif command == 'reminders':
+        show_reminders()
     elif command == 'full-reset':
         print("🔄 Performing full reset...")
         reset_to_admin_only()
@@ -0,0 +1,199 @@
+"""
+Near-duplicate doubt clustering
+In exam weeks many students ask the same question in slightly different
+words. Each doubt's text is reduced to a MinHash signature (NUM_HASHES
+minimums over its character shingles); the signature is cut into BANDS
+bands of ROWS values and each band is hashed to a bucket key. Two doubts
+that share any bucket are candidates, and candidates whose signatures
+agree on at least SIMILARITY_THRESHOLD of their positions (an estimate of
+Jaccard similarity) are near-duplicates.
+
+Bucket keys live in doubt_lsh_buckets, a WITHOUT ROWID table keyed on
+(bucket, doubt_id). Finding the candidates for a new doubt reads at most
+BUCKET_CANDIDATES of the newest doubts from each of its BANDS buckets, so
+the cost stays flat however many doubts have been asked, even when
+hundreds of them are the same question. Signatures and bucket rows are
+written when a doubt is posted; nothing is rebuilt.
+
+Signing is bounded too: only the first MAX_TEXT_CHARS of a doubt are
+shingled, and only the MAX_SHINGLES shingles with the smallest CRCs are
+hashed. Picking by CRC is a consistent sample, so two near-duplicates
+sample mostly the same shingles.
+
+A new doubt joins the cluster of its most similar open doubt in the same
+subject, or starts its own. Answering a cluster answers every open member.
+"""
+
+import hashlib
+import heapq
+import re
+import zlib
+from array import array
+
+import doubt_queue
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+SHINGLE_SIZE = 4
+MAX_TEXT_CHARS = 2000
+MAX_SHINGLES = 128
+# Newest doubts read from each bucket when looking for candidates
+BUCKET_CANDIDATES = 32
+# Estimated Jaccard similarity at which two doubts count as the same question
+SIMILARITY_THRESHOLD = 0.6
+
+_PRIME = (1 << 61) - 1
+_MASK = 0xFFFFFFFF
+
+
+def _hash_parameters():
+    """Fixed (a, b) pairs for the universal hashes, derived from a seed so they survive restarts"""
+    parameters = []
+    for i in range(NUM_HASHES):
+        digest = hashlib.blake2b(f'doubt-minhash-{i}'.encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], 'big') % (_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:], 'big') % _PRIME
+        parameters.append((a, b))
+    return parameters
+
+
+_PARAMETERS = _hash_parameters()
+
+
+def has_clusters_table(cur):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'doubt_signatures'")
+    return cur.fetchone() is not None
+
+
+def shingles(text):
+    """Character shingles of the lower-cased text with punctuation and extra spaces removed"""
+    normalized = ' '.join(re.findall(r'[a-z0-9]+', (text or '').lower()))[:MAX_TEXT_CHARS]
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def signature(text):
+    """MinHash signature of a text as NUM_HASHES 32-bit values"""
+    hashes = [zlib.crc32(shingle.encode()) for shingle in shingles(text)]
+    if len(hashes) > MAX_SHINGLES:
+        hashes = heapq.nsmallest(MAX_SHINGLES, hashes)
+    return array('I', [min([(a * h + b) % _PRIME for h in hashes]) & _MASK for a, b in _PARAMETERS])
+
+
+def bucket_keys(sig):
+    """One signed 64-bit key per band, so all bands share a single index"""
+    keys = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS:(band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + rows, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+def similarity(first, second):
+    return sum(x == y for x, y in zip(first, second)) / NUM_HASHES
+
+
+def _unpack(blob):
+    sig = array('I')
+    sig.frombytes(blob)
+    return sig
+
+
+def similar(conn, text, subject=None, limit=5, sig=None, open_only=False):
+    """Doubts whose text is a near-duplicate of `text`, most similar first.
+
+    Returns [(doubt_id, cluster_id, similarity)].
+    """
+    sig = sig or signature(text)
+    # Newest BUCKET_CANDIDATES doubts per bucket, each read off the (bucket, doubt_id) key
+    newest = ' UNION '.join(['SELECT doubt_id FROM (SELECT doubt_id FROM doubt_lsh_buckets '
+                             'WHERE bucket = ? ORDER BY doubt_id DESC LIMIT ?)'] * BANDS)
+    conditions = ''
+    params = [value for key in bucket_keys(sig) for value in (key, BUCKET_CANDIDATES)]
+    if subject is not None:
+        conditions += ' AND d.subject = ?'
+        params.append(subject)
+    if open_only:
+        conditions += " AND d.status = 'open'"
+    cur = conn.execute(f'''
+        SELECT s.doubt_id, s.cluster_id, s.signature
+        FROM doubt_signatures s
+        JOIN doubts d ON d.id = s.doubt_id
+        WHERE s.doubt_id IN ({newest})
+        {conditions}
+    ''', params)
+    matches = []
+    for doubt_id, cluster_id, blob in cur.fetchall():
+        score = similarity(sig, _unpack(blob))
+        if score >= SIMILARITY_THRESHOLD:
+            matches.append((doubt_id, cluster_id, score))
+    matches.sort(key=lambda match: (-match[2], match[0]))
+    return matches[:limit]
+
+
+def add_doubt(conn, doubt_id, subject, text):
+    """Index a newly posted doubt and place it in a cluster; the caller commits.
+
+    Returns the cluster id (the id of the cluster's first doubt).
+    """
+    sig = signature(text)
+    matches = similar(conn, text, subject, limit=1, sig=sig, open_only=True)
+    cluster_id = matches[0][1] if matches else doubt_id
+    conn.execute('INSERT OR REPLACE INTO doubt_signatures (doubt_id, cluster_id, signature) VALUES (?, ?, ?)',
+                 (doubt_id, cluster_id, sig.tobytes()))
+    conn.executemany('INSERT OR IGNORE INTO doubt_lsh_buckets (bucket, doubt_id) VALUES (?, ?)',
+                     [(key, doubt_id) for key in bucket_keys(sig)])
+    return cluster_id
+
+
+def open_members(conn, doubt_id):
+    """Open doubts in the same cluster as doubt_id (including it, if open), oldest first"""
+    cur = conn.execute('''
+        SELECT d.id FROM doubt_signatures s
+        JOIN doubts d ON d.id = s.doubt_id
+        WHERE s.cluster_id = (SELECT cluster_id FROM doubt_signatures WHERE doubt_id = ?)
+          AND d.status = 'open'
+        ORDER BY d.id
+    ''', (doubt_id,))
+    members = [row[0] for row in cur.fetchall()]
+    return members or [doubt_id]
+
+
+def group_queue(conn, items):
+    """Fold a doubt_queue.queue() list into clusters, keeping queue order by first member"""
+    if not items:
+        return []
+    ids = [item['id'] for item in items]
+    cur = conn.execute(f'''
+        SELECT doubt_id, cluster_id FROM doubt_signatures WHERE doubt_id IN ({', '.join('?' * len(ids))})
+    ''', ids)
+    cluster_of = dict(cur.fetchall())
+    clusters = {}
+    for item in items:
+        key = cluster_of.get(item['id'], item['id'])
+        if key not in clusters:
+            clusters[key] = {'lead': item, 'members': []}
+        clusters[key]['members'].append(item)
+    return list(clusters.values())
+
+
+def answer_cluster(conn, doubt_id, responder_id, response, override=False):
+    """Answer doubt_id and every other open doubt in its cluster; the caller commits.
+
+    The lead doubt follows doubt_queue.answer() rules and raises ValueError if
+    it cannot be answered; members another teacher has claimed, or that are
+    not routed to this teacher, are skipped. Returns [(doubt_id, student_id, subject)].
+    """
+    answered = [(doubt_id,) + tuple(doubt_queue.answer(conn, doubt_id, responder_id, response, override=override))]
+    for member_id in open_members(conn, doubt_id):
+        if member_id == doubt_id:
+            continue
+        try:
+            answered.append((member_id,) + tuple(doubt_queue.answer(conn, member_id, responder_id, response,
+                                                                    override=override)))
+        except ValueError:
+            continue
+    return answered
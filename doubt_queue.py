@@ -0,0 +1,230 @@
+"""
+Subject-routed doubt queue
+A doubt is routed to the teachers who teach its subject (teacher_subjects)
+in the student's class (teacher_class_map). The class is resolved when the
+doubt is posted, so a teacher's queue is
+
+    status = 'open' AND subject IN (their subjects)
+                    AND (class_id IN (their classes) OR class_id IS NULL)
+
+answered from the partial index idx_doubts_open, which only holds open
+doubts. Answered doubts leave the index, so queue reads and per-teacher
+open counts stay proportional to the open backlog rather than to every
+doubt ever asked. Doubts without a class (asked before routing, or in a
+subject no teacher of the student's classes takes) go to every teacher
+of the subject.
+
+The queue is ordered by priority, then age. A teacher claims a doubt before
+answering it; the claim is a lease that lapses after LEASE_SECONDS, so a
+doubt is never stuck behind a teacher who walked away, and two teachers
+never answer the same doubt.
+"""
+
+from datetime import datetime, timedelta
+
+import teacher_access
+
+# Stored as integers so the index orders them; higher is more urgent
+PRIORITIES = {'normal': 0, 'high': 1, 'urgent': 2}
+PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+LEASE_SECONDS = 15 * 60
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def has_queue_index(cur):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_doubts_open'")
+    return cur.fetchone() is not None
+
+
+def _stamp(moment):
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
+def _routing_clause(teacher_id):
+    """SQL condition and parameters selecting the open doubts routed to a teacher"""
+    class_ids, subjects = teacher_access.get_teacher_access(teacher_id)
+    if not subjects:
+        return None, []
+    subjects = sorted(subjects)
+    class_ids = sorted(class_ids)
+    clause = f"d.status = 'open' AND d.subject IN ({', '.join('?' * len(subjects))}) AND "
+    if class_ids:
+        clause += f"(d.class_id IN ({', '.join('?' * len(class_ids))}) OR d.class_id IS NULL)"
+    else:
+        clause += 'd.class_id IS NULL'
+    return clause, subjects + class_ids
+
+
+def route_class(conn, student_id, subject):
+    """The student's class whose teachers take `subject`, or None"""
+    cur = conn.execute('''
+        SELECT scm.class_id FROM student_class_map scm
+        JOIN teacher_class_map tcm ON tcm.class_id = scm.class_id
+        JOIN teacher_subjects ts ON ts.teacher_id = tcm.teacher_id AND ts.subject_name = ?
+        WHERE scm.student_id = ? AND scm.status = 'active'
+        ORDER BY scm.class_id
+        LIMIT 1
+    ''', (subject, student_id))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def teachers_for(conn, subject, class_id):
+    """Teachers a doubt in this subject and class is routed to"""
+    if class_id is None:
+        cur = conn.execute('SELECT teacher_id FROM teacher_subjects WHERE subject_name = ?', (subject,))
+    else:
+        cur = conn.execute('''
+            SELECT tcm.teacher_id FROM teacher_class_map tcm
+            JOIN teacher_subjects ts ON ts.teacher_id = tcm.teacher_id AND ts.subject_name = ?
+            WHERE tcm.class_id = ?
+        ''', (subject, class_id))
+    return sorted({row[0] for row in cur.fetchall()})
+
+
+def post_doubt(conn, student_id, subject, doubt_text, priority='normal'):
+    """Insert a routed doubt; the caller commits. Returns (doubt_id, class_id)
+
+    Before migrate_doubt_queue.py has run the doubt is stored unrouted, as
+    doubts were before the queue existed, and class_id is None.
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f'Unknown priority: {priority}')
+    if not has_queue_index(conn.cursor()):
+        cur = conn.execute("INSERT INTO doubts (student_id, subject, doubt_text, status) VALUES (?, ?, ?, 'open')",
+                           (student_id, subject, doubt_text))
+        return cur.lastrowid, None
+    class_id = route_class(conn, student_id, subject)
+    cur = conn.execute('''
+        INSERT INTO doubts (student_id, subject, doubt_text, status, class_id, priority)
+        VALUES (?, ?, ?, 'open', ?, ?)
+    ''', (student_id, subject, doubt_text, class_id, PRIORITIES[priority]))
+    return cur.lastrowid, class_id
+
+
+def open_count(conn, teacher_id):
+    """Open doubts routed to the teacher, counted from the partial index alone"""
+    clause, params = _routing_clause(teacher_id)
+    if clause is None:
+        return 0
+    return conn.execute(f'SELECT COUNT(*) FROM doubts d WHERE {clause}', params).fetchone()[0]
+
+
+def queue(conn, teacher_id, now=None, limit=50):
+    """Open doubts for a teacher, most urgent and then oldest first"""
+    clause, params = _routing_clause(teacher_id)
+    if clause is None:
+        return []
+    now = _stamp(now or datetime.utcnow())
+    cur = conn.execute(f'''
+        SELECT d.id, d.student_id, COALESCE(u.name, u.username), d.subject, d.class_id, c.name,
+               d.doubt_text, d.priority, d.submitted_on, d.claimed_by, d.claim_expires
+        FROM doubts d
+        LEFT JOIN users u ON u.id = d.student_id
+        LEFT JOIN classes c ON c.id = d.class_id
+        WHERE {clause}
+        ORDER BY d.priority DESC, d.submitted_on, d.id
+        LIMIT ?
+    ''', params + [limit])
+    items = []
+    for (doubt_id, student_id, student_name, subject, class_id, class_name, text, priority,
+         submitted_on, claimed_by, claim_expires) in cur.fetchall():
+        claimed = claimed_by is not None and claim_expires is not None and claim_expires > now
+        items.append({
+            'id': doubt_id,
+            'student_id': student_id,
+            'student_name': student_name,
+            'subject': subject,
+            'class_id': class_id,
+            'class_name': class_name,
+            'doubt_text': text,
+            'priority': PRIORITY_NAMES.get(priority, 'normal'),
+            'submitted_on': submitted_on,
+            'claimed_by_me': claimed and claimed_by == teacher_id,
+            'claimed_by_other': claimed and claimed_by != teacher_id,
+            'claim_expires': claim_expires if claimed else None,
+        })
+    return items
+
+
+def _is_routed(conn, doubt_id, teacher_id):
+    clause, params = _routing_clause(teacher_id)
+    if clause is None:
+        return False
+    cur = conn.execute(f'SELECT 1 FROM doubts d WHERE d.id = ? AND {clause}', [doubt_id] + params)
+    return cur.fetchone() is not None
+
+
+def claim(conn, doubt_id, teacher_id, now=None, lease_seconds=LEASE_SECONDS):
+    """Take (or renew) the lease on an open doubt; the caller commits.
+
+    Returns the lease expiry, or None if another teacher holds a live claim.
+    Raises ValueError if the doubt is not open or not routed to this teacher.
+    """
+    now = now or datetime.utcnow()
+    if not _is_routed(conn, doubt_id, teacher_id):
+        raise ValueError('Doubt not found')
+    expires = _stamp(now + timedelta(seconds=lease_seconds))
+    cur = conn.execute('''
+        UPDATE doubts SET claimed_by = ?, claim_expires = ?
+        WHERE id = ? AND status = 'open'
+          AND (claimed_by IS NULL OR claimed_by = ? OR claim_expires <= ?)
+    ''', (teacher_id, expires, doubt_id, teacher_id, _stamp(now)))
+    return expires if cur.rowcount == 1 else None
+
+
+def release(conn, doubt_id, teacher_id):
+    """Give up a claim so the doubt goes back to the queue; the caller commits"""
+    cur = conn.execute('''
+        UPDATE doubts SET claimed_by = NULL, claim_expires = NULL
+        WHERE id = ? AND claimed_by = ? AND status = 'open'
+    ''', (doubt_id, teacher_id))
+    return cur.rowcount == 1
+
+
+def answer(conn, doubt_id, responder_id, response, now=None, override=False):
+    """Answer an open doubt; the caller commits. Returns (student_id, subject).
+
+    Teachers must hold the claim or find the doubt unclaimed; admins pass
+    override=True to answer regardless.
+    """
+    now = now or datetime.utcnow()
+    if not (response or '').strip():
+        raise ValueError('A response is required')
+    if not override and not _is_routed(conn, doubt_id, responder_id):
+        raise ValueError('Doubt not found')
+    params = [response.strip(), _stamp(now), responder_id, doubt_id]
+    lease_check = ''
+    if not override:
+        lease_check = 'AND (claimed_by IS NULL OR claimed_by = ? OR claim_expires <= ?)'
+        params += [responder_id, _stamp(now)]
+    cur = conn.execute(f'''
+        UPDATE doubts
+        SET status = 'answered', response = ?, response_time = ?, resolved_by = ?,
+            claimed_by = NULL, claim_expires = NULL
+        WHERE id = ? AND status = 'open' {lease_check}
+    ''', params)
+    if cur.rowcount != 1:
+        raise ValueError('This doubt has already been answered or is being answered by another teacher')
+    return conn.execute('SELECT student_id, subject FROM doubts WHERE id = ?', (doubt_id,)).fetchone()
+
+
+def answered_by(conn, teacher_id, limit=10):
+    """The teacher's most recent answers"""
+    cur = conn.execute('''
+        SELECT d.id, d.subject, d.doubt_text, d.response, d.response_time, COALESCE(u.name, u.username)
+        FROM doubts d
+        LEFT JOIN users u ON u.id = d.student_id
+        WHERE d.resolved_by = ? AND d.status != 'open'
+        ORDER BY d.response_time DESC
+        LIMIT ?
+    ''', (teacher_id, limit))
+    return [{
+        'id': doubt_id,
+        'subject': subject,
+        'doubt_text': text,
+        'response': response,
+        'response_time': response_time,
+        'student_name': student_name,
+    } for doubt_id, subject, text, response, response_time, student_name in cur.fetchall()]
@@ -0,0 +1,159 @@
+"""
+File downloads
+One endpoint serves class schedule PDFs, class resources (notes, lecture
+recordings) and homework submission files to everyone allowed to see them:
+
+    GET /files/<kind>/<id>        kind = schedule | resource | submission
+
+Responses carry a strong ETag (the content SHA-256 where known) and
+Last-Modified, and honour If-None-Match / If-Modified-Since with a 304.
+Range requests get 206 partial content, so the browser can seek in a
+recording without fetching the whole file.
+
+With DOWNLOAD_OFFLOAD set, Python only checks permissions and the validators
+and hands the bytes to the front proxy, which also handles Range itself:
+
+    'x-sendfile'        X-Sendfile: <absolute path>        (Apache, lighttpd)
+    'x-accel-redirect'  X-Accel-Redirect: <prefix><path>   (nginx)
+
+For nginx, map DOWNLOAD_ACCEL_PREFIX to the application directory with an
+internal location, e.g.  location /protected/ { internal; alias /srv/lms/; }
+"""
+
+import os
+import sqlite3
+from collections import namedtuple
+
+from flask import Response, abort, current_app, request, send_file, session, url_for
+
+import blobstore
+import teacher_access
+
+DATABASE = 'users.db'
+
+DOWNLOAD_KINDS = ('schedule', 'resource', 'submission')
+# Downloads are private and must be revalidated; no-transform keeps compression off byte ranges
+DOWNLOAD_CACHE_CONTROL = 'private, no-cache, no-transform'
+DEFAULT_ACCEL_PREFIX = '/protected/'
+
+DownloadFile = namedtuple('DownloadFile', 'path download_name mimetype etag class_id')
+
+
+def _can_see_class(conn, class_id, user_id, role):
+    if role == 'admin':
+        return True
+    if role == 'teacher':
+        return teacher_access.has_class_access(user_id, class_id)
+    if role == 'student':
+        cur = conn.execute('''
+            SELECT 1 FROM student_class_map WHERE student_id = ? AND class_id = ? AND status = 'active'
+        ''', (user_id, class_id))
+        return cur.fetchone() is not None
+    return False
+
+
+def find_file(conn, kind, item_id, user_id, role):
+    """The DownloadFile for kind/item_id if it exists and the user may read it, else None"""
+    cur = conn.cursor()
+    if kind == 'schedule':
+        # Classes have no schedule_pdf_sha256 until migrate_blobs.py has run
+        sha256_column = 'schedule_pdf_sha256' if blobstore.has_blobs_table(cur) else 'NULL'
+        cur.execute(f'SELECT schedule_pdf_path, {sha256_column}, name FROM classes WHERE id = ?', (item_id,))
+        row = cur.fetchone()
+        if not row or not row[0]:
+            return None
+        found = DownloadFile(row[0], f'{row[2]}_schedule.pdf', 'application/pdf', row[1], item_id)
+    elif kind == 'resource':
+        cur.execute('SELECT file_path, filename, content_type, sha256, class_id FROM resources WHERE id = ?', (item_id,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        found = DownloadFile(*row)
+    elif kind == 'submission':
+        cur.execute('''
+            SELECT s.file_path, s.student_id, h.teacher_id, h.class_id, u.sha256
+            FROM homework_submissions s
+            JOIN homework h ON h.id = s.homework_id
+            LEFT JOIN uploads u ON u.file_path = s.file_path AND u.status = 'complete'
+            WHERE s.id = ?
+        ''', (item_id,))
+        row = cur.fetchone()
+        if not row or not row[0]:
+            return None
+        file_path, student_id, teacher_id, class_id, sha256 = row
+        if role != 'admin' and user_id not in (student_id, teacher_id):
+            return None
+        # Stored as <upload id>_<original name>
+        download_name = os.path.basename(file_path).split('_', 1)[-1]
+        return DownloadFile(file_path, download_name, None, sha256, class_id)
+    else:
+        return None
+
+    if not _can_see_class(conn, found.class_id, user_id, role):
+        return None
+    return found
+
+
+def _offload(found, path, stat):
+    """Empty-bodied response that tells the front proxy which file to send"""
+    response = Response(mimetype=found.mimetype or 'application/octet-stream')
+    response.headers.set('Content-Disposition', 'attachment', filename=found.download_name)
+    response.last_modified = stat.st_mtime
+    response.set_etag(found.etag or f'{int(stat.st_mtime)}-{stat.st_size}')
+    # 304 handling only; the proxy serves Range requests from the file itself
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+
+    if current_app.config.get('DOWNLOAD_OFFLOAD') == 'x-accel-redirect':
+        prefix = current_app.config.get('DOWNLOAD_ACCEL_PREFIX', DEFAULT_ACCEL_PREFIX)
+        relative = os.path.relpath(path, current_app.root_path).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + relative
+    else:
+        response.headers['X-Sendfile'] = path
+    return response
+
+
+def send_download(found):
+    """Serve a DownloadFile with validators, Range support and optional proxy offload"""
+    path = os.path.join(current_app.root_path, found.path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        abort(404)
+
+    if current_app.config.get('DOWNLOAD_OFFLOAD'):
+        response = _offload(found, path, stat)
+    else:
+        response = send_file(path, mimetype=found.mimetype, as_attachment=True,
+                             download_name=found.download_name, conditional=True,
+                             etag=found.etag or True, last_modified=stat.st_mtime, max_age=None)
+    response.headers['Cache-Control'] = DOWNLOAD_CACHE_CONTROL
+    return response
+
+
+def serve_download(kind, item_id):
+    """View for GET /files/<kind>/<id>"""
+    if 'user_id' not in session:
+        return Response(status=401)
+    if kind not in DOWNLOAD_KINDS:
+        abort(404)
+    conn = sqlite3.connect(DATABASE)
+    try:
+        found = find_file(conn, kind, item_id, session['user_id'], session.get('role'))
+    finally:
+        conn.close()
+    if found is None:
+        abort(404)
+    return send_download(found)
+
+
+def download_url(kind, item_id):
+    """URL for a download (templates: download_url('resource', resource.id))"""
+    return url_for('download_file', kind=kind, item_id=item_id)
+
+
+def init_app(app):
+    """Register the download endpoint and the download_url() template helper"""
+    app.add_url_rule('/files/<kind>/<int:item_id>', 'download_file', serve_download)
+    app.jinja_env.globals['download_url'] = download_url
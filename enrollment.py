@@ -0,0 +1,136 @@
+"""
+Bulk student enrollment helpers
+Assigns many students to many classes in a single transaction while
+respecting each class's max_students limit and skipping (student, class)
+pairs that would double-book a student
+"""
+
+
+def _placeholders(values):
+    """Build a '?, ?, ?' placeholder list for an IN clause"""
+    return ', '.join('?' for _ in values)
+
+
+def get_class_capacity(cur, class_ids):
+    """Return {class_id: (max_students, active_count)} for the given classes in one query"""
+    if not class_ids:
+        return {}
+
+    cur.execute(f'''
+        SELECT c.id, c.max_students, COUNT(scm.id)
+        FROM classes c
+        LEFT JOIN student_class_map scm ON c.id = scm.class_id AND scm.status = 'active'
+        WHERE c.id IN ({_placeholders(class_ids)})
+        GROUP BY c.id
+    ''', list(class_ids))
+    return {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+
+
+def split_students(cur, user_ids):
+    """Split user ids into (students, others) by users.role, keeping the given order"""
+    user_ids = list(dict.fromkeys(int(u) for u in user_ids))
+    if not user_ids:
+        return [], []
+
+    cur.execute(f'''
+        SELECT id FROM users WHERE role = 'student' AND id IN ({_placeholders(user_ids)})
+    ''', user_ids)
+    students = {row[0] for row in cur.fetchall()}
+    return [u for u in user_ids if u in students], [u for u in user_ids if u not in students]
+
+
+def bulk_enroll_students(conn, class_ids, student_ids, assigned_by, exclude=()):
+    """Enroll every student in every class, filling each class up to max_students.
+
+    Students are taken in the order given, so when a class fills up the
+    students at the end of the list are the ones rejected. The caller owns
+    the transaction; nothing is committed here.
+
+    `exclude` is a collection of (student_id, class_id) pairs that must not be
+    enrolled, e.g. schedule conflicts; they are reported as 'rejected_conflict'.
+
+    Only active enrollments count as 'already_enrolled'. A student whose row
+    is inactive or dropped is re-activated and reported under 'added'.
+
+    Returns {class_id: {'added': [...], 'already_enrolled': [...],
+    'rejected_capacity': [...], 'rejected_conflict': [...]}}. Unknown class
+    ids are reported under 'not_found' instead.
+    """
+    class_ids = list(dict.fromkeys(int(c) for c in class_ids))
+    student_ids = list(dict.fromkeys(int(s) for s in student_ids))
+    exclude = {(int(s), int(c)) for s, c in exclude}
+
+    results = {}
+    if not class_ids:
+        return results
+
+    cur = conn.cursor()
+    capacity = get_class_capacity(cur, class_ids)
+
+    # Existing enrollments for all target classes (any status) in one pass
+    cur.execute(f'''
+        SELECT class_id, student_id, status FROM student_class_map
+        WHERE class_id IN ({_placeholders(class_ids)})
+    ''', class_ids)
+    enrolled = {}
+    lapsed = set()
+    for class_id, student_id, status in cur.fetchall():
+        if status == 'active':
+            enrolled.setdefault(class_id, set()).add(student_id)
+        else:
+            lapsed.add((student_id, class_id))
+
+    rows = []
+    reactivated = []
+    for class_id in class_ids:
+        if class_id not in capacity:
+            results[class_id] = {'not_found': True, 'added': [], 'already_enrolled': [],
+                                 'rejected_capacity': [], 'rejected_conflict': []}
+            continue
+
+        max_students, active_count = capacity[class_id]
+        existing = enrolled.get(class_id, set())
+        already = [s for s in student_ids if s in existing]
+        conflicted = [s for s in student_ids if s not in existing and (s, class_id) in exclude]
+        candidates = [s for s in student_ids if s not in existing and (s, class_id) not in exclude]
+
+        if max_students is None:
+            added, rejected = candidates, []
+        else:
+            free = max(int(max_students) - active_count, 0)
+            added, rejected = candidates[:free], candidates[free:]
+
+        results[class_id] = {
+            'added': added,
+            'already_enrolled': already,
+            'rejected_capacity': rejected,
+            'rejected_conflict': conflicted
+        }
+        for student_id in added:
+            if (student_id, class_id) in lapsed:
+                reactivated.append((assigned_by, student_id, class_id))
+            else:
+                rows.append((student_id, class_id, assigned_by))
+
+    if reactivated:
+        cur.executemany('''
+            UPDATE student_class_map
+            SET status = 'active', assigned_by = ?, assigned_on = CURRENT_TIMESTAMP
+            WHERE student_id = ? AND class_id = ?
+        ''', reactivated)
+    if rows:
+        cur.executemany('''
+            INSERT OR IGNORE INTO student_class_map (student_id, class_id, assigned_by)
+            VALUES (?, ?, ?)
+        ''', rows)
+
+    return results
+
+
+def summarize_results(results):
+    """Total added / already enrolled / rejected counts across all classes"""
+    summary = {'added': 0, 'already_enrolled': 0, 'rejected_capacity': 0, 'rejected_conflict': 0}
+    for result in results.values():
+        for key in summary:
+            summary[key] += len(result.get(key, []))
+    return summary
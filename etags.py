@@ -0,0 +1,46 @@
+"""
+ETag and conditional GET helpers for JSON endpoints
+ETags are derived from data_versions, so a request can be answered with
+304 Not Modified before any of the endpoint's main queries run.
+"""
+
+import hashlib
+
+from flask import request, make_response
+
+import data_versions
+
+
+def versioned_etag(tables, *key_parts):
+    """Build a strong ETag from the versions of `tables` plus request-specific key parts.
+
+    Returns None when versions are unavailable (data_versions not migrated),
+    in which case the endpoint should respond normally without an ETag.
+    """
+    versions = data_versions.versions_for(tables)
+    if versions is None:
+        return None
+
+    raw = repr((request.endpoint, tuple(tables), versions, key_parts))
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+def not_modified(etag):
+    """Return a 304 response if the client already has this ETag, otherwise None"""
+    # Weak comparison: compressed responses carry a weakened copy of the ETag
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def with_etag(response, etag):
+    """Attach the ETag to a response; clients must revalidate before reusing it"""
+    response = make_response(response)
+    if etag is not None and response.status_code == 200:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
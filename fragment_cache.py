@@ -0,0 +1,151 @@
+"""
+Template fragment cache
+Adds a {% cache key, tables %} ... {% endcache %} tag to Jinja. The body is
+rendered once per key and reused until one of the listed tables changes
+(tracked through data_versions). Fragments without a table list depend only
+on their key, e.g. the admin sidebar keyed on the current endpoint.
+
+    {% cache 'class_options', ['classes'] %}
+        {% for class in classes %}<option ...>{% endfor %}
+    {% endcache %}
+
+LazyRows lets a route hand a query to the template without running it, so
+the query only executes when the fragment actually has to be rendered.
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+import data_versions
+
+DATABASE = 'users.db'
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered template fragments"""
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, template_name, key, tables, render_body):
+        """Return the cached fragment for (template, key, table versions), rendering on a miss"""
+        if tables:
+            tables = tuple(tables)
+            versions = data_versions.versions_for(tables)
+            if versions is None:
+                # No version tracking: always render fresh
+                return render_body()
+        else:
+            tables, versions = (), ()
+
+        cache_key = (template_name, _freeze(key), tables, versions)
+
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return self._entries[cache_key]
+            self.misses += 1
+
+        fragment = render_body()
+
+        with self._lock:
+            self._entries[cache_key] = fragment
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+            }
+
+
+def _freeze(value):
+    """Turn lists/sets in a cache key into hashable tuples"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(item) for item in value))
+    return value
+
+
+fragment_cache = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja extension implementing {% cache key[, tables] %}...{% endcache %}"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name), parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_fragment', args), [], [], body).set_lineno(lineno)
+
+    def _render_fragment(self, template_name, key, tables, caller):
+        return fragment_cache.render(template_name, key, tables, caller)
+
+
+class LazyRows:
+    """Query result fetched on first use, so cached fragments can skip the query entirely"""
+
+    def __init__(self, query, params=()):
+        self.query = query
+        self.params = params
+        self._rows = None
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            conn = sqlite3.connect(DATABASE)
+            try:
+                self._rows = conn.execute(self.query, self.params).fetchall()
+            finally:
+                conn.close()
+        return self._rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+
+def init_app(app):
+    """Enable the {% cache %} tag in the app's templates"""
+    app.jinja_env.add_extension(FragmentCacheExtension)
@@ -0,0 +1,343 @@
+"""
+Homework assignments and submissions
+Homework rows are looked up through (class_id, due_at), so a student's
+"due this week" list is a range scan over their classes. Submissions are
+unique per (homework_id, student_id).
+
+Each homework row carries student_count, submission_count and
+graded_count. Triggers keep them current as students enroll or leave and
+as work is submitted and graded (see migrate_homework.py), so submission
+rates and grading backlogs come from the homework rows alone. No page
+needs to count submissions.
+"""
+
+from datetime import datetime, timedelta
+
+HOMEWORK_TYPES = ('homework', 'quiz', 'project', 'lab', 'exam')
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+HOMEWORK_COLUMNS = '''
+    h.id, h.class_id, c.name, h.subject_name, h.title, h.description, h.homework_type,
+    h.max_points, h.due_at, h.allow_late, h.status, h.created_at,
+    h.student_count, h.submission_count, h.graded_count
+'''
+
+# teacher_stats() before migrate_homework.py has run
+EMPTY_STATS = {'total': 0, 'active': 0, 'completed': 0, 'avg_submission_rate': 0, 'pending_grading': 0}
+
+
+def has_homework_table(cur):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'homework'")
+    return cur.fetchone() is not None
+
+
+def parse_due(value):
+    """Accept 'YYYY-MM-DD', 'YYYY-MM-DDTHH:MM' (datetime-local) or a datetime"""
+    if isinstance(value, datetime):
+        return value.replace(microsecond=0)
+    value = (value or '').strip()
+    if not value:
+        raise ValueError('A due date is required')
+    due = datetime.fromisoformat(value)
+    # A bare date is due at the end of that day
+    if len(value) == 10:
+        due = due.replace(hour=23, minute=59, second=59)
+    return due
+
+
+def _stamp(moment):
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
+def _parse_stamp(value):
+    return datetime.strptime(value[:19], TIMESTAMP_FORMAT) if value else None
+
+
+def week_bounds(today=None):
+    """Monday 00:00 of this week and of the next"""
+    today = (today or datetime.now()).date()
+    start = datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time())
+    return start, start + timedelta(days=7)
+
+
+def submission_rate(submission_count, student_count):
+    """Percentage of the class that has submitted, capped at 100"""
+    if not student_count:
+        return 0
+    return min(100, round(100 * submission_count / student_count))
+
+
+def describe(row, now=None):
+    """Template-friendly dict for a homework row"""
+    (homework_id, class_id, class_name, subject_name, title, description, homework_type,
+     max_points, due_at, allow_late, status, created_at,
+     student_count, submission_count, graded_count) = row
+    due = _parse_stamp(due_at)
+    if status == 'active' and due < (now or datetime.now()):
+        status = 'completed'
+    return {
+        'id': homework_id,
+        'class_id': class_id,
+        'class_name': class_name,
+        'subject_name': subject_name,
+        'title': title,
+        'description': description or '',
+        'homework_type': homework_type,
+        'max_points': max_points,
+        'due_date': due,
+        'upload_date': _parse_stamp(created_at),
+        'allow_late': bool(allow_late),
+        'status': status,
+        'total_students': student_count,
+        'submission_count': submission_count,
+        'graded_count': graded_count,
+        'submission_rate': submission_rate(submission_count, student_count),
+    }
+
+
+def create_homework(conn, teacher_id, class_id, subject_name, title, due_at, description=None,
+                    max_points=100, homework_type='homework', allow_late=False):
+    """Insert a homework for a class; the caller commits. Returns the new id"""
+    title = (title or '').strip()
+    if not title:
+        raise ValueError('A title is required')
+    if not subject_name:
+        raise ValueError('A subject is required')
+    if homework_type not in HOMEWORK_TYPES:
+        raise ValueError(f'Unknown homework type: {homework_type}')
+    max_points = float(max_points)
+    if max_points <= 0:
+        raise ValueError('Total points must be positive')
+
+    cur = conn.cursor()
+    # The one count this homework ever needs; enrollment triggers keep it current afterwards
+    cur.execute("SELECT COUNT(*) FROM student_class_map WHERE class_id = ? AND status = 'active'", (class_id,))
+    student_count = cur.fetchone()[0]
+    cur.execute('''
+        INSERT INTO homework (class_id, subject_name, teacher_id, title, description, homework_type,
+                              max_points, due_at, allow_late, student_count, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (int(class_id), subject_name, teacher_id, title, (description or '').strip() or None, homework_type,
+          max_points, _stamp(parse_due(due_at)), 1 if allow_late else 0, student_count, _stamp(datetime.now())))
+    return cur.lastrowid
+
+
+def get_homework(conn, homework_id):
+    cur = conn.cursor()
+    cur.execute(f'''
+        SELECT {HOMEWORK_COLUMNS}, h.teacher_id
+        FROM homework h JOIN classes c ON c.id = h.class_id
+        WHERE h.id = ?
+    ''', (homework_id,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    homework = describe(row[:-1])
+    homework['teacher_id'] = row[-1]
+    return homework
+
+
+def teacher_homework(conn, teacher_id, class_id=None, now=None):
+    """A teacher's homework, newest due date first"""
+    query = f'''
+        SELECT {HOMEWORK_COLUMNS}
+        FROM homework h JOIN classes c ON c.id = h.class_id
+        WHERE h.teacher_id = ?
+    '''
+    params = [teacher_id]
+    if class_id:
+        query += ' AND h.class_id = ?'
+        params.append(int(class_id))
+    cur = conn.cursor()
+    cur.execute(query + ' ORDER BY h.due_at DESC', params)
+    return [describe(row, now) for row in cur.fetchall()]
+
+
+def teacher_stats(conn, teacher_id, now=None):
+    """Totals and average submission rate from the counters on the teacher's homework rows"""
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT COUNT(*),
+               COALESCE(SUM(status = 'active' AND due_at >= ?), 0),
+               AVG(CASE WHEN student_count > 0
+                        THEN MIN(100.0, 100.0 * submission_count / student_count) END),
+               COALESCE(SUM(submission_count - graded_count), 0)
+        FROM homework
+        WHERE teacher_id = ?
+    ''', (_stamp(now or datetime.now()), teacher_id))
+    total, active, average_rate, pending = cur.fetchone()
+    return {
+        'total': total,
+        'active': active,
+        'completed': total - active,
+        'avg_submission_rate': round(average_rate or 0),
+        'pending_grading': pending,
+    }
+
+
+def due_between(conn, student_id, start, end=None, limit=None):
+    """Active homework in the student's classes due in [start, end), soonest first.
+
+    One pass over idx_homework_class_due per class the student is in, with
+    the student's own submission picked up through (homework_id, student_id).
+    """
+    query = '''
+        SELECT h.id, h.title, h.subject_name, h.due_at, h.max_points, h.allow_late, c.name,
+               s.id, s.submitted_at, s.is_late, s.grade, s.feedback
+        FROM homework h
+        JOIN classes c ON c.id = h.class_id
+        LEFT JOIN homework_submissions s ON s.homework_id = h.id AND s.student_id = ?
+        WHERE h.class_id IN (SELECT class_id FROM student_class_map WHERE student_id = ? AND status = 'active')
+          AND h.due_at >= ?
+    '''
+    params = [student_id, student_id, _stamp(start)]
+    if end is not None:
+        query += ' AND h.due_at < ?'
+        params.append(_stamp(end))
+    query += " AND h.status = 'active' ORDER BY h.due_at"
+    if limit:
+        query += ' LIMIT ?'
+        params.append(int(limit))
+
+    cur = conn.cursor()
+    cur.execute(query, params)
+    items = []
+    for (homework_id, title, subject_name, due_at, max_points, allow_late, class_name,
+         submission_id, submitted_at, is_late, grade, feedback) in cur.fetchall():
+        items.append({
+            'id': homework_id,
+            'title': title,
+            'subject_name': subject_name,
+            'class_name': class_name,
+            'due_date': _parse_stamp(due_at),
+            'max_points': max_points,
+            'allow_late': bool(allow_late),
+            'submitted': submission_id is not None,
+            'submitted_date': _parse_stamp(submitted_at),
+            'is_late': bool(is_late),
+            'grade': grade,
+            'feedback': feedback,
+        })
+    return items
+
+
+def due_this_week(conn, student_id, today=None):
+    start, end = week_bounds(today)
+    return due_between(conn, student_id, start, end)
+
+
+def submit(conn, homework_id, student_id, content=None, file_path=None, now=None):
+    """Record or replace a student's submission; the caller commits. Returns the submission id
+
+    Text and file are replaced independently, so attaching a file keeps the
+    text answer already submitted and vice versa.
+    """
+    now = now or datetime.now()
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT h.due_at, h.allow_late, h.status FROM homework h
+        JOIN student_class_map scm ON scm.class_id = h.class_id
+        WHERE h.id = ? AND scm.student_id = ? AND scm.status = 'active'
+    ''', (homework_id, student_id))
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError('Homework not found for this student')
+    due_at, allow_late, status = row
+    if status != 'active':
+        raise ValueError('This homework is closed')
+    if not (content or '').strip() and not file_path:
+        raise ValueError('Nothing to submit')
+    is_late = now > _parse_stamp(due_at)
+    if is_late and not allow_late:
+        raise ValueError('The due date has passed')
+
+    cur.execute('SELECT grade FROM homework_submissions WHERE homework_id = ? AND student_id = ?',
+                (homework_id, student_id))
+    existing = cur.fetchone()
+    if existing and existing[0] is not None:
+        raise ValueError('This submission has already been graded')
+
+    cur.execute('''
+        INSERT INTO homework_submissions (homework_id, student_id, content, file_path, submitted_at, is_late)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(homework_id, student_id) DO UPDATE
+        SET content = COALESCE(excluded.content, content),
+            file_path = COALESCE(excluded.file_path, file_path),
+            submitted_at = excluded.submitted_at,
+            is_late = excluded.is_late
+    ''', (homework_id, student_id, (content or '').strip() or None, file_path, _stamp(now), 1 if is_late else 0))
+    cur.execute('SELECT id FROM homework_submissions WHERE homework_id = ? AND student_id = ?',
+                (homework_id, student_id))
+    return cur.fetchone()[0]
+
+
+def list_submissions(conn, teacher_id, homework_id=None, class_id=None, subject_name=None, status=None):
+    """Submissions to a teacher's homework, newest first"""
+    query = '''
+        SELECT s.id, s.student_id, COALESCE(u.name, u.username), h.id, h.title, c.name, h.subject_name,
+               s.submitted_at, s.is_late, s.grade, s.feedback, h.max_points, s.content, s.file_path
+        FROM homework h
+        JOIN homework_submissions s ON s.homework_id = h.id
+        JOIN users u ON u.id = s.student_id
+        JOIN classes c ON c.id = h.class_id
+        WHERE h.teacher_id = ?
+    '''
+    params = [teacher_id]
+    for column, value in (('h.id', homework_id), ('h.class_id', class_id), ('h.subject_name', subject_name)):
+        if value:
+            query += f' AND {column} = ?'
+            params.append(value)
+    if status == 'pending':
+        query += ' AND s.grade IS NULL'
+    elif status == 'graded':
+        query += ' AND s.grade IS NOT NULL'
+    elif status == 'late':
+        query += ' AND s.is_late = 1'
+
+    cur = conn.cursor()
+    cur.execute(query + ' ORDER BY s.submitted_at DESC', params)
+    return [{
+        'id': submission_id,
+        'student_id': student_id,
+        'student_name': student_name,
+        'homework_id': hw_id,
+        'assignment_title': title,
+        'class_name': class_name,
+        'subject_name': subject,
+        'submitted_date': _parse_stamp(submitted_at),
+        'is_late': bool(is_late),
+        'grade': grade,
+        'feedback': feedback,
+        'max_points': max_points,
+        'content': content or '',
+        'file_path': file_path,
+    } for (submission_id, student_id, student_name, hw_id, title, class_name, subject, submitted_at,
+           is_late, grade, feedback, max_points, content, file_path) in cur.fetchall()]
+
+
+def grade_submission(conn, submission_id, teacher_id, grade, feedback=None):
+    """Grade a submission to one of the teacher's homework; the caller commits.
+
+    Returns (student_id, homework_title).
+    """
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT s.student_id, h.title, h.max_points FROM homework_submissions s
+        JOIN homework h ON h.id = s.homework_id
+        WHERE s.id = ? AND h.teacher_id = ?
+    ''', (submission_id, teacher_id))
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError('Submission not found')
+    student_id, title, max_points = row
+    grade = float(grade)
+    if not 0 <= grade <= max_points:
+        raise ValueError(f'Grade must be between 0 and {max_points:g}')
+
+    cur.execute('''
+        UPDATE homework_submissions
+        SET grade = ?, feedback = ?, graded_by = ?, graded_at = ?
+        WHERE id = ?
+    ''', (grade, (feedback or '').strip() or None, teacher_id, _stamp(datetime.now()), submission_id))
+    return student_id, title
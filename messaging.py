@@ -0,0 +1,371 @@
+"""
+Anonymous student-teacher messaging
+A student opens a thread with one of their teachers and may do so
+anonymously. An anonymous student is shown under a pseudonym derived from
+HMAC(thread salt, student id): stable within a thread, different in every
+other thread, and not linkable to the student without the database.
+
+Messages are read a page at a time through the (thread_id, id) index:
+
+    GET /messages/threads/<id>?before=<id>   older messages (scrolling back)
+    GET /messages/threads/<id>?after=<id>    newer messages (catching up)
+
+so opening a thread costs one page however long the thread is.
+
+Delivery reuses the notification bus. Each new message is published to
+'user:<recipient>' after it commits. Pages on the SSE stream receive it as
+a 'message' event. GET /messages/poll is the long-poll alternative: it holds
+a bounded bus subscription for up to POLL_TIMEOUT seconds and resumes from
+last_event_id, so a message published between two polls is replayed from
+the bus history rather than lost.
+"""
+
+import hashlib
+import hmac
+import secrets
+import sqlite3
+
+from flask import jsonify, redirect, render_template, request, session, url_for
+
+import notifications
+
+DATABASE = 'users.db'
+
+PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+MAX_MESSAGE_LENGTH = 4000
+THREAD_LIST_SIZE = 50
+# Longest a poll request waits for a message (seconds)
+POLL_TIMEOUT = 25
+
+PSEUDONYM_ADJECTIVES = (
+    'Amber', 'Brave', 'Calm', 'Clever', 'Curious', 'Gentle', 'Golden', 'Happy',
+    'Lively', 'Lucky', 'Mellow', 'Quiet', 'Rapid', 'Silver', 'Sunny', 'Witty',
+)
+PSEUDONYM_ANIMALS = (
+    'Badger', 'Dolphin', 'Falcon', 'Fox', 'Heron', 'Koala', 'Lynx', 'Otter',
+    'Owl', 'Panda', 'Penguin', 'Robin', 'Seal', 'Sparrow', 'Tiger', 'Wolf',
+)
+
+
+class MessageError(Exception):
+    """A messaging request that cannot be honoured; carries the HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def has_messaging_tables(cur):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_threads'")
+    return cur.fetchone() is not None
+
+
+def _require_tables(conn):
+    if not has_messaging_tables(conn.cursor()):
+        raise MessageError('Messaging is not set up yet', 503)
+
+
+def pseudonym(salt, user_id):
+    """The name an anonymous student goes by in the thread with this salt"""
+    digest = hmac.new(salt.encode(), str(user_id).encode(), hashlib.sha256).digest()
+    return f'{PSEUDONYM_ADJECTIVES[digest[0] % len(PSEUDONYM_ADJECTIVES)]} ' \
+           f'{PSEUDONYM_ANIMALS[digest[1] % len(PSEUDONYM_ANIMALS)]}'
+
+
+def teachers_for_student(conn, student_id):
+    """Teachers of the student's active classes, as (id, name)"""
+    cur = conn.execute('''
+        SELECT DISTINCT u.id, COALESCE(u.name, u.username) FROM teacher_class_map tcm
+        JOIN student_class_map scm ON scm.class_id = tcm.class_id AND scm.status = 'active'
+        JOIN users u ON u.id = tcm.teacher_id
+        WHERE scm.student_id = ?
+        ORDER BY 2
+    ''', (student_id,))
+    return cur.fetchall()
+
+
+def _clean_body(body):
+    body = (body or '').strip()
+    if not body:
+        raise MessageError('A message is required')
+    if len(body) > MAX_MESSAGE_LENGTH:
+        raise MessageError(f'Messages are limited to {MAX_MESSAGE_LENGTH} characters')
+    return body
+
+
+def _insert_message(conn, thread_id, sender_id, body):
+    cur = conn.execute('INSERT INTO messages (thread_id, sender_id, body) VALUES (?, ?, ?)',
+                       (thread_id, sender_id, body))
+    conn.execute('''
+        UPDATE message_threads SET last_message_id = ?, last_message_on = CURRENT_TIMESTAMP WHERE id = ?
+    ''', (cur.lastrowid, thread_id))
+    return cur.lastrowid
+
+
+def start_thread(conn, student_id, teacher_id, body, subject=None, anonymous=True):
+    """Open a thread with a teacher of one of the student's classes; the caller commits.
+
+    Returns (thread_id, message_id).
+    """
+    body = _clean_body(body)
+    if int(teacher_id) not in {row[0] for row in teachers_for_student(conn, student_id)}:
+        raise MessageError('Teacher not found', 404)
+    cur = conn.execute('''
+        INSERT INTO message_threads (student_id, teacher_id, subject, anonymous, pseudonym_salt)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (student_id, int(teacher_id), (subject or '').strip() or None, 1 if anonymous else 0,
+          secrets.token_hex(16)))
+    thread_id = cur.lastrowid
+    return thread_id, _insert_message(conn, thread_id, student_id, body)
+
+
+def _load_thread(conn, thread_id, user_id):
+    """The thread as seen by one of its two participants"""
+    row = conn.execute('''
+        SELECT t.id, t.student_id, t.teacher_id, t.subject, t.anonymous, t.pseudonym_salt,
+               COALESCE(s.name, s.username), COALESCE(te.name, te.username)
+        FROM message_threads t
+        LEFT JOIN users s ON s.id = t.student_id
+        LEFT JOIN users te ON te.id = t.teacher_id
+        WHERE t.id = ?
+    ''', (thread_id,)).fetchone()
+    if row is None or user_id not in (row[1], row[2]):
+        raise MessageError('Thread not found', 404)
+    thread_id, student_id, teacher_id, subject, anonymous, salt, student_name, teacher_name = row
+    return {
+        'id': thread_id,
+        'student_id': student_id,
+        'teacher_id': teacher_id,
+        'subject': subject,
+        'anonymous': bool(anonymous),
+        'student_name': pseudonym(salt, student_id) if anonymous else student_name,
+        'teacher_name': teacher_name,
+    }
+
+
+def _public(thread, user_id):
+    """Thread fields safe to show to user_id: never the id of an anonymous student"""
+    is_student = user_id == thread['student_id']
+    return {
+        'id': thread['id'],
+        'subject': thread['subject'],
+        'anonymous': thread['anonymous'],
+        'with': thread['teacher_name'] if is_student else thread['student_name'],
+        'me': thread['student_name'] if is_student else thread['teacher_name'],
+    }
+
+
+def post_message(conn, thread_id, user_id, body):
+    """Add a message to a thread the user takes part in; the caller commits.
+
+    Returns (message_id, recipient_id, sender_name).
+    """
+    body = _clean_body(body)
+    thread = _load_thread(conn, thread_id, user_id)
+    message_id = _insert_message(conn, thread_id, user_id, body)
+    if user_id == thread['student_id']:
+        return message_id, thread['teacher_id'], thread['student_name']
+    return message_id, thread['student_id'], thread['teacher_name']
+
+
+def thread_page(conn, thread_id, user_id, before_id=None, after_id=None, limit=PAGE_SIZE):
+    """One page of a thread, oldest first.
+
+    Without a cursor this is the newest page. `before_id` pages back through
+    older messages; `after_id` fetches messages newer than the last one
+    shown. `before` in the result is the cursor for the next older page, or
+    None at the start of the thread.
+    """
+    thread = _load_thread(conn, thread_id, user_id)
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    if after_id is not None:
+        cur = conn.execute('''
+            SELECT id, sender_id, body, created_on FROM messages
+            WHERE thread_id = ? AND id > ? ORDER BY id LIMIT ?
+        ''', (thread_id, int(after_id), limit))
+        rows = cur.fetchall()
+        before = None
+    else:
+        cur = conn.execute(f'''
+            SELECT id, sender_id, body, created_on FROM messages
+            WHERE thread_id = ? {'AND id < ?' if before_id is not None else ''}
+            ORDER BY id DESC LIMIT ?
+        ''', [thread_id] + ([int(before_id)] if before_id is not None else []) + [limit + 1])
+        rows = cur.fetchall()
+        before = rows[limit - 1][0] if len(rows) > limit else None
+        rows = list(reversed(rows[:limit]))
+    names = {thread['student_id']: thread['student_name'], thread['teacher_id']: thread['teacher_name']}
+    return {
+        'thread': _public(thread, user_id),
+        'messages': [{
+            'id': message_id,
+            'sender': names.get(sender_id, 'Unknown'),
+            'mine': sender_id == user_id,
+            'body': body,
+            'created_on': created_on,
+        } for message_id, sender_id, body, created_on in rows],
+        'before': before,
+    }
+
+
+def threads_for(conn, user_id, role, limit=THREAD_LIST_SIZE):
+    """The user's threads, most recently active first"""
+    column = 'student_id' if role == 'student' else 'teacher_id'
+    cur = conn.execute(f'''
+        SELECT t.id, t.student_id, t.subject, t.anonymous, t.pseudonym_salt, t.last_message_on,
+               COALESCE(s.name, s.username), COALESCE(te.name, te.username), m.body
+        FROM message_threads t
+        LEFT JOIN users s ON s.id = t.student_id
+        LEFT JOIN users te ON te.id = t.teacher_id
+        LEFT JOIN messages m ON m.id = t.last_message_id
+        WHERE t.{column} = ?
+        ORDER BY t.last_message_id DESC
+        LIMIT ?
+    ''', (user_id, limit))
+    threads = []
+    for (thread_id, student_id, subject, anonymous, salt, last_message_on,
+         student_name, teacher_name, preview) in cur.fetchall():
+        if role == 'student':
+            counterpart = teacher_name
+        else:
+            counterpart = pseudonym(salt, student_id) if anonymous else student_name
+        threads.append({
+            'id': thread_id,
+            'subject': subject,
+            'anonymous': bool(anonymous),
+            'with': counterpart,
+            'last_message_on': last_message_on,
+            'preview': (preview or '')[:120],
+        })
+    return threads
+
+
+def deliver(thread_id, message_id, sender_id, recipient_id, sender_name):
+    """Publish a committed message to its recipient"""
+    notifications.publish([f'user:{recipient_id}'], 'message', f'New message from {sender_name}',
+                          actor=sender_id, thread_id=thread_id, message_id=message_id)
+
+
+def poll(user_id, last_event_id=None, timeout=POLL_TIMEOUT):
+    """Wait for message events after last_event_id.
+
+    Returns (messages, cursor, resync): the message events, the event id to
+    poll from next, and whether events were lost so the client must reload.
+    """
+    cursor = notifications.bus.stats()['last_event_id'] if last_event_id is None else last_event_id
+    subscription = notifications.bus.subscribe([f'user:{user_id}'], user_id, cursor)
+    try:
+        events, overflowed = subscription.get(timeout=timeout)
+    finally:
+        notifications.bus.unsubscribe(subscription)
+    for event in events:
+        cursor = max(cursor, event.id)
+    return [notifications.describe(e) for e in events if e.type == 'message'], cursor, overflowed
+
+
+def _error_response(error):
+    return jsonify({'error': str(error)}), error.status
+
+
+def _optional_int(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise MessageError(f'{name} must be a message id')
+
+
+def page_view():
+    """View for GET /messages"""
+    if session.get('role') not in ('student', 'teacher'):
+        return redirect(url_for('auth.login'))
+    conn = sqlite3.connect(DATABASE)
+    role = session['role']
+    threads, teachers = [], []
+    try:
+        # Empty until migrate_messaging.py has run
+        ready = has_messaging_tables(conn.cursor())
+        if ready:
+            threads = threads_for(conn, session['user_id'], role)
+            teachers = teachers_for_student(conn, session['user_id']) if role == 'student' else []
+    finally:
+        conn.close()
+    return render_template('messages.html', threads=threads, teachers=teachers, role=role, ready=ready,
+                           selected=request.args.get('thread', type=int), page_size=PAGE_SIZE)
+
+
+def threads_view():
+    """View for POST /messages/threads: a student starts a thread (JSON)"""
+    if session.get('role') != 'student':
+        return jsonify({'error': 'Unauthorized'}), 401
+    data = request.get_json(silent=True) or {}
+    conn = sqlite3.connect(DATABASE)
+    try:
+        _require_tables(conn)
+        thread_id, message_id = start_thread(conn, session['user_id'], data.get('teacher_id') or 0,
+                                             data.get('body'), data.get('subject'),
+                                             data.get('anonymous', True) not in (False, 0, '0', 'false'))
+        conn.commit()
+        thread = _load_thread(conn, thread_id, session['user_id'])
+        deliver(thread_id, message_id, session['user_id'], thread['teacher_id'], thread['student_name'])
+        return jsonify({'thread_id': thread_id, 'message_id': message_id}), 201
+    except MessageError as e:
+        conn.rollback()
+        return _error_response(e)
+    except (TypeError, ValueError):
+        conn.rollback()
+        return jsonify({'error': 'teacher_id must be a teacher id'}), 400
+    finally:
+        conn.close()
+
+
+def thread_view(thread_id):
+    """View for GET/POST /messages/threads/<id> (JSON)"""
+    if session.get('role') not in ('student', 'teacher'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    user_id = session['user_id']
+    conn = sqlite3.connect(DATABASE)
+    try:
+        _require_tables(conn)
+        if request.method == 'GET':
+            return jsonify(thread_page(conn, thread_id, user_id, _optional_int('before'), _optional_int('after'),
+                                       request.args.get('limit', PAGE_SIZE, type=int)))
+        data = request.get_json(silent=True) or {}
+        message_id, recipient_id, sender_name = post_message(conn, thread_id, user_id, data.get('body'))
+        conn.commit()
+        deliver(thread_id, message_id, user_id, recipient_id, sender_name)
+        return jsonify({'message_id': message_id}), 201
+    except MessageError as e:
+        conn.rollback()
+        return _error_response(e)
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+
+def poll_view():
+    """View for GET /messages/poll (JSON long-poll)"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    try:
+        last_event_id = _optional_int('last_event_id')
+    except MessageError as e:
+        return _error_response(e)
+    timeout = min(max(request.args.get('timeout', POLL_TIMEOUT, type=float), 0), POLL_TIMEOUT)
+    messages, cursor, resync = poll(session['user_id'], last_event_id, timeout)
+    response = jsonify({'messages': messages, 'last_event_id': cursor, 'resync': resync})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def init_app(app):
+    """Register the messaging page and its JSON endpoints"""
+    app.add_url_rule('/messages', 'messages_page', page_view)
+    app.add_url_rule('/messages/threads', 'messages_threads', threads_view, methods=['POST'])
+    app.add_url_rule('/messages/threads/<int:thread_id>', 'messages_thread', thread_view, methods=['GET', 'POST'])
+    app.add_url_rule('/messages/poll', 'messages_poll', poll_view)
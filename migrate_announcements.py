@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to add the scoped announcements table and per-user read cursors
+"""
+
+import sqlite3
+import os
+
+def migrate_announcements(db_path='users.db'):
+    """Create announcements/announcement_reads, or add scope columns to an older announcements table"""
+    print("=== Migrating Announcements Tables ===")
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database {db_path} not found!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+
+        print("Creating announcements table...")
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS announcements (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                author_id INTEGER NOT NULL,
+                scope TEXT NOT NULL DEFAULT 'school' CHECK(scope IN ('school', 'grade', 'class', 'subject')),
+                scope_key TEXT NOT NULL DEFAULT 'school',
+                grade_level TEXT,
+                class_id INTEGER,
+                subject_name TEXT,
+                priority TEXT DEFAULT 'normal' CHECK(priority IN ('low', 'normal', 'high', 'urgent')),
+                is_active BOOLEAN DEFAULT 1,
+                created_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_on DATETIME,
+                expires_on DATETIME,
+                FOREIGN KEY (author_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY (class_id) REFERENCES classes(id) ON DELETE CASCADE
+            )
+        ''')
+
+        # Databases created from the older schema have class_id/subject_name but no scope
+        cur.execute("PRAGMA table_info(announcements)")
+        columns = {row[1] for row in cur.fetchall()}
+        for column, definition in (('scope', "TEXT NOT NULL DEFAULT 'school'"),
+                                   ('scope_key', "TEXT NOT NULL DEFAULT 'school'"),
+                                   ('grade_level', 'TEXT')):
+            if column not in columns:
+                print(f"Adding announcements.{column}...")
+                cur.execute(f'ALTER TABLE announcements ADD COLUMN {column} {definition}')
+        if 'scope' not in columns:
+            cur.execute('''
+                UPDATE announcements
+                SET scope = CASE WHEN class_id IS NOT NULL THEN 'class'
+                                 WHEN subject_name IS NOT NULL THEN 'subject'
+                                 ELSE 'school' END,
+                    scope_key = CASE WHEN class_id IS NOT NULL THEN 'class:' || class_id
+                                     WHEN subject_name IS NOT NULL THEN 'subject:' || subject_name
+                                     ELSE 'school' END
+            ''')
+
+        print("Creating announcement_reads table...")
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS announcement_reads (
+                user_id INTEGER PRIMARY KEY,
+                last_read_id INTEGER NOT NULL DEFAULT 0,
+                updated_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        ''')
+
+        print("Creating indexes...")
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_announcements_author ON announcements(author_id)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_announcements_class ON announcements(class_id)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_announcements_active ON announcements(is_active, created_on)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_announcements_scope ON announcements(scope_key, id)')
+
+        conn.commit()
+        print("✅ Migration completed successfully!")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == '__main__':
+    migrate_announcements()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to add the content-addressed blob store
+Moves existing schedule PDFs and class resources into uploads/blobs and
+counts their references.
+"""
+
+import sqlite3
+import os
+
+import blobstore
+
+# Keep blobs.ref_count equal to the number of classes and resources pointing at each blob
+REFERENCE_TRIGGERS = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS blob_ref_class_insert
+    AFTER INSERT ON classes
+    WHEN NEW.schedule_pdf_sha256 IS NOT NULL
+    BEGIN
+        UPDATE blobs SET ref_count = ref_count + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE sha256 = NEW.schedule_pdf_sha256;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS blob_ref_class_delete
+    AFTER DELETE ON classes
+    WHEN OLD.schedule_pdf_sha256 IS NOT NULL
+    BEGIN
+        UPDATE blobs SET ref_count = ref_count - 1, updated_at = CURRENT_TIMESTAMP
+        WHERE sha256 = OLD.schedule_pdf_sha256;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS blob_ref_class_update
+    AFTER UPDATE OF schedule_pdf_sha256 ON classes
+    WHEN OLD.schedule_pdf_sha256 IS NOT NEW.schedule_pdf_sha256
+    BEGIN
+        UPDATE blobs SET ref_count = ref_count - 1, updated_at = CURRENT_TIMESTAMP
+        WHERE sha256 = OLD.schedule_pdf_sha256;
+        UPDATE blobs SET ref_count = ref_count + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE sha256 = NEW.schedule_pdf_sha256;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS blob_ref_resource_insert
+    AFTER INSERT ON resources
+    WHEN NEW.sha256 IS NOT NULL
+    BEGIN
+        UPDATE blobs SET ref_count = ref_count + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE sha256 = NEW.sha256;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS blob_ref_resource_delete
+    AFTER DELETE ON resources
+    WHEN OLD.sha256 IS NOT NULL
+    BEGIN
+        UPDATE blobs SET ref_count = ref_count - 1, updated_at = CURRENT_TIMESTAMP
+        WHERE sha256 = OLD.sha256;
+    END
+    ''',
+)
+
+def migrate_blobs(db_path='users.db'):
+    """Create the blobs table, move existing files into it and add the reference triggers"""
+    print("=== Migrating Blob Store ===")
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database {db_path} not found!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+
+        cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'resources'")
+        if cur.fetchone() is None:
+            print("❌ resources table not found; run migrate_uploads.py first")
+            conn.close()
+            return False
+
+        print("Creating blobs table...")
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                size_bytes INTEGER NOT NULL,
+                content_type TEXT,
+                ref_count INTEGER NOT NULL DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced ON blobs(updated_at) WHERE ref_count <= 0')
+
+        cur.execute("PRAGMA table_info(classes)")
+        if 'schedule_pdf_sha256' not in {row[1] for row in cur.fetchall()}:
+            print("Adding classes.schedule_pdf_sha256...")
+            cur.execute('ALTER TABLE classes ADD COLUMN schedule_pdf_sha256 TEXT')
+
+        # Flat uuid_name files from before the blob store; files that have gone missing are left as they are
+        print("Moving existing files into the blob store...")
+        moved = 0
+        cur.execute("SELECT id, schedule_pdf_path FROM classes WHERE schedule_pdf_path != '' AND schedule_pdf_sha256 IS NULL")
+        for class_id, path in cur.fetchall():
+            if os.path.isfile(path):
+                sha256 = blobstore.hash_file(path)
+                path = blobstore.store_file(conn, path, sha256, 'application/pdf')
+                conn.execute('UPDATE classes SET schedule_pdf_path = ?, schedule_pdf_sha256 = ? WHERE id = ?',
+                             (path, sha256, class_id))
+                moved += 1
+        cur.execute('SELECT id, file_path, content_type FROM resources')
+        for resource_id, path, content_type in cur.fetchall():
+            if os.path.isfile(path) and not path.startswith(blobstore.BLOB_ROOT):
+                sha256 = blobstore.hash_file(path)
+                path = blobstore.store_file(conn, path, sha256, content_type)
+                conn.execute('UPDATE resources SET file_path = ?, sha256 = ? WHERE id = ?', (path, sha256, resource_id))
+                moved += 1
+        print(f"Moved {moved} files")
+
+        print("Creating reference triggers...")
+        for trigger in REFERENCE_TRIGGERS:
+            cur.execute(trigger)
+        blobstore.recount(conn)
+
+        conn.commit()
+        print("✅ Migration completed successfully!")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == '__main__':
+    migrate_blobs()
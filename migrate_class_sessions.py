@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to add the normalized class_sessions timetable table
+and backfill it from classes.schedule_days / schedule_time_start / schedule_time_end
+"""
+
+import sqlite3
+import os
+
+import data_versions
+import timetable
+
+def migrate_class_sessions(db_path='users.db'):
+    """Add class_sessions table, its indexes and backfill existing classes"""
+    print("=== Migrating Class Sessions Table ===")
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database {db_path} not found!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+
+        print("Creating class_sessions table...")
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS class_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                class_id INTEGER NOT NULL,
+                weekday INTEGER NOT NULL CHECK(weekday BETWEEN 0 AND 6),
+                start_minute INTEGER NOT NULL CHECK(start_minute BETWEEN 0 AND 1439),
+                end_minute INTEGER NOT NULL CHECK(end_minute > start_minute AND end_minute <= 1440),
+                FOREIGN KEY (class_id) REFERENCES classes(id) ON DELETE CASCADE
+            )
+        ''')
+
+        print("Creating indexes...")
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_class_sessions_class ON class_sessions(class_id)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_class_sessions_day_start ON class_sessions(weekday, start_minute)')
+
+        # Track writes for caches if version tracking is already installed
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='data_versions'")
+        if cur.fetchone():
+            data_versions.install(conn, ['class_sessions'])
+
+        print("Backfilling sessions from class schedules...")
+        total = timetable.backfill_sessions(conn)
+
+        conn.commit()
+        print(f"✅ Migration completed successfully! {total} weekly sessions created")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == '__main__':
+    migrate_class_sessions()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to add the data_versions table and its triggers for cache invalidation
+"""
+
+import sqlite3
+import os
+
+import data_versions
+
+def migrate_data_versions(db_path='users.db'):
+    """Add data_versions table and version-bump triggers to the database"""
+    print("=== Migrating Data Versions Table ===")
+    
+    if not os.path.exists(db_path):
+        print(f"❌ Database {db_path} not found!")
+        return False
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+        
+        # Only track tables that exist in this database
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        existing_tables = {row[0] for row in cur.fetchall()}
+        tables = [table for table in data_versions.TRACKED_TABLES if table in existing_tables]
+        
+        missing = [table for table in data_versions.TRACKED_TABLES if table not in existing_tables]
+        if missing:
+            print(f"⚠️  Skipping missing tables: {missing}")
+        
+        print("Creating data_versions table and triggers...")
+        data_versions.install(conn, tables)
+        
+        conn.commit()
+        print("✅ Migration completed successfully!")
+        
+        cur.execute("SELECT table_name, version FROM data_versions ORDER BY table_name")
+        for table_name, version in cur.fetchall():
+            print(f"  {table_name}: version {version}")
+        
+        conn.close()
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == '__main__':
+    migrate_data_versions()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to add the MinHash/LSH near-duplicate index over doubts
+Creates the signature and bucket tables and indexes every existing doubt.
+"""
+
+import sqlite3
+import os
+
+import doubt_clusters
+
+def migrate_doubt_clusters(db_path='users.db'):
+    """Create doubt_signatures and doubt_lsh_buckets and backfill them"""
+    print("=== Migrating Doubt Clusters ===")
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database {db_path} not found!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+
+        print("Creating doubt_signatures table...")
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS doubt_signatures (
+                doubt_id INTEGER PRIMARY KEY,
+                cluster_id INTEGER NOT NULL,
+                signature BLOB NOT NULL,
+                FOREIGN KEY (doubt_id) REFERENCES doubts(id) ON DELETE CASCADE
+            )
+        ''')
+
+        print("Creating doubt_lsh_buckets table...")
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS doubt_lsh_buckets (
+                bucket INTEGER NOT NULL,
+                doubt_id INTEGER NOT NULL,
+                PRIMARY KEY (bucket, doubt_id)
+            ) WITHOUT ROWID
+        ''')
+
+        print("Creating indexes and triggers...")
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_doubt_signatures_cluster ON doubt_signatures(cluster_id)')
+        # Only for removing a deleted doubt's buckets; lookups go through the primary key
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_doubt_lsh_buckets_doubt ON doubt_lsh_buckets(doubt_id)')
+        cur.execute('''
+            CREATE TRIGGER IF NOT EXISTS doubt_signatures_delete
+            AFTER DELETE ON doubts
+            BEGIN
+                DELETE FROM doubt_lsh_buckets WHERE doubt_id = OLD.id;
+                DELETE FROM doubt_signatures WHERE doubt_id = OLD.id;
+            END
+        ''')
+
+        # Oldest first, so earlier doubts become the cluster leads
+        print("Indexing existing doubts...")
+        cur.execute('''
+            SELECT id, subject, doubt_text FROM doubts
+            WHERE id NOT IN (SELECT doubt_id FROM doubt_signatures)
+            ORDER BY id
+        ''')
+        rows = cur.fetchall()
+        for doubt_id, subject, text in rows:
+            doubt_clusters.add_doubt(conn, doubt_id, subject, text)
+        print(f"Indexed {len(rows)} doubts")
+
+        # Long doubts signed before shingles were capped would never match new ones
+        print("Re-signing long doubts...")
+        cur.execute('''
+            SELECT s.doubt_id, d.doubt_text, s.signature FROM doubt_signatures s
+            JOIN doubts d ON d.id = s.doubt_id
+            WHERE length(d.doubt_text) > ?
+        ''', (doubt_clusters.MAX_SHINGLES,))
+        resigned = 0
+        for doubt_id, text, old_signature in cur.fetchall():
+            sig = doubt_clusters.signature(text)
+            if sig.tobytes() == old_signature:
+                continue
+            conn.execute('UPDATE doubt_signatures SET signature = ? WHERE doubt_id = ?', (sig.tobytes(), doubt_id))
+            conn.execute('DELETE FROM doubt_lsh_buckets WHERE doubt_id = ?', (doubt_id,))
+            conn.executemany('INSERT OR IGNORE INTO doubt_lsh_buckets (bucket, doubt_id) VALUES (?, ?)',
+                             [(key, doubt_id) for key in doubt_clusters.bucket_keys(sig)])
+            resigned += 1
+        print(f"Re-signed {resigned} doubts")
+
+        conn.commit()
+        print("✅ Migration completed successfully!")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == '__main__':
+    migrate_doubt_clusters()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to route doubts to teachers through a subject/class queue
+Adds the routing, priority, claim and response columns to doubts, routes
+existing open doubts to a class and builds the partial index on open doubts.
+"""
+
+import sqlite3
+import os
+
+DOUBT_COLUMNS = (
+    ('class_id', 'INTEGER REFERENCES classes(id)'),
+    ('priority', 'INTEGER NOT NULL DEFAULT 0'),
+    ('claimed_by', 'INTEGER REFERENCES users(id)'),
+    ('claim_expires', 'DATETIME'),
+    ('resolved_on', 'DATETIME'),
+    ('resolved_by', 'INTEGER REFERENCES users(id)'),
+    ('response', 'TEXT'),
+    ('response_time', 'DATETIME'),
+)
+
+def migrate_doubt_queue(db_path='users.db'):
+    """Add the doubt queue columns and the partial index over open doubts"""
+    print("=== Migrating Doubt Queue ===")
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database {db_path} not found!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+
+        cur.execute("PRAGMA table_info(doubts)")
+        columns = {row[1] for row in cur.fetchall()}
+        for column, definition in DOUBT_COLUMNS:
+            if column not in columns:
+                print(f"Adding doubts.{column}...")
+                cur.execute(f'ALTER TABLE doubts ADD COLUMN {column} {definition}')
+
+        # Same rule as doubt_queue.route_class: the student's class taught by a teacher of the subject
+        print("Routing open doubts to classes...")
+        cur.execute('''
+            UPDATE doubts SET class_id = (
+                SELECT scm.class_id FROM student_class_map scm
+                JOIN teacher_class_map tcm ON tcm.class_id = scm.class_id
+                JOIN teacher_subjects ts ON ts.teacher_id = tcm.teacher_id AND ts.subject_name = doubts.subject
+                WHERE scm.student_id = doubts.student_id AND scm.status = 'active'
+                ORDER BY scm.class_id
+                LIMIT 1
+            )
+            WHERE status = 'open' AND class_id IS NULL
+        ''')
+
+        print("Creating indexes...")
+        # status is redundant with the WHERE clause, but listing it lets SQLite count from the index alone
+        cur.execute('''
+            CREATE INDEX IF NOT EXISTS idx_doubts_open
+            ON doubts(subject, class_id, priority, submitted_on, status) WHERE status = 'open'
+        ''')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_doubts_resolved_by ON doubts(resolved_by, response_time)')
+
+        conn.commit()
+        print("✅ Migration completed successfully!")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == '__main__':
+    migrate_doubt_queue()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to add homework and homework_submissions tables
+"""
+
+import sqlite3
+import os
+
+# Keep homework.student_count / submission_count / graded_count current so
+# submission rates never need a COUNT over submissions or enrollments
+COUNTER_TRIGGERS = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS homework_submission_insert
+    AFTER INSERT ON homework_submissions
+    BEGIN
+        UPDATE homework
+        SET submission_count = submission_count + 1,
+            graded_count = graded_count + (NEW.grade IS NOT NULL)
+        WHERE id = NEW.homework_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS homework_submission_delete
+    AFTER DELETE ON homework_submissions
+    BEGIN
+        UPDATE homework
+        SET submission_count = submission_count - 1,
+            graded_count = graded_count - (OLD.grade IS NOT NULL)
+        WHERE id = OLD.homework_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS homework_submission_graded
+    AFTER UPDATE OF grade ON homework_submissions
+    BEGIN
+        UPDATE homework
+        SET graded_count = graded_count + (NEW.grade IS NOT NULL) - (OLD.grade IS NOT NULL)
+        WHERE id = NEW.homework_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS homework_roster_insert
+    AFTER INSERT ON student_class_map
+    WHEN NEW.status = 'active'
+    BEGIN
+        UPDATE homework SET student_count = student_count + 1
+        WHERE class_id = NEW.class_id AND status = 'active';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS homework_roster_delete
+    AFTER DELETE ON student_class_map
+    WHEN OLD.status = 'active'
+    BEGIN
+        UPDATE homework SET student_count = student_count - 1
+        WHERE class_id = OLD.class_id AND status = 'active';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS homework_roster_update
+    AFTER UPDATE OF status, class_id ON student_class_map
+    BEGIN
+        UPDATE homework SET student_count = student_count - 1
+        WHERE class_id = OLD.class_id AND status = 'active' AND OLD.status = 'active';
+        UPDATE homework SET student_count = student_count + 1
+        WHERE class_id = NEW.class_id AND status = 'active' AND NEW.status = 'active';
+    END
+    ''',
+)
+
+def migrate_homework(db_path='users.db'):
+    """Create the homework tables, their indexes and counter triggers"""
+    print("=== Migrating Homework Tables ===")
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database {db_path} not found!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+
+        print("Creating homework table...")
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS homework (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                class_id INTEGER NOT NULL,
+                subject_name TEXT NOT NULL,
+                teacher_id INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT,
+                homework_type TEXT DEFAULT 'homework' CHECK(homework_type IN ('homework', 'quiz', 'project', 'lab', 'exam')),
+                max_points REAL NOT NULL DEFAULT 100 CHECK(max_points > 0),
+                due_at DATETIME NOT NULL,
+                allow_late BOOLEAN DEFAULT 0,
+                status TEXT DEFAULT 'active' CHECK(status IN ('active', 'closed')),
+                student_count INTEGER NOT NULL DEFAULT 0,
+                submission_count INTEGER NOT NULL DEFAULT 0,
+                graded_count INTEGER NOT NULL DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (class_id) REFERENCES classes(id) ON DELETE CASCADE,
+                FOREIGN KEY (teacher_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        ''')
+
+        print("Creating homework_submissions table...")
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS homework_submissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                homework_id INTEGER NOT NULL,
+                student_id INTEGER NOT NULL,
+                content TEXT,
+                file_path TEXT,
+                submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                is_late BOOLEAN DEFAULT 0,
+                grade REAL CHECK(grade >= 0),
+                feedback TEXT,
+                graded_by INTEGER,
+                graded_at DATETIME,
+                FOREIGN KEY (homework_id) REFERENCES homework(id) ON DELETE CASCADE,
+                FOREIGN KEY (student_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY (graded_by) REFERENCES users(id)
+            )
+        ''')
+
+        print("Creating indexes...")
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_homework_class_due ON homework(class_id, due_at)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_homework_teacher_due ON homework(teacher_id, due_at)')
+        cur.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_submissions_homework_student ON homework_submissions(homework_id, student_id)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_submissions_student ON homework_submissions(student_id)')
+
+        print("Creating counter triggers...")
+        for trigger in COUNTER_TRIGGERS:
+            cur.execute(trigger)
+
+        conn.commit()
+        print("✅ Migration completed successfully!")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == '__main__':
+    migrate_homework()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to add anonymous student-teacher messaging
+Creates message_threads and messages, with messages indexed on
+(thread_id, id) so threads are read a page at a time.
+"""
+
+import sqlite3
+import os
+
+def migrate_messaging(db_path='users.db'):
+    """Create message_threads and messages"""
+    print("=== Migrating Messaging ===")
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database {db_path} not found!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+
+        print("Creating message_threads table...")
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS message_threads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id INTEGER NOT NULL,
+                teacher_id INTEGER NOT NULL,
+                subject TEXT,
+                anonymous INTEGER NOT NULL DEFAULT 1,
+                pseudonym_salt TEXT NOT NULL,
+                last_message_id INTEGER,
+                last_message_on DATETIME,
+                created_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (student_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY (teacher_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        ''')
+
+        print("Creating messages table...")
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                thread_id INTEGER NOT NULL,
+                sender_id INTEGER NOT NULL,
+                body TEXT NOT NULL,
+                created_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (thread_id) REFERENCES message_threads(id) ON DELETE CASCADE,
+                FOREIGN KEY (sender_id) REFERENCES users(id)
+            )
+        ''')
+
+        print("Creating indexes...")
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_messages_thread ON messages(thread_id, id)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_message_threads_student ON message_threads(student_id, last_message_id)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_message_threads_teacher ON message_threads(teacher_id, last_message_id)')
+
+        conn.commit()
+        print("✅ Migration completed successfully!")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == '__main__':
+    migrate_messaging()
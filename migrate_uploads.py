@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to add the chunked upload and class resource tables
+"""
+
+import sqlite3
+import os
+
+def migrate_uploads(db_path='users.db'):
+    """Create uploads (in-progress chunked uploads) and resources (class files)"""
+    print("=== Migrating Upload Tables ===")
+
+    if not os.path.exists(db_path):
+        print(f"❌ Database {db_path} not found!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+
+        print("Creating uploads table...")
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS uploads (
+                id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                kind TEXT NOT NULL CHECK(kind IN ('submission', 'resource')),
+                target_id INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                content_type TEXT,
+                total_size INTEGER NOT NULL CHECK(total_size > 0),
+                received INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'complete', 'failed')),
+                sha256 TEXT,
+                file_path TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        ''')
+
+        print("Creating resources table...")
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS resources (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                class_id INTEGER NOT NULL,
+                uploader_id INTEGER NOT NULL,
+                type TEXT NOT NULL DEFAULT 'other' CHECK(type IN ('document', 'video', 'audio', 'image', 'other')),
+                filename TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                content_type TEXT,
+                size_bytes INTEGER,
+                sha256 TEXT,
+                upload_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (class_id) REFERENCES classes(id) ON DELETE CASCADE,
+                FOREIGN KEY (uploader_id) REFERENCES users(id)
+            )
+        ''')
+
+        print("Creating indexes...")
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_uploads_status_updated ON uploads(status, updated_at)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_resources_class ON resources(class_id, upload_time)')
+
+        conn.commit()
+        print("✅ Migration completed successfully!")
+
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == '__main__':
+    migrate_uploads()
@@ -51,13 +51,17 @@ class Attendance:
         self.updated_on = updated_on
 
 class Resource:
-    def __init__(self, id, class_id, uploader_id, type, filename, upload_time=None, created_by=None, created_on=None, updated_by=None, updated_on=None):
+    def __init__(self, id, class_id, uploader_id, type, filename, upload_time=None, file_path=None, content_type=None, size_bytes=None, sha256=None, created_by=None, created_on=None, updated_by=None, updated_on=None):
         self.id = id
         self.class_id = class_id
         self.uploader_id = uploader_id
         self.type = type
         self.filename = filename
         self.upload_time = upload_time or datetime.now()
+        self.file_path = file_path
+        self.content_type = content_type
+        self.size_bytes = size_bytes
+        self.sha256 = sha256
         self.created_by = created_by
         self.created_on = created_on or datetime.now()
         self.updated_by = updated_by
@@ -0,0 +1,213 @@
+"""
+Real-time notifications over Server-Sent Events
+Write paths (doubts, attendance, marks, announcements) publish events to an
+in-process bus after they commit. Every event is addressed to topics:
+'user:<id>', 'role:<role>' or 'class:<id>'. Each logged-in page holds one
+EventSource connection to /notifications/stream instead of polling.
+
+Each connection gets a bounded buffer; a client too slow to drain it loses
+the oldest events and is sent a 'resync' event so it can reload. Recent
+events are kept in a ring buffer so a reconnecting client resumes from its
+Last-Event-ID. The bus lives in the process, so with several worker
+processes each worker only sees its own publishes.
+"""
+
+import json
+import sqlite3
+import threading
+from collections import deque, namedtuple
+from datetime import datetime
+
+from flask import Response, jsonify, request, session
+
+DATABASE = 'users.db'
+
+# Events kept for Last-Event-ID resume and the dashboard's recent list
+HISTORY_SIZE = 1000
+# Undelivered events held per connection before the oldest are dropped
+SUBSCRIBER_BUFFER = 100
+# Seconds between keep-alive comments on an idle connection
+HEARTBEAT_SECONDS = 20
+# Client reconnect delay sent in the stream's retry field (milliseconds)
+RETRY_MS = 5000
+
+Event = namedtuple('Event', ['id', 'topics', 'type', 'message', 'data', 'actor', 'created_at'])
+
+
+class Subscription:
+    """One connection's view of the bus: its topics and a bounded event queue"""
+
+    def __init__(self, topics, user_id=None, buffer_size=SUBSCRIBER_BUFFER):
+        self.topics = frozenset(topics)
+        self.user_id = user_id
+        self.overflowed = False
+        self._queue = deque(maxlen=buffer_size)
+        self._ready = threading.Condition()
+
+    def wants(self, event):
+        """Addressed to one of our topics and not caused by this user"""
+        return not self.topics.isdisjoint(event.topics) and (event.actor is None or event.actor != self.user_id)
+
+    def push(self, event):
+        with self._ready:
+            if len(self._queue) == self._queue.maxlen:
+                self.overflowed = True
+            self._queue.append(event)
+            self._ready.notify()
+
+    def get(self, timeout=None):
+        """Wait up to `timeout` seconds; return (events, overflowed) and clear the queue"""
+        with self._ready:
+            if not self._queue and not self.overflowed:
+                self._ready.wait(timeout)
+            events = list(self._queue)
+            self._queue.clear()
+            overflowed, self.overflowed = self.overflowed, False
+        return events, overflowed
+
+
+class NotificationBus:
+    """Thread-safe publish/subscribe with a replayable history"""
+
+    def __init__(self, history_size=HISTORY_SIZE, buffer_size=SUBSCRIBER_BUFFER):
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+
+    def publish(self, topics, event_type, message, actor=None, **data):
+        """Record an event and hand it to every matching subscriber"""
+        with self._lock:
+            event = Event(self._next_id, frozenset(topics), event_type, message, data, actor, datetime.now())
+            self._next_id += 1
+            self._history.append(event)
+            subscribers = [s for s in self._subscribers if s.wants(event)]
+        for subscriber in subscribers:
+            subscriber.push(event)
+        return event
+
+    def subscribe(self, topics, user_id=None, last_event_id=None):
+        """Register a subscriber, queueing any events it missed after last_event_id"""
+        subscription = Subscription(topics, user_id, self.buffer_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if last_event_id is not None:
+                # Events older than the history were lost; the client must reload
+                if self._history and self._history[0].id > last_event_id + 1:
+                    subscription.overflowed = True
+                missed = [e for e in self._history if e.id > last_event_id and subscription.wants(e)]
+                for event in missed[-self.buffer_size:]:
+                    subscription.push(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def recent(self, topics, user_id=None, limit=5):
+        """Newest events addressed to the topics, for pages rendered server side"""
+        probe = Subscription(topics, user_id)
+        with self._lock:
+            events = [e for e in reversed(self._history) if probe.wants(e)]
+        return events[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {'subscribers': len(self._subscribers), 'history': len(self._history),
+                    'last_event_id': self._next_id - 1}
+
+
+bus = NotificationBus()
+
+
+def publish(topics, event_type, message, actor=None, **data):
+    """Publish on the shared bus; call after the write has committed"""
+    return bus.publish(topics, event_type, message, actor=actor, **data)
+
+
+def user_topics(conn, user_id, role):
+    """Topics a user listens on: themselves, their role and their classes"""
+    topics = {f'user:{user_id}', f'role:{role}'}
+    cur = conn.cursor()
+    if role == 'teacher':
+        cur.execute('SELECT class_id FROM teacher_class_map WHERE teacher_id = ?', (user_id,))
+    elif role == 'student':
+        cur.execute("SELECT class_id FROM student_class_map WHERE student_id = ? AND status = 'active'", (user_id,))
+    else:
+        return topics
+    topics.update(f'class:{class_id}' for (class_id,) in cur.fetchall())
+    return topics
+
+
+def describe(event):
+    """Template-friendly dict for a notification"""
+    return {
+        'id': event.id,
+        'type': event.type,
+        'message': event.message,
+        'time': event.created_at.strftime('%b %d, %H:%M'),
+        'data': event.data,
+    }
+
+
+def format_event(event):
+    """Serialize an event in text/event-stream format"""
+    return f'id: {event.id}\nevent: {event.type}\ndata: {json.dumps(describe(event))}\n\n'
+
+
+def event_stream(subscription, heartbeat=HEARTBEAT_SECONDS):
+    """Generator behind the SSE response; unsubscribes when the client goes away"""
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        while True:
+            events, overflowed = subscription.get(timeout=heartbeat)
+            if overflowed:
+                yield 'event: resync\ndata: {}\n\n'
+            for event in events:
+                yield format_event(event)
+            if not events and not overflowed:
+                yield ': heartbeat\n\n'
+    finally:
+        bus.unsubscribe(subscription)
+
+
+def current_topics():
+    conn = sqlite3.connect(DATABASE)
+    try:
+        return user_topics(conn, session['user_id'], session.get('role'))
+    finally:
+        conn.close()
+
+
+def stream():
+    """View for /notifications/stream"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    subscription = bus.subscribe(current_topics(), session['user_id'], last_event_id)
+    response = Response(event_stream(subscription), mimetype='text/event-stream')
+    # no-transform keeps the compression middleware from buffering the stream
+    response.headers['Cache-Control'] = 'no-cache, no-transform'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def recent():
+    """View for /notifications/recent (JSON)"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    events = bus.recent(current_topics(), session['user_id'], limit=request.args.get('limit', 10, type=int))
+    return jsonify({'notifications': [describe(e) for e in events]})
+
+
+def init_app(app):
+    """Register the SSE stream and the recent-notifications endpoint"""
+    app.add_url_rule('/notifications/stream', 'notifications_stream', stream)
+    app.add_url_rule('/notifications/recent', 'notifications_recent', recent)
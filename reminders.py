@@ -0,0 +1,309 @@
+"""
+Class reminders on a hierarchical timer wheel
+Every weekly session in class_sessions gets one pending reminder, due
+REMINDER_MINUTES before its next start. Reminders sit in a hierarchical
+timer wheel: levels of 60 one-second slots, 60 one-minute slots, 24 one-hour
+slots and 8 one-day slots. Scheduling drops a timer into the slot of the
+coarsest level it fits and cancelling just marks it, both O(1). Each tick
+empties one second slot; when a lower level wraps, the matching slot of the
+level above is cascaded down. A timer moves down at most three times before
+it fires, so the cost per reminder does not grow with how many are pending.
+
+When a reminder fires it is published to 'class:<id>' on the notification
+bus, so the class's students and teachers get it on their SSE stream with
+the meeting link. It can also be mailed through an SMTP server
+(REMINDER_SMTP_HOST, e.g. a local debugging server). The session's reminder
+for the following week is then scheduled.
+
+Nothing is persisted: on start the scheduler rebuilds every reminder from
+the database. It watches data_versions for the timetable tables and, on a
+change, reschedules only the classes whose sessions changed. Like the bus,
+the scheduler lives in the process; run it in a single worker.
+"""
+
+import math
+import smtplib
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+import data_versions
+import notifications
+import timetable
+
+DATABASE = 'users.db'
+
+# Minutes before the start of a class that its reminder fires
+REMINDER_MINUTES = 10
+# Seconds between wheel ticks, and between checks for timetable changes
+TICK_SECONDS = 1
+RELOAD_CHECK_SECONDS = 30
+
+# Slots per level: seconds, minutes, hours, days (a reminder is at most a week ahead)
+WHEEL_SIZES = (60, 60, 24, 8)
+
+# Optional SMTP delivery, e.g. `python -m aiosmtpd -n -l localhost:1025`
+REMINDER_SMTP_HOST = None
+REMINDER_SMTP_PORT = 25
+REMINDER_SENDER = 'reminders@localhost'
+
+Reminder = namedtuple('Reminder', ['class_id', 'weekday', 'start_minute', 'starts_at'])
+
+
+class Timer:
+    __slots__ = ('due', 'payload', 'cancelled')
+
+    def __init__(self, due, payload):
+        self.due = due
+        self.payload = payload
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """Hierarchical timing wheel with O(1) schedule and cancel"""
+
+    def __init__(self, now, tick_seconds=TICK_SECONDS, sizes=WHEEL_SIZES):
+        self.tick_seconds = tick_seconds
+        self.sizes = sizes
+        # Ticks covered by one slot of each level
+        self.spans = [1]
+        for size in sizes[:-1]:
+            self.spans.append(self.spans[-1] * size)
+        self.current = int(now // tick_seconds)
+        self.wheels = [[[] for _ in range(size)] for size in sizes]
+        self._due_now = []
+        self.pending = 0
+
+    def schedule(self, when, payload):
+        """Add a timer for the epoch time `when`; past times fire on the next advance"""
+        timer = Timer(math.ceil(when / self.tick_seconds), payload)
+        self._place(timer)
+        self.pending += 1
+        return timer
+
+    def _place(self, timer):
+        delta = timer.due - self.current
+        if delta <= 0:
+            self._due_now.append(timer)
+            return
+        for level, (size, span) in enumerate(zip(self.sizes, self.spans)):
+            if delta < span * size:
+                self.wheels[level][(timer.due // span) % size].append(timer)
+                return
+        # Beyond the top level: park in the slot cascaded last, to be placed again from there
+        top = len(self.sizes) - 1
+        self.wheels[top][(self.current // self.spans[top] - 1) % self.sizes[top]].append(timer)
+
+    def advance(self, now):
+        """Move the wheel to `now` and return the payloads that fell due, in due order"""
+        target = int(now // self.tick_seconds)
+        fired = self._collect(self._due_now)
+        self._due_now = []
+        while self.current < target:
+            self.current += 1
+            for level in range(len(self.sizes) - 1, 0, -1):
+                if self.current % self.spans[level] == 0:
+                    slot = (self.current // self.spans[level]) % self.sizes[level]
+                    bucket, self.wheels[level][slot] = self.wheels[level][slot], []
+                    for timer in bucket:
+                        if not timer.cancelled:
+                            self._place(timer)
+                        else:
+                            self.pending -= 1
+            slot = self.current % self.sizes[0]
+            bucket, self.wheels[0][slot] = self.wheels[0][slot], []
+            fired.extend(self._collect(bucket + self._due_now))
+            self._due_now = []
+        return fired
+
+    def _collect(self, bucket):
+        live = sorted((timer for timer in bucket if not timer.cancelled), key=lambda timer: timer.due)
+        self.pending -= len(bucket)
+        return [timer.payload for timer in live]
+
+
+def next_start(weekday, start_minute, lead_minutes, now):
+    """Start of the next occurrence whose reminder time has not passed yet"""
+    days_ahead = (weekday - now.weekday()) % 7
+    day = (now + timedelta(days=days_ahead)).replace(hour=0, minute=0, second=0, microsecond=0)
+    starts_at = day + timedelta(minutes=start_minute)
+    if starts_at - timedelta(minutes=lead_minutes) <= now:
+        # Already inside the reminder window: remind now unless the class has begun
+        if starts_at <= now:
+            starts_at += timedelta(days=7)
+    return starts_at
+
+
+class ReminderScheduler:
+    """Timer wheel of class reminders, rebuilt from and kept in step with class_sessions"""
+
+    def __init__(self, lead_minutes=REMINDER_MINUTES, now=None):
+        self.lead_minutes = lead_minutes
+        self.wheel = TimerWheel(time.time() if now is None else now.timestamp())
+        self.sessions = {}   # class_id -> tuple of (weekday, start_minute, end_minute)
+        self.classes = {}    # class_id -> {'name', 'meeting_link'}
+        self.versions = None
+        self._timers = {}    # class_id -> [Timer]
+        self._sent = set()   # (class_id, starts_at) already delivered
+
+    def _schedule_session(self, class_id, weekday, start_minute, now):
+        starts_at = next_start(weekday, start_minute, self.lead_minutes, now)
+        if (class_id, starts_at) in self._sent:
+            starts_at += timedelta(days=7)
+        remind_at = max(starts_at - timedelta(minutes=self.lead_minutes), now)
+        timer = self.wheel.schedule(remind_at.timestamp(), Reminder(class_id, weekday, start_minute, starts_at))
+        self._timers.setdefault(class_id, []).append(timer)
+
+    def _schedule_class(self, class_id, now):
+        for timer in self._timers.pop(class_id, ()):
+            timer.cancel()
+        for weekday, start_minute, _ in self.sessions.get(class_id, ()):
+            self._schedule_session(class_id, weekday, start_minute, now)
+
+    def reload(self, conn, now=None):
+        """Bring the wheel in line with the database; returns the ids of classes rescheduled"""
+        now = now or datetime.now()
+        sessions = {class_id: tuple(rows) for class_id, rows in timetable.sessions_by_class(conn).items()}
+        cur = conn.execute("SELECT id, name, meeting_link FROM classes WHERE status = 'active'")
+        self.classes = {row[0]: {'name': row[1], 'meeting_link': row[2] or ''} for row in cur.fetchall()}
+        changed = {class_id for class_id in set(sessions) | set(self.sessions)
+                   if sessions.get(class_id) != self.sessions.get(class_id)}
+        self.sessions = sessions
+        for class_id in changed:
+            self._schedule_class(class_id, now)
+        return changed
+
+    def reload_if_changed(self, conn, now=None):
+        """Reload when data_versions reports a timetable change (always, if it is not installed)"""
+        versions = data_versions.versions_for(timetable.TIMETABLE_TABLES, conn)
+        if versions is not None and versions == self.versions:
+            return set()
+        self.versions = versions
+        return self.reload(conn, now)
+
+    def due(self, now=None):
+        """Reminders that fell due by `now`, each rescheduled for the following week"""
+        now = now or datetime.now()
+        reminders = []
+        for reminder in self.wheel.advance(now.timestamp()):
+            self._timers[reminder.class_id] = [timer for timer in self._timers.get(reminder.class_id, ())
+                                               if timer.payload is not reminder]
+            if reminder.class_id not in self.classes:
+                continue
+            self._sent.add((reminder.class_id, reminder.starts_at))
+            reminders.append(reminder)
+            self._schedule_session(reminder.class_id, reminder.weekday, reminder.start_minute, now)
+        self._sent = {(class_id, starts_at) for class_id, starts_at in self._sent if starts_at > now}
+        return reminders
+
+    def upcoming(self, limit=10):
+        """Pending reminders in firing order, for diagnostics"""
+        pending = sorted((timer.payload for timers in self._timers.values() for timer in timers
+                          if not timer.cancelled), key=lambda reminder: reminder.starts_at)
+        return pending[:limit]
+
+    def describe(self, reminder):
+        info = self.classes.get(reminder.class_id, {})
+        return {
+            'class_id': reminder.class_id,
+            'class_name': info.get('name', ''),
+            'meeting_link': info.get('meeting_link', ''),
+            'start_time': timetable.format_minutes(reminder.start_minute),
+            'starts_at': reminder.starts_at.strftime('%Y-%m-%d %H:%M'),
+        }
+
+
+def deliver(conn, details, lead_minutes=REMINDER_MINUTES):
+    """Publish a reminder to the class, and mail it when an SMTP server is configured"""
+    message = f"{details['class_name']} starts at {details['start_time']} (in {lead_minutes} minutes)"
+    notifications.publish([f"class:{details['class_id']}"], 'class_reminder', message, **details)
+    if REMINDER_SMTP_HOST:
+        send_email(conn, details, message)
+
+
+def send_email(conn, details, message):
+    cur = conn.execute('''
+        SELECT u.email FROM users u JOIN student_class_map scm ON scm.student_id = u.id
+        WHERE scm.class_id = ? AND scm.status = 'active' AND u.email IS NOT NULL AND u.email != ''
+        UNION
+        SELECT u.email FROM users u JOIN teacher_class_map tcm ON tcm.teacher_id = u.id
+        WHERE tcm.class_id = ? AND u.email IS NOT NULL AND u.email != ''
+    ''', (details['class_id'], details['class_id']))
+    recipients = [row[0] for row in cur.fetchall()]
+    if not recipients:
+        return
+    email = EmailMessage()
+    email['Subject'] = f"Reminder: {details['class_name']} at {details['start_time']}"
+    email['From'] = REMINDER_SENDER
+    email['Bcc'] = ', '.join(recipients)
+    body = message
+    if details['meeting_link']:
+        body += f"\n\nJoin: {details['meeting_link']}"
+    email.set_content(body)
+    with smtplib.SMTP(REMINDER_SMTP_HOST, REMINDER_SMTP_PORT, timeout=10) as smtp:
+        smtp.send_message(email)
+
+
+def run_once(scheduler, conn, now=None, check_changes=True):
+    """One scheduler step: pick up timetable changes, then deliver what is due"""
+    if check_changes:
+        scheduler.reload_if_changed(conn, now)
+    reminders = scheduler.due(now)
+    for reminder in reminders:
+        try:
+            deliver(conn, scheduler.describe(reminder), scheduler.lead_minutes)
+        except (OSError, smtplib.SMTPException):
+            # The bus event has gone out; a mail server being down must not stop the loop
+            pass
+    return reminders
+
+
+_scheduler = None
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def _loop():
+    last_check = 0
+    while True:
+        conn = sqlite3.connect(DATABASE)
+        try:
+            check = time.monotonic() - last_check >= RELOAD_CHECK_SECONDS
+            run_once(_scheduler, conn, check_changes=check)
+            if check:
+                last_check = time.monotonic()
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+        time.sleep(TICK_SECONDS)
+
+
+def ensure_scheduler_thread():
+    """Start the reminder scheduler once per process"""
+    global _scheduler, _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _scheduler = ReminderScheduler(REMINDER_MINUTES)
+            _thread = threading.Thread(target=_loop, name='class-reminders', daemon=True)
+            _thread.start()
+    return _scheduler
+
+
+def init_app(app):
+    """Start the scheduler with the first request (not under TESTING, or with CLASS_REMINDERS off)"""
+    global REMINDER_MINUTES, REMINDER_SMTP_HOST, REMINDER_SMTP_PORT
+    REMINDER_MINUTES = app.config.setdefault('REMINDER_MINUTES', REMINDER_MINUTES)
+    REMINDER_SMTP_HOST = app.config.setdefault('REMINDER_SMTP_HOST', REMINDER_SMTP_HOST)
+    REMINDER_SMTP_PORT = app.config.setdefault('REMINDER_SMTP_PORT', REMINDER_SMTP_PORT)
+
+    @app.before_request
+    def start_reminders():
+        if app.config.get('CLASS_REMINDERS', True) and not app.testing:
+            ensure_scheduler_thread()
@@ -0,0 +1,88 @@
+"""
+In-process class roster cache
+Stores each class's active students as a compact tuple of (id, name) pairs.
+Entries are tagged with the student_class_map/users data versions and are
+dropped as soon as either table changes. The cache is bounded by LRU size.
+"""
+
+import threading
+from collections import OrderedDict
+
+import data_versions
+
+ROSTER_TABLES = ('student_class_map', 'users')
+
+
+class RosterCache:
+    """LRU cache of class rosters keyed by class_id"""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conn, class_id):
+        """Return the roster for a class, loading it from the database on a miss"""
+        class_id = int(class_id)
+        versions = data_versions.versions_for(ROSTER_TABLES, conn)
+
+        with self._lock:
+            entry = self._entries.get(class_id)
+            if entry is not None and versions is not None and entry[0] == versions:
+                self._entries.move_to_end(class_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        roster = load_roster(conn, class_id)
+
+        if versions is not None:
+            with self._lock:
+                self._entries[class_id] = (versions, roster)
+                self._entries.move_to_end(class_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+        return roster
+
+    def clear(self):
+        """Drop every cached roster and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size
+            }
+
+
+def load_roster(conn, class_id):
+    """Query the active students of a class as a tuple of (id, name)"""
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT u.id, u.name
+        FROM users u
+        JOIN student_class_map scm ON u.id = scm.student_id
+        WHERE scm.class_id = ? AND u.role = 'student' AND scm.status = 'active'
+        ORDER BY u.name
+    ''', (class_id,))
+    return tuple((row[0], row[1]) for row in cur.fetchall())
+
+
+roster_cache = RosterCache()
+
+
+def get_class_roster(conn, class_id):
+    """Cached roster lookup shared by attendance, marks and CSV export"""
+    return roster_cache.get(conn, class_id)
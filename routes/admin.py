@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, current_app
 import sqlite3
 import os
 import json
@@ -6,9 +6,40 @@ import uuid
 import hashlib
 from werkzeug.utils import secure_filename
 from datetime import datetime
+from enrollment import bulk_enroll_students, split_students, summarize_results
+from roster_cache import get_class_roster
+import teacher_access
+import timetable
+import timetable_generator
+import schedule_conflicts
+import section_balancer
+import notifications
+import announcements as announcement_feed
+import uploads
+import blobstore
+import downloads
+import doubt_queue
+import doubt_clusters
+import answer_index
+from schedule_conflicts import find_conflicts
+from etags import versioned_etag, not_modified, with_etag
+from fragment_cache import LazyRows
+from streaming import RowStream, stream_page
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+# Largest schedule PDF accepted by add_class (bytes)
+MAX_SCHEDULE_PDF_SIZE = 20 * 1024 * 1024
+# Where schedule PDFs go until migrate_blobs.py moves them into the blob store
+LEGACY_SCHEDULE_DIR = 'static/uploads/schedules'
+
+# Tables whose rows belong to a class (by class_id) and go when it is deleted
+CLASS_TABLES = ('student_class_map', 'teacher_class_map', 'homework', 'announcements',
+                'attendance', 'class_sessions', 'resources')
+
+# Class pickers are rendered inside {% cache %} fragments, so this only runs on a cache miss
+ACTIVE_CLASSES_QUERY = 'SELECT id, name, type FROM classes WHERE status = "active" ORDER BY name'
+
 def simple_hash_password(password):
     """Simple password hashing function"""
     return hashlib.sha256(password.encode()).hexdigest()
@@ -28,6 +59,13 @@ def get_current_user():
         return User(session['user_id'], session.get('username', ''))
     return None
 
+def conflict_summary(conn, conflicts, limit=3):
+    """Short text listing the first few schedule conflicts for a flash message"""
+    names = schedule_conflicts.class_names(conn, {c.class_id for c in conflicts} | {c.other_class_id for c in conflicts})
+    details = list(dict.fromkeys(schedule_conflicts.describe(c, names) for c in conflicts))
+    more = f' (and {len(details) - limit} more)' if len(details) > limit else ''
+    return '; '.join(details[:limit]) + more
+
 @admin_bp.route('/dashboard')
 def dashboard():
     """Admin dashboard"""
@@ -57,10 +95,6 @@ def users():
     cur.execute('SELECT id, role_name FROM user_roles ORDER BY role_name')
     roles = cur.fetchall()
     
-    # Get all classes for student assignment
-    cur.execute('SELECT id, name, type FROM classes WHERE status = "active" ORDER BY name')
-    classes = cur.fetchall()
-    
     # Fixed subjects list
     subjects = ['Math', 'Science', 'Social Science', 'English', 'Hindi']
     
@@ -73,7 +107,7 @@ def users():
     users_list = cur.fetchall()
     
     conn.close()
-    return render_template('admin/add_user.html', roles=roles, classes=classes, subjects=subjects, users=users_list)
+    return render_template('admin/add_user.html', roles=roles, subjects=subjects, users=users_list)
 
 @admin_bp.route('/add_user', methods=['POST'])
 def add_user():
@@ -141,6 +175,8 @@ def add_user():
                            (user_id, subject, current_user.id))
         
         conn.commit()
+        if role == 'teacher':
+            teacher_access.invalidate_teacher(user_id)
         flash(f'User {username} created successfully!', 'success')
         
     except Exception as e:
@@ -180,6 +216,13 @@ def get_user_details(user_id):
     if 'role' not in session or session['role'] != 'admin':
         return jsonify({'error': 'Unauthorized'}), 401
     
+    # Answer 304 if the client's copy is still current
+    etag = versioned_etag(['users', 'classes', 'student_class_map', 'teacher_class_map',
+                           'student_subjects', 'teacher_subjects'], user_id)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
     conn = get_db()
     cur = conn.cursor()
     
@@ -242,7 +285,7 @@ def get_user_details(user_id):
             subjects_data = cur.fetchall()
             data['subjects'] = [row[0] for row in subjects_data]
         
-        return jsonify(data)
+        return with_etag(jsonify(data), etag)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -268,8 +311,7 @@ def edit_student(student_id):
         return redirect(url_for('admin.manage_users'))
     
     # Get all classes
-    cur.execute('SELECT id, name, type FROM classes WHERE status = "active" ORDER BY name')
-    all_classes = cur.fetchall()
+    all_classes = LazyRows(ACTIVE_CLASSES_QUERY)
     
     # Get assigned classes
     cur.execute('''
@@ -314,6 +356,12 @@ def update_student(student_id):
         classes = request.form.getlist('classes')
         subjects = request.form.getlist('subjects')
         
+        # Refuse class sets that would double-book the student
+        conflicts = find_conflicts(conn, 'student', {student_id: classes}, replace=True)
+        if conflicts:
+            flash(f'Schedule conflict: {conflict_summary(conn, conflicts)}', 'error')
+            return redirect(url_for('admin.edit_student', student_id=student_id))
+        
         # Remove existing assignments
         cur.execute('DELETE FROM student_class_map WHERE student_id = ?', (student_id,))
         cur.execute('DELETE FROM student_subjects WHERE student_id = ?', (student_id,))
@@ -358,8 +406,7 @@ def edit_teacher(teacher_id):
         return redirect(url_for('admin.manage_users'))
     
     # Get all classes
-    cur.execute('SELECT id, name, type FROM classes WHERE status = "active" ORDER BY name')
-    all_classes = cur.fetchall()
+    all_classes = LazyRows(ACTIVE_CLASSES_QUERY)
     
     # Get assigned classes
     cur.execute('''
@@ -404,6 +451,12 @@ def update_teacher(teacher_id):
         classes = request.form.getlist('classes')
         subjects = request.form.getlist('subjects')
         
+        # Refuse class sets that would double-book the teacher
+        conflicts = find_conflicts(conn, 'teacher', {teacher_id: classes}, replace=True)
+        if conflicts:
+            flash(f'Schedule conflict: {conflict_summary(conn, conflicts)}', 'error')
+            return redirect(url_for('admin.edit_teacher', teacher_id=teacher_id))
+        
         # Remove existing assignments
         cur.execute('DELETE FROM teacher_class_map WHERE teacher_id = ?', (teacher_id,))
         cur.execute('DELETE FROM teacher_subjects WHERE teacher_id = ?', (teacher_id,))
@@ -419,6 +472,7 @@ def update_teacher(teacher_id):
                        (teacher_id, subject, current_user.id))
         
         conn.commit()
+        teacher_access.invalidate_teacher(teacher_id)
         flash('Teacher assignments updated successfully!', 'success')
         
     except Exception as e:
@@ -458,6 +512,7 @@ def delete_user(user_id):
         cur.execute('DELETE FROM users WHERE id = ?', (user_id,))
         
         conn.commit()
+        teacher_access.invalidate_teacher(user_id)
         return jsonify({'message': f'User {user[0]} deleted successfully'})
         
     except Exception as e:
@@ -497,38 +552,55 @@ def add_class():
     schedule_time_start = request.form.get('schedule_time_start', '')
     schedule_time_end = request.form.get('schedule_time_end', '')
     
-    # Handle PDF upload
-    schedule_pdf_path = ''
-    if 'schedule_pdf' in request.files:
-        file = request.files['schedule_pdf']
-        if file and file.filename:
-            filename = secure_filename(file.filename)
-            # Create uploads directory if it doesn't exist
-            upload_dir = 'static/uploads/schedules'
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            # Generate unique filename
-            unique_filename = f"{uuid.uuid4()}_{filename}"
-            file_path = os.path.join(upload_dir, unique_filename)
-            file.save(file_path)
-            schedule_pdf_path = file_path
-    
     conn = get_db()
     cur = conn.cursor()
     
     try:
-        # Insert class
-        cur.execute('''
-            INSERT INTO classes (
-                name, type, description, grade_level, section,
-                schedule_days, schedule_time_start, schedule_time_end,
-                schedule_pdf_path, meeting_link, max_students, created_by
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            name, class_type, description, grade_level, section,
-            json.dumps(schedule_days), schedule_time_start, schedule_time_end,
-            schedule_pdf_path, meeting_link, max_students, current_user.id
-        ))
+        # Handle PDF upload: stream to disk under a size cap, then store it once per distinct content
+        use_blobs = blobstore.has_blobs_table(cur)
+        schedule_pdf_path = ''
+        schedule_pdf_sha256 = None
+        file = request.files.get('schedule_pdf')
+        if file and file.filename:
+            directory = blobstore.staging_directory() if use_blobs else LEGACY_SCHEDULE_DIR
+            try:
+                schedule_pdf_path, schedule_pdf_sha256 = uploads.save_file(file.stream, directory,
+                                                                           file.filename, MAX_SCHEDULE_PDF_SIZE)
+            except ValueError as e:
+                flash(f'Schedule PDF not saved: {str(e)}', 'error')
+                return redirect(url_for('admin.create_class'))
+            if use_blobs:
+                schedule_pdf_path = blobstore.store_file(conn, schedule_pdf_path, schedule_pdf_sha256, 'application/pdf')
+        
+        if use_blobs:
+            # Insert class; a trigger counts its reference to the schedule blob
+            cur.execute('''
+                INSERT INTO classes (
+                    name, type, description, grade_level, section,
+                    schedule_days, schedule_time_start, schedule_time_end,
+                    schedule_pdf_path, schedule_pdf_sha256, meeting_link, max_students, created_by
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                name, class_type, description, grade_level, section,
+                json.dumps(schedule_days), schedule_time_start, schedule_time_end,
+                schedule_pdf_path, schedule_pdf_sha256, meeting_link, max_students, current_user.id
+            ))
+        else:
+            cur.execute('''
+                INSERT INTO classes (
+                    name, type, description, grade_level, section,
+                    schedule_days, schedule_time_start, schedule_time_end,
+                    schedule_pdf_path, meeting_link, max_students, created_by
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                name, class_type, description, grade_level, section,
+                json.dumps(schedule_days), schedule_time_start, schedule_time_end,
+                schedule_pdf_path, meeting_link, max_students, current_user.id
+            ))
+        
+        # Normalized weekly sessions for the timetable index
+        timetable.replace_class_sessions(cur, cur.lastrowid, schedule_days,
+                                         schedule_time_start, schedule_time_end)
         
         conn.commit()
         flash(f'Class "{name}" created successfully!', 'success')
@@ -570,6 +642,34 @@ def view_classes():
     conn.close()
     return render_template('admin/view_classes.html', classes=classes)
 
+@admin_bp.route('/generate_timetable', methods=['POST'])
+def generate_timetable():
+    """Re-solve the weekly timetable for all active classes and save it"""
+    if 'role' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    conn = get_db()
+    
+    try:
+        requests = timetable_generator.load_requests(conn)
+        solution = timetable_generator.generate_timetable(requests)
+        
+        if solution.unscheduled:
+            # A partial timetable could clash with the classes left on their old slots
+            names = schedule_conflicts.class_names(conn, solution.unscheduled)
+            flash(f"Timetable not saved; could not place: {', '.join(names.values())}", 'error')
+        else:
+            timetable_generator.apply_timetable(conn, solution, updated_by=session.get('user_id'))
+            flash(f'Timetable generated for {len(solution.placements)} classes', 'success')
+    
+    except Exception as e:
+        flash(f'Error generating timetable: {str(e)}', 'error')
+    
+    finally:
+        conn.close()
+    
+    return redirect(url_for('admin.view_classes'))
+
 @admin_bp.route('/view_class/<int:class_id>')
 def view_class(class_id):
     """View specific class details"""
@@ -640,8 +740,7 @@ def add_students():
     cur = conn.cursor()
     
     # Get all classes
-    cur.execute('SELECT id, name, type FROM classes WHERE status = "active" ORDER BY name')
-    classes = cur.fetchall()
+    classes = LazyRows(ACTIVE_CLASSES_QUERY)
     
     # Get all students (only users with role 'student')
     cur.execute('''
@@ -666,20 +765,28 @@ def assign_students():
     current_user = get_current_user()
     
     conn = get_db()
-    cur = conn.cursor()
     
     try:
-        for student_id in student_ids:
-            # Check if already assigned
-            cur.execute('SELECT id FROM student_class_map WHERE student_id = ? AND class_id = ?',
-                       (student_id, class_id))
-            if not cur.fetchone():
-                cur.execute('INSERT INTO student_class_map (student_id, class_id, assigned_by) VALUES (?, ?, ?)',
-                           (student_id, class_id, current_user.id))
-        
+        # Only users with the student role can be enrolled
+        student_ids, not_students = split_students(conn.cursor(), student_ids)
+        if not_students:
+            flash(f'{len(not_students)} selected user(s) are not students and were not assigned', 'error')
+        
+        # Students whose timetable clashes with this class are not enrolled
+        conflicts = find_conflicts(conn, 'student', {student_id: [class_id] for student_id in student_ids})
+        results = bulk_enroll_students(conn, [class_id], student_ids, current_user.id,
+                                       exclude={(c.person_id, c.class_id) for c in conflicts})
         conn.commit()
-        flash('Students assigned successfully!', 'success')
         
+        summary = summarize_results(results)
+        if summary['rejected_capacity']:
+            flash(f"{summary['added']} student(s) assigned, {summary['rejected_capacity']} not assigned because the class is full", 'error')
+        elif not summary['rejected_conflict']:
+            flash('Students assigned successfully!', 'success')
+        if summary['rejected_conflict']:
+            flash(f"{summary['rejected_conflict']} student(s) not assigned because of a schedule conflict: "
+                  f"{conflict_summary(conn, conflicts)}", 'error')
+    
     except Exception as e:
         conn.rollback()
         flash(f'Error assigning students: {str(e)}', 'error')
@@ -689,9 +796,127 @@ def assign_students():
     
     return redirect(url_for('admin.add_students'))
 
+@admin_bp.route('/assign_students/bulk', methods=['POST'])
+def bulk_assign_students():
+    """Assign many students to many classes at once (JSON API)"""
+    if 'role' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    class_ids = data.get('class_ids', [])
+    student_ids = data.get('student_ids', [])
+    
+    if not class_ids or not student_ids:
+        return jsonify({'error': 'class_ids and student_ids are required'}), 400
+    if not isinstance(class_ids, list) or not isinstance(student_ids, list):
+        return jsonify({'error': 'class_ids and student_ids must be lists of integers'}), 400
+    
+    current_user = get_current_user()
+    conn = get_db()
+    
+    try:
+        # Only users with the student role can be enrolled
+        student_ids, not_students = split_students(conn.cursor(), student_ids)
+        conflicts = find_conflicts(conn, 'student', {student_id: class_ids for student_id in student_ids})
+        results = bulk_enroll_students(conn, class_ids, student_ids, current_user.id,
+                                       exclude={(c.person_id, c.class_id) for c in conflicts})
+        conn.commit()
+        
+        names = schedule_conflicts.class_names(conn, {c.class_id for c in conflicts} | {c.other_class_id for c in conflicts})
+        return jsonify({
+            'classes': {str(class_id): result for class_id, result in results.items()},
+            'summary': summarize_results(results),
+            'not_students': not_students,
+            'conflicts': [{'student_id': c.person_id, 'class_id': c.class_id, 'conflicts_with': c.other_class_id,
+                           'detail': schedule_conflicts.describe(c, names)} for c in conflicts]
+        })
+    
+    except (TypeError, ValueError):
+        conn.rollback()
+        return jsonify({'error': 'class_ids and student_ids must be lists of integers'}), 400
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    finally:
+        conn.close()
+
+@admin_bp.route('/balance_sections', methods=['POST'])
+def balance_sections():
+    """Spread a grade's students evenly across its sections (JSON API; dry run unless apply is true)"""
+    if 'role' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    grade_level = data.get('grade_level')
+    
+    if not grade_level:
+        return jsonify({'error': 'grade_level is required'}), 400
+    
+    current_user = get_current_user()
+    conn = get_db()
+    
+    try:
+        plan = section_balancer.balance_sections(
+            conn, grade_level,
+            class_ids=data.get('class_ids'),
+            student_ids=data.get('student_ids', []),
+            keep_subjects_together=bool(data.get('keep_subjects_together')),
+            balance_by_average=bool(data.get('balance_by_average')))
+        
+        if not plan.sections:
+            return jsonify({'error': f'No active classes found for grade {grade_level}'}), 404
+        
+        applied = bool(data.get('apply'))
+        if applied:
+            section_balancer.apply_balance(conn, plan, current_user.id)
+            conn.commit()
+        
+        return jsonify({
+            'applied': applied,
+            'sections': {str(class_id): info for class_id, info in plan.sections.items()},
+            'moves': [{'student_id': s, 'from': old, 'to': new} for s, old, new in plan.moves],
+            'dropped': [{'student_id': s, 'class_id': class_id} for s, class_id in plan.dropped],
+            'unassigned': plan.unassigned
+        })
+    
+    except (TypeError, ValueError):
+        conn.rollback()
+        return jsonify({'error': 'class_ids and student_ids must be lists of integers'}), 400
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    finally:
+        conn.close()
+
 # Subject creation functionality removed - using fixed subject list now
 # Fixed subjects: Math, Science, Social Science, English, Hindi
 
+def feedback_row(row):
+    """Shape a feedback row the way view_feedback.html expects"""
+    return [
+        row[0],  # id
+        row[1],  # student_id
+        'general',  # category (mock)
+        '',  # subject (mock)
+        '',  # teacher (mock)
+        '',  # class (mock)
+        row[3],  # rating
+        row[2],  # feedback_text
+        0,  # is_anonymous (mock)
+        row[4],  # submitted_on
+        'pending',  # status (mock)
+        '',  # admin_response (mock)
+        '',  # response_date (mock)
+        '',  # resolved_date (mock)
+        row[5]  # username
+    ]
+
 @admin_bp.route('/view_feedback')
 def view_feedback():
     """View all feedback submissions"""
@@ -713,7 +938,7 @@ def view_feedback():
         'resolved': total_feedback // 4
     }
     
-    # Get all feedback with user details
+    # Get all feedback with user details; rows are streamed into the template
     cur.execute('''
         SELECT f.id, f.student_id, f.feedback_text, f.rating, f.submitted_on,
                u.username
@@ -721,33 +946,10 @@ def view_feedback():
         LEFT JOIN users u ON f.student_id = u.id
         ORDER BY f.submitted_on DESC
     ''')
-    feedback_raw = cur.fetchall()
-    
-    # Transform feedback data to match template expectations
-    feedback_list = []
-    for row in feedback_raw:
-        feedback_list.append([
-            row[0],  # id
-            row[1],  # student_id
-            'general',  # category (mock)
-            '',  # subject (mock)
-            '',  # teacher (mock)
-            '',  # class (mock)
-            row[3],  # rating
-            row[2],  # feedback_text
-            0,  # is_anonymous (mock)
-            row[4],  # submitted_on
-            'pending',  # status (mock)
-            '',  # admin_response (mock)
-            '',  # response_date (mock)
-            '',  # resolved_date (mock)
-            row[5]  # username
-        ])
     
-    conn.close()
-    return render_template('admin/view_feedback.html', 
-                         feedback_stats=feedback_stats, 
-                         feedback_list=feedback_list)
+    return stream_page('admin/view_feedback.html', conn,
+                       feedback_stats=feedback_stats,
+                       feedback_list=RowStream(cur, count=total_feedback, transform=feedback_row))
 
 @admin_bp.route('/respond_to_feedback', methods=['POST'])
 def respond_to_feedback():
@@ -815,18 +1017,26 @@ def respond_doubt():
         return redirect(url_for('admin.view_doubts'))
     
     conn = get_db()
-    cur = conn.cursor()
     
     try:
-        cur.execute('''
-            UPDATE doubts 
-            SET response = ?, status = 'answered', response_time = ?, responder_id = ?
-            WHERE id = ?
-        ''', (response, datetime.now(), current_user.id, doubt_id))
-        
+        # Admins answer regardless of a teacher's claim on the doubt
+        if request.form.get('whole_cluster') and doubt_clusters.has_clusters_table(conn.cursor()):
+            answered = doubt_clusters.answer_cluster(conn, int(doubt_id), current_user.id, response, override=True)
+        else:
+            answered = [(int(doubt_id),) + tuple(doubt_queue.answer(conn, int(doubt_id), current_user.id, response,
+                                                                     override=True))]
         conn.commit()
-        flash('Response added successfully!', 'success')
-        
+        answer_index.index_answers(conn, [row[0] for row in answered])
+        for answered_id, student_id, subject in answered:
+            notifications.publish([f'user:{student_id}'], 'doubt_answered', f'Your doubt about {subject} was answered',
+                                  actor=current_user.id, doubt_id=answered_id)
+        flash(f'Response added to {len(answered)} doubt(s)!' if len(answered) > 1 else 'Response added successfully!',
+              'success')
+        
+    except ValueError as e:
+        conn.rollback()
+        flash(str(e), 'error')
+    
     except Exception as e:
         conn.rollback()
         flash(f'Error adding response: {str(e)}', 'error')
@@ -836,6 +1046,52 @@ def respond_doubt():
     
     return redirect(url_for('admin.view_doubts'))
 
+@admin_bp.route('/announcements', methods=['GET', 'POST'])
+def announcements():
+    """Post announcements to the school, a grade, a class or a subject"""
+    if 'role' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    conn = get_db()
+    cur = conn.cursor()
+    
+    try:
+        ready = announcement_feed.has_announcements_table(cur)
+        if request.method == 'POST' and not ready:
+            flash('Announcements are not set up yet. Run migrate_announcements.py first.', 'error')
+            return redirect(url_for('admin.announcements'))
+        if request.method == 'POST':
+            scope = request.form.get('scope', 'school')
+            target = request.form.get(f'{scope}_target') if scope != 'school' else None
+            title = request.form.get('title', '')
+            try:
+                announcement_id = announcement_feed.post_announcement(
+                    conn, session['user_id'], title, request.form.get('content', ''), scope, target,
+                    request.form.get('priority', 'normal'), request.form.get('expires_on'))
+                conn.commit()
+            except (TypeError, ValueError) as e:
+                flash(str(e), 'error')
+            else:
+                announcement_feed.notify(conn, announcement_id, session['user_id'], title.strip(), scope, target)
+                flash('Announcement posted!', 'success')
+            return redirect(url_for('admin.announcements'))
+        
+        cur.execute(ACTIVE_CLASSES_QUERY)
+        classes = cur.fetchall()
+        cur.execute("SELECT DISTINCT grade_level FROM classes WHERE status = 'active' AND grade_level IS NOT NULL ORDER BY grade_level")
+        grades = [row[0] for row in cur.fetchall()]
+        cur.execute('SELECT name FROM subjects ORDER BY name')
+        subjects = [row[0] for row in cur.fetchall()]
+        
+        recent = []
+        if ready:
+            recent = announcement_feed.feed(conn, None, limit=50, before_id=request.args.get('before', type=int))
+        return render_template('admin/announcements.html', announcements=recent, classes=classes,
+                               grades=grades, subjects=subjects, priorities=announcement_feed.PRIORITIES)
+    
+    finally:
+        conn.close()
+
 @admin_bp.route('/download_schedule/<int:class_id>')
 def download_schedule(class_id):
     """Download class schedule PDF"""
@@ -843,20 +1099,19 @@ def download_schedule(class_id):
         return redirect(url_for('auth.login'))
     
     conn = get_db()
-    cur = conn.cursor()
     
-    cur.execute('SELECT schedule_pdf_path, name FROM classes WHERE id = ?', (class_id,))
-    result = cur.fetchone()
-    conn.close()
+    try:
+        found = downloads.find_file(conn, 'schedule', class_id, session.get('user_id'), 'admin')
+    finally:
+        conn.close()
     
-    if not result or not result[0]:
+    if found is None:
         flash('Schedule PDF not found!', 'error')
         return redirect(url_for('admin.view_classes'))
     
-    pdf_path, class_name = result
-    
-    if os.path.exists(pdf_path):
-        return send_file(pdf_path, as_attachment=True, download_name=f"{class_name}_schedule.pdf")
+    if os.path.exists(os.path.join(current_app.root_path, found.path)):
+        # Shared download path: ETag/Range handling and optional proxy offload
+        return downloads.send_download(found)
     else:
         flash('Schedule file not found on server!', 'error')
         return redirect(url_for('admin.view_classes'))
@@ -867,6 +1122,12 @@ def get_class_subjects(class_id):
     if 'role' not in session or session['role'] != 'admin':
         return jsonify({'error': 'Unauthorized'}), 401
     
+    # Answer 304 if the client's copy is still current
+    etag = versioned_etag(['classes', 'subjects'], class_id)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
     conn = get_db()
     cur = conn.cursor()
     
@@ -890,10 +1151,10 @@ def get_class_subjects(class_id):
                 'description': subject[2] or 'No description'
             })
         
-        return jsonify({
+        return with_etag(jsonify({
             'class_name': class_result[0],
             'subjects': subjects
-        })
+        }), etag)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -920,16 +1181,22 @@ def delete_class(class_id):
         if not class_info:
             return jsonify({'error': 'Class not found'}), 404
         
-        # Delete all related records
-        cur.execute('DELETE FROM student_class_map WHERE class_id = ?', (class_id,))
-        cur.execute('DELETE FROM teacher_class_map WHERE class_id = ?', (class_id,))
-        cur.execute('DELETE FROM subjects WHERE class_id = ?', (class_id,))
-        cur.execute('DELETE FROM homework WHERE class_id = ?', (class_id,))
-        cur.execute('DELETE FROM announcements WHERE class_id = ?', (class_id,))
-        cur.execute('DELETE FROM attendance WHERE class_id = ?', (class_id,))
+        # Delete all related records; tables added by migrations may not exist yet
+        cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        tables = {row[0] for row in cur.fetchall()}
+        # Triggers on resources release the class's references to its schedule and resource blobs
+        for table in CLASS_TABLES:
+            if table in tables:
+                cur.execute(f'DELETE FROM {table} WHERE class_id = ?', (class_id,))
         cur.execute('DELETE FROM classes WHERE id = ?', (class_id,))
         
         conn.commit()
+        teacher_access.invalidate_teacher()
+        
+        # Drop blobs that have been unreferenced past the grace period
+        if blobstore.has_blobs_table(cur):
+            blobstore.collect_garbage(conn)
+            conn.commit()
         return jsonify({'message': f'Class "{class_info[0]}" deleted successfully'})
         
     except Exception as e:
@@ -975,12 +1242,35 @@ def toggle_class_status(class_id):
     finally:
         conn.close()
 
+@admin_bp.route('/compression_stats')
+def compression_stats():
+    """Per-endpoint response compression ratio and CPU time"""
+    if 'role' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    middleware = current_app.extensions.get('compression')
+    if middleware is None:
+        return jsonify({'enabled': False, 'endpoints': {}})
+    return jsonify({
+        'enabled': True,
+        'min_size': middleware.min_size,
+        'gzip_level': middleware.gzip_level,
+        'brotli_quality': middleware.brotli_quality,
+        'endpoints': middleware.stats.snapshot()
+    })
+
 @admin_bp.route('/stats')
 def admin_stats():
     """Get admin dashboard statistics"""
     if 'role' not in session or session['role'] != 'admin':
         return redirect(url_for('auth.login'))
     
+    # Answer 304 if the client's copy is still current
+    etag = versioned_etag(['users', 'user_role_map', 'classes', 'subjects', 'feedback', 'doubts'])
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
     conn = get_db()
     cur = conn.cursor()
     
@@ -1015,7 +1305,7 @@ def admin_stats():
         cur.execute('SELECT COUNT(*) FROM doubts WHERE status = "pending"')
         stats['pending_doubts'] = cur.fetchone()[0]
         
-        return jsonify(stats)
+        return with_etag(jsonify(stats), etag)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1104,15 +1394,8 @@ def mark_attendance():
                 flash('Class not found', 'error')
                 return redirect(url_for('admin.attendance'))
             
-            # Get students in this class
-            cur.execute('''
-                SELECT u.id, u.name
-                FROM users u
-                JOIN student_class_map scm ON u.id = scm.student_id
-                WHERE scm.class_id = ? AND u.role = 'student' AND scm.status = 'active'
-                ORDER BY u.name
-            ''', (class_id,))
-            students = cur.fetchall()
+            # Get students in this class (cached roster)
+            students = get_class_roster(conn, class_id)
             
             # Get existing attendance for this date
             cur.execute('''
@@ -1148,14 +1431,8 @@ def mark_attendance():
     cur = conn.cursor()
     
     try:
-        # Get all students in the class
-        cur.execute('''
-            SELECT u.id
-            FROM users u
-            JOIN student_class_map scm ON u.id = scm.student_id
-            WHERE scm.class_id = ? AND u.role = 'student' AND scm.status = 'active'
-        ''', (class_id,))
-        students = [row[0] for row in cur.fetchall()]
+        # Get all students in the class (cached roster)
+        students = [student_id for student_id, _ in get_class_roster(conn, class_id)]
         
         attendance_saved = 0
         for student_id in students:
@@ -1177,6 +1454,8 @@ def mark_attendance():
             attendance_saved += 1
         
         conn.commit()
+        notifications.publish([f'class:{class_id}'], 'attendance', f'Attendance recorded for {attendance_date}',
+                              actor=session['user_id'], class_id=int(class_id), date=attendance_date)
         flash(f'Attendance marked for {attendance_saved} students', 'success')
         return redirect(url_for('admin.attendance'))
         
@@ -1219,8 +1498,8 @@ def attendance_report():
         
         where_clause = ' AND '.join(where_conditions) if where_conditions else '1=1'
         
-        # Get attendance summary
-        cur.execute(f'''
+        # Per-student summary rows, streamed into the template
+        report_query = f'''
             SELECT 
                 u.name as student_name,
                 c.name as class_name,
@@ -1236,23 +1515,38 @@ def attendance_report():
             JOIN classes c ON a.class_id = c.id
             WHERE {where_clause}
             GROUP BY u.id, c.id
-            ORDER BY c.name, u.name
+        '''
+        
+        # Totals for the summary cards, computed before any rows are streamed
+        cur.execute(f'''
+            SELECT COUNT(*), COALESCE(AVG(attendance_percentage), 0),
+                   COALESCE(SUM(present_days), 0), COALESCE(SUM(absent_days), 0)
+            FROM ({report_query})
         ''', params)
-        report_data = cur.fetchall()
+        total_students, average_attendance, present_days, absent_days = cur.fetchone()
+        summary = {
+            'total_students': total_students,
+            'average_attendance': average_attendance,
+            'present_days': present_days,
+            'absent_days': absent_days
+        }
         
         # Get all classes for filter dropdown
         cur.execute('SELECT id, name, grade_level FROM classes ORDER BY grade_level, name')
         classes = cur.fetchall()
         
-        return render_template('admin/attendance_report.html',
-                             report_data=report_data,
-                             classes=classes,
-                             filters={'class_id': class_id, 'start_date': start_date, 'end_date': end_date})
+        report_cur = conn.cursor()
+        report_cur.execute(report_query + ' ORDER BY c.name, u.name', params)
         
     except Exception as e:
+        conn.close()
         flash(f'Error generating report: {str(e)}', 'error')
         return redirect(url_for('admin.attendance'))
-    finally:
-        conn.close()
+    
+    return stream_page('admin/attendance_report.html', conn,
+                       report_data=RowStream(report_cur, count=total_students),
+                       summary=summary,
+                       classes=classes,
+                       filters={'class_id': class_id, 'start_date': start_date, 'end_date': end_date})
 
 
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 import sqlite3
 import hashlib
+import teacher_access
 
 auth_bp = Blueprint('auth', __name__)
 DATABASE = 'users.db'
@@ -38,6 +39,9 @@ def login():
             if user[3] == 'admin':
                 return redirect(url_for('admin.dashboard'))
             elif user[3] == 'teacher':
+                # Warm the teacher's class/subject access cache
+                teacher_access.invalidate_teacher(user[0])
+                teacher_access.get_teacher_access(user[0])
                 return redirect(url_for('teacher.dashboard'))
             elif user[3] == 'student':
                 return redirect(url_for('student.site'))
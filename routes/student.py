@@ -1,6 +1,13 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
 import sqlite3
 import os
+from datetime import datetime
+import notifications
+import announcements as announcement_feed
+import homework as homework_store
+import doubt_queue
+import doubt_clusters
+import answer_index
 
 student_bp = Blueprint('student', __name__, url_prefix='/student')
 
@@ -39,6 +46,12 @@ def site():
     ''', (student_id,))
     pending_doubts_count = cur.fetchone()[0]
     
+    # Unread announcements across the student's scopes
+    unread_announcements = 0
+    if announcement_feed.has_announcements_table(cur):
+        scopes = announcement_feed.user_scopes(conn, student_id, 'student')
+        unread_announcements = announcement_feed.unread_count(conn, student_id, scopes)
+    
     # Get enrolled classes details
     cur.execute('''
         SELECT c.id, c.name, c.description, c.grade_level, c.type,
@@ -68,6 +81,7 @@ def site():
                          enrolled_classes_count=enrolled_classes_count,
                          subjects_count=subjects_count,
                          pending_doubts_count=pending_doubts_count,
+                         unread_announcements=unread_announcements,
                          enrolled_classes=enrolled_classes)
 
 @student_bp.route('/classes')
@@ -80,11 +94,47 @@ def classes():
 
 @student_bp.route('/homework')
 def homework():
-    """Display homework assignments"""
+    """Display homework due this week and later"""
     if 'role' not in session or session['role'] != 'student':
         return redirect(url_for('auth.login'))
     
-    return render_template('student/student_homework.html')
+    student_id = session.get('user_id')
+    conn = get_db()
+    
+    due_this_week, due_later = [], []
+    
+    try:
+        if homework_store.has_homework_table(conn.cursor()):
+            week_start, week_end = homework_store.week_bounds()
+            due_this_week = homework_store.due_between(conn, student_id, week_start, week_end)
+            due_later = homework_store.due_between(conn, student_id, week_end, limit=20)
+    finally:
+        conn.close()
+    
+    return render_template('student/student_homework.html',
+                         due_this_week=due_this_week,
+                         due_later=due_later,
+                         now=datetime.now())
+
+@student_bp.route('/homework/<int:homework_id>/submit', methods=['POST'])
+def submit_homework(homework_id):
+    """Submit (or resubmit) work for a homework"""
+    if 'role' not in session or session['role'] != 'student':
+        return redirect(url_for('auth.login'))
+    
+    conn = get_db()
+    
+    try:
+        homework_store.submit(conn, homework_id, session.get('user_id'), request.form.get('content'))
+        conn.commit()
+        flash('Your homework has been submitted!', 'success')
+    except ValueError as e:
+        conn.rollback()
+        flash(str(e), 'error')
+    finally:
+        conn.close()
+    
+    return redirect(url_for('student.homework'))
 
 @student_bp.route('/feedback')
 def feedback():
@@ -96,11 +146,29 @@ def feedback():
 
 @student_bp.route('/announcements')
 def announcements():
-    """View announcements"""
+    """View announcements for the student's school, grades, classes and subjects"""
     if 'role' not in session or session['role'] != 'student':
         return redirect(url_for('auth.login'))
     
-    return render_template('student/student_announcements.html')
+    student_id = session.get('user_id')
+    conn = get_db()
+    items = []
+    
+    try:
+        # Empty feed until migrate_announcements.py has run
+        if announcement_feed.has_announcements_table(conn.cursor()):
+            scopes = announcement_feed.user_scopes(conn, student_id, 'student')
+            items = announcement_feed.feed(conn, scopes, before_id=request.args.get('before', type=int))
+            last_read_id = announcement_feed.read_cursor(conn, student_id)
+            for item in items:
+                item['unread'] = item['id'] > last_read_id
+            if items:
+                announcement_feed.mark_read(conn, student_id, items[0]['id'])
+                conn.commit()
+    finally:
+        conn.close()
+    
+    return render_template('student/student_announcements.html', announcements=items)
 
 @student_bp.route('/doubts', methods=['GET', 'POST'])
 def doubts():
@@ -115,18 +183,25 @@ def doubts():
     if request.method == 'POST':
         subject = request.form.get('subject')
         doubt_text = request.form.get('doubt_text')
+        priority = request.form.get('priority', 'normal')
         
-        if subject and doubt_text:
-            # Insert new doubt
-            cur.execute('''
-                INSERT INTO doubts (student_id, subject, doubt_text, status)
-                VALUES (?, ?, ?, 'open')
-            ''', (student_id, subject, doubt_text))
+        if subject and doubt_text and priority in doubt_queue.PRIORITIES:
+            # Route the doubt to the teachers of this subject in the student's class
+            doubt_id, class_id = doubt_queue.post_doubt(conn, student_id, subject, doubt_text, priority)
+            if doubt_clusters.has_clusters_table(cur):
+                doubt_clusters.add_doubt(conn, doubt_id, subject, doubt_text)
             conn.commit()
+            topics = [f'user:{teacher_id}' for teacher_id in doubt_queue.teachers_for(conn, subject, class_id)]
+            notifications.publish(topics + ['role:admin'], 'doubt', f'New doubt in {subject}',
+                                  actor=student_id, doubt_id=doubt_id, subject=subject)
             flash('Your doubt has been submitted successfully!', 'success')
         else:
             flash('Please fill in all fields.', 'error')
     
+    # Subjects the student takes, for the subject picker
+    cur.execute('SELECT subject_name FROM student_subjects WHERE student_id = ? ORDER BY subject_name', (student_id,))
+    subjects = [row[0] for row in cur.fetchall()]
+    
     # Get student's doubts
     cur.execute('''
         SELECT id, subject, doubt_text, status, submitted_on
@@ -146,4 +221,25 @@ def doubts():
         })
     
     conn.close()
-    return render_template('student/student_doubts.html', doubts=doubts_data)
+    return render_template('student/student_doubts.html', doubts=doubts_data, subjects=subjects,
+                           priorities=list(doubt_queue.PRIORITIES))
+
+@student_bp.route('/doubts/suggestions')
+def doubt_suggestions():
+    """Past answers to similar doubts, shown while the student types (JSON)"""
+    if 'role' not in session or session['role'] != 'student':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({'suggestions': []})
+    
+    conn = get_db()
+    
+    try:
+        suggestions = answer_index.suggest(conn, text, request.args.get('subject') or None)
+        return jsonify({'suggestions': suggestions})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
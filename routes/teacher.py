@@ -1,7 +1,18 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 import sqlite3
 from datetime import datetime
-from datetime import datetime
+from datetime import datetime, timedelta
+from roster_cache import get_class_roster
+import teacher_access
+import timetable
+import notifications
+import announcements as announcement_feed
+import homework as homework_store
+import doubt_queue
+import doubt_clusters
+import answer_index
+from streaming import RowStream, stream_page
+from etags import versioned_etag, not_modified, with_etag
 
 teacher_bp = Blueprint('teacher', __name__, url_prefix='/teacher')
 
@@ -9,6 +20,32 @@ def get_db():
     """Get database connection"""
     return sqlite3.connect('users.db')
 
+def todays_entry(index, item, now):
+    """Describe one of today's sessions with its status relative to now"""
+    entry = index.describe(item)
+    minute = now.hour * 60 + now.minute
+    if item.end_minute <= minute:
+        entry['status'], entry['status_color'] = 'Completed', 'secondary'
+    elif item.start_minute <= minute:
+        entry['status'], entry['status_color'] = 'In Progress', 'success'
+    else:
+        entry['status'], entry['status_color'] = 'Upcoming', 'primary'
+    entry['subject'] = entry['grade_level']
+    entry['room'] = 'Online' if entry['meeting_link'] else 'Room TBA'
+    return entry
+
+def build_weekly_schedule(index, teacher_id):
+    """One row per distinct time slot with the teacher's class for each weekday"""
+    slots = {}
+    for weekday in range(7):
+        for item in index.sessions_on(weekday, teacher_id):
+            entry = index.describe(item)
+            entry['subject'] = entry['grade_level']
+            entry['room'] = 'Online' if entry['meeting_link'] else None
+            row = slots.setdefault((item.start_minute, item.end_minute), {'time': entry['time']})
+            row.setdefault(timetable.WEEKDAYS[weekday].lower(), entry)
+    return [slots[key] for key in sorted(slots)]
+
 @teacher_bp.route('/dashboard')
 def dashboard():
     """Teacher dashboard"""
@@ -26,24 +63,25 @@ def dashboard():
     ''', (teacher_id,))
     assigned_classes_count = cur.fetchone()[0]
     
-    # Get pending doubts count
-    cur.execute('''
-        SELECT COUNT(*) FROM doubts 
-        WHERE status = 'open'
-    ''', ())
-    pending_doubts_count = cur.fetchone()[0]
+    # Open doubts routed to this teacher, counted from the partial index
+    pending_doubts_count = 0
+    if doubt_queue.has_queue_index(cur):
+        pending_doubts_count = doubt_queue.open_count(conn, teacher_id)
     
-    # Get submissions to grade (placeholder - we can implement this later)
+    # Submissions to grade, from the counters on the teacher's homework rows
     submissions_to_grade = 0
+    if homework_store.has_homework_table(cur):
+        submissions_to_grade = homework_store.teacher_stats(conn, teacher_id)['pending_grading']
     
-    # Count today's classes (placeholder)
-    todays_classes = 1
-    
-    # Today's schedule (empty for now)
-    todays_schedule = []
+    # Today's classes from the timetable index
+    now = datetime.now()
+    index = timetable.get_index()
+    todays_schedule = [todays_entry(index, item, now) for item in index.sessions_on(now.weekday(), teacher_id)]
+    todays_classes = len(todays_schedule)
     
-    # Recent notifications (empty for now)
-    recent_notifications = []
+    # Recent notifications from the live notification bus
+    events = notifications.bus.recent(notifications.user_topics(conn, teacher_id, 'teacher'), teacher_id)
+    recent_notifications = [notifications.describe(event) for event in events]
     
     conn.close()
     
@@ -108,23 +146,24 @@ def homework():
             WHERE tcm.teacher_id = ? AND c.status = 'active'
             ORDER BY c.grade_level, c.name
         ''', (teacher_id,))
-        classes = cur.fetchall()
+        teacher_classes = [{'id': row[0], 'name': row[1], 'grade_level': row[2]} for row in cur.fetchall()]
         
-        # Since we don't have assignments table yet, provide empty data
-        assignments = []
+        _, subjects = teacher_access.get_teacher_access(teacher_id)
+        teacher_subjects = [{'id': name, 'name': name} for name in sorted(subjects)]
         
-        # Provide default assignment stats
-        assignment_stats = {
-            'total': 0,
-            'active': 0,
-            'completed': 0,
-            'avg_submission_rate': 0
-        }
+        # Submission counts live on the homework rows, so stats need no join
+        now = datetime.now()
+        assignments, assignment_stats = [], homework_store.EMPTY_STATS
+        if homework_store.has_homework_table(cur):
+            assignments = homework_store.teacher_homework(conn, teacher_id, request.args.get('class_id', type=int), now)
+            assignment_stats = homework_store.teacher_stats(conn, teacher_id, now)
         
         return render_template('teacher/teacher_homework.html',
-                             classes=classes,
-                             assignments=assignments,
-                             assignment_stats=assignment_stats)
+                             teacher_classes=teacher_classes,
+                             teacher_subjects=teacher_subjects,
+                             teacher_assignments=assignments,
+                             assignment_stats=assignment_stats,
+                             due_soon_cutoff=now + timedelta(days=3))
         
     except Exception as e:
         flash(f'Error loading homework data: {str(e)}', 'error')
@@ -132,6 +171,43 @@ def homework():
     finally:
         conn.close()
 
+@teacher_bp.route('/homework/create', methods=['POST'])
+def create_homework():
+    """Set homework for one of the teacher's classes"""
+    if 'role' not in session or session['role'] != 'teacher':
+        return redirect(url_for('auth.login'))
+    
+    teacher_id = session.get('user_id')
+    class_id = request.form.get('class_id')
+    subject_name = request.form.get('subject_name')
+    
+    if not teacher_access.has_access(teacher_id, class_id, subject_name):
+        flash('You can only set homework for your own classes and subjects.', 'error')
+        return redirect(url_for('teacher.homework'))
+    
+    conn = get_db()
+    
+    try:
+        title = request.form.get('title', '')
+        homework_id = homework_store.create_homework(
+            conn, teacher_id, class_id, subject_name, title, request.form.get('due_at'),
+            description=request.form.get('description'),
+            max_points=request.form.get('max_points') or 100,
+            homework_type=request.form.get('homework_type') or 'homework',
+            allow_late=bool(request.form.get('allow_late')))
+        conn.commit()
+        if request.form.get('notify_students'):
+            notifications.publish([f'class:{int(class_id)}'], 'homework', f'New homework: {title.strip()}',
+                                  actor=teacher_id, homework_id=homework_id)
+        flash('Homework created successfully!', 'success')
+    except (TypeError, ValueError) as e:
+        conn.rollback()
+        flash(f'Could not create homework: {str(e)}', 'error')
+    finally:
+        conn.close()
+    
+    return redirect(url_for('teacher.homework'))
+
 @teacher_bp.route('/schedule')
 def schedule():
     """View teaching schedule"""
@@ -153,18 +229,27 @@ def schedule():
         ''', (teacher_id,))
         classes = cur.fetchall()
         
-        # Provide default schedule data
-        todays_classes_count = len(classes)
-        next_class_info = "Check your class schedule below"
+        # Weekly timetable, today's classes and the next class from the timetable index
+        now = datetime.now()
+        index = timetable.get_index()
+        weekly_schedule = build_weekly_schedule(index, teacher_id)
+        todays_schedule = [todays_entry(index, item, now) for item in index.sessions_on(now.weekday(), teacher_id)]
+        todays_classes_count = len(todays_schedule)
         
-        # Create empty weekly timetable structure
-        weekly_schedule = []
+        next_class_info = "No upcoming classes"
+        upcoming = index.next_session(now.weekday(), now.hour * 60 + now.minute, teacher_id)
+        if upcoming:
+            days_ahead, next_item = upcoming
+            info = index.describe(next_item)
+            when = 'Today' if days_ahead == 0 else 'Tomorrow' if days_ahead == 1 else info['day']
+            next_class_info = f"{info['class_name']} at {info['start_time']} ({when})"
         
         return render_template('teacher/teacher_schedule.html',
                              classes=classes,
                              todays_classes_count=todays_classes_count,
                              next_class_info=next_class_info,
-                             weekly_schedule=weekly_schedule)
+                             weekly_schedule=weekly_schedule,
+                             todays_schedule=todays_schedule)
         
     except Exception as e:
         flash(f'Error loading schedule data: {str(e)}', 'error')
@@ -191,14 +276,27 @@ def submissions():
             WHERE tcm.teacher_id = ? AND c.status = 'active'
             ORDER BY c.grade_level, c.name
         ''', (teacher_id,))
-        classes = cur.fetchall()
+        teacher_classes = [{'id': row[0], 'name': row[1], 'grade_level': row[2]} for row in cur.fetchall()]
         
-        # Since we don't have submissions table yet, provide empty data
-        submissions = []
+        _, subjects = teacher_access.get_teacher_access(teacher_id)
+        teacher_subjects = [{'subject_name': name} for name in sorted(subjects)]
+        
+        student_submissions = []
+        if homework_store.has_homework_table(cur):
+            student_submissions = homework_store.list_submissions(
+                conn, teacher_id,
+                homework_id=request.args.get('assignment_id', type=int),
+                class_id=request.args.get('class_id', type=int),
+                subject_name=request.args.get('subject'),
+                status=request.args.get('status'))
+        graded = sum(1 for submission in student_submissions if submission['grade'] is not None)
+        grading_stats = {'graded': graded, 'pending': len(student_submissions) - graded}
         
         return render_template('teacher/teacher_submissions.html',
-                             classes=classes,
-                             submissions=submissions)
+                             teacher_classes=teacher_classes,
+                             teacher_subjects=teacher_subjects,
+                             student_submissions=student_submissions,
+                             grading_stats=grading_stats)
         
     except Exception as e:
         flash(f'Error loading submissions data: {str(e)}', 'error')
@@ -206,13 +304,153 @@ def submissions():
     finally:
         conn.close()
 
+@teacher_bp.route('/submissions/<int:submission_id>/grade', methods=['POST'])
+def grade_submission(submission_id):
+    """Grade a submission to one of the teacher's homework (JSON)"""
+    if 'role' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    teacher_id = session.get('user_id')
+    data = request.get_json(silent=True) or request.form
+    conn = get_db()
+    
+    try:
+        student_id, title = homework_store.grade_submission(conn, submission_id, teacher_id,
+                                                            data.get('grade'), data.get('feedback'))
+        conn.commit()
+        if data.get('notify', True):
+            notifications.publish([f'user:{student_id}'], 'homework_graded', f'Your {title} submission was graded',
+                                  actor=teacher_id, submission_id=submission_id)
+        return jsonify({'success': True})
+    except (TypeError, ValueError) as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
 @teacher_bp.route('/doubts')
 def doubts():
-    """View and manage student doubts"""
+    """Open doubts routed to the teacher's subjects and classes, most urgent first"""
     if 'role' not in session or session['role'] != 'teacher':
         return redirect(url_for('auth.login'))
     
-    return render_template('teacher/teacher_doubts.html')
+    teacher_id = session.get('user_id')
+    conn = get_db()
+    
+    try:
+        # Empty queue until migrate_doubt_queue.py has added routing to doubts
+        open_doubts, answered_doubts = [], []
+        if doubt_queue.has_queue_index(conn.cursor()):
+            open_doubts = doubt_queue.queue(conn, teacher_id)
+            answered_doubts = doubt_queue.answered_by(conn, teacher_id)
+        if doubt_clusters.has_clusters_table(conn.cursor()):
+            clusters = doubt_clusters.group_queue(conn, open_doubts)
+        else:
+            clusters = [{'lead': doubt, 'members': [doubt]} for doubt in open_doubts]
+    finally:
+        conn.close()
+    
+    return render_template('teacher/teacher_doubts.html',
+                         open_doubts=open_doubts,
+                         clusters=clusters,
+                         answered_doubts=answered_doubts,
+                         lease_minutes=doubt_queue.LEASE_SECONDS // 60)
+
+@teacher_bp.route('/doubts/<int:doubt_id>/claim', methods=['POST'])
+def claim_doubt(doubt_id):
+    """Take the lease on a doubt so no other teacher answers it (JSON)"""
+    if 'role' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    conn = get_db()
+    
+    try:
+        expires = doubt_queue.claim(conn, doubt_id, session.get('user_id'))
+        conn.commit()
+        if expires is None:
+            return jsonify({'error': 'Another teacher is answering this doubt'}), 409
+        return jsonify({'success': True, 'claim_expires': expires})
+    except ValueError as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+@teacher_bp.route('/doubts/<int:doubt_id>/release', methods=['POST'])
+def release_doubt(doubt_id):
+    """Hand a claimed doubt back to the queue (JSON)"""
+    if 'role' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    conn = get_db()
+    
+    try:
+        released = doubt_queue.release(conn, doubt_id, session.get('user_id'))
+        conn.commit()
+        return jsonify({'success': released})
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+@teacher_bp.route('/doubts/<int:doubt_id>/suggestions')
+def doubt_suggestions(doubt_id):
+    """Past answers to doubts like this one, shown when the teacher opens it (JSON)"""
+    if 'role' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    conn = get_db()
+    
+    try:
+        row = conn.execute('SELECT subject, doubt_text FROM doubts WHERE id = ?', (doubt_id,)).fetchone()
+        if row is None:
+            return jsonify({'error': 'Doubt not found'}), 404
+        suggestions = answer_index.suggest(conn, row[1], row[0], exclude=(doubt_id,))
+        return jsonify({'suggestions': suggestions})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+@teacher_bp.route('/doubts/<int:doubt_id>/respond', methods=['POST'])
+def respond_doubt(doubt_id):
+    """Answer a doubt the teacher has claimed (or that nobody has claimed), and
+    optionally every open near-duplicate of it"""
+    if 'role' not in session or session['role'] != 'teacher':
+        return redirect(url_for('auth.login'))
+    
+    teacher_id = session.get('user_id')
+    response = request.form.get('response')
+    conn = get_db()
+    
+    try:
+        if request.form.get('whole_cluster') and doubt_clusters.has_clusters_table(conn.cursor()):
+            answered = doubt_clusters.answer_cluster(conn, doubt_id, teacher_id, response)
+        else:
+            answered = [(doubt_id,) + tuple(doubt_queue.answer(conn, doubt_id, teacher_id, response))]
+        conn.commit()
+        answer_index.index_answers(conn, [row[0] for row in answered])
+        for answered_id, student_id, subject in answered:
+            notifications.publish([f'user:{student_id}'], 'doubt_answered', f'Your doubt about {subject} was answered',
+                                  actor=teacher_id, doubt_id=answered_id)
+        if len(answered) > 1:
+            flash(f'Response sent to {len(answered)} students!', 'success')
+        else:
+            flash('Response sent to the student!', 'success')
+    except ValueError as e:
+        conn.rollback()
+        flash(str(e), 'error')
+    finally:
+        conn.close()
+    
+    return redirect(url_for('teacher.doubts'))
 
 @teacher_bp.route('/marks')
 def marks():
@@ -252,13 +490,63 @@ def marks():
                          assigned_classes=assigned_classes,
                          teacher_subjects=teacher_subjects)
 
-@teacher_bp.route('/announcements')
+@teacher_bp.route('/announcements', methods=['GET', 'POST'])
 def announcements():
-    """Manage announcements"""
+    """Post announcements to the teacher's classes and subjects, and read the teacher's feed"""
     if 'role' not in session or session['role'] != 'teacher':
         return redirect(url_for('auth.login'))
     
-    return render_template('teacher/teacher_announcements.html')
+    teacher_id = session.get('user_id')
+    class_ids, subjects = teacher_access.get_teacher_access(teacher_id)
+    conn = get_db()
+    cur = conn.cursor()
+    
+    try:
+        ready = announcement_feed.has_announcements_table(cur)
+        if request.method == 'POST' and not ready:
+            flash('Announcements are not set up yet. Run migrate_announcements.py first.', 'error')
+            return redirect(url_for('teacher.announcements'))
+        if request.method == 'POST':
+            scope = request.form.get('scope', 'class')
+            target = request.form.get(f'{scope}_target')
+            title = request.form.get('title', '')
+    
+            if scope == 'class' and not (target and target.isdigit() and int(target) in class_ids):
+                flash('You can only post announcements to your own classes.', 'error')
+            elif scope == 'subject' and target not in subjects:
+                flash('You can only post announcements for subjects you teach.', 'error')
+            elif scope not in ('class', 'subject'):
+                flash('Teachers can post to a class or a subject.', 'error')
+            else:
+                try:
+                    announcement_id = announcement_feed.post_announcement(
+                        conn, teacher_id, title, request.form.get('content', ''), scope, target,
+                        request.form.get('priority', 'normal'), request.form.get('expires_on'))
+                    conn.commit()
+                except (TypeError, ValueError) as e:
+                    flash(str(e), 'error')
+                else:
+                    announcement_feed.notify(conn, announcement_id, teacher_id, title.strip(), scope, target)
+                    flash('Announcement posted!', 'success')
+            return redirect(url_for('teacher.announcements'))
+    
+        cur.execute('''
+            SELECT c.id, c.name FROM classes c
+            JOIN teacher_class_map tcm ON c.id = tcm.class_id
+            WHERE tcm.teacher_id = ? AND c.status = 'active'
+            ORDER BY c.name
+        ''', (teacher_id,))
+        classes = cur.fetchall()
+    
+        items = []
+        if ready:
+            scopes = announcement_feed.user_scopes(conn, teacher_id, 'teacher')
+            items = announcement_feed.feed(conn, scopes, before_id=request.args.get('before', type=int))
+    finally:
+        conn.close()
+    
+    return render_template('teacher/teacher_announcements.html', announcements=items, classes=classes,
+                           subjects=sorted(subjects), priorities=announcement_feed.PRIORITIES)
 
 @teacher_bp.route('/attendance')
 def attendance():
@@ -281,7 +569,7 @@ def attendance():
         ''', (teacher_id,))
         classes = cur.fetchall()
         
-        # Get recent attendance data for teacher's classes
+        # Recent attendance for teacher's classes, streamed into the template
         cur.execute('''
             SELECT 
                 a.id,
@@ -299,17 +587,15 @@ def attendance():
             WHERE tcm.teacher_id = ? AND a.attendance_date >= date('now', '-7 days')
             ORDER BY a.attendance_date DESC, c.name, u.name
         ''', (teacher_id,))
-        attendance_records = cur.fetchall()
-        
-        return render_template('teacher/teacher_attendance.html', 
-                             classes=classes, 
-                             attendance_records=attendance_records)
         
     except Exception as e:
+        conn.close()
         flash(f'Error loading attendance data: {str(e)}', 'error')
         return redirect(url_for('teacher.dashboard'))
-    finally:
-        conn.close()
+    
+    return stream_page('teacher/teacher_attendance.html', conn,
+                       classes=classes,
+                       attendance_records=RowStream(cur))
 
 @teacher_bp.route('/attendance/mark', methods=['GET', 'POST'])
 def mark_attendance():
@@ -344,22 +630,15 @@ def mark_attendance():
                 flash('Class not found or access denied', 'error')
                 return redirect(url_for('teacher.attendance'))
             
-            # Get students in this class
-            cur.execute('''
-                SELECT u.id, u.name
-                FROM users u
-                JOIN student_class_map scm ON u.id = scm.student_id
-                WHERE scm.class_id = ? AND u.role = 'student' AND scm.status = 'active'
-                ORDER BY u.name
-            ''')
-            students = cur.fetchall()
+            # Get students in this class (cached roster)
+            students = get_class_roster(conn, class_id)
             
             # Get existing attendance for this date
             cur.execute('''
                 SELECT student_id, status, notes
                 FROM attendance
                 WHERE class_id = ? AND attendance_date = ?
-            ''')
+            ''', (class_id, attendance_date))
             existing_attendance = {row[0]: {'status': row[1], 'notes': row[2]} 
                                  for row in cur.fetchall()}
             
@@ -389,23 +668,12 @@ def mark_attendance():
     
     try:
         # Verify teacher has access to this class
-        cur.execute('''
-            SELECT 1 FROM teacher_class_map 
-            WHERE class_id = ? AND teacher_id = ?
-        ''', (class_id, teacher_id))
-        
-        if not cur.fetchone():
+        if not teacher_access.has_class_access(teacher_id, class_id):
             flash('Access denied to this class', 'error')
             return redirect(url_for('teacher.attendance'))
         
-        # Get all students in the class
-        cur.execute('''
-            SELECT u.id
-            FROM users u
-            JOIN student_class_map scm ON u.id = scm.student_id
-            WHERE scm.class_id = ? AND u.role = 'student' AND scm.status = 'active'
-        ''')
-        students = [row[0] for row in cur.fetchall()]
+        # Get all students in the class (cached roster)
+        students = [student_id for student_id, _ in get_class_roster(conn, class_id)]
         
         attendance_saved = 0
         for student_id in students:
@@ -427,6 +695,8 @@ def mark_attendance():
             attendance_saved += 1
         
         conn.commit()
+        notifications.publish([f'class:{class_id}'], 'attendance', f'Attendance recorded for {attendance_date}',
+                              actor=teacher_id, class_id=int(class_id), date=attendance_date)
         flash(f'Attendance marked for {attendance_saved} students', 'success')
         return redirect(url_for('teacher.attendance'))
         
@@ -442,28 +712,8 @@ def mark_attendance():
 # ============================================================================
 
 def verify_teacher_access(teacher_id, class_id, subject_name):
-    """Verify teacher has access to the given class and subject"""
-    conn = get_db()
-    cur = conn.cursor()
-    
-    # Check if teacher is assigned to the class
-    cur.execute('''
-        SELECT 1 FROM teacher_class_map 
-        WHERE teacher_id = ? AND class_id = ?
-    ''', (teacher_id, class_id))
-    
-    class_access = cur.fetchone() is not None
-    
-    # Check if teacher is assigned to the subject
-    cur.execute('''
-        SELECT 1 FROM teacher_subjects 
-        WHERE teacher_id = ? AND subject_name = ?
-    ''', (teacher_id, subject_name))
-    
-    subject_access = cur.fetchone() is not None
-    
-    conn.close()
-    return class_access and subject_access
+    """Verify teacher has access to the given class and subject (cached per teacher)"""
+    return teacher_access.has_access(teacher_id, class_id, subject_name)
 
 @teacher_bp.route('/assessments/list')
 def assessments_list():
@@ -482,6 +732,12 @@ def assessments_list():
     if not verify_teacher_access(teacher_id, class_id, subject_name):
         return jsonify({'error': 'Access denied'}), 403
     
+    # Answer 304 if the client's copy is still current
+    etag = versioned_etag(['assessments'], teacher_id, class_id, subject_name)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
     conn = get_db()
     cur = conn.cursor()
     cur.execute("PRAGMA foreign_keys = ON")
@@ -505,7 +761,7 @@ def assessments_list():
         })
     
     conn.close()
-    return jsonify(assessments)
+    return with_etag(jsonify(assessments), etag)
 
 @teacher_bp.route('/assessments/create', methods=['POST'])
 def create_assessment():
@@ -626,6 +882,13 @@ def marks_roster():
     if not class_id or not assessment_id:
         return jsonify({'error': 'class_id and assessment_id are required'}), 400
     
+    # Answer 304 if the client's copy is still current
+    etag = versioned_etag(['assessments', 'marks', 'student_class_map', 'users'],
+                          teacher_id, class_id, assessment_id)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
     conn = get_db()
     cur = conn.cursor()
     cur.execute("PRAGMA foreign_keys = ON")
@@ -640,34 +903,30 @@ def marks_roster():
     if not assessment or str(assessment[0]) != str(class_id):
         return jsonify({'error': 'Assessment not found or access denied'}), 403
     
-    # Get students in the class with their marks
+    # Get existing marks for this assessment
     cur.execute('''
-        SELECT 
-            u.id,
-            u.name,
-            COALESCE(m.score, '') as score,
-            COALESCE(m.comment, '') as comment
-        FROM users u
-        INNER JOIN student_class_map scm ON u.id = scm.student_id
-        LEFT JOIN marks m ON u.id = m.student_id AND m.assessment_id = ?
-        WHERE scm.class_id = ? AND u.role = 'student'
-        ORDER BY u.name
-    ''', (assessment_id, class_id))
+        SELECT student_id, score, comment
+        FROM marks
+        WHERE assessment_id = ?
+    ''', (assessment_id,))
+    marks_by_student = {row[0]: (row[1], row[2]) for row in cur.fetchall()}
     
+    # Merge marks into the cached class roster
     students = []
-    for row in cur.fetchall():
+    for student_id, name in get_class_roster(conn, class_id):
+        score, comment = marks_by_student.get(student_id, ('', ''))
         students.append({
-            'id': row[0],
-            'name': row[1],
-            'score': row[2],
-            'comment': row[3]
+            'id': student_id,
+            'name': name,
+            'score': score,
+            'comment': comment or ''
         })
     
     conn.close()
-    return jsonify({
+    return with_etag(jsonify({
         'students': students,
         'max_score': assessment[2]
-    })
+    }), etag)
 
 @teacher_bp.route('/marks/save', methods=['POST'])
 def save_marks():
@@ -691,7 +950,7 @@ def save_marks():
         
         # Verify teacher owns this assessment and get max_score
         cur.execute('''
-            SELECT class_id, subject_name, max_score FROM assessments 
+            SELECT class_id, subject_name, max_score, title FROM assessments 
             WHERE id = ? AND teacher_id = ?
         ''', (assessment_id, teacher_id))
         
@@ -703,6 +962,7 @@ def save_marks():
         
         # Process marks in transaction
         results = {'saved': 0, 'updated': 0, 'skipped': 0, 'errors': []}
+        marked_students = []
         
         for item in items:
             student_id = item.get('student_id')
@@ -742,6 +1002,7 @@ def save_marks():
                         VALUES (?, ?, ?, ?)
                     ''', (assessment_id, student_id, score, comment))
                     results['saved'] += 1
+                marked_students.append(student_id)
                 
             except ValueError:
                 results['errors'].append(f'Invalid score for student {student_id}')
@@ -751,6 +1012,11 @@ def save_marks():
         conn.commit()
         conn.close()
         
+        if marked_students:
+            notifications.publish([f'user:{s}' for s in marked_students], 'marks',
+                                  f'New marks for {assessment[3]} ({assessment[1]})',
+                                  actor=teacher_id, assessment_id=int(assessment_id))
+        
         return jsonify(results)
         
     except Exception as e:
@@ -925,7 +1191,7 @@ def export_csv():
     
     # Verify teacher owns this assessment
     cur.execute('''
-        SELECT a.title, a.max_score, c.name as class_name, a.subject_name
+        SELECT a.title, a.max_score, c.name as class_name, a.subject_name, a.class_id
         FROM assessments a
         INNER JOIN classes c ON a.class_id = c.id
         WHERE a.id = ? AND a.teacher_id = ?
@@ -938,19 +1204,16 @@ def export_csv():
     
     # Get marks data
     cur.execute('''
-        SELECT 
-            u.name,
-            COALESCE(m.score, '') as score,
-            COALESCE(m.comment, '') as comment
-        FROM users u
-        INNER JOIN student_class_map scm ON u.id = scm.student_id
-        INNER JOIN assessments a ON scm.class_id = a.class_id
-        LEFT JOIN marks m ON u.id = m.student_id AND m.assessment_id = ?
-        WHERE a.id = ? AND u.role = 'student'
-        ORDER BY u.name
-    ''', (assessment_id, assessment_id))
-    
-    marks_data = cur.fetchall()
+        SELECT student_id, score, comment
+        FROM marks
+        WHERE assessment_id = ?
+    ''', (assessment_id,))
+    marks_by_student = {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+    
+    marks_data = []
+    for student_id, name in get_class_roster(conn, assessment[4]):
+        score, comment = marks_by_student.get(student_id, ('', ''))
+        marks_data.append((name, score, comment or ''))
     conn.close()
     
     # Generate CSV content
@@ -0,0 +1,198 @@
+"""
+Schedule conflict detection
+Before a teacher or student is booked into a class, the class's weekly
+sessions are checked against that person's existing sessions. Each person
+gets one interval tree per weekday, so validating k new assignments costs
+O(k log n) instead of comparing every pair of classes.
+
+school_conflicts() scans every teacher and student in one pass for the
+`python devtools.py conflicts` report.
+"""
+
+from collections import namedtuple
+
+import timetable
+
+Conflict = namedtuple('Conflict', ['person_id', 'class_id', 'other_class_id',
+                                   'weekday', 'start_minute', 'end_minute'])
+
+# How each role's class assignments are stored
+ASSIGNMENT_QUERIES = {
+    'teacher': 'SELECT teacher_id, class_id FROM teacher_class_map',
+    'student': "SELECT student_id, class_id FROM student_class_map WHERE status = 'active'",
+}
+
+
+class IntervalTree:
+    """Static augmented interval tree over half-open [start, end) intervals.
+
+    Intervals are kept sorted by start; the tree is the implicit balanced
+    BST over that array, and each node stores the largest end in its
+    subtree so whole subtrees that finish too early are skipped.
+    """
+
+    def __init__(self, intervals=()):
+        self._items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self._max_end = [0] * len(self._items)
+        self._build(0, len(self._items))
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return 0
+        mid = (lo + hi) // 2
+        self._max_end[mid] = max(self._items[mid][1], self._build(lo, mid), self._build(mid + 1, hi))
+        return self._max_end[mid]
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, start, end, value=None):
+        """Insert an interval (rebuilds; per-person trees hold a handful of sessions)"""
+        self._items.append((start, end, value))
+        self._items.sort(key=lambda item: (item[0], item[1]))
+        self._max_end = [0] * len(self._items)
+        self._build(0, len(self._items))
+
+    def overlapping(self, start, end):
+        """Return every stored (start, end, value) that overlaps [start, end)"""
+        found = []
+        self._search(0, len(self._items), start, end, found)
+        return found
+
+    def _search(self, lo, hi, start, end, found):
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] <= start:
+            return
+        self._search(lo, mid, start, end, found)
+        item = self._items[mid]
+        if item[0] < end:
+            if item[1] > start:
+                found.append(item)
+            self._search(mid + 1, hi, start, end, found)
+
+
+def _person_trees(sessions, class_ids):
+    """{weekday: IntervalTree} for the sessions of a person's classes"""
+    by_day = {}
+    for class_id in class_ids:
+        for weekday, start, end in sessions.get(class_id, ()):
+            by_day.setdefault(weekday, []).append((start, end, class_id))
+    return {weekday: IntervalTree(items) for weekday, items in by_day.items()}
+
+
+def load_assignments(conn, role, person_ids=None):
+    """Return {person_id: set(class_ids)} for teachers or students"""
+    query = ASSIGNMENT_QUERIES[role]
+    params = []
+    if person_ids is not None:
+        person_ids = list(person_ids)
+        if not person_ids:
+            return {}
+        column = 'teacher_id' if role == 'teacher' else 'student_id'
+        joiner = ' AND ' if 'WHERE' in query else ' WHERE '
+        query += f"{joiner}{column} IN ({', '.join('?' for _ in person_ids)})"
+        params = person_ids
+
+    cur = conn.cursor()
+    cur.execute(query, params)
+    assignments = {}
+    for person_id, class_id in cur.fetchall():
+        assignments.setdefault(person_id, set()).add(class_id)
+    return assignments
+
+
+def find_conflicts(conn, role, assignments, replace=False):
+    """Check proposed assignments {person_id: [class_ids]} against existing schedules.
+
+    With replace=True the person's current classes are being replaced (as in
+    admin.update_teacher), so only the proposed classes are compared with
+    each other. Proposed classes are added to the person's tree as they are
+    checked, so two new classes that clash with each other are also caught;
+    the later one is reported.
+    """
+    assignments = {int(person): [int(c) for c in classes] for person, classes in assignments.items()}
+    existing = {} if replace else load_assignments(conn, role, assignments.keys())
+
+    class_ids = {c for classes in assignments.values() for c in classes}
+    for classes in existing.values():
+        class_ids.update(classes)
+    sessions = timetable.sessions_by_class(conn, class_ids)
+
+    conflicts = []
+    for person_id, proposed in assignments.items():
+        current = existing.get(person_id, set())
+        trees = _person_trees(sessions, current)
+
+        for class_id in dict.fromkeys(proposed):
+            if class_id in current:
+                continue
+            clashes = []
+            for weekday, start, end in sessions.get(class_id, ()):
+                tree = trees.get(weekday)
+                if tree is None:
+                    continue
+                for other_start, other_end, other_class in tree.overlapping(start, end):
+                    clashes.append(Conflict(person_id, class_id, other_class, weekday,
+                                            max(start, other_start), min(end, other_end)))
+
+            conflicts.extend(clashes)
+            if not clashes:
+                current = current | {class_id}
+                for weekday, start, end in sessions.get(class_id, ()):
+                    trees.setdefault(weekday, IntervalTree()).add(start, end, class_id)
+
+    return conflicts
+
+
+def school_conflicts(conn):
+    """Every overlapping pair of classes for every teacher and student.
+
+    Returns {'teacher': [Conflict, ...], 'student': [...]}; each clash is
+    reported once with class_id < other_class_id.
+    """
+    sessions = timetable.sessions_by_class(conn)
+    report = {}
+
+    for role in ASSIGNMENT_QUERIES:
+        conflicts = []
+        for person_id, class_ids in sorted(load_assignments(conn, role).items()):
+            by_day = {}
+            for class_id in class_ids:
+                for weekday, start, end in sessions.get(class_id, ()):
+                    by_day.setdefault(weekday, []).append((start, end, class_id))
+
+            # Sweep each day in start order, keeping the sessions still running
+            for weekday, items in sorted(by_day.items()):
+                running = []
+                for start, end, class_id in sorted(items):
+                    running = [item for item in running if item[1] > start]
+                    for other_start, other_end, other_class in running:
+                        if other_class != class_id:
+                            first, second = sorted((class_id, other_class))
+                            conflicts.append(Conflict(person_id, first, second, weekday,
+                                                      start, min(end, other_end)))
+                    running.append((start, end, class_id))
+        report[role] = conflicts
+
+    return report
+
+
+def class_names(conn, class_ids):
+    """{class_id: name} for describing conflicts"""
+    class_ids = list(class_ids)
+    if not class_ids:
+        return {}
+    cur = conn.cursor()
+    cur.execute(f"SELECT id, name FROM classes WHERE id IN ({', '.join('?' for _ in class_ids)})", class_ids)
+    return dict(cur.fetchall())
+
+
+def describe(conflict, class_names=None):
+    """Human readable one-line description of a conflict"""
+    names = class_names or {}
+    first = names.get(conflict.class_id, f'class {conflict.class_id}')
+    second = names.get(conflict.other_class_id, f'class {conflict.other_class_id}')
+    return (f"{first} overlaps {second} on {timetable.WEEKDAYS[conflict.weekday]} "
+            f"{timetable.format_minutes(conflict.start_minute)}-{timetable.format_minutes(conflict.end_minute)}")
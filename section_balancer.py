@@ -0,0 +1,285 @@
+"""
+Section balancing
+Spreads the students of a grade across its sections (classes with the same
+grade_level) as evenly as max_students allows.
+
+Students are placed in units: one student each, or with
+keep_subjects_together every student with the same student_subjects
+selection forms one unit, so their subject classes can share a section.
+Units already sitting wholly in one section stay there while it has room,
+which keeps the number of moves small; the rest go largest-first to the
+section with the most free places. With balance_by_average, equal-sized
+units are then swapped between the sections with the highest and lowest
+mean prior mark until the means meet.
+
+A student is never placed in a section whose sessions clash with their
+other classes (schedule_conflicts). A student found in several of the
+sections ends up in exactly one; the extra enrollments are listed in
+plan.dropped.
+
+apply_balance() writes the moves with executemany calls; the caller owns
+the transaction, as with enrollment.bulk_enroll_students.
+"""
+
+from bisect import bisect_left
+from collections import namedtuple
+
+from schedule_conflicts import find_conflicts, load_assignments
+
+# Stop swapping once section means are this close (percentage points)
+AVERAGE_TOLERANCE = 0.5
+
+# other_sections: further sections of this grade the student is enrolled in besides current_class
+StudentInfo = namedtuple('StudentInfo', ['current_class', 'subjects', 'average', 'other_sections'],
+                         defaults=(frozenset(),))
+BalancePlan = namedtuple('BalancePlan', ['assignments', 'moves', 'unassigned', 'sections', 'dropped'])
+
+
+def section_targets(total, capacities):
+    """Even split of `total` students over sections, never above a section's capacity.
+
+    `capacities` is {class_id: max_students or None}; returns {class_id: target}.
+    """
+    order = sorted(capacities, key=lambda c: (capacities[c] is None, capacities[c] or 0, c))
+    targets, remaining = {}, total
+    for position, class_id in enumerate(order):
+        share = remaining // (len(order) - position)
+        if capacities[class_id] is not None:
+            share = min(share, max(int(capacities[class_id]), 0))
+        targets[class_id] = share
+        remaining -= share
+
+    # Hand out what is left (rounding) to sections that still have room
+    for class_id in reversed(order):
+        if remaining <= 0:
+            break
+        room = remaining if capacities[class_id] is None else int(capacities[class_id]) - targets[class_id]
+        extra = min(room, remaining)
+        if extra > 0:
+            targets[class_id] += extra
+            remaining -= extra
+    return targets
+
+
+def plan_sections(students, capacities, keep_subjects_together=False, balance_by_average=False, blocked=None):
+    """Assign students ({student_id: StudentInfo}) to sections ({class_id: max_students}).
+
+    `blocked` is {student_id: set(class_ids)} of sections a student may not
+    be moved into, e.g. because of a timetable clash.
+    """
+    targets = section_targets(len(students), capacities)
+    order = sorted(students)
+    blocked = blocked or {}
+
+    def allowed(unit, class_id):
+        return not any(class_id in blocked.get(s, ()) for s in unit)
+
+    if keep_subjects_together:
+        groups = {}
+        for student_id in order:
+            subjects = students[student_id].subjects
+            key = subjects if subjects else ('single', student_id)
+            groups.setdefault(key, []).append(student_id)
+        units = list(groups.values())
+    else:
+        units = [[student_id] for student_id in order]
+
+    # A group bigger than any section cannot stay together
+    largest = max(targets.values(), default=0)
+    units = [unit for group in units for unit in ([group] if len(group) <= largest else [[s] for s in group])]
+
+    load = {class_id: 0 for class_id in targets}
+    placed = {}  # class_id -> list of units
+
+    def place(unit, class_id):
+        placed.setdefault(class_id, []).append(unit)
+        load[class_id] += len(unit)
+
+    # Units already together in one section stay put while it has room, those with fewer options first
+    pending = []
+    for unit in sorted(units, key=lambda u: (-len(u), not any(s in blocked for s in u), u[0])):
+        current = {students[s].current_class for s in unit}
+        class_id = current.pop() if len(current) == 1 else None
+        if class_id in targets and load[class_id] + len(unit) <= targets[class_id]:
+            place(unit, class_id)
+        else:
+            pending.append(unit)
+
+    unassigned = []
+    while pending:
+        unit = pending.pop(0)
+        fits = [c for c in targets if targets[c] - load[c] >= len(unit) and allowed(unit, c)]
+        if fits:
+            place(unit, max(fits, key=lambda c: (targets[c] - load[c], -c)))
+        elif len(unit) > 1:
+            pending[:0] = [[s] for s in unit]
+        else:
+            unassigned.extend(unit)
+
+    if balance_by_average:
+        _swap_for_averages(students, placed, allowed)
+
+    assignments = {s: class_id for class_id, class_units in placed.items() for unit in class_units for s in unit}
+    moves = sorted((s, students[s].current_class, class_id) for s, class_id in assignments.items()
+                   if students[s].current_class != class_id)
+    dropped = sorted((s, class_id) for s, info in students.items() for class_id in info.other_sections
+                     if class_id != assignments.get(s, info.current_class))
+
+    sections = {}
+    for class_id in targets:
+        members = [s for unit in placed.get(class_id, []) for s in unit]
+        marks = [students[s].average for s in members if students[s].average is not None]
+        sections[class_id] = {
+            'capacity': capacities[class_id],
+            'target': targets[class_id],
+            'size': len(members),
+            'average': round(sum(marks) / len(marks), 1) if marks else None,
+        }
+
+    return BalancePlan(assignments, moves, sorted(unassigned), sections, dropped)
+
+
+def _swap_for_averages(students, placed, allowed):
+    """Swap equal-sized units between the highest and lowest scoring sections until their means meet"""
+    known = [info.average for info in students.values() if info.average is not None]
+    if not known or len(placed) < 2:
+        return
+    overall = sum(known) / len(known)
+
+    def score(unit):
+        # Students without marks count as the grade average
+        return sum(overall if students[s].average is None else students[s].average for s in unit)
+
+    totals = {c: sum(score(u) for u in units) for c, units in placed.items()}
+    sizes = {c: sum(len(u) for u in units) for c, units in placed.items()}
+
+    for _ in range(sum(sizes.values())):
+        means = {c: totals[c] / sizes[c] for c in placed if sizes[c]}
+        high = max(means, key=means.get)
+        low = min(means, key=means.get)
+        if means[high] - means[low] <= AVERAGE_TOLERANCE:
+            return
+
+        # Moving `ideal` marks from high to low would make the two means equal
+        ideal = (totals[high] * sizes[low] - totals[low] * sizes[high]) / (sizes[high] + sizes[low])
+
+        by_size = {}
+        for position, unit in enumerate(placed[low]):
+            by_size.setdefault(len(unit), []).append((score(unit), position))
+        for candidates in by_size.values():
+            candidates.sort()
+
+        best = None
+        for position, unit in enumerate(placed[high]):
+            candidates = by_size.get(len(unit))
+            if not candidates:
+                continue
+            unit_score = score(unit)
+            wanted = unit_score - ideal
+            at = bisect_left(candidates, (wanted, -1))
+            for other_score, other_position in candidates[max(at - 1, 0):at + 1]:
+                if not (allowed(unit, low) and allowed(placed[low][other_position], high)):
+                    continue
+                gap = abs(unit_score - other_score - ideal)
+                if best is None or gap < best[0]:
+                    best = (gap, position, other_position, unit_score - other_score)
+
+        # Only swap when it brings the two sections closer together
+        if best is None or best[0] >= abs(ideal):
+            return
+        _, position, other_position, moved = best
+        placed[high][position], placed[low][other_position] = placed[low][other_position], placed[high][position]
+        totals[high] -= moved
+        totals[low] += moved
+
+
+def grade_sections(conn, grade_level):
+    """Active classes for a grade level as {class_id: max_students}"""
+    cur = conn.cursor()
+    cur.execute("SELECT id, max_students FROM classes WHERE grade_level = ? AND status = 'active' ORDER BY id",
+                (str(grade_level),))
+    return dict(cur.fetchall())
+
+
+def load_students(conn, class_ids, student_ids=()):
+    """StudentInfo for everyone active in the sections plus any extra student_ids"""
+    class_ids = list(class_ids)
+    cur = conn.cursor()
+    cur.execute(f'''
+        SELECT student_id, class_id FROM student_class_map
+        WHERE status = 'active' AND class_id IN ({', '.join('?' for _ in class_ids)})
+        ORDER BY student_id, class_id
+    ''', class_ids)
+    current, others = {}, {}
+    for student_id, class_id in cur.fetchall():
+        if student_id in current:
+            others.setdefault(student_id, set()).add(class_id)
+        else:
+            current[student_id] = class_id
+    for student_id in student_ids:
+        current.setdefault(int(student_id), None)
+
+    subjects, averages = {}, {}
+    cur.execute('SELECT student_id, subject_name FROM student_subjects')
+    for student_id, subject in cur.fetchall():
+        if student_id in current:
+            subjects.setdefault(student_id, set()).add(subject)
+    cur.execute('''
+        SELECT m.student_id, AVG(m.score * 100.0 / a.max_score)
+        FROM marks m JOIN assessments a ON a.id = m.assessment_id
+        GROUP BY m.student_id
+    ''')
+    for student_id, average in cur.fetchall():
+        if student_id in current:
+            averages[student_id] = average
+
+    return {student_id: StudentInfo(class_id, frozenset(subjects.get(student_id, ())), averages.get(student_id),
+                                    frozenset(others.get(student_id, ())))
+            for student_id, class_id in current.items()}
+
+
+def blocked_sections(conn, student_ids, class_ids):
+    """{student_id: set(class_ids)} of sections that clash with the student's classes outside the grade"""
+    sections = set(class_ids)
+    outside = {student_id: classes - sections
+               for student_id, classes in load_assignments(conn, 'student', student_ids).items()}
+    outside = {student_id: classes for student_id, classes in outside.items() if classes}
+    blocked = {}
+    if not outside:
+        return blocked
+
+    for class_id in sorted(sections):
+        # The section goes first, so every clash is reported against one of the other classes
+        proposed = {student_id: [class_id, *sorted(classes)] for student_id, classes in outside.items()}
+        for conflict in find_conflicts(conn, 'student', proposed, replace=True):
+            if conflict.other_class_id == class_id:
+                blocked.setdefault(conflict.person_id, set()).add(class_id)
+    return blocked
+
+
+def balance_sections(conn, grade_level, class_ids=None, student_ids=(),
+                     keep_subjects_together=False, balance_by_average=False):
+    """Plan a balanced split of a grade's students over its sections (nothing is written)"""
+    capacities = grade_sections(conn, grade_level)
+    if class_ids:
+        class_ids = {int(c) for c in class_ids}
+        capacities = {c: cap for c, cap in capacities.items() if c in class_ids}
+    if not capacities:
+        return BalancePlan({}, [], sorted(int(s) for s in student_ids), {}, [])
+
+    students = load_students(conn, capacities, student_ids)
+    blocked = blocked_sections(conn, students, capacities)
+    return plan_sections(students, capacities, keep_subjects_together, balance_by_average, blocked)
+
+
+def apply_balance(conn, plan, assigned_by):
+    """Write a plan's moves in one batch; the caller commits. Returns the number of students moved"""
+    cur = conn.cursor()
+    cur.executemany('DELETE FROM student_class_map WHERE student_id = ? AND class_id = ?',
+                    [(student_id, old) for student_id, old, _ in plan.moves if old is not None] + plan.dropped)
+    cur.executemany('''
+        INSERT INTO student_class_map (student_id, class_id, assigned_by) VALUES (?, ?, ?)
+        ON CONFLICT(student_id, class_id) DO UPDATE
+        SET status = 'active', assigned_by = excluded.assigned_by, assigned_on = CURRENT_TIMESTAMP
+    ''', [(student_id, new, assigned_by) for student_id, _, new in plan.moves])
+    return len(plan.moves)
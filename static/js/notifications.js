@@ -0,0 +1,64 @@
+// Live notifications over Server-Sent Events.
+// One EventSource per page; the browser reconnects on its own and sends
+// Last-Event-ID so missed events are replayed by the server.
+(function() {
+    var container = document.querySelector('[data-notifications]');
+    if (!container || !window.EventSource) {
+        return;
+    }
+
+    var MAX_ITEMS = 10;
+    var EVENT_TYPES = ['doubt', 'doubt_answered', 'attendance', 'marks', 'announcement', 'homework', 'homework_graded'];
+
+    function renderItem(notification) {
+        var item = document.createElement('div');
+        item.className = 'list-group-item border-0 px-0';
+        var time = document.createElement('small');
+        time.className = 'text-muted';
+        time.textContent = notification.time;
+        var message = document.createElement('p');
+        message.className = 'mb-0';
+        message.textContent = notification.message;
+        item.appendChild(time);
+        item.appendChild(message);
+        return item;
+    }
+
+    function listElement() {
+        var list = container.querySelector('.list-group');
+        if (!list) {
+            container.innerHTML = '';
+            list = document.createElement('div');
+            list.className = 'list-group list-group-flush';
+            container.appendChild(list);
+        }
+        return list;
+    }
+
+    function show(event) {
+        var list = listElement();
+        list.insertBefore(renderItem(JSON.parse(event.data)), list.firstChild);
+        while (list.children.length > MAX_ITEMS) {
+            list.removeChild(list.lastChild);
+        }
+    }
+
+    // Too many events were missed; rebuild the list from the server
+    function resync() {
+        fetch('/notifications/recent?limit=' + MAX_ITEMS, { credentials: 'same-origin' })
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                var list = listElement();
+                list.innerHTML = '';
+                data.notifications.forEach(function(notification) {
+                    list.appendChild(renderItem(notification));
+                });
+            });
+    }
+
+    var source = new EventSource('/notifications/stream');
+    EVENT_TYPES.forEach(function(type) {
+        source.addEventListener(type, show);
+    });
+    source.addEventListener('resync', resync);
+})();
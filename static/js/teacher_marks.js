@@ -0,0 +1,294 @@
+// Marks & Reports page (templates/teacher/teacher_marks.html)
+// Global variables
+let currentAssessmentId = null;
+let currentMaxScore = 0;
+
+// Initialize page
+document.addEventListener('DOMContentLoaded', function() {
+    // Set default assessment date to today
+    document.getElementById('assessment_date').value = new Date().toISOString().split('T')[0];
+
+    // Event listeners for filters
+    document.getElementById('filter_class').addEventListener('change', loadAssessments);
+    document.getElementById('filter_subject').addEventListener('change', loadAssessments);
+
+    // Event listeners for marks entry
+    document.getElementById('marks_class_id').addEventListener('change', loadMarksAssessments);
+    document.getElementById('marks_subject_name').addEventListener('change', loadMarksAssessments);
+    document.getElementById('marks_assessment_id').addEventListener('change', loadMarksRoster);
+
+    // Event listeners for reports
+    document.getElementById('generate_class_report').addEventListener('click', generateClassReport);
+    document.getElementById('export_assessment_csv').addEventListener('click', exportAssessmentCSV);
+});
+
+// Load assessments based on filters
+function loadAssessments() {
+    const classId = document.getElementById('filter_class').value;
+    const subjectName = document.getElementById('filter_subject').value;
+
+    if (!classId || !subjectName) {
+        document.getElementById('assessments_list').innerHTML = '<p class="text-muted">Select a class and subject to view assessments.</p>';
+        return;
+    }
+
+    document.getElementById('assessments_list').innerHTML = '<div class="text-center"><div class="spinner-border text-success" role="status"></div></div>';
+
+    fetchJSONCached(`/teacher/assessments/list?class_id=${classId}&subject_name=${encodeURIComponent(subjectName)}`)
+        .then(data => {
+            if (data.error) {
+                document.getElementById('assessments_list').innerHTML = `<div class="alert alert-danger">${data.error}</div>`;
+                return;
+            }
+
+            if (data.length === 0) {
+                document.getElementById('assessments_list').innerHTML = '<p class="text-muted">No assessments found for the selected class and subject.</p>';
+                return;
+            }
+
+            let html = '';
+            data.forEach(assessment => {
+                html += `
+                    <div class="card assessment-card mb-3">
+                        <div class="card-body">
+                            <div class="row align-items-center">
+                                <div class="col-md-8">
+                                    <h6 class="card-title mb-1">${assessment.title}</h6>
+                                    <p class="card-text mb-1">
+                                        <small class="text-muted">
+                                            Date: ${assessment.date} | Max Score: ${assessment.max_score} | Weight: ${assessment.weight}
+                                        </small>
+                                    </p>
+                                    ${assessment.description ? `<p class="card-text mb-0">${assessment.description}</p>` : ''}
+                                </div>
+                                <div class="col-md-4 text-end">
+                                    <form method="POST" action="${TEACHER_MARKS_URLS.deleteAssessment}" style="display: inline;">
+                                        <input type="hidden" name="assessment_id" value="${assessment.id}">
+                                        <button type="submit" class="btn btn-danger btn-sm" 
+                                                onclick="return confirm('Are you sure you want to delete this assessment? All marks will be lost.')">
+                                            <i class="bi bi-trash"></i> Delete
+                                        </button>
+                                    </form>
+                                </div>
+                            </div>
+                        </div>
+                    </div>
+                `;
+            });
+            document.getElementById('assessments_list').innerHTML = html;
+        })
+        .catch(error => {
+            document.getElementById('assessments_list').innerHTML = `<div class="alert alert-danger">Error loading assessments: ${error.message}</div>`;
+        });
+}
+
+// Load assessments for marks entry
+function loadMarksAssessments() {
+    const classId = document.getElementById('marks_class_id').value;
+    const subjectName = document.getElementById('marks_subject_name').value;
+    const assessmentSelect = document.getElementById('marks_assessment_id');
+
+    assessmentSelect.innerHTML = '<option value="">Select an assessment</option>';
+    document.getElementById('marks_roster').innerHTML = '<p class="text-muted">Select a class, subject, and assessment to enter marks.</p>';
+
+    if (!classId || !subjectName) return;
+
+    fetchJSONCached(`/teacher/assessments/list?class_id=${classId}&subject_name=${encodeURIComponent(subjectName)}`)
+        .then(data => {
+            if (data.error) {
+                assessmentSelect.innerHTML = '<option value="">Error loading assessments</option>';
+                return;
+            }
+
+            data.forEach(assessment => {
+                const option = document.createElement('option');
+                option.value = assessment.id;
+                option.textContent = `${assessment.title} (${assessment.date})`;
+                assessmentSelect.appendChild(option);
+            });
+        })
+        .catch(error => {
+            assessmentSelect.innerHTML = '<option value="">Error loading assessments</option>';
+        });
+}
+
+// Load student roster for marks entry
+function loadMarksRoster() {
+    const classId = document.getElementById('marks_class_id').value;
+    const assessmentId = document.getElementById('marks_assessment_id').value;
+
+    if (!classId || !assessmentId) {
+        document.getElementById('marks_roster').innerHTML = '<p class="text-muted">Select a class, subject, and assessment to enter marks.</p>';
+        return;
+    }
+
+    currentAssessmentId = assessmentId;
+    document.getElementById('marks_roster').innerHTML = '<div class="text-center"><div class="spinner-border text-success" role="status"></div></div>';
+
+    fetchJSONCached(`/teacher/marks/roster?class_id=${classId}&assessment_id=${assessmentId}`)
+        .then(data => {
+            if (data.error) {
+                document.getElementById('marks_roster').innerHTML = `<div class="alert alert-danger">${data.error}</div>`;
+                return;
+            }
+
+            currentMaxScore = data.max_score;
+
+            let html = `
+                <div class="d-flex justify-content-between align-items-center mb-3">
+                    <h6>Student Marks (Max Score: ${data.max_score})</h6>
+                    <button type="button" class="btn btn-success" onclick="saveAllMarks()">
+                        <i class="bi bi-save"></i> Save All Marks
+                    </button>
+                </div>
+                <div class="table-responsive">
+                    <table class="table table-striped">
+                        <thead>
+                            <tr>
+                                <th>Student Name</th>
+                                <th>Score</th>
+                                <th>Comment</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+            `;
+
+            data.students.forEach(student => {
+                html += `
+                    <tr>
+                        <td>${student.name}</td>
+                        <td>
+                            <input type="number" 
+                                   class="form-control score-input" 
+                                   data-student-id="${student.id}"
+                                   value="${student.score}" 
+                                   min="0" 
+                                   max="${data.max_score}"
+                                   step="0.1">
+                        </td>
+                        <td>
+                            <input type="text" 
+                                   class="form-control comment-input" 
+                                   data-student-id="${student.id}"
+                                   value="${student.comment}" 
+                                   placeholder="Optional comment">
+                        </td>
+                    </tr>
+                `;
+            });
+
+            html += `
+                        </tbody>
+                    </table>
+                </div>
+            `;
+
+            document.getElementById('marks_roster').innerHTML = html;
+        })
+        .catch(error => {
+            document.getElementById('marks_roster').innerHTML = `<div class="alert alert-danger">Error loading roster: ${error.message}</div>`;
+        });
+}
+
+// Save all marks
+function saveAllMarks() {
+    if (!currentAssessmentId) {
+        alert('No assessment selected');
+        return;
+    }
+
+    const items = [];
+    const scoreInputs = document.querySelectorAll('.score-input');
+    const commentInputs = document.querySelectorAll('.comment-input');
+
+    scoreInputs.forEach(input => {
+        const studentId = input.dataset.studentId;
+        const score = input.value.trim();
+        const commentInput = document.querySelector(`.comment-input[data-student-id="${studentId}"]`);
+        const comment = commentInput ? commentInput.value.trim() : '';
+
+        if (score !== '') {
+            if (parseFloat(score) > currentMaxScore) {
+                alert(`Score ${score} exceeds maximum score ${currentMaxScore} for student ID ${studentId}`);
+                return;
+            }
+            items.push({
+                student_id: studentId,
+                score: score,
+                comment: comment
+            });
+        }
+    });
+
+    if (items.length === 0) {
+        alert('No marks to save');
+        return;
+    }
+
+    // Show loading state
+    document.getElementById('marks_roster').classList.add('loading');
+
+    fetch('/teacher/marks/save', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            assessment_id: currentAssessmentId,
+            items: items
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        document.getElementById('marks_roster').classList.remove('loading');
+
+        if (data.error) {
+            alert(`Error: ${data.error}`);
+            return;
+        }
+
+        let message = `Marks saved successfully!\n`;
+        message += `Saved: ${data.saved}, Updated: ${data.updated}, Skipped: ${data.skipped}`;
+
+        if (data.errors && data.errors.length > 0) {
+            message += `\n\nErrors:\n${data.errors.join('\n')}`;
+        }
+
+        alert(message);
+    })
+    .catch(error => {
+        document.getElementById('marks_roster').classList.remove('loading');
+        alert(`Error saving marks: ${error.message}`);
+    });
+}
+
+// Generate class report
+function generateClassReport() {
+    const classId = document.getElementById('reports_class_id').value;
+    const subjectName = document.getElementById('reports_subject_name').value;
+    const fromDate = document.getElementById('reports_from_date').value;
+    const toDate = document.getElementById('reports_to_date').value;
+
+    if (!classId || !subjectName) {
+        alert('Please select a class and subject');
+        return;
+    }
+
+    let url = `/teacher/reports/class?class_id=${classId}&subject_name=${encodeURIComponent(subjectName)}`;
+    if (fromDate) url += `&from=${fromDate}`;
+    if (toDate) url += `&to=${toDate}`;
+
+    window.open(url, '_blank');
+}
+
+// Export assessment CSV
+function exportAssessmentCSV() {
+    const assessmentId = document.getElementById('marks_assessment_id').value;
+
+    if (!assessmentId) {
+        alert('Please select an assessment in the Enter Marks tab');
+        return;
+    }
+
+    window.location.href = `/teacher/reports/export_csv?assessment_id=${assessmentId}`;
+}
@@ -0,0 +1,106 @@
+// Chunked, resumable uploads.
+// Any <input type="file" data-upload-kind data-upload-target> is sent as a
+// series of small PUTs to /uploads/<id>. If a chunk fails the client asks the
+// server how much it already has and carries on from there.
+(function() {
+    var RETRIES = 5;
+
+    function request(method, url, body, headers) {
+        return fetch(url, {
+            method: method,
+            body: body,
+            headers: headers || {},
+            credentials: 'same-origin'
+        }).then(function(response) {
+            return response.json().then(function(data) {
+                data.status = response.status;
+                return data;
+            });
+        });
+    }
+
+    function wait(ms) {
+        return new Promise(function(resolve) { setTimeout(resolve, ms); });
+    }
+
+    function sendChunks(upload, file, chunkSize, onProgress, attempt) {
+        if (upload.complete) {
+            return Promise.resolve(upload);
+        }
+        var end = Math.min(upload.received + chunkSize, file.size);
+        return request('PUT', '/uploads/' + upload.upload_id, file.slice(upload.received, end), {
+            'Upload-Offset': String(upload.received),
+            'Content-Type': 'application/octet-stream'
+        }).then(function(result) {
+            if (result.status === 200) {
+                result.upload_id = upload.upload_id;
+                onProgress(result.received, file.size);
+                return sendChunks(result, file, chunkSize, onProgress, 0);
+            }
+            if (result.status >= 500 || result.status === 409) {
+                return Promise.reject(result);
+            }
+            throw new Error(result.error || 'Upload failed');
+        }).catch(function(error) {
+            if (error instanceof Error && !(error instanceof TypeError)) {
+                throw error;
+            }
+            if (attempt >= RETRIES) {
+                throw new Error('Upload interrupted; please try again');
+            }
+            // Network error or offset mismatch: ask the server where to resume
+            return wait(1000 * Math.pow(2, attempt)).then(function() {
+                return request('GET', '/uploads/' + upload.upload_id);
+            }).then(function(current) {
+                current.upload_id = upload.upload_id;
+                return sendChunks(current, file, chunkSize, onProgress, attempt + 1);
+            });
+        });
+    }
+
+    function upload(file, kind, targetId, onProgress) {
+        return request('POST', '/uploads', JSON.stringify({
+            kind: kind,
+            target_id: targetId,
+            filename: file.name,
+            size: file.size,
+            content_type: file.type
+        }), {'Content-Type': 'application/json'}).then(function(started) {
+            if (started.status !== 201) {
+                throw new Error(started.error || 'Upload could not be started');
+            }
+            return sendChunks(started, file, started.chunk_size, onProgress, 0);
+        });
+    }
+
+    document.querySelectorAll('input[type="file"][data-upload-kind]').forEach(function(input) {
+        var status = document.getElementById(input.dataset.uploadStatus);
+        input.addEventListener('change', function() {
+            var file = input.files[0];
+            if (!file) {
+                return;
+            }
+            input.disabled = true;
+            upload(file, input.dataset.uploadKind, input.dataset.uploadTarget, function(received, total) {
+                if (status) {
+                    status.textContent = 'Uploading… ' + Math.floor(received * 100 / total) + '%';
+                }
+            }).then(function() {
+                if (status) {
+                    status.textContent = 'Uploaded ' + file.name;
+                }
+                if (input.dataset.uploadReload !== undefined) {
+                    window.location.reload();
+                }
+            }).catch(function(error) {
+                if (status) {
+                    status.textContent = error.message;
+                }
+            }).then(function() {
+                input.disabled = false;
+            });
+        });
+    });
+
+    window.ChunkedUpload = {upload: upload};
+})();
@@ -8,3 +8,33 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 });
+
+// Client-side cache for JSON endpoints that send ETags.
+// Stores the last body per URL and revalidates with If-None-Match,
+// reusing the stored body when the server answers 304 Not Modified.
+var jsonCache = new Map();
+
+function fetchJSONCached(url) {
+    var cached = jsonCache.get(url);
+    var headers = {};
+    if (cached) {
+        headers['If-None-Match'] = cached.etag;
+    }
+
+    return fetch(url, { headers: headers, cache: 'no-store', credentials: 'same-origin' })
+        .then(function(response) {
+            if (response.status === 304 && cached) {
+                return cached.data;
+            }
+
+            var etag = response.headers.get('ETag');
+            return response.json().then(function(data) {
+                if (response.ok && etag) {
+                    jsonCache.set(url, { etag: etag, data: data });
+                } else {
+                    jsonCache.delete(url);
+                }
+                return data;
+            });
+        });
+}
@@ -0,0 +1,83 @@
+"""
+Streaming page rendering
+For report pages whose size grows with the data (attendance reports,
+feedback lists), the page shell is sent right away and table rows are
+rendered straight from the database cursor with Flask's stream_template,
+so memory stays flat no matter how many rows a report covers.
+
+Routes run their queries first (so errors can still redirect with a flash)
+and then hand the open connection to stream_page(), which closes it once
+the response has been fully sent.
+"""
+
+from flask import Response, get_flashed_messages, stream_template
+
+# Rows pulled from the cursor per fetchmany() call
+STREAM_BATCH = 200
+# Rendered template output is sent in chunks of roughly this many characters
+STREAM_BUFFER = 8192
+
+
+class RowStream:
+    """Single-pass iterable over a cursor for use in templates.
+
+    `count`, when known, answers |length and truthiness checks; otherwise
+    truthiness peeks at the first row. `transform` maps each raw row to
+    the shape the template expects.
+    """
+
+    def __init__(self, cursor, count=None, transform=None, batch_size=STREAM_BATCH):
+        self.cursor = cursor
+        self.count = count
+        self.transform = transform
+        self.batch_size = batch_size
+        self._peeked = []
+
+    def _rows(self):
+        yield from self._peeked
+        self._peeked = []
+        while True:
+            batch = self.cursor.fetchmany(self.batch_size)
+            if not batch:
+                return
+            yield from batch
+
+    def __iter__(self):
+        for row in self._rows():
+            yield self.transform(row) if self.transform else row
+
+    def __bool__(self):
+        if self.count is not None:
+            return self.count > 0
+        if not self._peeked:
+            self._peeked = self.cursor.fetchmany(1)
+        return bool(self._peeked)
+
+    def __len__(self):
+        if self.count is None:
+            raise TypeError('RowStream length is unknown; pass count= when the template needs it')
+        return self.count
+
+
+def _buffered(chunks, size):
+    """Join small template chunks so each write to the client is reasonably sized"""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_page(template_name, conn, **context):
+    """Stream a template to the client, closing `conn` when the response finishes"""
+    # Pop flashed messages now: the session cookie cannot change once streaming starts
+    get_flashed_messages(with_categories=True)
+
+    response = Response(_buffered(stream_template(template_name, **context), STREAM_BUFFER),
+                        mimetype='text/html')
+    response.call_on_close(conn.close)
+    return response
@@ -0,0 +1,85 @@
+"""
+Memoized teacher authorization
+Each teacher's assigned classes and subjects are loaded once (at login or
+on first use) and kept per process with a TTL. Access checks are then set
+membership tests. Admin routes that change teacher mappings call
+invalidate_teacher() so the next check reloads.
+"""
+
+import sqlite3
+import threading
+import time
+
+DATABASE = 'users.db'
+
+# Seconds before a cached entry is reloaded, bounding staleness across processes
+ACCESS_TTL = 300
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _load_access(teacher_id):
+    """Load (class_ids, subjects) for a teacher in one query"""
+    conn = sqlite3.connect(DATABASE)
+    cur = conn.cursor()
+
+    try:
+        cur.execute('''
+            SELECT 'class', CAST(class_id AS TEXT) FROM teacher_class_map WHERE teacher_id = ?
+            UNION ALL
+            SELECT 'subject', subject_name FROM teacher_subjects WHERE teacher_id = ?
+        ''', (teacher_id, teacher_id))
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    class_ids = frozenset(int(value) for kind, value in rows if kind == 'class')
+    subjects = frozenset(value for kind, value in rows if kind == 'subject')
+    return class_ids, subjects
+
+
+def get_teacher_access(teacher_id):
+    """Return the cached (class_ids, subjects) for a teacher, loading it if missing or expired"""
+    teacher_id = int(teacher_id)
+    now = time.monotonic()
+
+    with _lock:
+        entry = _cache.get(teacher_id)
+        if entry is not None and entry[0] > now:
+            return entry[1], entry[2]
+
+    class_ids, subjects = _load_access(teacher_id)
+
+    with _lock:
+        _cache[teacher_id] = (now + ACCESS_TTL, class_ids, subjects)
+
+    return class_ids, subjects
+
+
+def has_class_access(teacher_id, class_id):
+    """Check whether a teacher is assigned to a class"""
+    try:
+        class_id = int(class_id)
+    except (TypeError, ValueError):
+        return False
+    return class_id in get_teacher_access(teacher_id)[0]
+
+
+def has_access(teacher_id, class_id, subject_name):
+    """Check whether a teacher may work with the given class and subject"""
+    try:
+        class_id = int(class_id)
+    except (TypeError, ValueError):
+        return False
+    class_ids, subjects = get_teacher_access(teacher_id)
+    return class_id in class_ids and subject_name in subjects
+
+
+def invalidate_teacher(teacher_id=None):
+    """Forget cached access for one teacher, or for everyone when teacher_id is None"""
+    with _lock:
+        if teacher_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(int(teacher_id), None)
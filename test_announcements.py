@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script for scoped announcements and per-user read cursors
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+import announcements
+import notifications
+from migrate_announcements import migrate_announcements
+from notifications import NotificationBus
+
+
+def make_db(db_path):
+    assert migrate_announcements(db_path)
+    return sqlite3.connect(db_path)
+
+
+def test_scopes_and_feed(db_path):
+    """Students see school, grade, class and subject posts meant for them only"""
+    print("=== TESTING ANNOUNCEMENTS ===")
+    conn = make_db(db_path)
+    cur = conn.cursor()
+    try:
+        cur.execute("INSERT INTO classes (name, grade_level, status) VALUES ('Scope A', '97', 'active')")
+        mine = cur.lastrowid
+        cur.execute("INSERT INTO classes (name, grade_level, status) VALUES ('Scope B', '98', 'active')")
+        other = cur.lastrowid
+        cur.execute("INSERT INTO student_class_map (student_id, class_id, status) VALUES (15, ?, 'active')", (mine,))
+        cur.execute("INSERT OR IGNORE INTO student_subjects (student_id, subject_name) VALUES (15, 'Astronomy')")
+
+        post = announcements.post_announcement
+        visible = [post(conn, 1, 'School', 'All', 'school'),
+                   post(conn, 1, 'Grade', 'G97', 'grade', '97'),
+                   post(conn, 1, 'Class', 'Mine', 'class', mine),
+                   post(conn, 1, 'Subject', 'Stars', 'subject', 'Astronomy')]
+        post(conn, 1, 'Other grade', 'G98', 'grade', '98')
+        post(conn, 1, 'Other class', 'Theirs', 'class', other)
+        post(conn, 1, 'Expired', 'Old', 'school', expires_on='2000-01-01 00:00:00')
+        conn.commit()
+
+        scopes = announcements.user_scopes(conn, 15, 'student')
+        assert {'school', 'grade:97', f'class:{mine}', 'subject:Astronomy'} <= scopes
+        assert f'class:{other}' not in scopes
+
+        page = announcements.feed(conn, scopes, limit=2)
+        assert [a['id'] for a in page] == visible[:1:-1]
+        older = announcements.feed(conn, scopes, limit=10, before_id=page[-1]['id'])
+        assert [a['id'] for a in older][:2] == visible[1::-1]
+        assert page[0]['audience'] == 'Astronomy' and page[1]['audience'] == 'Scope A'
+
+        try:
+            post(conn, 1, 'Bad', 'No target', 'class')
+            assert False, 'class scope without a target should fail'
+        except ValueError:
+            pass
+    finally:
+        conn.close()
+
+
+def test_read_cursor(db_path):
+    """Unread counts come from one cursor per user that only moves forward"""
+    conn = make_db(db_path)
+    try:
+        first = announcements.post_announcement(conn, 1, 'One', 'First', 'school')
+        second = announcements.post_announcement(conn, 1, 'Two', 'Second', 'school')
+        conn.commit()
+        scopes = {'school'}
+
+        baseline = announcements.unread_count(conn, 15, scopes)
+        assert baseline >= 2
+        announcements.mark_read(conn, 15, second)
+        announcements.mark_read(conn, 15, first)
+        conn.commit()
+        assert announcements.read_cursor(conn, 15) == second
+        assert announcements.unread_count(conn, 15, scopes) == 0
+
+        announcements.post_announcement(conn, 1, 'Three', 'Third', 'school')
+        assert announcements.unread_count(conn, 15, scopes) == 1
+        print("✅ Read cursors track unread announcements")
+    finally:
+        conn.close()
+
+
+def test_school_wide_post_is_one_row(db_path):
+    """Fan-out-on-read: posting to everyone writes one row and feeds stay fast"""
+    conn = make_db(db_path)
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT COUNT(*) FROM announcements')
+        before = cur.fetchone()[0]
+        announcements.post_announcement(conn, 1, 'Everyone', 'Hello', 'school')
+        cur.execute('SELECT COUNT(*) FROM announcements')
+        assert cur.fetchone()[0] == before + 1
+
+        cur.executemany("INSERT INTO announcements (title, content, author_id, scope, scope_key, class_id) VALUES ('t', 'c', 1, 'class', ?, ?)",
+                        [(f'class:{n}', n) for n in range(100000, 120000)])
+        conn.commit()
+        scopes = announcements.user_scopes(conn, 15, 'student')
+        started = time.perf_counter()
+        announcements.feed(conn, scopes)
+        announcements.unread_count(conn, 15, scopes)
+        assert time.perf_counter() - started < 0.1
+    finally:
+        conn.close()
+
+
+def test_notify_topics(db_path):
+    """Posts are pushed to the scope's topics on the notification bus"""
+    original = notifications.bus
+    notifications.bus = bus = NotificationBus()
+    conn = make_db(db_path)
+    try:
+        announcements.notify(conn, 1, 1, 'Exam', 'school')
+        announcements.notify(conn, 2, 1, 'Lab', 'class', 1000)
+        events = bus.recent({'role:student', 'class:1000'}, limit=10)
+        assert [e.type for e in events] == ['announcement', 'announcement']
+        assert events[0].data == {'announcement_id': 2}
+    finally:
+        conn.close()
+        notifications.bus = original
+
+
+def test_migration_upgrades_old_table(tmp_path):
+    """An announcements table from the old schema gains scope columns"""
+    db_path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE announcements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, content TEXT NOT NULL,
+            author_id INTEGER NOT NULL, class_id INTEGER, subject_name TEXT,
+            priority TEXT DEFAULT 'normal', is_active BOOLEAN DEFAULT 1,
+            created_on DATETIME DEFAULT CURRENT_TIMESTAMP, updated_on DATETIME, expires_on DATETIME
+        )
+    ''')
+    conn.execute("INSERT INTO announcements (title, content, author_id, class_id) VALUES ('a', 'b', 1, 7)")
+    conn.execute("INSERT INTO announcements (title, content, author_id, subject_name) VALUES ('a', 'b', 1, 'Math')")
+    conn.commit()
+    conn.close()
+
+    assert migrate_announcements(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        keys = [row[0] for row in conn.execute('SELECT scope_key FROM announcements ORDER BY id')]
+        assert keys == ['class:7', 'subject:Math']
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
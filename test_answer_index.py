@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for suggested answers: BM25 ranking, the on-disk index, incremental updates and query speed
+"""
+
+import random
+import sqlite3
+import time
+
+import pytest
+
+import answer_index
+import doubt_clusters
+import doubt_queue
+from migrate_doubt_clusters import migrate_doubt_clusters
+from migrate_doubt_queue import migrate_doubt_queue
+
+ORIGINAL = (answer_index.DATABASE, answer_index.INDEX_PATH)
+
+
+def restore():
+    answer_index.DATABASE, answer_index.INDEX_PATH = ORIGINAL
+    answer_index.invalidate()
+
+
+def test_ranking_and_round_trip(tmp_path):
+    """Relevant answers rank first, subjects filter, and a saved index loads identically"""
+    print("=== TESTING ANSWER INDEX ===")
+    index = answer_index.AnswerIndex()
+    index.add(1, 'Computer Science', 'What is the time complexity of binary search?', 'O(log n), it halves the range', '2030-01-01 09:00:00')
+    index.add(2, 'Computer Science', 'How do I reverse a list in Python?', 'Use slicing: items[::-1]', '2030-01-02 09:00:00')
+    index.add(3, 'Mathematics', 'Binary numbers: how do I convert 10 to binary?', 'Divide by two repeatedly: 1010', '2030-01-03 09:00:00')
+    index.compact()
+    index.add(4, 'Computer Science', 'Is binary search faster than linear search?', 'Yes, on sorted data', '2030-01-04 09:00:00')
+
+    assert [doubt_id for doubt_id, _ in index.search('complexity of binary search')][:2] == [1, 4]
+    assert [doubt_id for doubt_id, _ in index.search('binary', subject='Mathematics')] == [3]
+    assert 1 not in [doubt_id for doubt_id, _ in index.search('binary search', exclude=(1,))]
+    assert index.search('binary', subject='History') == [] and index.search('the of') == []
+    assert index.add(1, 'Computer Science', 'duplicate', 'ignored') is False
+
+    path = str(tmp_path / 'answer_index.bin')
+    index.save(path)
+    loaded = answer_index.AnswerIndex.load(path)
+    assert loaded.watermark == '2030-01-04 09:00:00' and len(loaded) == 4
+    assert loaded.search('reverse python list') == index.search('reverse python list')
+    assert loaded.search('binary search') == index.search('binary search')
+    print("✅ BM25 ranking and index file round trip")
+
+
+def test_index_catches_up_with_new_answers(db_path, tmp_path):
+    assert migrate_doubt_queue(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        answer_index.DATABASE = db_path
+        answer_index.INDEX_PATH = str(tmp_path / 'instance' / 'answer_index.bin')
+        answer_index.invalidate()
+
+        first, _ = doubt_queue.post_doubt(conn, 15, 'Computer Science', 'What does a compiler do?')
+        doubt_queue.answer(conn, first, 1, 'It translates source code to machine code', override=True)
+        conn.commit()
+        answer_index.build_index(conn)
+
+        # Answered after the build: picked up when the index loads
+        second, _ = doubt_queue.post_doubt(conn, 15, 'Computer Science', 'What is an interpreter?')
+        doubt_queue.answer(conn, second, 1, 'It runs source code line by line', override=True)
+        conn.commit()
+        assert [item['id'] for item in answer_index.suggest(conn, 'interpreter')] == [second]
+
+        # Answered while loaded: added straight to the in-memory index
+        third, _ = doubt_queue.post_doubt(conn, 15, 'Computer Science', 'Compiler versus interpreter?')
+        assert answer_index.suggest(conn, 'compiler versus interpreter')[0]['id'] != third
+        doubt_queue.answer(conn, third, 1, 'Compilers translate ahead of time', override=True)
+        conn.commit()
+        answer_index.index_answers(conn, [third])
+        suggestions = answer_index.suggest(conn, 'compiler versus interpreter')
+        assert suggestions[0]['id'] == third and suggestions[0]['response'] == 'Compilers translate ahead of time'
+    finally:
+        conn.close()
+        restore()
+
+
+def test_cluster_answer_is_suggested_once(db_path, tmp_path):
+    """Answering a cluster gives its members one response, and it is suggested once"""
+    assert migrate_doubt_queue(db_path) and migrate_doubt_clusters(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        answer_index.DATABASE = db_path
+        answer_index.INDEX_PATH = str(tmp_path / 'answer_index.bin')
+        answer_index.invalidate()
+
+        other, _ = doubt_queue.post_doubt(conn, 15, 'Computer Science', 'Why does my while loop run forever?')
+        doubt_queue.answer(conn, other, 1, 'Make sure its condition eventually becomes false', override=True)
+        conn.commit()
+        assert [item['id'] for item in answer_index.suggest(conn, 'loop never stops running')] == [other]
+
+        cluster = []
+        for text in ('Why does my for loop never stop running?', 'why does my for-loop never stop running',
+                     'Why does my for loop never stop running??'):
+            doubt_id, _ = doubt_queue.post_doubt(conn, 15, 'Computer Science', text)
+            doubt_clusters.add_doubt(conn, doubt_id, 'Computer Science', text)
+            cluster.append(doubt_id)
+        answered = doubt_clusters.answer_cluster(conn, cluster[0], 1, 'Check the loop condition', override=True)
+        conn.commit()
+        assert [row[0] for row in answered] == cluster
+        answer_index.index_answers(conn, cluster)
+
+        suggestions = answer_index.suggest(conn, 'for loop never stops running')
+        assert [item['response'] for item in suggestions] == ['Check the loop condition',
+                                                              'Make sure its condition eventually becomes false']
+        assert suggestions[0]['id'] in cluster
+    finally:
+        conn.close()
+        restore()
+
+
+def test_query_stays_under_20ms():
+    rng = random.Random(48)
+    vocabulary = [f'term{i}' for i in range(5000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    index = answer_index.AnswerIndex()
+    for doubt_id in range(1, 20001):
+        words = rng.choices(vocabulary, weights, k=30)
+        index.add(doubt_id, rng.choice(['Mathematics', 'Science', 'History']), ' '.join(words[:12]), ' '.join(words[12:]))
+    index.compact()
+
+    query = 'term3 term40 term250 term900 term2000 term4500'
+    timings = []
+    for _ in range(5):
+        began = time.perf_counter()
+        results = index.search(query, subject='Science')
+        timings.append(time.perf_counter() - began)
+    assert len(results) == answer_index.TOP_K
+    assert min(timings) < 0.020, f'query took {min(timings) * 1000:.1f}ms'
+    print(f"✅ Query over 20k resolved doubts in {min(timings) * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
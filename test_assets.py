@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for the fingerprinted static asset pipeline
+"""
+
+import gzip
+import os
+
+import pytest
+from flask import Flask, render_template_string
+
+import assets
+
+
+def make_static_dir(tmp_path):
+    """Static folder under tmp_path with one CSS and one JS file"""
+    static_dir = str(tmp_path / 'static')
+    os.makedirs(os.path.join(static_dir, 'css'))
+    os.makedirs(os.path.join(static_dir, 'uploads'))
+    with open(os.path.join(static_dir, 'css', 'page.css'), 'w') as f:
+        f.write('body { color: #333; }\n' * 50)
+    with open(os.path.join(static_dir, 'site.js'), 'w') as f:
+        f.write('console.log("hello");\n')
+    with open(os.path.join(static_dir, 'uploads', 'ignored.js'), 'w') as f:
+        f.write('// user upload\n')
+    return static_dir
+
+
+def test_build_assets(tmp_path):
+    """Assets are fingerprinted by content, precompressed and old builds removed"""
+    print("=== TESTING ASSET BUILD ===")
+    static_dir = make_static_dir(tmp_path)
+
+    manifest = assets.build_assets(static_dir)
+    assert sorted(manifest) == ['css/page.css', 'site.js']
+    hashed = manifest['css/page.css']
+    assert hashed.startswith('css/page.') and hashed.endswith('.css')
+
+    dist_dir = os.path.join(static_dir, 'dist')
+    with open(os.path.join(dist_dir, hashed + '.gz'), 'rb') as f:
+        assert gzip.decompress(f.read()) == b'body { color: #333; }\n' * 50
+    assert assets.load_manifest(static_dir) == manifest
+
+    # Same content gives the same name; changed content a new one
+    assert assets.build_assets(static_dir) == manifest
+    with open(os.path.join(static_dir, 'css', 'page.css'), 'a') as f:
+        f.write('p { margin: 0; }\n')
+    rebuilt = assets.build_assets(static_dir)
+    assert rebuilt['css/page.css'] != hashed
+    assert not os.path.exists(os.path.join(dist_dir, hashed))
+    print(f"✅ Built {len(rebuilt)} assets")
+
+
+def test_asset_url_and_headers(tmp_path):
+    """asset_url() emits hashed names served with immutable, negotiated responses"""
+    static_dir = make_static_dir(tmp_path)
+    manifest = assets.build_assets(static_dir)
+
+    app = Flask(__name__, static_folder=static_dir, static_url_path='/static')
+    assets.init_app(app)
+    client = app.test_client()
+
+    with app.test_request_context():
+        url = render_template_string("{{ asset_url('css/page.css') }}")
+        missing = render_template_string("{{ asset_url('js/missing.js') }}")
+    assert url == '/assets/' + manifest['css/page.css']
+    assert missing == '/static/js/missing.js'
+
+    plain = client.get(url)
+    assert plain.status_code == 200
+    assert plain.headers['Cache-Control'] == assets.IMMUTABLE_CACHE
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.mimetype == 'text/css'
+
+    assert client.get('/assets/dist/manifest.json').status_code == 404
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
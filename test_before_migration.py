@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test script for running the app on the shipped users.db before any migration
+
+Each feature that adds tables has to keep its pages and writes working until
+its migrate_*.py script has been run.
+"""
+
+import io
+import sqlite3
+
+import pytest
+
+USERS = {'student': 15, 'teacher': 12, 'admin': 1}
+
+PAGES = {
+    'student': ['/student/classes', '/student/doubts', '/student/feedback', '/student/homework',
+                '/student/announcements', '/student/site', '/messages'],
+    'teacher': ['/teacher/dashboard', '/teacher/classes', '/teacher/schedule', '/teacher/attendance',
+                '/teacher/marks', '/teacher/doubts', '/teacher/homework', '/teacher/submissions',
+                '/teacher/announcements', '/messages'],
+    'admin': ['/admin/dashboard', '/admin/users', '/admin/manage_users', '/admin/add_students',
+              '/admin/create_class', '/admin/view_classes', '/admin/view_doubts', '/admin/view_feedback',
+              '/admin/attendance', '/admin/attendance/report', '/admin/compression_stats', '/admin/announcements'],
+}
+
+PDF = b'%PDF-1.4 schedule'
+
+
+def login(app, role):
+    """A test client logged in as the sample user for `role`"""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = USERS[role]
+        sess['role'] = role
+    return client
+
+
+@pytest.mark.parametrize('role,page', [(role, page) for role, pages in PAGES.items() for page in pages])
+def test_pages_render(app_in_tmp, role, page):
+    """Every page a role can open renders on the unmigrated database"""
+    assert login(app_in_tmp, role).get(page).status_code == 200
+
+
+def test_student_can_post_a_doubt(app_in_tmp):
+    """Doubts are stored without the queue columns and the teacher queue stays empty"""
+    student = login(app_in_tmp, 'student')
+    response = student.post('/student/doubts', data={'subject': 'Computer Science', 'doubt_text': 'What is a stack?'})
+    assert response.status_code == 200
+    assert login(app_in_tmp, 'teacher').get('/teacher/doubts').status_code == 200
+
+    conn = sqlite3.connect('users.db')
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM doubts WHERE doubt_text = 'What is a stack?'").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_create_class_saves_a_plain_schedule(app_in_tmp):
+    """Without the blob store the schedule PDF is saved as a plain file"""
+    admin = login(app_in_tmp, 'admin')
+    for name, files in (('Plain Class', {}), ('PDF Class', {'schedule_pdf': (io.BytesIO(PDF), 'week.pdf')})):
+        admin.post('/admin/create_class', data={'name': name, 'type': 'regular', **files},
+                   content_type='multipart/form-data')
+
+    conn = sqlite3.connect('users.db')
+    try:
+        rows = dict(conn.execute("SELECT name, schedule_pdf_path FROM classes WHERE name IN ('Plain Class', 'PDF Class')"))
+    finally:
+        conn.close()
+    assert rows['Plain Class'] == ''
+    with open(rows['PDF Class'], 'rb') as saved:
+        assert saved.read() == PDF
+
+
+def test_delete_class(app_in_tmp):
+    """A class and its enrollments are deleted without the homework, announcements or blob tables"""
+    conn = sqlite3.connect('users.db')
+    cur = conn.cursor()
+    cur.execute("INSERT INTO classes (name, status) VALUES ('Doomed Class', 'active')")
+    class_id = cur.lastrowid
+    cur.execute('INSERT INTO student_class_map (student_id, class_id, assigned_by) VALUES (15, ?, 1)', (class_id,))
+    conn.commit()
+
+    try:
+        assert login(app_in_tmp, 'admin').post(f'/admin/delete_class/{class_id}').status_code == 200
+        assert conn.execute('SELECT COUNT(*) FROM classes WHERE id = ?', (class_id,)).fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM student_class_map WHERE class_id = ?', (class_id,)).fetchone()[0] == 0
+    finally:
+        conn.close()
+
+
+def test_plain_schedules_download(app_in_tmp, tmp_path):
+    """Schedules saved before the blob store existed still download"""
+    path = tmp_path / 'schedule.pdf'
+    path.write_bytes(PDF)
+    conn = sqlite3.connect('users.db')
+    conn.execute('UPDATE classes SET schedule_pdf_path = ? WHERE id = 1000', (str(path),))
+    conn.commit()
+    conn.close()
+
+    admin = login(app_in_tmp, 'admin')
+    for url in ('/admin/download_schedule/1000', '/files/schedule/1000'):
+        response = admin.get(url)
+        assert response.status_code == 200 and response.data == PDF, url
+
+
+def test_announcements_cannot_be_posted(app_in_tmp):
+    """Posting is refused with a message until the announcements table exists"""
+    for role, scope in (('admin', 'school'), ('teacher', 'class')):
+        response = login(app_in_tmp, role).post(f'/{role}/announcements', follow_redirects=True, data={
+            'scope': scope, 'class_target': '1000', 'title': 'Exam', 'content': 'Monday'})
+        assert response.status_code == 200 and b'not set up yet' in response.data, role
+
+
+def test_messaging_is_unavailable(app_in_tmp):
+    """The messages page explains why it is empty and the JSON views answer 503"""
+    student = login(app_in_tmp, 'student')
+    response = student.get('/messages')
+    assert response.status_code == 200 and b'not set up yet' in response.data
+    assert student.post('/messages/threads', json={'teacher_id': 12, 'body': 'hello'}).status_code == 503
+    assert student.get('/messages/threads/1').status_code == 503
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
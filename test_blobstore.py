@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test script for the content-addressed blob store and its reference counts
+"""
+
+import hashlib
+import io
+import os
+import sqlite3
+import time
+
+import pytest
+
+import blobstore
+import uploads
+from migrate_blobs import migrate_blobs
+from migrate_uploads import migrate_uploads
+
+ORIGINAL = (blobstore.BLOB_ROOT, uploads.UPLOAD_ROOT, uploads.ensure_cleanup_thread)
+
+
+def make_db(db_path, legacy_files=()):
+    tmp_dir = os.path.dirname(db_path)
+    blobstore.BLOB_ROOT = os.path.join(tmp_dir, 'uploads', 'blobs')
+    uploads.UPLOAD_ROOT = os.path.join(tmp_dir, 'uploads')
+    uploads.ensure_cleanup_thread = lambda *args: None
+
+    conn = sqlite3.connect(db_path)
+    for name, content in legacy_files:
+        path = os.path.join(tmp_dir, name)
+        with open(path, 'wb') as legacy:
+            legacy.write(content)
+        conn.execute("INSERT INTO classes (name, schedule_pdf_path, status) VALUES (?, ?, 'active')", (name, path))
+    conn.commit()
+    conn.close()
+    assert migrate_uploads(db_path) and migrate_blobs(db_path)
+    return sqlite3.connect(db_path)
+
+
+def restore():
+    blobstore.BLOB_ROOT, uploads.UPLOAD_ROOT, uploads.ensure_cleanup_thread = ORIGINAL
+
+
+def add_class(conn, name, content):
+    staged, sha256 = uploads.save_file(io.BytesIO(content), blobstore.staging_directory(), 'schedule.pdf', 1024 * 1024)
+    path = blobstore.store_file(conn, staged, sha256, 'application/pdf')
+    cur = conn.execute('INSERT INTO classes (name, schedule_pdf_path, schedule_pdf_sha256) VALUES (?, ?, ?)',
+                       (name, path, sha256))
+    return cur.lastrowid, sha256
+
+
+def test_identical_uploads_share_one_blob(db_path):
+    """Six sections with the same schedule store one file with six references"""
+    print("=== TESTING BLOB STORE ===")
+    conn = make_db(db_path)
+    try:
+        pdf = b'%PDF-1.4 timetable ' * 500
+        classes = [add_class(conn, f'Section {i}', pdf) for i in range(6)]
+        sha256 = classes[0][1]
+        assert sha256 == hashlib.sha256(pdf).hexdigest()
+        assert blobstore.reference_count(conn, sha256) == 6
+
+        path = blobstore.blob_path(sha256)
+        assert path == os.path.join(blobstore.BLOB_ROOT, sha256[:2], sha256[2:4], sha256)
+        assert os.listdir(os.path.dirname(path)) == [sha256]
+        assert os.listdir(blobstore.staging_directory()) == []
+        print("✅ Duplicate schedule PDFs stored once")
+    finally:
+        conn.close()
+        restore()
+
+
+def test_deleting_references_allows_collection(db_path):
+    conn = make_db(db_path)
+    try:
+        (first, sha256), (second, _) = add_class(conn, 'A', b'same'), add_class(conn, 'B', b'same')
+        conn.execute('DELETE FROM classes WHERE id = ?', (first,))
+        assert blobstore.reference_count(conn, sha256) == 1
+        assert blobstore.collect_garbage(conn, grace_seconds=0) == (0, 0)
+
+        conn.execute('DELETE FROM classes WHERE id = ?', (second,))
+        assert blobstore.reference_count(conn, sha256) == 0
+        # Still inside the grace period
+        assert blobstore.collect_garbage(conn) == (0, 0)
+        assert blobstore.collect_garbage(conn, now=time.time() + blobstore.GC_GRACE_SECONDS + 1) == (1, 4)
+        assert not os.path.exists(blobstore.blob_path(sha256))
+        assert not os.path.exists(os.path.join(blobstore.BLOB_ROOT, sha256[:2]))
+
+        # Re-uploading after collection writes the file again
+        _, sha256 = add_class(conn, 'C', b'same')
+        assert os.path.exists(blobstore.blob_path(sha256)) and blobstore.reference_count(conn, sha256) == 1
+    finally:
+        conn.close()
+        restore()
+
+
+def test_files_without_a_row_are_collected(db_path):
+    """A blob stored by a rolled-back transaction, and a stale staged file, are swept after the grace period"""
+    conn = make_db(db_path)
+    try:
+        _, sha256 = add_class(conn, 'Rolled back', b'never committed')
+        conn.rollback()
+        stray = os.path.join(blobstore.staging_directory(), 'stray.pdf')
+        with open(stray, 'wb') as staged:
+            staged.write(b'abandoned')
+        assert os.path.exists(blobstore.blob_path(sha256))
+        assert blobstore.collect_garbage(conn) == (0, 0)
+
+        later = time.time() + blobstore.GC_GRACE_SECONDS + 1
+        assert blobstore.collect_garbage(conn, now=later) == (2, len(b'never committed') + len(b'abandoned'))
+        assert not os.path.exists(blobstore.blob_path(sha256)) and not os.path.exists(stray)
+        assert not os.path.exists(os.path.join(blobstore.BLOB_ROOT, sha256[:2]))
+
+        # Committed blobs are left alone
+        _, kept = add_class(conn, 'Committed', b'kept')
+        conn.commit()
+        assert blobstore.collect_garbage(conn, now=later) == (0, 0)
+        assert os.path.exists(blobstore.blob_path(kept))
+    finally:
+        conn.close()
+        restore()
+
+
+def test_resources_and_schedules_are_counted_together(db_path):
+    conn = make_db(db_path)
+    try:
+        class_id, sha256 = add_class(conn, 'Shared', b'lecture notes')
+        conn.execute("UPDATE classes SET schedule_pdf_sha256 = NULL WHERE id = ?", (class_id,))
+        assert blobstore.reference_count(conn, sha256) == 0
+
+        upload_id = uploads.start_upload(conn, 1, 'admin', 'resource', class_id, 'notes.pdf', 13, 'application/pdf')
+        status = uploads.write_chunk(conn, upload_id, 1, 0, io.BytesIO(b'lecture notes'), 13)
+        assert status['sha256'] == sha256
+        file_path = conn.execute('SELECT file_path FROM resources WHERE id = ?', (status['resource_id'],)).fetchone()[0]
+        assert file_path == blobstore.blob_path(sha256)
+        assert blobstore.reference_count(conn, sha256) == 1
+
+        before = blobstore.reference_count(conn, sha256)
+        blobstore.recount(conn)
+        assert blobstore.reference_count(conn, sha256) == before
+    finally:
+        conn.close()
+        restore()
+
+
+def test_migration_moves_legacy_files(db_path):
+    conn = make_db(db_path, legacy_files=[('one.pdf', b'legacy'), ('two.pdf', b'legacy')])
+    try:
+        rows = conn.execute("SELECT schedule_pdf_path, schedule_pdf_sha256 FROM classes WHERE name IN ('one.pdf', 'two.pdf')").fetchall()
+        sha256 = hashlib.sha256(b'legacy').hexdigest()
+        assert rows == [(blobstore.blob_path(sha256), sha256)] * 2
+        assert blobstore.reference_count(conn, sha256) == 2
+    finally:
+        conn.close()
+        restore()
+
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
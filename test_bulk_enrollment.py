@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test script for bulk class enrollment with max_students capacity checks
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from enrollment import bulk_enroll_students, get_class_capacity, summarize_results
+
+
+def make_test_db(db_path):
+    """Open the test copy of users.db"""
+    return sqlite3.connect(db_path)
+
+
+def create_students(cur, count, prefix='bulk_student'):
+    """Create student users and return their ids"""
+    ids = []
+    for i in range(count):
+        cur.execute("INSERT INTO users (username, password, role, name) VALUES (?, 'x', 'student', ?)",
+                    (f'{prefix}_{i}', f'Bulk Student {i}'))
+        ids.append(cur.lastrowid)
+    return ids
+
+
+def create_class(cur, name, max_students):
+    """Create an active class and return its id"""
+    cur.execute("INSERT INTO classes (name, max_students, status) VALUES (?, ?, 'active')",
+                (name, max_students))
+    return cur.lastrowid
+
+
+def test_capacity_and_duplicates(db_path):
+    """Students beyond max_students are rejected and existing enrollments are reported"""
+    print("=== TESTING BULK ENROLLMENT CAPACITY ===")
+    conn = make_test_db(db_path)
+    cur = conn.cursor()
+
+    try:
+        students = create_students(cur, 5)
+        small_class = create_class(cur, 'Bulk Small', 3)
+        big_class = create_class(cur, 'Bulk Big', 30)
+
+        # One student is already in the small class
+        cur.execute('INSERT INTO student_class_map (student_id, class_id, assigned_by) VALUES (?, ?, 1)',
+                    (students[0], small_class))
+
+        results = bulk_enroll_students(conn, [small_class, big_class], students, 1)
+        conn.commit()
+
+        small = results[small_class]
+        assert small['already_enrolled'] == [students[0]]
+        assert small['added'] == students[1:3]
+        assert small['rejected_capacity'] == students[3:]
+
+        big = results[big_class]
+        assert big['added'] == students
+        assert big['rejected_capacity'] == []
+
+        capacity = get_class_capacity(cur, [small_class, big_class])
+        assert capacity[small_class] == (3, 3)
+        assert capacity[big_class] == (30, 5)
+
+        summary = summarize_results(results)
+        assert summary == {'added': 7, 'already_enrolled': 1, 'rejected_capacity': 2, 'rejected_conflict': 0}
+        print("✅ Capacity limits and duplicate enrollments handled correctly")
+
+    finally:
+        conn.close()
+
+
+def test_dropped_students_are_reactivated(db_path):
+    """A dropped enrollment is re-activated rather than reported as already enrolled"""
+    conn = make_test_db(db_path)
+    cur = conn.cursor()
+
+    try:
+        students = create_students(cur, 3, prefix='dropped_student')
+        class_id = create_class(cur, 'Bulk Dropped', 2)
+        cur.executemany("INSERT INTO student_class_map (student_id, class_id, assigned_by, status) VALUES (?, ?, 1, ?)",
+                        [(students[0], class_id, 'active'), (students[1], class_id, 'dropped')])
+
+        results = bulk_enroll_students(conn, [class_id], students, 1)
+        assert results[class_id]['already_enrolled'] == [students[0]]
+        assert results[class_id]['added'] == [students[1]]
+        assert results[class_id]['rejected_capacity'] == [students[2]]
+
+        cur.execute('SELECT status FROM student_class_map WHERE student_id = ? AND class_id = ?',
+                    (students[1], class_id))
+        assert cur.fetchone()[0] == 'active'
+        assert get_class_capacity(cur, [class_id])[class_id] == (2, 2)
+
+    finally:
+        conn.close()
+
+
+def test_unknown_class(db_path):
+    """Unknown class ids are reported instead of raising"""
+    conn = make_test_db(db_path)
+
+    try:
+        results = bulk_enroll_students(conn, [999999], [1], 1)
+        assert results[999999]['not_found'] is True
+        assert results[999999]['added'] == []
+
+    finally:
+        conn.close()
+
+
+def test_whole_grade_enrollment_speed(db_path):
+    """Enrolling 400 students into 6 classes stays well under a second"""
+    conn = make_test_db(db_path)
+    cur = conn.cursor()
+
+    try:
+        students = create_students(cur, 400, prefix='grade_student')
+        classes = [create_class(cur, f'Grade Section {i}', 500) for i in range(6)]
+        conn.commit()
+
+        start = time.perf_counter()
+        results = bulk_enroll_students(conn, classes, students, 1)
+        conn.commit()
+        elapsed = time.perf_counter() - start
+
+        assert summarize_results(results)['added'] == 2400
+        cur.execute(f"SELECT COUNT(*) FROM student_class_map WHERE class_id IN ({', '.join('?' for _ in classes)})",
+                    classes)
+        assert cur.fetchone()[0] == 2400
+        assert elapsed < 1.0
+        print(f"✅ Enrolled 400 students into 6 classes in {elapsed * 1000:.1f} ms")
+
+    finally:
+        conn.close()
+
+
+def test_bulk_assign_route_validates_input(app_in_tmp):
+    """The JSON route rejects non-object bodies and never enrolls non-students"""
+    conn = sqlite3.connect('users.db')
+    cur = conn.cursor()
+    student = create_students(cur, 1, prefix='route_student')[0]
+    class_id = create_class(cur, 'Route Class', 10)
+    conn.commit()
+    conn.close()
+
+    client = app_in_tmp.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['role'] = 'admin'
+
+    for body in ([1, 2], 'class_ids', 7):
+        assert client.post('/admin/assign_students/bulk', json=body).status_code == 400
+    assert client.post('/admin/assign_students/bulk', json={'class_ids': '1', 'student_ids': [student]}).status_code == 400
+
+    response = client.post('/admin/assign_students/bulk', json={'class_ids': [class_id], 'student_ids': [student, 12, 1]})
+    assert response.status_code == 200
+    assert response.get_json()['classes'][str(class_id)]['added'] == [student]
+    assert response.get_json()['not_students'] == [12, 1]
+
+    conn = sqlite3.connect('users.db')
+    try:
+        assert conn.execute('SELECT student_id FROM student_class_map WHERE class_id = ?', (class_id,)).fetchall() == [(student,)]
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
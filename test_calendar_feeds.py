@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script for the .ics timetable feeds
+"""
+
+import json
+import sqlite3
+
+import pytest
+from flask import Flask
+
+import calendar_feeds
+import timetable
+from calendar_feeds import feed_cache, render_calendar
+from migrate_class_sessions import migrate_class_sessions
+from migrate_data_versions import migrate_data_versions
+
+
+def test_render_calendar():
+    """Recurring weekly events with escaping and line folding"""
+    print("=== TESTING CALENDAR FEEDS ===")
+    link = 'https://meet.example.com/' + 'x' * 80
+    text = render_calendar('Ms. Smith, Timetable', [
+        (7, 'Maths; Set 1', '10', link, '2025-01-01 08:00:00', None),
+    ], {7: [(0, 540, 600), (2, 540, 600), (4, 840, 900)]})
+
+    lines = text.split('\r\n')
+    assert lines[0] == 'BEGIN:VCALENDAR' and lines[-2] == 'END:VCALENDAR'
+    assert 'X-WR-CALNAME:Ms. Smith\\, Timetable' in lines
+    assert 'SUMMARY:Maths\\; Set 1' in lines
+    # 2025-01-01 is a Wednesday, so the Mon/Wed series starts that day
+    assert 'DTSTART:20250101T090000' in lines
+    assert 'RRULE:FREQ=WEEKLY;BYDAY=MO,WE' in lines
+    assert 'DTSTART:20250103T140000' in lines
+    assert 'RRULE:FREQ=WEEKLY;BYDAY=FR' in lines
+    assert text.count('BEGIN:VEVENT') == 2
+    assert all(len(line.encode()) <= 75 for line in lines)
+    # Folded lines unfold back to the original link
+    assert link in text.replace('\r\n ', '')
+    print("✅ Feed renders valid recurring events")
+
+
+def test_feed_endpoint(db_path):
+    """Signed URLs, caching and conditional GET"""
+    assert migrate_data_versions(db_path)
+    assert migrate_class_sessions(db_path)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE classes SET schedule_days = ?, schedule_time_start = '09:00', schedule_time_end = '10:00' WHERE id = 1000",
+                 (json.dumps(['Tuesday']),))
+    timetable.replace_class_sessions(conn.cursor(), 1000, '["Tuesday"]', '09:00', '10:00')
+    conn.commit()
+    teacher_id = conn.execute('SELECT teacher_id FROM teacher_class_map WHERE class_id = 1000').fetchone()[0]
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    calendar_feeds.init_app(app)
+    client = app.test_client()
+
+    originals = (calendar_feeds.DATABASE, calendar_feeds.data_versions.DATABASE)
+    calendar_feeds.DATABASE = calendar_feeds.data_versions.DATABASE = db_path
+    feed_cache.clear()
+
+    try:
+        with app.test_request_context():
+            url = calendar_feeds.calendar_feed_url('teacher', teacher_id)
+        path = url.split('localhost', 1)[1]
+
+        assert client.get(path.replace('.ics', 'x.ics')).status_code == 404
+        assert client.get(f'/calendar/teacher/{teacher_id + 1}/' + path.rsplit('/', 1)[1]).status_code == 404
+
+        first = client.get(path)
+        assert first.status_code == 200
+        assert first.mimetype == 'text/calendar'
+        assert 'RRULE:FREQ=WEEKLY;BYDAY=TU' in first.get_data(as_text=True)
+        etag = first.headers['ETag']
+        assert first.headers['Last-Modified']
+
+        # Polling with the ETag or the date is answered from cache with 304
+        assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+        assert client.get(path, headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+        assert feed_cache.stats()['hits'] == 2
+
+        # Writes elsewhere re-render, but an unchanged feed keeps its ETag
+        conn.execute("UPDATE classes SET description = 'x' WHERE id = 1001")
+        conn.commit()
+        assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+        timetable.replace_class_sessions(conn.cursor(), 1000, '["Thursday"]', '09:00', '10:00')
+        conn.commit()
+        changed = client.get(path, headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.headers['ETag'] != etag
+        assert 'BYDAY=TH' in changed.get_data(as_text=True)
+
+    finally:
+        conn.close()
+        calendar_feeds.DATABASE, calendar_feeds.data_versions.DATABASE = originals
+        feed_cache.clear()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
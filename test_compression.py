@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for the gzip/brotli response compression middleware
+"""
+
+import gzip
+import zlib
+
+from flask import Flask, Response, jsonify
+
+import compression
+
+
+def make_app():
+    """Small app with large, small, streamed and binary responses"""
+    app = Flask(__name__)
+
+    @app.route('/large')
+    def large():
+        return '<tr><td>Student</td><td>Present</td></tr>\n' * 500
+
+    @app.route('/small')
+    def small():
+        return 'ok'
+
+    @app.route('/json')
+    def json_rows():
+        response = jsonify({'rows': [{'id': i, 'status': 'present'} for i in range(300)]})
+        response.set_etag('abc123')
+        return response
+
+    @app.route('/stream')
+    def stream():
+        def rows():
+            for i in range(200):
+                yield f'<tr><td>Row {i}</td></tr>\n'
+        return Response(rows(), mimetype='text/html')
+
+    @app.route('/schedule.pdf')
+    def pdf():
+        return Response(b'%PDF-1.4 ' + b'0' * 5000, mimetype='application/pdf')
+
+    compression.init_app(app)
+    return app
+
+
+def test_negotiation_and_thresholds():
+    """Large text bodies are gzipped; small, binary and non-accepting requests are not"""
+    print("=== TESTING RESPONSE COMPRESSION ===")
+    app = make_app()
+    client = app.test_client()
+
+    plain = client.get('/large')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    compressed = client.get('/large', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert len(compressed.data) * 8 < len(plain.data)
+
+    refused = client.get('/large', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in refused.headers
+
+    small = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers and small.data == b'ok'
+
+    pdf = client.get('/schedule.pdf', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in pdf.headers
+    assert pdf.data.startswith(b'%PDF')
+
+    tagged = client.get('/json', headers={'Accept-Encoding': 'gzip'})
+    assert tagged.headers['ETag'] == 'W/"abc123"'
+    print("✅ Negotiation and thresholds behave as expected")
+
+
+def test_streaming_and_stats():
+    """Streamed bodies are compressed with flushes and stats are recorded per endpoint"""
+    app = make_app()
+    client = app.test_client()
+    middleware = app.extensions['compression']
+
+    response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    expected = ''.join(f'<tr><td>Row {i}</td></tr>\n' for i in range(200)).encode()
+    assert zlib.decompress(response.data, 31) == expected
+
+    assert client.get('/large', headers={'Accept-Encoding': 'gzip'}).data
+    stats = middleware.stats.snapshot()
+    assert stats['stream']['responses'] == 1
+    assert stats['large']['ratio'] > 8
+    assert stats['large']['encodings'] == {'gzip': 1}
+    print(f"✅ Stats: large ratio {stats['large']['ratio']}, stream ratio {stats['stream']['ratio']}")
+
+
+def test_choose_encoding():
+    """Accept-Encoding parsing honours q-values and wildcards"""
+    assert compression.choose_encoding(None) is None
+    assert compression.choose_encoding('identity') is None
+    assert compression.choose_encoding('*') == 'gzip'
+    assert compression.choose_encoding('br;q=0, gzip;q=0.5') == 'gzip'
+
+
+if __name__ == '__main__':
+    test_negotiation_and_thresholds()
+    test_streaming_and_stats()
+    test_choose_encoding()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test script for the data_versions table, its triggers and versions_for()
+"""
+
+import sqlite3
+
+import pytest
+
+import data_versions
+from migrate_data_versions import migrate_data_versions
+
+
+def make_test_db(db_path, migrate=True):
+    """Open the test copy of users.db, optionally migrated"""
+    if migrate:
+        assert migrate_data_versions(db_path)
+    return sqlite3.connect(db_path)
+
+
+def test_triggers_bump_versions(db_path):
+    """Every insert, update and delete on a tracked table bumps its version"""
+    print("=== TESTING DATA VERSION TRIGGERS ===")
+    conn = make_test_db(db_path)
+    cur = conn.cursor()
+
+    try:
+        before = data_versions.versions_for(['classes', 'users'], conn)
+
+        cur.execute("INSERT INTO classes (name, status) VALUES ('Version Test', 'active')")
+        class_id = cur.lastrowid
+        after_insert = data_versions.versions_for(['classes', 'users'], conn)
+        assert after_insert[0] == before[0] + 1
+        assert after_insert[1] == before[1]
+
+        cur.execute("UPDATE classes SET name = 'Version Test 2' WHERE id = ?", (class_id,))
+        cur.execute("DELETE FROM classes WHERE id = ?", (class_id,))
+        assert data_versions.versions_for(['classes'], conn)[0] == before[0] + 3
+
+        # A rolled back write leaves the version untouched
+        conn.commit()
+        committed = data_versions.versions_for(['users'], conn)
+        cur.execute("DELETE FROM users WHERE role = 'student'")
+        conn.rollback()
+        assert data_versions.versions_for(['users'], conn) == committed
+        print("✅ Versions follow writes and rollbacks")
+
+    finally:
+        conn.close()
+
+
+def test_versions_for_order_and_unknown_tables(db_path):
+    """versions_for keeps the requested order and reports unknown tables as 0"""
+    conn = make_test_db(db_path)
+
+    try:
+        data_versions.bump(conn, 'marks', 'marks', 'custom_table')
+        versions = data_versions.versions_for(['custom_table', 'marks', 'not_tracked'], conn)
+        assert versions == (1, 2, 0)
+
+    finally:
+        conn.close()
+
+
+def test_unmigrated_database(db_path):
+    """versions_for returns None before the migration has run"""
+    conn = make_test_db(db_path, migrate=False)
+
+    try:
+        assert data_versions.versions_for(['users'], conn) is None
+
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test script for near-duplicate doubt clustering: grouping, fan-out answers and lookup speed
+"""
+
+import random
+import sqlite3
+import time
+
+import pytest
+
+import doubt_clusters
+import doubt_queue
+import teacher_access
+from migrate_doubt_clusters import migrate_doubt_clusters
+from migrate_doubt_queue import migrate_doubt_queue
+
+
+def make_db(db_path):
+    assert migrate_doubt_queue(db_path) and migrate_doubt_clusters(db_path)
+    teacher_access.DATABASE = db_path
+    teacher_access.invalidate_teacher()
+    return sqlite3.connect(db_path)
+
+
+def restore():
+    teacher_access.DATABASE = 'users.db'
+    teacher_access.invalidate_teacher()
+
+
+def post(conn, student_id, subject, text):
+    doubt_id, _ = doubt_queue.post_doubt(conn, student_id, subject, text)
+    return doubt_id, doubt_clusters.add_doubt(conn, doubt_id, subject, text)
+
+
+def test_near_duplicates_share_a_cluster(db_path):
+    """Rephrasings of one question cluster together; other questions and subjects do not"""
+    print("=== TESTING DOUBT CLUSTERS ===")
+    conn = make_db(db_path)
+    try:
+        first, cluster = post(conn, 15, 'Computer Science', 'What is the time complexity of binary search?')
+        assert cluster == first
+        second, cluster = post(conn, 15, 'Computer Science', 'what is the time complexity of a binary search??')
+        assert cluster == first
+        other, cluster = post(conn, 15, 'Computer Science', 'How do I reverse a linked list in Python?')
+        assert cluster == other
+        history, cluster = post(conn, 15, 'History', 'What is the time complexity of binary search?')
+        assert cluster == history
+
+        assert doubt_clusters.open_members(conn, second) == [first, second]
+        conn.commit()
+        groups = doubt_clusters.group_queue(conn, doubt_queue.queue(conn, 12))
+        sizes = {group['lead']['id']: len(group['members']) for group in groups}
+        assert sizes[first] == 2 and sizes[other] == 1 and second not in sizes
+        print("✅ Near-duplicate doubts grouped")
+    finally:
+        conn.close()
+        restore()
+
+
+def test_answer_fans_out_to_the_cluster(db_path):
+    conn = make_db(db_path)
+    try:
+        conn.execute("INSERT INTO teacher_subjects (teacher_id, subject_name) VALUES (13, 'Computer Science')")
+        conn.execute("INSERT INTO teacher_class_map (teacher_id, class_id) VALUES (13, 1000)")
+        conn.commit()
+        teacher_access.invalidate_teacher()
+        lead, _ = post(conn, 15, 'Computer Science', 'Why does my for loop never stop running?')
+        member, _ = post(conn, 15, 'Computer Science', 'why does my for-loop never stop running')
+        held, _ = post(conn, 15, 'Computer Science', 'Why does my for loop never stop running??')
+        assert doubt_queue.claim(conn, held, 13)
+
+        answered = doubt_clusters.answer_cluster(conn, lead, 12, 'Check the loop condition')
+        assert [row[0] for row in answered] == [lead, member]
+        assert doubt_clusters.open_members(conn, lead) == [held]
+
+        # Admins are not held back by another teacher's claim
+        answered = doubt_clusters.answer_cluster(conn, held, 1, 'Check the loop condition', override=True)
+        assert [row[0] for row in answered] == [held]
+
+        # Deleting a doubt drops it from the index
+        conn.execute('DELETE FROM doubts WHERE id = ?', (member,))
+        assert conn.execute('SELECT COUNT(*) FROM doubt_lsh_buckets WHERE doubt_id = ?', (member,)).fetchone()[0] == 0
+    finally:
+        conn.close()
+        restore()
+
+
+QUESTION = ('I am revising for the calculus exam and I keep getting stuck on integration by parts when the '
+            'integrand is x squared times e to the x. I pick u as x squared and dv as e to the x dx, then I '
+            'have to integrate by parts a second time for the 2x e to the x term, and somewhere in there my '
+            'signs go wrong so my answer never matches the one in the back of the textbook. Is there a '
+            'quicker way to keep track of the signs, like the tabular method our teacher mentioned, and '
+            'how do I know when to stop differentiating u? Also, should the constant of integration be '
+            'added after each step or only once at the very end of the whole calculation?')
+
+
+def rephrase(rng, text, edits=6):
+    """The same question with a few words dropped or swapped, as another student might ask it"""
+    words = text.split()
+    for _ in range(edits):
+        i = rng.randrange(len(words) - 1)
+        if rng.random() < 0.5:
+            del words[i]
+        else:
+            words[i], words[i + 1] = words[i + 1], words[i]
+    return ' '.join(words)
+
+
+def test_lookup_stays_fast_at_100k_doubts(db_path):
+    """Paragraph-length lookups stay fast with 100k doubts and thousands of copies of one question"""
+    conn = make_db(db_path)
+    try:
+        rng = random.Random(47)
+        target, _ = post(conn, 15, 'Mathematics', QUESTION)
+        start = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM doubts').fetchone()[0]
+        ids = range(start, start + 100000)
+        conn.executemany("INSERT INTO doubts (id, student_id, subject, doubt_text, status) VALUES (?, 15, 'Mathematics', '', 'answered')",
+                         ((doubt_id,) for doubt_id in ids))
+        signatures = {doubt_id: rng.randbytes(doubt_clusters.NUM_HASHES * 4) for doubt_id in ids}
+
+        # Exam week: 5000 students post rewordings of the same question, all sharing its buckets
+        variants = [doubt_clusters.signature(rephrase(rng, QUESTION)).tobytes() for _ in range(50)]
+        copies = range(start + 100000, start + 105000)
+        conn.executemany("INSERT INTO doubts (id, student_id, subject, doubt_text, status) VALUES (?, 15, 'Mathematics', '', 'open')",
+                         ((doubt_id,) for doubt_id in copies))
+        signatures.update((doubt_id, variants[doubt_id % len(variants)]) for doubt_id in copies)
+
+        conn.executemany('INSERT INTO doubt_signatures (doubt_id, cluster_id, signature) VALUES (?, ?, ?)',
+                         ((doubt_id, doubt_id, sig) for doubt_id, sig in signatures.items()))
+        conn.executemany('INSERT INTO doubt_lsh_buckets (bucket, doubt_id) VALUES (?, ?)',
+                         ((key, doubt_id) for doubt_id, sig in signatures.items()
+                          for key in doubt_clusters.bucket_keys(doubt_clusters._unpack(sig))))
+        conn.commit()
+
+        timings = []
+        for _ in range(20):
+            text = rephrase(rng, QUESTION)
+            began = time.perf_counter()
+            matches = doubt_clusters.similar(conn, text, 'Mathematics')
+            timings.append(time.perf_counter() - began)
+            assert len(matches) == 5 and all(doubt_id in copies or doubt_id == target for doubt_id, _, _ in matches)
+        assert max(timings) < 0.010, f'slowest lookup took {max(timings) * 1000:.1f}ms'
+        print(f"✅ Paragraph lookup over 105k doubts in {max(timings) * 1000:.2f}ms at worst")
+    finally:
+        conn.close()
+        restore()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
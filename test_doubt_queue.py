@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test script for the subject-routed doubt queue: routing, ordering, leases and the partial index
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import doubt_queue
+import teacher_access
+from migrate_doubt_queue import migrate_doubt_queue
+
+
+def make_db(db_path):
+    assert migrate_doubt_queue(db_path)
+    teacher_access.DATABASE = db_path
+    teacher_access.invalidate_teacher()
+    return sqlite3.connect(db_path)
+
+
+def restore():
+    teacher_access.DATABASE = 'users.db'
+    teacher_access.invalidate_teacher()
+
+
+def test_routing_and_priority_order(db_path):
+    """Doubts reach the subject teachers of the student's class, urgent first then oldest"""
+    print("=== TESTING DOUBT QUEUE ===")
+    conn = make_db(db_path)
+    try:
+        first, class_id = doubt_queue.post_doubt(conn, 15, 'Computer Science', 'What is recursion?')
+        assert class_id == 1000
+        assert doubt_queue.teachers_for(conn, 'Computer Science', class_id) == [12]
+        urgent, _ = doubt_queue.post_doubt(conn, 15, 'Computer Science', 'Exam tomorrow!', 'urgent')
+        history, _ = doubt_queue.post_doubt(conn, 15, 'History', 'Who won?')
+        conn.commit()
+
+        queue = [item['id'] for item in doubt_queue.queue(conn, 12)]
+        assert queue.index(urgent) < queue.index(first) and history not in queue
+        assert doubt_queue.open_count(conn, 12) == len(queue)
+        assert history in [item['id'] for item in doubt_queue.queue(conn, 13)]
+
+        clause, params = doubt_queue._routing_clause(12)
+        plan = ' '.join(row[3] for row in conn.execute(
+            f'EXPLAIN QUERY PLAN SELECT COUNT(*) FROM doubts d WHERE {clause}', params))
+        assert 'COVERING INDEX idx_doubts_open' in plan
+        print("✅ Doubts routed by subject and class")
+    finally:
+        conn.close()
+        restore()
+
+
+def test_claims_are_exclusive_until_the_lease_lapses(db_path):
+    conn = make_db(db_path)
+    try:
+        conn.execute("INSERT INTO teacher_subjects (teacher_id, subject_name) VALUES (13, 'Computer Science')")
+        conn.execute("INSERT INTO teacher_class_map (teacher_id, class_id) VALUES (13, 1000)")
+        conn.commit()
+        teacher_access.invalidate_teacher()
+        doubt_id, _ = doubt_queue.post_doubt(conn, 15, 'Computer Science', 'Big-O of binary search?')
+        now = datetime(2030, 1, 1, 12, 0)
+
+        assert doubt_queue.claim(conn, doubt_id, 12, now=now)
+        assert doubt_queue.claim(conn, doubt_id, 13, now=now + timedelta(minutes=5)) is None
+        other_view = doubt_queue.queue(conn, 13, now=now + timedelta(minutes=5))[0]
+        assert other_view['claimed_by_other'] and not other_view['claimed_by_me']
+        try:
+            doubt_queue.answer(conn, doubt_id, 13, 'log n', now=now + timedelta(minutes=5))
+            assert False, 'a live claim blocks other teachers'
+        except ValueError:
+            pass
+
+        # The lease lapses and the second teacher takes over
+        later = now + timedelta(seconds=doubt_queue.LEASE_SECONDS + 1)
+        assert doubt_queue.claim(conn, doubt_id, 13, now=later)
+        assert doubt_queue.answer(conn, doubt_id, 13, 'O(log n)', now=later) == (15, 'Computer Science')
+        assert doubt_queue.open_count(conn, 12) == doubt_queue.open_count(conn, 13) == 0
+        assert doubt_queue.answered_by(conn, 13)[0]['response'] == 'O(log n)'
+        try:
+            doubt_queue.answer(conn, doubt_id, 1, 'again', override=True)
+            assert False, 'answered doubts cannot be answered twice'
+        except ValueError:
+            pass
+    finally:
+        conn.close()
+        restore()
+
+
+def test_unrouted_teachers_cannot_claim(db_path):
+    conn = make_db(db_path)
+    try:
+        doubt_id, _ = doubt_queue.post_doubt(conn, 15, 'Computer Science', 'Why Python?')
+        for teacher_id in (13, 14):
+            try:
+                doubt_queue.claim(conn, doubt_id, teacher_id)
+                assert False, 'doubt is not routed to this teacher'
+            except ValueError:
+                pass
+        assert doubt_queue.release(conn, doubt_id, 12) is False
+        assert doubt_queue.claim(conn, doubt_id, 12) and doubt_queue.release(conn, doubt_id, 12)
+    finally:
+        conn.close()
+        restore()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
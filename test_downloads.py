@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared download endpoint: permissions, Range, conditional GET and offload
+"""
+
+import io
+import os
+import sqlite3
+
+import pytest
+
+import blobstore
+import downloads
+import teacher_access
+import uploads
+from migrate_blobs import migrate_blobs
+from migrate_homework import migrate_homework
+from migrate_uploads import migrate_uploads
+
+ORIGINAL = (blobstore.BLOB_ROOT, downloads.DATABASE, teacher_access.DATABASE)
+PDF = b'%PDF-1.4 ' + bytes(range(256)) * 40
+
+
+def make_client(db_path):
+    tmp_dir = os.path.dirname(db_path)
+    assert migrate_homework(db_path) and migrate_uploads(db_path) and migrate_blobs(db_path)
+    blobstore.BLOB_ROOT = os.path.join(tmp_dir, 'blobs')
+    downloads.DATABASE = teacher_access.DATABASE = db_path
+
+    conn = sqlite3.connect(db_path)
+    staged, sha256 = uploads.save_file(io.BytesIO(PDF), blobstore.staging_directory(), 'week.pdf', 1024 * 1024)
+    path = blobstore.store_file(conn, staged, sha256, 'application/pdf')
+    conn.execute('UPDATE classes SET schedule_pdf_path = ?, schedule_pdf_sha256 = ? WHERE id = 1000', (path, sha256))
+    outsider = conn.execute('''
+        SELECT id FROM users WHERE role = 'student'
+        AND id NOT IN (SELECT student_id FROM student_class_map WHERE class_id = 1000)
+    ''').fetchone()[0]
+    conn.commit()
+    conn.close()
+
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app, sha256, outsider
+
+
+def restore():
+    blobstore.BLOB_ROOT, downloads.DATABASE, teacher_access.DATABASE = ORIGINAL
+    teacher_access.invalidate_teacher()
+
+
+def login(client, user_id, role):
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['role'] = role
+
+
+def test_ranges_and_validators(db_path):
+    """Full download, a byte range and a revalidation that returns 304"""
+    print("=== TESTING DOWNLOADS ===")
+    app, sha256, _ = make_client(db_path)
+    try:
+        client = app.test_client()
+        login(client, 15, 'student')
+
+        response = client.get('/files/schedule/1000')
+        assert response.status_code == 200 and response.data == PDF
+        assert response.headers['ETag'] == f'"{sha256}"'
+        assert response.headers['Accept-Ranges'] == 'bytes' and 'Last-Modified' in response.headers
+        assert 'no-transform' in response.headers['Cache-Control']
+
+        response = client.get('/files/schedule/1000', headers={'Range': 'bytes=100-199'})
+        assert response.status_code == 206 and response.data == PDF[100:200]
+        assert response.headers['Content-Range'] == f'bytes 100-199/{len(PDF)}'
+
+        response = client.get('/files/schedule/1000', headers={'If-None-Match': f'"{sha256}"'})
+        assert response.status_code == 304 and response.data == b''
+        print("✅ Range and conditional GET handled")
+    finally:
+        restore()
+
+
+def test_only_class_members_can_download(db_path):
+    app, _, outsider = make_client(db_path)
+    try:
+        client = app.test_client()
+        assert client.get('/files/schedule/1000').status_code == 401
+        for user_id, role, status in ((outsider, 'student', 404), (12, 'teacher', 200), (1, 'admin', 200)):
+            login(client, user_id, role)
+            assert client.get('/files/schedule/1000').status_code == status
+        assert client.get('/files/unknown/1000').status_code == 404
+    finally:
+        restore()
+
+
+def test_proxy_offload_headers(db_path):
+    app, sha256, _ = make_client(db_path)
+    try:
+        client = app.test_client()
+        login(client, 1, 'admin')
+
+        app.config['DOWNLOAD_OFFLOAD'] = 'x-accel-redirect'
+        response = client.get('/files/schedule/1000')
+        assert response.status_code == 200 and response.data == b''
+        accel = response.headers['X-Accel-Redirect']
+        assert accel.startswith('/protected/') and accel.endswith(sha256)
+        assert response.headers['ETag'] == f'"{sha256}"'
+
+        response = client.get('/files/schedule/1000', headers={'If-None-Match': f'"{sha256}"'})
+        assert response.status_code == 304 and 'X-Accel-Redirect' not in response.headers
+
+        app.config['DOWNLOAD_OFFLOAD'] = 'x-sendfile'
+        response = client.get('/files/schedule/1000')
+        assert response.headers['X-Sendfile'] == blobstore.blob_path(sha256)
+        assert 'attachment' in response.headers['Content-Disposition']
+    finally:
+        restore()
+
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for ETag / If-None-Match handling on JSON endpoints
+"""
+
+import sqlite3
+
+import pytest
+from flask import Flask, jsonify
+
+import data_versions
+from etags import versioned_etag, not_modified, with_etag
+from migrate_data_versions import migrate_data_versions
+
+
+def make_app(db_path, calls):
+    """Small app with one versioned JSON endpoint that counts its main queries"""
+    app = Flask(__name__)
+
+    @app.route('/classes/<int:class_id>')
+    def class_json(class_id):
+        etag = versioned_etag(['classes'], class_id)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        calls.append(class_id)
+        conn = sqlite3.connect(db_path)
+        row = conn.execute('SELECT name FROM classes WHERE id = ?', (class_id,)).fetchone()
+        conn.close()
+        return with_etag(jsonify({'name': row[0]}), etag)
+
+    return app
+
+
+def test_conditional_get(db_path):
+    """Matching If-None-Match returns 304 without running the endpoint query"""
+    print("=== TESTING ETAG CONDITIONAL GET ===")
+    assert migrate_data_versions(db_path)
+
+    original_database = data_versions.DATABASE
+    data_versions.DATABASE = db_path
+    calls = []
+
+    try:
+        client = make_app(db_path, calls).test_client()
+
+        first = client.get('/classes/1000')
+        etag = first.headers['ETag']
+        assert first.status_code == 200
+        assert first.headers['Cache-Control'] == 'private, no-cache'
+
+        second = client.get('/classes/1000', headers={'If-None-Match': etag})
+        assert second.status_code == 304
+        assert second.headers['ETag'] == etag
+        assert calls == [1000]
+
+        # Different key parts give a different ETag
+        other = client.get('/classes/1001', headers={'If-None-Match': etag})
+        assert other.status_code == 200
+
+        # A write to classes changes the ETag
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE classes SET name = 'Renamed' WHERE id = 1000")
+        conn.commit()
+        conn.close()
+        third = client.get('/classes/1000', headers={'If-None-Match': etag})
+        assert third.status_code == 200
+        assert third.get_json() == {'name': 'Renamed'}
+        assert third.headers['ETag'] != etag
+        print("✅ ETags validate and change with data versions")
+
+    finally:
+        data_versions.DATABASE = original_database
+
+
+def test_without_versions_table(db_path):
+    """Endpoints behave normally (no ETag) on an unmigrated database"""
+    original_database = data_versions.DATABASE
+    data_versions.DATABASE = db_path
+    calls = []
+
+    try:
+        client = make_app(db_path, calls).test_client()
+        response = client.get('/classes/1000', headers={'If-None-Match': '"anything"'})
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers
+
+    finally:
+        data_versions.DATABASE = original_database
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
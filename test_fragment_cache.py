@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script for the {% cache %} template fragment cache
+"""
+
+import sqlite3
+
+import pytest
+from jinja2 import Environment
+
+import data_versions
+import fragment_cache
+from fragment_cache import FragmentCache, FragmentCacheExtension, LazyRows
+from migrate_data_versions import migrate_data_versions
+
+TEMPLATE = """{% cache 'class_options', ['classes'] %}{% for class in classes %}<option>{{ class[1] }}</option>{% endfor %}{% endcache %}"""
+
+
+def test_fragments_follow_data_versions(db_path):
+    """A fragment renders once, is reused, and re-renders after its table changes"""
+    print("=== TESTING FRAGMENT CACHE ===")
+    assert migrate_data_versions(db_path)
+
+    original = (data_versions.DATABASE, fragment_cache.DATABASE, fragment_cache.fragment_cache)
+    data_versions.DATABASE = fragment_cache.DATABASE = db_path
+    fragment_cache.fragment_cache = FragmentCache(max_size=4)
+    query = 'SELECT id, name FROM classes WHERE status = "active" ORDER BY name'
+
+    try:
+        env = Environment(extensions=[FragmentCacheExtension], autoescape=True)
+        template = env.from_string(TEMPLATE)
+
+        first = template.render(classes=LazyRows(query))
+        unused = LazyRows(query)
+        second = template.render(classes=unused)
+        assert first == second
+        assert unused._rows is None  # the query never ran on a hit
+        assert fragment_cache.fragment_cache.stats()['hits'] == 1
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO classes (name, status) VALUES ('AAA <New>', 'active')")
+        conn.commit()
+        conn.close()
+
+        third = template.render(classes=LazyRows(query))
+        assert third.startswith('<option>AAA &lt;New&gt;</option>')
+        assert fragment_cache.fragment_cache.stats()['misses'] == 2
+        print(f"✅ Stats: {fragment_cache.fragment_cache.stats()}")
+
+    finally:
+        data_versions.DATABASE, fragment_cache.DATABASE, fragment_cache.fragment_cache = original
+
+
+def test_keys_and_lru():
+    """Different keys get separate fragments and the LRU stays bounded"""
+    cache = FragmentCache(max_size=2)
+    calls = []
+
+    def body(name):
+        def render():
+            calls.append(name)
+            return name
+        return render
+
+    assert cache.render('t', ('nav', 'a'), None, body('a')) == 'a'
+    assert cache.render('t', ('nav', 'b'), None, body('b')) == 'b'
+    assert cache.render('t', ('nav', 'a'), None, body('x')) == 'a'
+    cache.render('t', ('nav', 'c'), None, body('c'))  # evicts b
+    cache.render('t', ('nav', 'b'), None, body('b'))
+    assert calls == ['a', 'b', 'c', 'b']
+    assert cache.stats()['size'] == 2
+
+    # List keys are hashable and order-sensitive
+    assert cache.render('t', ['picker', [1, 2]], None, body('p')) == 'p'
+    assert cache.render('t', ['picker', [1, 2]], None, body('q')) == 'p'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test script for homework, submissions and the incremental submission counters
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import homework
+from migrate_homework import migrate_homework
+
+
+def make_db(db_path):
+    assert migrate_homework(db_path)
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("INSERT INTO classes (name, grade_level, status) VALUES ('Homework Class', '9', 'active')")
+    class_id = cur.lastrowid
+    cur.execute("SELECT id FROM users WHERE role = 'student' ORDER BY id LIMIT 4")
+    students = [row[0] for row in cur.fetchall()]
+    cur.executemany("INSERT INTO student_class_map (student_id, class_id, status) VALUES (?, ?, 'active')",
+                    [(student_id, class_id) for student_id in students[:3]])
+    conn.commit()
+    return conn, class_id, students
+
+
+def counters(conn, homework_id):
+    return conn.execute('SELECT student_count, submission_count, graded_count FROM homework WHERE id = ?',
+                        (homework_id,)).fetchone()
+
+
+def test_counters_follow_submissions_and_roster(db_path):
+    """Triggers keep student, submission and graded counts current"""
+    print("=== TESTING HOMEWORK ===")
+    conn, class_id, students = make_db(db_path)
+    try:
+        due = datetime.now() + timedelta(days=2)
+        hw = homework.create_homework(conn, 12, class_id, 'Math', 'Worksheet 1', due)
+        conn.commit()
+        assert counters(conn, hw) == (3, 0, 0)
+
+        first = homework.submit(conn, hw, students[0], 'answers')
+        homework.submit(conn, hw, students[1], 'answers')
+        homework.submit(conn, hw, students[1], 'better answers')
+        assert counters(conn, hw) == (3, 2, 0)
+
+        homework.grade_submission(conn, first, 12, 8)
+        assert counters(conn, hw) == (3, 2, 1)
+        try:
+            homework.submit(conn, hw, students[0], 'again')
+            assert False, 'graded work cannot be resubmitted'
+        except ValueError:
+            pass
+
+        conn.execute("INSERT INTO student_class_map (student_id, class_id, status) VALUES (?, ?, 'active')",
+                     (students[3], class_id))
+        conn.execute("UPDATE student_class_map SET status = 'inactive' WHERE student_id = ? AND class_id = ?",
+                     (students[2], class_id))
+        assert counters(conn, hw)[0] == 3
+        conn.execute('DELETE FROM student_class_map WHERE student_id = ? AND class_id = ?', (students[3], class_id))
+        assert counters(conn, hw)[0] == 2
+
+        stats = homework.teacher_stats(conn, 12)
+        assert stats['avg_submission_rate'] == 100 and stats['pending_grading'] == 1
+        assert stats['active'] == stats['total'] >= 1
+        print("✅ Submission counters stay in step")
+    finally:
+        conn.close()
+
+
+def test_due_this_week_and_late_rules(db_path):
+    """Week window, late submissions and per-student submission status"""
+    conn, class_id, students = make_db(db_path)
+    try:
+        today = datetime(2030, 3, 6, 10, 0)  # a Wednesday
+        start, end = homework.week_bounds(today)
+        assert start == datetime(2030, 3, 4) and end == datetime(2030, 3, 11)
+
+        monday = homework.create_homework(conn, 12, class_id, 'Math', 'Monday', '2030-03-04T09:00')
+        sunday = homework.create_homework(conn, 12, class_id, 'Math', 'Sunday', '2030-03-10')
+        homework.create_homework(conn, 12, class_id, 'Math', 'Next week', '2030-03-11T09:00')
+        late_ok = homework.create_homework(conn, 12, class_id, 'Math', 'Late ok', '2030-03-05', allow_late=True)
+
+        homework.submit(conn, sunday, students[0], 'done', now=today)
+        try:
+            homework.submit(conn, monday, students[0], 'too late', now=today)
+            assert False, 'late submissions need allow_late'
+        except ValueError:
+            pass
+        homework.submit(conn, late_ok, students[0], 'sorry', now=today)
+
+        week = homework.due_this_week(conn, students[0], today)
+        assert [item['title'] for item in week] == ['Monday', 'Late ok', 'Sunday']
+        assert [item['submitted'] for item in week] == [False, True, True]
+        assert week[1]['is_late'] and not week[2]['is_late']
+        assert homework.due_this_week(conn, students[3], today) == []
+
+        plan = ' '.join(row[3] for row in conn.execute('''
+            EXPLAIN QUERY PLAN SELECT id FROM homework
+            WHERE class_id IN (SELECT class_id FROM student_class_map WHERE student_id = ?)
+              AND due_at >= ? AND due_at < ?
+        ''', (students[0], '2030-03-04 00:00:00', '2030-03-11 00:00:00')))
+        assert 'idx_homework_class_due' in plan
+    finally:
+        conn.close()
+
+
+def test_grading_is_limited_to_the_owner(db_path):
+    conn, class_id, students = make_db(db_path)
+    try:
+        hw = homework.create_homework(conn, 12, class_id, 'Math', 'Owned', datetime.now() + timedelta(days=1),
+                                      max_points=10)
+        submission = homework.submit(conn, hw, students[0], 'work')
+        for teacher_id, grade in ((13, 5), (12, 11)):
+            try:
+                homework.grade_submission(conn, submission, teacher_id, grade)
+                assert False, 'grade should have been rejected'
+            except ValueError:
+                pass
+        assert homework.grade_submission(conn, submission, 12, 9.5) == (students[0], 'Owned')
+        assert homework.list_submissions(conn, 12, status='graded')[0]['grade'] == 9.5
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
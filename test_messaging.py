@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test script for anonymous messaging: pseudonyms, cursor pagination and long-poll delivery
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import messaging
+import notifications
+from migrate_messaging import migrate_messaging
+
+ORIGINAL = (messaging.DATABASE, notifications.DATABASE, notifications.bus)
+
+
+def make_db(db_path):
+    assert migrate_messaging(db_path)
+    messaging.DATABASE = notifications.DATABASE = db_path
+    notifications.bus = notifications.NotificationBus()
+    return db_path
+
+
+def restore():
+    messaging.DATABASE, notifications.DATABASE, notifications.bus = ORIGINAL
+
+
+def login(client, user_id, role):
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['role'] = role
+
+
+def test_anonymous_threads_use_per_thread_pseudonyms(db_path):
+    """Teachers see a stable nickname, never the student; only the student's teachers can be messaged"""
+    print("=== TESTING MESSAGING ===")
+    conn = sqlite3.connect(make_db(db_path))
+    try:
+        student_name = conn.execute('SELECT COALESCE(name, username) FROM users WHERE id = 15').fetchone()[0]
+        thread_id, _ = messaging.start_thread(conn, 15, 12, 'I am struggling with loops', 'Computer Science')
+        messaging.post_message(conn, thread_id, 12, 'Happy to help')
+
+        page = messaging.thread_page(conn, thread_id, 12)
+        alias = page['thread']['with']
+        assert alias != student_name and alias == messaging.thread_page(conn, thread_id, 12)['thread']['with']
+        assert [m['sender'] for m in page['messages']] == [alias, page['thread']['me']]
+        assert messaging.thread_page(conn, thread_id, 15)['thread']['me'] == alias
+        assert messaging.threads_for(conn, 12, 'teacher')[0]['with'] == alias
+
+        named, _ = messaging.start_thread(conn, 15, 12, 'Question about marks', anonymous=False)
+        assert messaging.thread_page(conn, named, 12)['thread']['with'] == student_name
+
+        for call in (lambda: messaging.start_thread(conn, 15, 14, 'hi'),
+                     lambda: messaging.thread_page(conn, thread_id, 14),
+                     lambda: messaging.post_message(conn, thread_id, 13, 'hi'),
+                     lambda: messaging.post_message(conn, thread_id, 15, '   ')):
+            try:
+                call()
+                assert False, 'request should be refused'
+            except messaging.MessageError:
+                pass
+        print("✅ Pseudonymous threads")
+    finally:
+        conn.close()
+        restore()
+
+
+def test_cursor_pagination_reads_one_page(db_path):
+    conn = sqlite3.connect(make_db(db_path))
+    try:
+        thread_id, first = messaging.start_thread(conn, 15, 12, 'message 0')
+        ids = [first] + [messaging.post_message(conn, thread_id, 15 if i % 2 else 12, f'message {i}')[0]
+                         for i in range(1, 75)]
+
+        seen = []
+        page = messaging.thread_page(conn, thread_id, 15, limit=30)
+        assert [m['id'] for m in page['messages']] == ids[-30:]
+        while True:
+            seen = [m['id'] for m in page['messages']] + seen
+            if page['before'] is None:
+                break
+            page = messaging.thread_page(conn, thread_id, 15, before_id=page['before'], limit=30)
+        assert seen == ids
+
+        newer = messaging.thread_page(conn, thread_id, 12, after_id=ids[-3])
+        assert [m['id'] for m in newer['messages']] == ids[-2:]
+
+        plan = ' '.join(row[3] for row in conn.execute('''
+            EXPLAIN QUERY PLAN SELECT id, sender_id, body, created_on FROM messages
+            WHERE thread_id = ? AND id < ? ORDER BY id DESC LIMIT ?
+        ''', (thread_id, ids[-1], 31)))
+        assert 'idx_messages_thread' in plan and 'TEMP B-TREE' not in plan
+    finally:
+        conn.close()
+        restore()
+
+
+def test_long_poll_delivers_and_resumes(db_path):
+    make_db(db_path)
+    try:
+        from app import create_app
+        app = create_app()
+        app.config['TESTING'] = True
+        student, teacher = app.test_client(), app.test_client()
+        login(student, 15, 'student')
+        login(teacher, 12, 'teacher')
+
+        response = teacher.get('/messages/poll?timeout=0')
+        cursor = response.get_json()['last_event_id']
+        response = student.post('/messages/threads', json={'teacher_id': 14, 'body': 'hello'})
+        assert response.status_code == 404
+        response = student.post('/messages/threads', json={'teacher_id': 12, 'body': 'Is the test on Friday?'})
+        assert response.status_code == 201
+        thread_id = response.get_json()['thread_id']
+
+        # Published before the poll: replayed from the bus history
+        data = teacher.get(f'/messages/poll?timeout=0&last_event_id={cursor}').get_json()
+        assert [event['data']['thread_id'] for event in data['messages']] == [thread_id]
+        assert 'student_id' not in data['messages'][0]['data']
+
+        # Published while the poll is waiting: delivered straight away
+        result = {}
+        waiter = threading.Thread(target=lambda: result.update(
+            student.get(f"/messages/poll?timeout=5&last_event_id={data['last_event_id']}").get_json()))
+        waiter.start()
+        while not notifications.bus.stats()['subscribers']:
+            time.sleep(0.01)
+        assert teacher.post(f'/messages/threads/{thread_id}', json={'body': 'Yes'}).status_code == 201
+        waiter.join(5)
+        assert [event['data']['thread_id'] for event in result['messages']] == [thread_id]
+
+        page = student.get(f'/messages/threads/{thread_id}').get_json()
+        assert [m['body'] for m in page['messages']] == ['Is the test on Friday?', 'Yes']
+        assert student.get('/messages').status_code == 200 and teacher.get('/messages').status_code == 200
+        assert app.test_client().get('/messages/poll').status_code == 401
+        print("✅ Long-poll delivery")
+    finally:
+        restore()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
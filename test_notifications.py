@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script for the notification bus and its Server-Sent Events stream
+"""
+
+import json
+import threading
+
+from flask import Flask
+
+import notifications
+from notifications import NotificationBus, event_stream
+
+
+def test_publish_and_subscribe():
+    """Topic matching, actor filtering and blocking delivery"""
+    print("=== TESTING NOTIFICATIONS ===")
+    bus = NotificationBus()
+    teacher = bus.subscribe({'user:12', 'role:teacher', 'class:1000'}, user_id=12)
+    student = bus.subscribe({'user:15', 'role:student', 'class:1000'}, user_id=15)
+
+    bus.publish(['role:teacher'], 'doubt', 'New doubt in Maths', actor=15)
+    bus.publish(['class:1000'], 'attendance', 'Attendance recorded', actor=12)
+
+    events, overflowed = teacher.get(timeout=0)
+    assert [e.type for e in events] == ['doubt'] and not overflowed
+    events, _ = student.get(timeout=0)
+    assert [e.type for e in events] == ['attendance']
+
+    # A waiting subscriber wakes up as soon as something is published
+    threading.Timer(0.05, bus.publish, (['user:15'], 'marks', 'New marks')).start()
+    events, _ = student.get(timeout=2)
+    assert [e.message for e in events] == ['New marks']
+
+    assert [e.type for e in bus.recent({'class:1000', 'user:15'}, user_id=99)] == ['marks', 'attendance']
+    bus.unsubscribe(teacher)
+    assert bus.stats()['subscribers'] == 1
+    print("✅ Events reach the right subscribers")
+
+
+def test_bounded_buffer_and_resume():
+    """Slow clients drop the oldest events; reconnects replay after Last-Event-ID"""
+    bus = NotificationBus(history_size=5, buffer_size=3)
+    slow = bus.subscribe({'all'})
+    for number in range(5):
+        bus.publish(['all'], 'doubt', f'event {number}')
+    events, overflowed = slow.get(timeout=0)
+    assert [e.message for e in events] == ['event 2', 'event 3', 'event 4']
+    assert overflowed
+
+    resumed = bus.subscribe({'all'}, last_event_id=3)
+    events, overflowed = resumed.get(timeout=0)
+    assert [e.id for e in events] == [4, 5] and not overflowed
+
+    # Event 2 has already left the 5-event history
+    for number in range(3):
+        bus.publish(['all'], 'doubt', f'more {number}')
+    late = bus.subscribe({'all'}, last_event_id=1)
+    _, overflowed = late.get(timeout=0)
+    assert overflowed
+
+
+def test_event_stream_format():
+    """retry field, events with ids, heartbeats, and unsubscribe on close"""
+    original = notifications.bus
+    notifications.bus = bus = NotificationBus()
+    try:
+        subscription = bus.subscribe({'user:1'})
+        stream = event_stream(subscription, heartbeat=0.01)
+        assert next(stream) == f'retry: {notifications.RETRY_MS}\n\n'
+        assert next(stream) == ': heartbeat\n\n'
+
+        event = bus.publish(['user:1'], 'marks', 'New marks', assessment_id=3)
+        chunk = next(stream)
+        lines = chunk.strip().split('\n')
+        assert lines[0] == f'id: {event.id}' and lines[1] == 'event: marks'
+        assert json.loads(lines[2][len('data: '):])['data'] == {'assessment_id': 3}
+
+        stream.close()
+        assert bus.stats()['subscribers'] == 0
+    finally:
+        notifications.bus = original
+
+
+def test_stream_endpoint():
+    """The endpoint requires a session and streams without compression"""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    notifications.init_app(app)
+    client = app.test_client()
+
+    assert client.get('/notifications/stream').status_code == 401
+
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['role'] = 'admin'
+    response = client.get('/notifications/stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    assert 'no-transform' in response.headers['Cache-Control']
+    assert next(response.response) in ('retry: 5000\n\n', b'retry: 5000\n\n')
+    response.close()
+
+    notifications.publish(['role:admin'], 'doubt', 'New doubt in Art')
+    recent = client.get('/notifications/recent').get_json()['notifications']
+    assert recent[0]['message'] == 'New doubt in Art'
+
+
+if __name__ == '__main__':
+    test_publish_and_subscribe()
+    test_bounded_buffer_and_resume()
+    test_event_stream_format()
+    test_stream_endpoint()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for class reminders: the timer wheel, scheduling from the timetable and incremental reloads
+"""
+
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import notifications
+import reminders
+import timetable
+from migrate_class_sessions import migrate_class_sessions
+
+ORIGINAL = (notifications.bus,)
+
+# 2030-01-07 is a Monday
+MONDAY = datetime(2030, 1, 7)
+
+
+def restore():
+    notifications.bus, = ORIGINAL
+
+
+def test_timer_wheel_fires_in_order_and_cascades():
+    """Timers fire on their tick, across every level and beyond the wheel's range"""
+    print("=== TESTING REMINDERS ===")
+    rng = random.Random(50)
+    wheel = reminders.TimerWheel(0, tick_seconds=1, sizes=(10, 10, 10))
+    dues = [rng.randint(1, 2500) for _ in range(2000)]
+    timers = [wheel.schedule(due, due) for due in dues]
+    cancelled = set(range(0, 2000, 7))
+    for position in cancelled:
+        timers[position].cancel()
+
+    fired = []
+    for now in range(0, 2600, 37):
+        for due in wheel.advance(now):
+            assert now - 37 < due <= now
+            fired.append(due)
+    assert fired == sorted(due for i, due in enumerate(dues) if i not in cancelled)
+    assert wheel.pending == 0 and wheel.advance(2600) == []
+
+    # A past time fires on the next advance
+    wheel.schedule(10, 'late')
+    assert wheel.advance(2600) == ['late']
+
+    # Thousands of reminders over a day of one-second ticks
+    wheel = reminders.TimerWheel(0)
+    for second in range(0, 86400, 8):
+        wheel.schedule(second + 1, second)
+    began = time.perf_counter()
+    fired = wheel.advance(86400)
+    assert len(fired) == 10800 and time.perf_counter() - began < 2
+    print("✅ Timer wheel")
+
+
+def make_db(db_path):
+    assert migrate_class_sessions(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE classes SET meeting_link = 'https://meet.example.com/cs' WHERE id = 1000")
+    cur = conn.cursor()
+    timetable.replace_class_sessions(cur, 1000, '["Monday", "Wednesday"]', '09:00', '10:00')
+    timetable.replace_class_sessions(cur, 1001, '["Monday"]', '11:00', '12:00')
+    conn.commit()
+    return conn
+
+
+def test_reminders_fire_before_class_with_the_meeting_link(db_path):
+    conn = make_db(db_path)
+    notifications.bus = notifications.NotificationBus()
+    try:
+        subscription = notifications.bus.subscribe(['class:1000'])
+        scheduler = reminders.ReminderScheduler(10, now=MONDAY + timedelta(hours=8))
+        scheduler.reload(conn, now=MONDAY + timedelta(hours=8))
+        upcoming = scheduler.upcoming()
+        assert [(r.class_id, r.starts_at) for r in upcoming[:2]] == [
+            (1000, MONDAY + timedelta(hours=9)), (1001, MONDAY + timedelta(hours=11))]
+
+        assert reminders.run_once(scheduler, conn, now=MONDAY + timedelta(hours=8, minutes=49, seconds=59)) == []
+        fired = reminders.run_once(scheduler, conn, now=MONDAY + timedelta(hours=8, minutes=50))
+        assert [(r.class_id, r.starts_at) for r in fired] == [(1000, MONDAY + timedelta(hours=9))]
+
+        events, _ = subscription.get(timeout=0)
+        assert events[0].type == 'class_reminder'
+        assert events[0].data['meeting_link'] == 'https://meet.example.com/cs'
+        assert events[0].data['start_time'] == '09:00'
+
+        # The fired session is rescheduled a week on, not again today
+        starts = sorted(r.starts_at for r in scheduler.upcoming(20) if r.class_id == 1000)
+        assert starts == [MONDAY + timedelta(days=2, hours=9), MONDAY + timedelta(days=7, hours=9)]
+
+        # Starting inside the reminder window still reminds; once class has begun it waits a week
+        late = reminders.ReminderScheduler(10, now=MONDAY + timedelta(hours=8, minutes=55))
+        late.reload(conn, now=MONDAY + timedelta(hours=8, minutes=55))
+        assert [r.class_id for r in late.due(MONDAY + timedelta(hours=8, minutes=55))] == [1000]
+        begun = reminders.ReminderScheduler(10, now=MONDAY + timedelta(hours=9, minutes=5))
+        begun.reload(conn, now=MONDAY + timedelta(hours=9, minutes=5))
+        assert begun.due(MONDAY + timedelta(hours=9, minutes=5)) == []
+    finally:
+        conn.close()
+        restore()
+
+
+def test_reload_only_touches_changed_classes(db_path):
+    conn = make_db(db_path)
+    try:
+        now = MONDAY + timedelta(hours=7)
+        scheduler = reminders.ReminderScheduler(10, now=now)
+        scheduler.reload_if_changed(conn, now)
+        untouched = list(scheduler._timers[1001])
+
+        timetable.replace_class_sessions(conn.cursor(), 1000, '["Tuesday"]', '14:00', '15:00')
+        conn.execute("UPDATE classes SET meeting_link = 'https://meet.example.com/new' WHERE id = 1001")
+        conn.commit()
+        assert scheduler.reload_if_changed(conn, now) == {1000}
+        assert scheduler._timers[1001] == untouched
+        assert [r.starts_at for r in scheduler.upcoming(20) if r.class_id == 1000] == [
+            MONDAY + timedelta(days=1, hours=14)]
+        assert scheduler.describe(scheduler.upcoming()[0])['meeting_link'] == 'https://meet.example.com/new'
+
+        # Nothing survives a restart except the database, and that is enough
+        rebuilt = reminders.ReminderScheduler(10, now=now)
+        rebuilt.reload(conn, now)
+        assert rebuilt.upcoming(20) == scheduler.upcoming(20)
+
+        conn.execute("UPDATE classes SET status = 'inactive' WHERE id = 1001")
+        conn.commit()
+        assert scheduler.reload_if_changed(conn, now) == {1001}
+        assert scheduler.due(MONDAY + timedelta(hours=12)) == []
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
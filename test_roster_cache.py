@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for the class roster cache used by attendance, marks and CSV export
+"""
+
+import sqlite3
+
+import pytest
+
+from migrate_data_versions import migrate_data_versions
+from roster_cache import RosterCache, load_roster
+
+
+def make_test_db(db_path):
+    """Open the test copy of users.db with data_versions installed"""
+    assert migrate_data_versions(db_path)
+    return sqlite3.connect(db_path)
+
+
+def create_class_with_students(cur, name, count):
+    """Create a class with `count` enrolled students and return (class_id, student_ids)"""
+    cur.execute("INSERT INTO classes (name, status) VALUES (?, 'active')", (name,))
+    class_id = cur.lastrowid
+    student_ids = []
+    for i in range(count):
+        cur.execute("INSERT INTO users (username, password, role, name) VALUES (?, 'x', 'student', ?)",
+                    (f'{name}_student_{i}', f'{name} Student {i}'))
+        student_ids.append(cur.lastrowid)
+        cur.execute('INSERT INTO student_class_map (student_id, class_id, assigned_by) VALUES (?, ?, 1)',
+                    (cur.lastrowid, class_id))
+    return class_id, student_ids
+
+
+def test_hits_and_invalidation(db_path):
+    """Repeated lookups hit the cache until the roster tables change"""
+    print("=== TESTING ROSTER CACHE ===")
+    conn = make_test_db(db_path)
+    cur = conn.cursor()
+    cache = RosterCache(max_size=8)
+
+    try:
+        class_id, student_ids = create_class_with_students(cur, 'Roster', 3)
+        conn.commit()
+
+        first = cache.get(conn, class_id)
+        second = cache.get(conn, str(class_id))
+        assert first == load_roster(conn, class_id)
+        assert second is first
+        assert len(first) == 3 and all(isinstance(entry, tuple) for entry in first)
+        assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+        # Enrollment change invalidates
+        cur.execute("UPDATE student_class_map SET status = 'dropped' WHERE student_id = ?", (student_ids[0],))
+        conn.commit()
+        assert len(cache.get(conn, class_id)) == 2
+        assert cache.stats()['misses'] == 2
+
+        # Renaming a student invalidates
+        cur.execute("UPDATE users SET name = 'Aaron First' WHERE id = ?", (student_ids[1],))
+        conn.commit()
+        assert cache.get(conn, class_id)[0] == (student_ids[1], 'Aaron First')
+        assert cache.stats()['misses'] == 3
+        print(f"✅ Cache stats: {cache.stats()}")
+
+    finally:
+        conn.close()
+
+
+def test_lru_bound(db_path):
+    """The least recently used roster is evicted once max_size is reached"""
+    conn = make_test_db(db_path)
+    cur = conn.cursor()
+    cache = RosterCache(max_size=2)
+
+    try:
+        class_ids = [create_class_with_students(cur, f'Lru{i}', 1)[0] for i in range(3)]
+        conn.commit()
+
+        cache.get(conn, class_ids[0])
+        cache.get(conn, class_ids[1])
+        cache.get(conn, class_ids[0])  # class 0 becomes most recent
+        cache.get(conn, class_ids[2])  # evicts class 1
+        assert cache.stats()['size'] == 2
+
+        cache.get(conn, class_ids[0])
+        assert cache.stats()['hits'] == 2
+        cache.get(conn, class_ids[1])
+        assert cache.stats()['misses'] == 4
+
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
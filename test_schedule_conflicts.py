@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for teacher/student schedule conflict detection
+"""
+
+import json
+import random
+import sqlite3
+
+import pytest
+
+import timetable
+from enrollment import bulk_enroll_students
+from migrate_class_sessions import migrate_class_sessions
+from schedule_conflicts import IntervalTree, find_conflicts, school_conflicts
+
+
+def make_test_db(db_path):
+    """Open the test copy of users.db with class_sessions installed"""
+    assert migrate_class_sessions(db_path)
+    return sqlite3.connect(db_path)
+
+
+def create_scheduled_class(cur, name, days, start, end):
+    """Create an active class with a weekly schedule and its class_sessions rows"""
+    cur.execute('''
+        INSERT INTO classes (name, status, schedule_days, schedule_time_start, schedule_time_end, max_students)
+        VALUES (?, 'active', ?, ?, ?, 30)
+    ''', (name, json.dumps(days), start, end))
+    class_id = cur.lastrowid
+    timetable.replace_class_sessions(cur, class_id, days, start, end)
+    return class_id
+
+
+def test_interval_tree_matches_brute_force():
+    """Overlap queries agree with a linear scan"""
+    print("=== TESTING SCHEDULE CONFLICTS ===")
+    rng = random.Random(7)
+    intervals = []
+    for i in range(300):
+        start = rng.randrange(0, 1400)
+        intervals.append((start, start + rng.randrange(1, 120), i))
+    tree = IntervalTree(intervals)
+
+    for _ in range(200):
+        start = rng.randrange(0, 1400)
+        end = start + rng.randrange(1, 90)
+        expected = sorted(item for item in intervals if item[0] < end and item[1] > start)
+        assert sorted(tree.overlapping(start, end)) == expected
+
+    # Touching intervals do not overlap
+    assert IntervalTree([(540, 600, 'a')]).overlapping(600, 660) == []
+    print("✅ Interval tree agrees with brute force")
+
+
+def test_assignment_conflicts(db_path):
+    """New assignments clashing with existing or with each other are reported"""
+    conn = make_test_db(db_path)
+    cur = conn.cursor()
+
+    try:
+        maths = create_scheduled_class(cur, 'Maths Mon', ['Monday', 'Wednesday'], '09:00', '10:00')
+        english = create_scheduled_class(cur, 'English Mon', ['Monday'], '09:30', '10:30')
+        art = create_scheduled_class(cur, 'Art Mon', ['Monday'], '10:00', '11:00')
+        cur.execute("INSERT INTO users (username, password, role, name) VALUES ('clash_student', 'x', 'student', 'Clash')")
+        student = cur.lastrowid
+        cur.execute('INSERT INTO student_class_map (student_id, class_id, assigned_by) VALUES (?, ?, 1)', (student, maths))
+        conn.commit()
+
+        conflicts = find_conflicts(conn, 'student', {student: [english, art]})
+        assert [(c.class_id, c.other_class_id, c.weekday, c.start_minute, c.end_minute) for c in conflicts] == [
+            (english, maths, 0, 570, 600)]
+
+        # Replacing the whole set only compares the proposed classes with each other
+        conflicts = find_conflicts(conn, 'teacher', {99: [art, english]}, replace=True)
+        assert [(c.class_id, c.other_class_id) for c in conflicts] == [(english, art)]
+        assert find_conflicts(conn, 'teacher', {99: [maths, art]}, replace=True) == []
+
+        # Conflicting pairs are skipped by bulk enrollment
+        conflicts = find_conflicts(conn, 'student', {student: [english, art]})
+        results = bulk_enroll_students(conn, [english, art], [student], 1,
+                                       exclude={(c.person_id, c.class_id) for c in conflicts})
+        assert results[english]['rejected_conflict'] == [student]
+        assert results[art]['added'] == [student]
+        conn.commit()
+
+        # A teacher double-booked directly in the table shows up in the school report
+        cur.execute('INSERT INTO teacher_class_map (teacher_id, class_id, assigned_by) VALUES (?, ?, 1)', (student, maths))
+        cur.execute('INSERT INTO teacher_class_map (teacher_id, class_id, assigned_by) VALUES (?, ?, 1)', (student, english))
+        conn.commit()
+        report = school_conflicts(conn)
+        assert [(c.person_id, c.class_id, c.other_class_id) for c in report['teacher']] == [(student, maths, english)]
+        assert report['student'] == []
+
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script for balancing a grade's students across its sections
+"""
+
+import json
+import random
+import sqlite3
+import time
+
+import pytest
+
+import timetable
+from migrate_class_sessions import migrate_class_sessions
+from schedule_conflicts import school_conflicts
+from section_balancer import (AVERAGE_TOLERANCE, StudentInfo, apply_balance,
+                              balance_sections, plan_sections, section_targets)
+
+
+def test_targets_respect_capacity():
+    """Even split, capped by max_students, with the overflow left over"""
+    print("=== TESTING SECTION BALANCER ===")
+    assert section_targets(10, {1: None, 2: None, 3: None}) == {1: 3, 2: 3, 3: 4}
+    assert section_targets(10, {1: 2, 2: 30}) == {1: 2, 2: 8}
+    assert sum(section_targets(50, {1: 10, 2: 20}).values()) == 30
+
+    students = {s: StudentInfo(None, frozenset(), None) for s in range(12)}
+    plan = plan_sections(students, {1: 5, 2: 5})
+    assert [info['size'] for info in plan.sections.values()] == [5, 5]
+    assert len(plan.unassigned) == 2
+
+
+def test_stability_and_subject_groups():
+    """Balanced sections are left alone and subject groups stay together"""
+    students = {s: StudentInfo(1 if s < 3 else 2, frozenset(), None) for s in range(6)}
+    assert plan_sections(students, {1: 30, 2: 30}).moves == []
+
+    # Everyone starts in section 1; the two subject groups end up apart but intact
+    students = {s: StudentInfo(1, frozenset({'Bio'} if s < 4 else {'CS'}), None) for s in range(8)}
+    plan = plan_sections(students, {1: 30, 2: 30}, keep_subjects_together=True)
+    assert {plan.assignments[s] for s in range(4)} != {plan.assignments[s] for s in range(4, 8)}
+    assert len({plan.assignments[s] for s in range(4)}) == 1
+    assert len({plan.assignments[s] for s in range(4, 8)}) == 1
+    assert all(old == 1 for _, old, _ in plan.moves)
+
+
+def test_thousand_students_balanced_by_average():
+    """1,000 students: sizes within one, means within tolerance, well under a second"""
+    rng = random.Random(5)
+    students = {s: StudentInfo(rng.choice([10, 11, None]), frozenset(), rng.gauss(70, 12))
+                for s in range(1000)}
+    # Sort the strong students into section 10 to start with
+    students = {s: info._replace(current_class=10 if info.average > 75 else info.current_class)
+                for s, info in students.items()}
+
+    started = time.perf_counter()
+    plan = plan_sections(students, {10: 300, 11: 300, 12: 300, 13: 300}, balance_by_average=True)
+    assert time.perf_counter() - started < 1.0
+
+    sizes = [info['size'] for info in plan.sections.values()]
+    assert sum(sizes) == 1000 and max(sizes) - min(sizes) <= 1
+    averages = [info['average'] for info in plan.sections.values()]
+    assert max(averages) - min(averages) <= AVERAGE_TOLERANCE + 0.1
+    print(f"✅ Balanced 1000 students in {time.perf_counter() - started:.3f}s")
+
+
+def test_apply_balance(db_path):
+    """Moves are written in one batch"""
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    try:
+        grade = cur.execute("SELECT grade_level FROM classes WHERE id = 1000").fetchone()[0]
+        cur.execute("INSERT INTO classes (name, grade_level, status, max_students) VALUES ('Section B', ?, 'active', 30)", (grade,))
+        new_section = cur.lastrowid
+        conn.commit()
+        enrolled = cur.execute("SELECT COUNT(*) FROM student_class_map WHERE class_id = 1000 AND status = 'active'").fetchone()[0]
+
+        plan = balance_sections(conn, grade)
+        assert set(plan.sections) == {1000, new_section}
+        assert apply_balance(conn, plan, 1) == len(plan.moves) > 0
+        conn.commit()
+
+        counts = dict(cur.execute('''
+            SELECT class_id, COUNT(*) FROM student_class_map
+            WHERE status = 'active' AND class_id IN (?, ?) GROUP BY class_id
+        ''', (1000, new_section)).fetchall())
+        assert sum(counts.values()) == enrolled
+        assert abs(counts[1000] - counts[new_section]) <= 1
+
+        assert balance_sections(conn, grade).moves == []
+    finally:
+        conn.close()
+
+
+def test_double_enrollment_and_clashes(db_path):
+    """Students in two sections end up in one, and never in a section that clashes with their timetable"""
+    assert migrate_class_sessions(db_path)
+
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    try:
+        def create_class(name, grade, day):
+            cur.execute('''
+                INSERT INTO classes (name, grade_level, status, schedule_days, schedule_time_start, schedule_time_end, max_students)
+                VALUES (?, ?, 'active', ?, '09:00', '10:00', 30)
+            ''', (name, grade, json.dumps([day])))
+            timetable.replace_class_sessions(cur, cur.lastrowid, [day], '09:00', '10:00')
+            return cur.lastrowid
+
+        section_a = create_class('Z Section A', 'Z9', 'Monday')
+        section_b = create_class('Z Section B', 'Z9', 'Tuesday')
+        club = create_class('Tuesday Club', None, 'Tuesday')
+        students = []
+        for i in range(4):
+            cur.execute("INSERT INTO users (username, password, role, name) VALUES (?, 'x', 'student', ?)",
+                        (f'section_student_{i}', f'Section Student {i}'))
+            students.append(cur.lastrowid)
+        rows = [(s, section_a) for s in students] + [(students[0], section_b)]
+        rows += [(s, club) for s in students[1:3]]
+        cur.executemany('INSERT INTO student_class_map (student_id, class_id, assigned_by) VALUES (?, ?, 1)', rows)
+        conn.commit()
+
+        plan = balance_sections(conn, 'Z9')
+        assert plan.assignments[students[1]] == plan.assignments[students[2]] == section_a
+        apply_balance(conn, plan, 1)
+        conn.commit()
+
+        memberships = {}
+        for student_id, class_id in cur.execute(f'''
+            SELECT student_id, class_id FROM student_class_map
+            WHERE status = 'active' AND class_id IN (?, ?) AND student_id IN ({', '.join('?' for _ in students)})
+        ''', [section_a, section_b] + students):
+            memberships.setdefault(student_id, []).append(class_id)
+        assert all(len(classes) == 1 for classes in memberships.values()) and len(memberships) == 4
+        assert sorted(len([s for s in memberships if memberships[s] == [c]]) for c in (section_a, section_b)) == [2, 2]
+        assert not [c for c in school_conflicts(conn)['student'] if c.person_id in students]
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
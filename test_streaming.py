@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming report pages straight from the database cursor
+"""
+
+import sqlite3
+
+from flask import Flask, flash, get_flashed_messages
+from jinja2 import DictLoader
+
+import streaming
+from streaming import RowStream, stream_page
+
+TEMPLATE = """<h1>Report</h1>{% for m in get_flashed_messages() %}<p>{{ m }}</p>{% endfor %}
+{% if rows %}<table>{% for row in rows %}<tr><td>{{ row }}</td></tr>{% endfor %}</table>{% else %}<p>Empty</p>{% endif %}"""
+
+
+class TrackingConnection(sqlite3.Connection):
+    closed = False
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+def make_conn(count):
+    conn = sqlite3.connect(':memory:', factory=TrackingConnection, check_same_thread=False)
+    conn.execute('CREATE TABLE t (n INTEGER)')
+    conn.executemany('INSERT INTO t VALUES (?)', [(i,) for i in range(count)])
+    return conn
+
+
+def make_app(connections):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.jinja_loader = DictLoader({'report.html': TEMPLATE})
+
+    @app.route('/flash')
+    def add_flash():
+        flash('Saved')
+        return 'ok'
+
+    @app.route('/report/<int:count>')
+    def report(count):
+        conn = make_conn(count)
+        connections.append(conn)
+        cur = conn.execute('SELECT n FROM t ORDER BY n')
+        return stream_page('report.html', conn, rows=RowStream(cur, transform=lambda row: row[0] * 2))
+
+    return app
+
+
+def test_stream_page():
+    """Rows stream in order, the connection closes afterwards and flashes are consumed once"""
+    print("=== TESTING STREAMED REPORTS ===")
+    connections = []
+    client = make_app(connections).test_client()
+
+    client.get('/flash')
+    response = client.get('/report/1000')
+    body = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert body.count('<tr>') == 1000
+    assert '<td>0</td>' in body and '<td>1998</td>' in body
+    assert '<p>Saved</p>' in body
+    response.close()
+    assert connections[0].closed
+
+    # The flash was removed from the session before streaming started
+    assert '<p>Saved</p>' not in client.get('/report/1').get_data(as_text=True)
+    assert '<p>Empty</p>' in client.get('/report/0').get_data(as_text=True)
+    print("✅ Streamed 1000 rows")
+
+
+def test_row_stream():
+    """Known counts answer |length; unknown counts peek without losing the first row"""
+    conn = make_conn(5)
+    counted = RowStream(conn.execute('SELECT n FROM t'), count=5)
+    assert len(counted) == 5 and counted
+
+    peeking = RowStream(conn.execute('SELECT n FROM t'), batch_size=2)
+    assert peeking
+    assert [row[0] for row in peeking] == [0, 1, 2, 3, 4]
+
+    chunks = list(streaming._buffered(['a' * 5, 'b' * 5, 'c'], 8))
+    assert chunks == ['aaaaabbbbb', 'c']
+    conn.close()
+
+
+if __name__ == '__main__':
+    test_stream_page()
+    test_row_stream()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for memoized teacher class/subject authorization
+"""
+
+import sqlite3
+
+import pytest
+
+import teacher_access
+
+
+def use_test_db(db_path):
+    """Point teacher_access at the test copy of users.db"""
+    teacher_access.DATABASE = db_path
+    teacher_access.invalidate_teacher()
+
+
+def create_teacher(db_path, class_ids, subjects):
+    """Create a teacher mapped to the given classes and subjects"""
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("INSERT INTO users (username, password, role, name) VALUES ('access_teacher', 'x', 'teacher', 'Access Teacher')")
+    teacher_id = cur.lastrowid
+    for class_id in class_ids:
+        cur.execute('INSERT INTO teacher_class_map (teacher_id, class_id, assigned_by) VALUES (?, ?, 1)',
+                    (teacher_id, class_id))
+    for subject in subjects:
+        cur.execute('INSERT INTO teacher_subjects (teacher_id, subject_name, assigned_by) VALUES (?, ?, 1)',
+                    (teacher_id, subject))
+    conn.commit()
+    conn.close()
+    return teacher_id
+
+
+def test_access_checks_are_memoized(db_path):
+    """Access is loaded once and answered from the cache until invalidated"""
+    print("=== TESTING TEACHER ACCESS CACHE ===")
+    original_database = teacher_access.DATABASE
+    use_test_db(db_path)
+
+    try:
+        teacher_id = create_teacher(db_path, [1000, 1001], ['Math'])
+
+        assert teacher_access.has_access(teacher_id, '1000', 'Math')
+        assert not teacher_access.has_access(teacher_id, 1002, 'Math')
+        assert not teacher_access.has_access(teacher_id, 1000, 'English')
+        assert not teacher_access.has_access(teacher_id, 'not-a-number', 'Math')
+        assert teacher_access.has_class_access(teacher_id, 1001)
+
+        # Remove the mapping behind the cache's back: cached answer is still used
+        conn = sqlite3.connect(db_path)
+        conn.execute('DELETE FROM teacher_class_map WHERE teacher_id = ?', (teacher_id,))
+        conn.commit()
+        conn.close()
+        assert teacher_access.has_access(teacher_id, 1000, 'Math')
+
+        # Admin reassignment invalidates the entry
+        teacher_access.invalidate_teacher(teacher_id)
+        assert not teacher_access.has_access(teacher_id, 1000, 'Math')
+        print("✅ Access cached and invalidated correctly")
+
+    finally:
+        teacher_access.DATABASE = original_database
+        teacher_access.invalidate_teacher()
+
+
+def test_ttl_expiry(db_path):
+    """Entries older than ACCESS_TTL are reloaded"""
+    original_database = teacher_access.DATABASE
+    original_ttl = teacher_access.ACCESS_TTL
+    use_test_db(db_path)
+
+    try:
+        teacher_id = create_teacher(db_path, [1000], ['Science'])
+        teacher_access.ACCESS_TTL = -1
+        assert teacher_access.has_access(teacher_id, 1000, 'Science')
+
+        conn = sqlite3.connect(db_path)
+        conn.execute('DELETE FROM teacher_subjects WHERE teacher_id = ?', (teacher_id,))
+        conn.commit()
+        conn.close()
+        assert not teacher_access.has_access(teacher_id, 1000, 'Science')
+
+    finally:
+        teacher_access.DATABASE = original_database
+        teacher_access.ACCESS_TTL = original_ttl
+        teacher_access.invalidate_teacher()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
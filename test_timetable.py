@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script for the class_sessions timetable and its in-memory interval index
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+import data_versions
+import timetable
+from migrate_class_sessions import migrate_class_sessions
+from migrate_data_versions import migrate_data_versions
+from timetable import TimetableIndex
+
+
+def test_parsing():
+    """schedule_days and HH:MM strings normalize into weekday/minute rows"""
+    print("=== TESTING TIMETABLE ===")
+    assert timetable.parse_minutes('09:30') == 570
+    assert timetable.parse_minutes('25:00') is None
+    assert timetable.parse_minutes('') is None
+    assert timetable.format_minutes(570) == '09:30'
+    assert timetable.parse_schedule_days('["Monday", "Wednesday"]') == [0, 2]
+    assert timetable.parse_schedule_days('fri, Tue') == [1, 4]
+    assert timetable.parse_schedule_days(None) == []
+    assert timetable.build_sessions('["Friday"]', '14:00', '15:30') == [(4, 840, 930)]
+    # End before start is not a valid session
+    assert timetable.build_sessions('["Friday"]', '12:30', '12:30') == []
+
+
+def test_index_queries():
+    """Today's schedule, what's on now, free teachers and next class"""
+    sessions = [
+        (1, 0, 540, 600),   # Mon 09:00-10:00
+        (2, 0, 570, 660),   # Mon 09:30-11:00
+        (3, 0, 840, 900),   # Mon 14:00-15:00
+        (1, 2, 540, 600),   # Wed 09:00-10:00
+    ]
+    index = TimetableIndex(sessions, {1: {10}, 2: {20}, 3: {10, 30}},
+                           {1: {'name': 'Maths'}, 2: {'name': 'English'}, 3: {'name': 'Lab'}})
+
+    assert [s.class_id for s in index.sessions_on(0)] == [1, 2, 3]
+    assert [s.class_id for s in index.sessions_on(0, teacher_id=10)] == [1, 3]
+
+    assert {s.class_id for s in index.active_at(0, 580)} == {1, 2}
+    assert [s.class_id for s in index.active_at(0, 600)] == [2]  # end minute is exclusive
+    assert index.active_at(0, 700) == []
+    assert index.active_at(1, 580) == []
+
+    assert index.busy_teachers(0, 580) == {10, 20}
+    assert index.free_teachers(0, 580) == {30}
+    assert index.free_teachers(0, 850, teacher_ids=[10, 20, 40]) == {20, 40}
+
+    days_ahead, nxt = index.next_session(0, 605, teacher_id=10)
+    assert (days_ahead, nxt.class_id) == (0, 3)
+    days_ahead, nxt = index.next_session(0, 905, teacher_id=10)
+    assert (days_ahead, nxt.weekday) == (2, 2)
+    # Wraps to next week's Monday
+    days_ahead, nxt = index.next_session(3, 0, teacher_id=10)
+    assert (days_ahead, nxt.start_minute) == (4, 540)
+    assert index.next_session(0, 0, teacher_id=99) is None
+
+    assert index.describe(nxt)['time'] == '09:00 - 10:00'
+    print("✅ Interval index answers schedule queries")
+
+
+def test_backfill_and_cached_index(db_path):
+    """Migration backfills from JSON and the shared index rebuilds after writes"""
+    assert migrate_data_versions(db_path)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE classes SET schedule_days = ?, schedule_time_start = '10:00', schedule_time_end = '11:00' WHERE id = 1000",
+                 (json.dumps(['Monday', 'Thursday']),))
+    conn.commit()
+    assert migrate_class_sessions(db_path)
+    assert conn.execute('SELECT weekday, start_minute, end_minute FROM class_sessions WHERE class_id = 1000 ORDER BY weekday').fetchall() == [
+        (0, 600, 660), (3, 600, 660)]
+
+    original = (data_versions.DATABASE, timetable.DATABASE, timetable._cached)
+    data_versions.DATABASE = timetable.DATABASE = db_path
+    timetable._cached = None
+
+    try:
+        first = timetable.get_index()
+        assert timetable.get_index() is first
+        assert [s.class_id for s in first.active_at(3, 630)] == [1000]
+
+        cur = conn.cursor()
+        timetable.replace_class_sessions(cur, 1000, '["Friday"]', '08:00', '08:45')
+        conn.commit()
+        second = timetable.get_index()
+        assert second is not first
+        assert second.active_at(3, 630) == []
+        assert [s.class_id for s in second.active_at(4, 500)] == [1000]
+
+    finally:
+        conn.close()
+        data_versions.DATABASE, timetable.DATABASE, timetable._cached = original
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for the automatic timetable generator
+"""
+
+import sqlite3
+
+import pytest
+
+import timetable
+from migrate_class_sessions import migrate_class_sessions
+from schedule_conflicts import school_conflicts
+from timetable_generator import (ClassRequest, SlotGrid, apply_timetable,
+                                 generate_timetable, load_requests)
+
+
+def assert_no_overlaps(requests, solution):
+    """No teacher or student has two placed classes at the same time"""
+    booked = {}
+    by_id = {r.class_id: r for r in requests}
+    for class_id, placement in solution.placements.items():
+        for resource in by_id[class_id].resources:
+            for weekday in placement.weekdays:
+                for start, end in booked.get((resource, weekday), []):
+                    assert placement.end_minute <= start or placement.start_minute >= end, (resource, class_id)
+                booked.setdefault((resource, weekday), []).append((placement.start_minute, placement.end_minute))
+
+
+def test_school_sized_problem():
+    """100 classes, 40 teachers and 10 student cohorts solve within the budget"""
+    print("=== TESTING TIMETABLE GENERATOR ===")
+    requests = []
+    for class_id in range(100):
+        # Ten cohorts of ten classes; each teacher has classes in three cohorts
+        resources = {('teacher', class_id % 40), ('cohort', class_id // 10)}
+        sessions = 3 if class_id % 10 < 4 else 2
+        requests.append(ClassRequest(class_id, sessions, 60, frozenset(resources), None))
+
+    solution = generate_timetable(requests, SlotGrid(), time_budget=5.0)
+    assert solution.complete, solution.unscheduled
+    assert solution.unscheduled == []
+    assert len(solution.placements) == 100
+    assert solution.elapsed < 5.0
+    assert_no_overlaps(requests, solution)
+
+    for request in requests:
+        placement = solution.placements[request.class_id]
+        assert len(placement.weekdays) == request.sessions
+        assert placement.end_minute - placement.start_minute == 60
+    print(f"✅ 100 classes placed in {solution.elapsed:.2f}s")
+
+
+def test_infeasible_and_preferences():
+    """Impossible classes are reported and a still-valid current slot is kept"""
+    grid = SlotGrid(weekdays=(0, 1), day_start='09:00', day_end='11:00')
+    shared = frozenset({('teacher', 1)})
+    requests = [
+        ClassRequest(1, 2, 60, shared, ((0, 1), 600)),
+        ClassRequest(2, 2, 60, shared, None),
+        ClassRequest(3, 2, 60, shared, None),   # teacher 1 only has two free hours a day
+        ClassRequest(4, 3, 60, frozenset(), None),  # more sessions than teaching days
+    ]
+    solution = generate_timetable(requests, grid, time_budget=1.0)
+    assert not solution.complete
+    assert 4 in solution.unscheduled
+    assert len(solution.unscheduled) == 2
+    assert solution.placements[1].start_minute == 600
+    try:
+        apply_timetable(None, solution)
+        assert False, 'partial timetable should not be applied'
+    except ValueError:
+        pass
+
+    # Longer sessions take several periods
+    solution = generate_timetable([ClassRequest(5, 1, 90, frozenset(), None)], grid)
+    assert (solution.placements[5].start_minute, solution.placements[5].end_minute) == (540, 630)
+
+
+def test_apply_to_database(db_path):
+    """Generated timetable is written to classes and class_sessions"""
+    assert migrate_class_sessions(db_path)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        requests = load_requests(conn)
+        assert requests
+        solution = generate_timetable(requests, time_budget=2.0)
+        assert solution.complete
+        assert apply_timetable(conn, solution, updated_by=1) == len(requests)
+
+        sessions = timetable.sessions_by_class(conn)
+        for request in requests:
+            placement = solution.placements[request.class_id]
+            assert [day for day, _, _ in sessions[request.class_id]] == list(placement.weekdays)
+        report = school_conflicts(conn)
+        assert report == {'teacher': [], 'student': []}
+
+        # Re-running keeps the schedule that is now stored
+        again = generate_timetable(load_requests(conn), time_budget=2.0)
+        assert again.placements == solution.placements
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Test script for chunked, resumable uploads
+"""
+
+import hashlib
+import io
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import homework
+import uploads
+from migrate_homework import migrate_homework
+from migrate_uploads import migrate_uploads
+
+
+ORIGINAL = (uploads.DATABASE, uploads.UPLOAD_ROOT, uploads.ensure_cleanup_thread)
+
+
+def make_env(db_path):
+    tmp_dir = os.path.dirname(db_path)
+    assert migrate_homework(db_path) and migrate_uploads(db_path)
+    uploads.DATABASE = db_path
+    uploads.UPLOAD_ROOT = os.path.join(tmp_dir, 'uploads')
+    uploads.ensure_cleanup_thread = lambda *args: None
+
+    conn = sqlite3.connect(db_path)
+    student_id = conn.execute("SELECT student_id FROM student_class_map WHERE class_id = 1000 LIMIT 1").fetchone()[0]
+    homework_id = homework.create_homework(conn, 12, 1000, 'Computer Science', 'Upload task',
+                                           datetime.now() + timedelta(days=1))
+    conn.commit()
+    return conn, student_id, homework_id
+
+
+def restore():
+    uploads.DATABASE, uploads.UPLOAD_ROOT, uploads.ensure_cleanup_thread = ORIGINAL
+
+
+def test_chunked_upload_attaches_submission(db_path):
+    """Chunks stream to disk, the hash matches and the file lands on the submission"""
+    print("=== TESTING UPLOADS ===")
+    conn, student_id, homework_id = make_env(db_path)
+    try:
+        data = os.urandom(300 * 1024)
+        upload_id = uploads.start_upload(conn, student_id, 'student', 'submission', homework_id,
+                                         '../essay.pdf', len(data), 'application/pdf')
+        for offset in range(0, len(data), 128 * 1024):
+            chunk = data[offset:offset + 128 * 1024]
+            status = uploads.write_chunk(conn, upload_id, student_id, offset, io.BytesIO(chunk), len(chunk))
+        conn.commit()
+
+        assert status['complete'] and status['sha256'] == hashlib.sha256(data).hexdigest()
+        file_path = conn.execute('SELECT file_path FROM homework_submissions WHERE id = ?',
+                                 (status['submission_id'],)).fetchone()[0]
+        assert file_path.endswith('_essay.pdf') and os.path.dirname(file_path) == uploads.final_directory('submission')
+        with open(file_path, 'rb') as saved:
+            assert saved.read() == data
+        assert not os.path.exists(uploads.partial_path(upload_id))
+        assert len(uploads.hashes) == 0
+        print("✅ Chunked upload attached to the submission")
+    finally:
+        conn.close()
+        restore()
+
+
+def test_file_attach_keeps_text_answer(db_path):
+    """Uploading a file to a submission does not erase the text already submitted"""
+    conn, student_id, homework_id = make_env(db_path)
+    try:
+        homework.submit(conn, homework_id, student_id, content='My written answer')
+        data = b'scanned working ' * 64
+        upload_id = uploads.start_upload(conn, student_id, 'student', 'submission', homework_id,
+                                         'working.txt', len(data))
+        status = uploads.write_chunk(conn, upload_id, student_id, 0, io.BytesIO(data), len(data))
+        conn.commit()
+
+        content, file_path = conn.execute('SELECT content, file_path FROM homework_submissions WHERE id = ?',
+                                          (status['submission_id'],)).fetchone()
+        assert content == 'My written answer' and file_path.endswith('_working.txt')
+    finally:
+        conn.close()
+        restore()
+
+
+def test_resume_after_dropped_chunk_and_restart(db_path):
+    """A short or out-of-order chunk is refused and the upload resumes from the stored offset"""
+    conn, student_id, homework_id = make_env(db_path)
+    try:
+        data = os.urandom(200 * 1024)
+        upload_id = uploads.start_upload(conn, student_id, 'student', 'submission', homework_id,
+                                         'scan.png', len(data), 'image/png')
+        uploads.write_chunk(conn, upload_id, student_id, 0, io.BytesIO(data[:100 * 1024]), 100 * 1024)
+
+        # Connection drops halfway through the second chunk
+        try:
+            uploads.write_chunk(conn, upload_id, student_id, 100 * 1024, io.BytesIO(data[100 * 1024:150 * 1024]),
+                                100 * 1024)
+            assert False, 'a short chunk must be rejected'
+        except uploads.UploadError as e:
+            assert e.extra['received'] == 100 * 1024
+
+        # Skipping ahead is a conflict that reports where to resume
+        try:
+            uploads.write_chunk(conn, upload_id, student_id, 150 * 1024, io.BytesIO(data[150 * 1024:]), 50 * 1024)
+            assert False, 'an out-of-order chunk must be rejected'
+        except uploads.UploadError as e:
+            assert e.status == 409 and e.extra['received'] == 100 * 1024
+
+        # Simulate a restart: no in-memory hash state, the partial file is re-hashed
+        uploads.hashes.discard(upload_id)
+        offset = uploads.upload_status(conn, upload_id, student_id)['received']
+        status = uploads.write_chunk(conn, upload_id, student_id, offset, io.BytesIO(data[offset:]),
+                                     len(data) - offset)
+        assert status['sha256'] == hashlib.sha256(data).hexdigest()
+    finally:
+        conn.close()
+        restore()
+
+
+def test_limits_and_permissions(db_path):
+    conn, student_id, homework_id = make_env(db_path)
+    try:
+        for args, code in (((student_id, 'student', 'submission', homework_id, 'big.mp4',
+                             uploads.MAX_FILE_SIZE['submission'] + 1), 413),
+                           ((student_id, 'student', 'resource', 1000, 'notes.pdf', 10), 403),
+                           ((13, 'teacher', 'resource', 1000, 'notes.pdf', 10), 403)):
+            try:
+                uploads.start_upload(conn, *args)
+                assert False, 'upload should have been refused'
+            except uploads.UploadError as e:
+                assert e.status == code
+
+        upload_id = uploads.start_upload(conn, student_id, 'student', 'submission', homework_id, 'a.txt', 10)
+        try:
+            uploads.write_chunk(conn, upload_id, student_id, 0, io.BytesIO(b'x' * 20), 20)
+            assert False, 'chunk past the declared size'
+        except uploads.UploadError as e:
+            assert e.status == 413
+
+        try:
+            uploads.save_file(io.BytesIO(b'x' * 2048), uploads.UPLOAD_ROOT, 'schedule.pdf', 1024)
+            assert False, 'save_file should enforce its cap'
+        except ValueError:
+            pass
+        assert os.listdir(uploads.UPLOAD_ROOT) == ['partial']
+    finally:
+        conn.close()
+        restore()
+
+
+def test_stale_uploads_are_cleaned(db_path):
+    conn, student_id, homework_id = make_env(db_path)
+    try:
+        stale = uploads.start_upload(conn, student_id, 'student', 'submission', homework_id, 'old.txt', 10)
+        fresh = uploads.start_upload(conn, student_id, 'student', 'submission', homework_id, 'new.txt', 10)
+        conn.execute("UPDATE uploads SET updated_at = datetime('now', '-2 days') WHERE id = ?", (stale,))
+        orphan = uploads.partial_path('orphan')
+        open(orphan, 'wb').close()
+        os.utime(orphan, (time.time() - 3 * 86400,) * 2)
+
+        assert uploads.cleanup_stale_uploads(conn) == 1
+        assert not os.path.exists(uploads.partial_path(stale)) and not os.path.exists(orphan)
+        assert os.path.exists(uploads.partial_path(fresh))
+        assert [row[0] for row in conn.execute('SELECT id FROM uploads')] == [fresh]
+    finally:
+        conn.close()
+        restore()
+
+
+def test_upload_endpoints(db_path):
+    conn, student_id, homework_id = make_env(db_path)
+    conn.close()
+    try:
+        check_endpoints(student_id, homework_id)
+    finally:
+        restore()
+
+
+def check_endpoints(student_id, homework_id):
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = student_id
+        sess['role'] = 'student'
+
+    data = b'homework answers ' * 100
+    response = client.post('/uploads', json={'kind': 'submission', 'target_id': homework_id,
+                                              'filename': 'answers.txt', 'size': len(data)})
+    assert response.status_code == 201
+    upload_id = response.get_json()['upload_id']
+
+    response = client.put(f'/uploads/{upload_id}', data=data[:1000], headers={'Upload-Offset': '500'})
+    assert response.status_code == 409 and response.headers['Upload-Offset'] == '0'
+    response = client.put(f'/uploads/{upload_id}', data=data[:1000], headers={'Upload-Offset': '0'})
+    assert response.get_json()['received'] == 1000
+    assert client.get(f'/uploads/{upload_id}').headers['Upload-Offset'] == '1000'
+    response = client.put(f'/uploads/{upload_id}', data=data[1000:], headers={'Upload-Offset': '1000'})
+    assert response.status_code == 200 and response.get_json()['complete']
+
+    # The homework closes while a second upload is in flight: it fails for good instead of inviting a resume
+    response = client.post('/uploads', json={'kind': 'submission', 'target_id': homework_id,
+                                              'filename': 'late.txt', 'size': len(data)})
+    upload_id = response.get_json()['upload_id']
+    client.put(f'/uploads/{upload_id}', data=data[:1000], headers={'Upload-Offset': '0'})
+    conn = sqlite3.connect(uploads.DATABASE)
+    conn.execute("UPDATE homework SET status = 'closed' WHERE id = ?", (homework_id,))
+    conn.commit()
+    conn.close()
+    response = client.put(f'/uploads/{upload_id}', data=data[1000:], headers={'Upload-Offset': '1000'})
+    assert response.status_code == 409 and response.get_json()['failed']
+    assert client.get(f'/uploads/{upload_id}').get_json()['failed']
+    assert client.put(f'/uploads/{upload_id}', data=data[1000:], headers={'Upload-Offset': '1000'}).status_code == 409
+    assert not os.path.exists(uploads.partial_path(upload_id))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-s'])
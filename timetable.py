@@ -0,0 +1,303 @@
+"""
+Normalized class timetable
+classes.schedule_days is a JSON list of day names and the start/end times
+are HH:MM strings, which SQL cannot compare or index. class_sessions keeps
+one row per weekly meeting (class_id, weekday, start_minute, end_minute),
+with weekday 0 = Monday as in datetime.weekday(). admin.add_class writes
+the rows and migrate_class_sessions.py backfills existing classes.
+
+TimetableIndex is an in-memory index over the sessions of active classes.
+Each weekday is cut into segments at every start and end minute, and each
+segment stores the sessions (and teachers) active in it, so "what's on
+now" and "which teachers are free" are a single bisect. The index is
+rebuilt only when data_versions reports a change to the timetable tables.
+"""
+
+import json
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+import data_versions
+
+DATABASE = 'users.db'
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Tables the index is built from
+TIMETABLE_TABLES = ['classes', 'class_sessions', 'teacher_class_map']
+
+Session = namedtuple('Session', ['class_id', 'weekday', 'start_minute', 'end_minute'])
+
+
+def parse_minutes(value):
+    """Convert 'HH:MM' to minutes since midnight, or None if it is not a valid time"""
+    try:
+        hours, minutes = str(value).strip().split(':')[:2]
+        hours, minutes = int(hours), int(minutes)
+    except (TypeError, ValueError):
+        return None
+    if 0 <= hours < 24 and 0 <= minutes < 60:
+        return hours * 60 + minutes
+    return None
+
+
+def format_minutes(minute):
+    """Convert minutes since midnight back to 'HH:MM'"""
+    return f'{minute // 60:02d}:{minute % 60:02d}'
+
+
+def parse_schedule_days(value):
+    """Turn schedule_days (JSON list, comma separated string or list) into sorted weekday numbers"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = value.split(',')
+        if isinstance(value, str):
+            value = [value]
+
+    weekdays = set()
+    for day in value:
+        name = str(day).strip().lower()
+        for number, weekday in enumerate(WEEKDAYS):
+            if name and weekday.lower().startswith(name[:3]):
+                weekdays.add(number)
+                break
+    return sorted(weekdays)
+
+
+def build_sessions(schedule_days, start_time, end_time):
+    """Return (weekday, start_minute, end_minute) rows for a class schedule"""
+    start, end = parse_minutes(start_time), parse_minutes(end_time)
+    if start is None or end is None or end <= start:
+        return []
+    return [(weekday, start, end) for weekday in parse_schedule_days(schedule_days)]
+
+
+def has_sessions_table(cur):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'class_sessions'")
+    return cur.fetchone() is not None
+
+
+def replace_class_sessions(cur, class_id, schedule_days, start_time, end_time):
+    """Rewrite a class's rows in class_sessions; the caller commits. Returns the number of sessions"""
+    if not has_sessions_table(cur):
+        return 0
+    rows = build_sessions(schedule_days, start_time, end_time)
+    cur.execute('DELETE FROM class_sessions WHERE class_id = ?', (class_id,))
+    cur.executemany(
+        'INSERT INTO class_sessions (class_id, weekday, start_minute, end_minute) VALUES (?, ?, ?, ?)',
+        [(class_id,) + row for row in rows])
+    return len(rows)
+
+
+def backfill_sessions(conn):
+    """Populate class_sessions from the schedule columns of every class; returns the number of sessions"""
+    cur = conn.cursor()
+    cur.execute('SELECT id, schedule_days, schedule_time_start, schedule_time_end FROM classes')
+    total = 0
+    for class_id, schedule_days, start_time, end_time in cur.fetchall():
+        total += replace_class_sessions(cur, class_id, schedule_days, start_time, end_time)
+    return total
+
+
+class TimetableIndex:
+    """Per-weekday interval index over class sessions"""
+
+    def __init__(self, sessions, class_teachers=None, classes=None):
+        self.sessions = [Session(*session) for session in sessions]
+        self.class_teachers = {class_id: frozenset(teachers) for class_id, teachers in (class_teachers or {}).items()}
+        # class_id -> {'name', 'grade_level', 'meeting_link'}
+        self.classes = classes or {}
+
+        self.teachers = frozenset(t for teachers in self.class_teachers.values() for t in teachers)
+        self._teacher_classes = {}
+        for class_id, teachers in self.class_teachers.items():
+            for teacher_id in teachers:
+                self._teacher_classes.setdefault(teacher_id, set()).add(class_id)
+
+        self._by_day = {weekday: [] for weekday in range(7)}
+        for session in sorted(self.sessions, key=lambda s: (s.start_minute, s.end_minute, s.class_id)):
+            self._by_day[session.weekday].append(session)
+        self._starts = {weekday: [s.start_minute for s in day] for weekday, day in self._by_day.items()}
+
+        self._teacher_day = {}
+        for weekday, day in self._by_day.items():
+            for session in day:
+                for teacher_id in self.class_teachers.get(session.class_id, ()):
+                    self._teacher_day.setdefault((teacher_id, weekday), []).append(session)
+        self._teacher_starts = {key: [s.start_minute for s in day] for key, day in self._teacher_day.items()}
+
+        self._segments = {weekday: self._build_segments(day) for weekday, day in self._by_day.items()}
+
+    def _build_segments(self, day):
+        """Sweep one weekday into (boundaries, sessions per segment, busy teachers per segment)"""
+        boundaries = sorted({s.start_minute for s in day} | {s.end_minute for s in day})
+        active_sessions, active_teachers = [], []
+        for left in boundaries[:-1]:
+            active = tuple(s for s in day if s.start_minute <= left < s.end_minute)
+            active_sessions.append(active)
+            active_teachers.append(frozenset(
+                t for s in active for t in self.class_teachers.get(s.class_id, ())))
+        return boundaries, active_sessions, active_teachers
+
+    def _segment(self, weekday, minute):
+        boundaries, _, _ = self._segments[weekday]
+        position = bisect_right(boundaries, minute) - 1
+        if position < 0 or position >= len(boundaries) - 1:
+            return None
+        return position
+
+    def sessions_on(self, weekday, teacher_id=None):
+        """All sessions on a weekday in start order, optionally for one teacher"""
+        if teacher_id is None:
+            return list(self._by_day[weekday])
+        return list(self._teacher_day.get((teacher_id, weekday), ()))
+
+    def active_at(self, weekday, minute, teacher_id=None):
+        """Sessions running at the given minute"""
+        position = self._segment(weekday, minute)
+        if position is None:
+            return []
+        active = self._segments[weekday][1][position]
+        if teacher_id is None:
+            return list(active)
+        return [s for s in active if teacher_id in self.class_teachers.get(s.class_id, ())]
+
+    def busy_teachers(self, weekday, minute):
+        position = self._segment(weekday, minute)
+        if position is None:
+            return frozenset()
+        return self._segments[weekday][2][position]
+
+    def free_teachers(self, weekday, minute, teacher_ids=None):
+        """Teachers (from teacher_ids, default every assigned teacher) not teaching at that minute"""
+        candidates = self.teachers if teacher_ids is None else set(teacher_ids)
+        return set(candidates) - self.busy_teachers(weekday, minute)
+
+    def next_session(self, weekday, minute, teacher_id=None):
+        """Next session starting at or after the given time as (days_ahead, Session), or None"""
+        for days_ahead in range(8):
+            day = (weekday + days_ahead) % 7
+            if teacher_id is None:
+                sessions, starts = self._by_day[day], self._starts[day]
+            else:
+                sessions = self._teacher_day.get((teacher_id, day), [])
+                starts = self._teacher_starts.get((teacher_id, day), [])
+            position = bisect_left(starts, minute) if days_ahead == 0 else 0
+            if position < len(sessions):
+                return days_ahead, sessions[position]
+        return None
+
+    def describe(self, session):
+        """Template-friendly dict for a session"""
+        info = self.classes.get(session.class_id, {})
+        return {
+            'class_id': session.class_id,
+            'class_name': info.get('name', ''),
+            'grade_level': info.get('grade_level') or '',
+            'meeting_link': info.get('meeting_link') or '',
+            'day': WEEKDAYS[session.weekday],
+            'start_time': format_minutes(session.start_minute),
+            'end_time': format_minutes(session.end_minute),
+            'time': f'{format_minutes(session.start_minute)} - {format_minutes(session.end_minute)}',
+            'duration': f'{session.end_minute - session.start_minute} min',
+        }
+
+
+def load_sessions(conn):
+    """Sessions of active classes, from class_sessions or (before migration) the classes columns"""
+    cur = conn.cursor()
+    if has_sessions_table(cur):
+        cur.execute('''
+            SELECT cs.class_id, cs.weekday, cs.start_minute, cs.end_minute
+            FROM class_sessions cs
+            JOIN classes c ON c.id = cs.class_id
+            WHERE c.status = 'active'
+        ''')
+        return cur.fetchall()
+
+    cur.execute('''
+        SELECT id, schedule_days, schedule_time_start, schedule_time_end
+        FROM classes WHERE status = 'active'
+    ''')
+    return [(class_id,) + row for class_id, days, start, end in cur.fetchall()
+            for row in build_sessions(days, start, end)]
+
+
+def sessions_by_class(conn, class_ids=None):
+    """Return {class_id: [(weekday, start_minute, end_minute), ...]} for active classes"""
+    cur = conn.cursor()
+    class_ids = None if class_ids is None else list(dict.fromkeys(int(c) for c in class_ids))
+    if class_ids == []:
+        return {}
+    condition = '' if class_ids is None else f"AND c.id IN ({', '.join('?' for _ in class_ids)})"
+
+    result = {}
+    if has_sessions_table(cur):
+        cur.execute(f'''
+            SELECT cs.class_id, cs.weekday, cs.start_minute, cs.end_minute
+            FROM class_sessions cs
+            JOIN classes c ON c.id = cs.class_id
+            WHERE c.status = 'active' {condition}
+            ORDER BY cs.class_id, cs.weekday, cs.start_minute
+        ''', class_ids or [])
+        for class_id, weekday, start, end in cur.fetchall():
+            result.setdefault(class_id, []).append((weekday, start, end))
+        return result
+
+    cur.execute(f'''
+        SELECT c.id, c.schedule_days, c.schedule_time_start, c.schedule_time_end
+        FROM classes c WHERE c.status = 'active' {condition}
+    ''', class_ids or [])
+    for class_id, days, start, end in cur.fetchall():
+        rows = build_sessions(days, start, end)
+        if rows:
+            result[class_id] = rows
+    return result
+
+
+def load_index(conn):
+    """Build a TimetableIndex from the database"""
+    cur = conn.cursor()
+    sessions = load_sessions(conn)
+
+    cur.execute('SELECT class_id, teacher_id FROM teacher_class_map')
+    class_teachers = {}
+    for class_id, teacher_id in cur.fetchall():
+        class_teachers.setdefault(class_id, set()).add(teacher_id)
+
+    cur.execute("SELECT id, name, grade_level, meeting_link FROM classes WHERE status = 'active'")
+    classes = {row[0]: {'name': row[1], 'grade_level': row[2], 'meeting_link': row[3]}
+               for row in cur.fetchall()}
+
+    return TimetableIndex(sessions, class_teachers, classes)
+
+
+_lock = threading.Lock()
+_cached = None  # (versions, index)
+
+
+def get_index():
+    """Return the shared TimetableIndex, rebuilding it when the timetable tables change"""
+    global _cached
+
+    versions = data_versions.versions_for(TIMETABLE_TABLES)
+    with _lock:
+        if versions is not None and _cached is not None and _cached[0] == versions:
+            return _cached[1]
+
+    conn = sqlite3.connect(DATABASE)
+    try:
+        index = load_index(conn)
+    finally:
+        conn.close()
+
+    if versions is not None:
+        with _lock:
+            _cached = (versions, index)
+    return index
@@ -0,0 +1,313 @@
+"""
+Automatic timetable generator
+Assigns every active class a set of weekdays and a start time so that no
+teacher (teacher_class_map) and no enrolled student (student_class_map) is
+booked into two classes at once.
+
+The week is a SlotGrid of equal periods. A class keeps one start time for
+all its days, as classes.schedule_time_start/end require, so a candidate
+placement is (weekdays, start period) and is stored as a bitmask of the
+grid cells it occupies. Classes linked by a shared teacher or student
+form groups that are solved independently, each by backtracking search
+that branches on the class with the fewest remaining placements and
+removes clashing placements from its neighbours (forward checking).
+Groups that do not finish within their share of the time budget are
+repaired with min-conflicts local search; whatever still clashes at the
+deadline is reported as unscheduled rather than double-booked.
+
+apply_timetable() writes the result to classes and class_sessions in one
+transaction.
+"""
+
+import itertools
+import json
+import random
+import time
+from collections import namedtuple
+
+import timetable
+
+# Weekly meetings for a class that has no schedule_days yet
+DEFAULT_SESSIONS_PER_WEEK = 3
+
+Placement = namedtuple('Placement', ['weekdays', 'start_minute', 'end_minute'])
+ClassRequest = namedtuple('ClassRequest', ['class_id', 'sessions', 'duration', 'resources', 'current'])
+Solution = namedtuple('Solution', ['placements', 'unscheduled', 'complete', 'elapsed'])
+
+
+class SlotGrid:
+    """Teaching days and equal-length periods between day_start and day_end"""
+
+    def __init__(self, weekdays=(0, 1, 2, 3, 4), day_start='08:00', day_end='15:00', period=60):
+        self.weekdays = tuple(sorted(set(weekdays)))
+        self.day_start = timetable.parse_minutes(day_start)
+        self.period = int(period)
+        end = timetable.parse_minutes(day_end)
+        if self.day_start is None or end is None or self.period <= 0 or end <= self.day_start:
+            raise ValueError('Invalid slot grid')
+        self.periods = (end - self.day_start) // self.period
+
+    def periods_for(self, duration):
+        """Number of whole periods a session of `duration` minutes occupies"""
+        return max(1, -(-int(duration) // self.period))
+
+    def start_minute(self, period):
+        return self.day_start + period * self.period
+
+    def candidates(self, request):
+        """Every (mask, weekdays, start period) a class could be placed at, preferred first"""
+        length = self.periods_for(request.duration)
+        if request.sessions > len(self.weekdays) or length > self.periods:
+            return []
+
+        run = (1 << length) - 1
+        options = []
+        for days in itertools.combinations(range(len(self.weekdays)), request.sessions):
+            # Prefer spreading meetings over the week
+            adjacent = sum(1 for a, b in zip(days, days[1:]) if b - a == 1)
+            for start in range(self.periods - length + 1):
+                mask = 0
+                for day in days:
+                    mask |= run << (day * self.periods + start)
+                weekdays = tuple(self.weekdays[day] for day in days)
+                options.append((adjacent, start, mask, weekdays))
+        options.sort(key=lambda option: option[:2])
+
+        values = [(mask, weekdays, start) for _, start, mask, weekdays in options]
+        if request.current:
+            current_days, current_start = request.current
+            for position, (mask, weekdays, start) in enumerate(values):
+                if weekdays == tuple(current_days) and self.start_minute(start) == current_start:
+                    values.insert(0, values.pop(position))
+                    break
+        return values
+
+
+def load_requests(conn, sessions_per_week=None):
+    """Build a ClassRequest for every active class.
+
+    Weekly sessions and duration come from the class's current schedule when
+    it has one; `sessions_per_week` ({class_id: n}) overrides the count.
+    """
+    sessions_per_week = sessions_per_week or {}
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT id, schedule_days, schedule_time_start, schedule_time_end
+        FROM classes WHERE status = 'active' ORDER BY id
+    ''')
+    classes = cur.fetchall()
+
+    resources = {class_id: set() for class_id, _, _, _ in classes}
+    cur.execute('SELECT class_id, teacher_id FROM teacher_class_map')
+    for class_id, teacher_id in cur.fetchall():
+        if class_id in resources:
+            resources[class_id].add(('teacher', teacher_id))
+    cur.execute("SELECT class_id, student_id FROM student_class_map WHERE status = 'active'")
+    for class_id, student_id in cur.fetchall():
+        if class_id in resources:
+            resources[class_id].add(('student', student_id))
+
+    requests = []
+    for class_id, days, start_time, end_time in classes:
+        weekdays = timetable.parse_schedule_days(days)
+        start, end = timetable.parse_minutes(start_time), timetable.parse_minutes(end_time)
+        has_times = start is not None and end is not None and end > start
+        requests.append(ClassRequest(
+            class_id=class_id,
+            sessions=int(sessions_per_week.get(class_id) or len(weekdays) or DEFAULT_SESSIONS_PER_WEEK),
+            duration=end - start if has_times else None,
+            resources=frozenset(resources[class_id]),
+            current=(tuple(weekdays), start) if weekdays and has_times else None,
+        ))
+    return requests
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _components(class_ids, neighbours):
+    """Connected components of the conflict graph; each is solved on its own"""
+    seen, components = set(), []
+    for class_id in class_ids:
+        if class_id in seen:
+            continue
+        seen.add(class_id)
+        stack, component = [class_id], []
+        while stack:
+            current = stack.pop()
+            component.append(current)
+            for other in neighbours[current]:
+                if other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+        components.append(sorted(component))
+    return components
+
+
+def _backtrack(component, domains, neighbours, deadline):
+    """MRV backtracking with forward checking; returns {class_id: value} or None"""
+    assigned = {}
+    nodes = 0
+
+    def search(domains):
+        nonlocal nodes
+        if len(assigned) == len(component):
+            return True
+        nodes += 1
+        if nodes % 64 == 0 and time.monotonic() > deadline:
+            raise _Timeout()
+
+        class_id = min((c for c in component if c not in assigned),
+                       key=lambda c: (len(domains[c]), -len(neighbours[c]), c))
+        for value in domains[class_id]:
+            mask = value[0]
+            pruned = {}
+            for other in neighbours[class_id]:
+                if other in assigned:
+                    continue
+                remaining = [v for v in domains[other] if not v[0] & mask]
+                if not remaining:
+                    break
+                pruned[other] = remaining
+            else:
+                assigned[class_id] = value
+                if search({**domains, **pruned, class_id: [value]}):
+                    return True
+                del assigned[class_id]
+        return False
+
+    try:
+        return dict(assigned) if search(domains) else None
+    except _Timeout:
+        return None
+
+
+def _local_search(class_ids, domains, neighbours, deadline, rng):
+    """Min-conflicts repair with a short tabu list; returns {class_id: value} and the clashing classes"""
+    current = {}
+    for class_id in sorted(class_ids, key=lambda c: len(domains[c])):
+        current[class_id] = min(domains[class_id], key=lambda v: sum(
+            1 for other in neighbours[class_id] if other in current and current[other][0] & v[0]))
+
+    def clashes(class_id, mask):
+        return sum(1 for other in neighbours[class_id] if current[other][0] & mask)
+
+    conflicted = {c for c in class_ids if clashes(c, current[c][0])}
+    best, best_conflicted = dict(current), set(conflicted)
+    tabu = {}
+    step = 0
+
+    while conflicted and time.monotonic() < deadline:
+        step += 1
+        class_id = rng.choice(sorted(conflicted))
+        scored = [(clashes(class_id, v[0]), rng.random(), v) for v in domains[class_id]
+                  if tabu.get((class_id, v[0]), 0) < step]
+        if not scored:
+            continue
+        _, _, value = min(scored)
+        tabu[(class_id, current[class_id][0])] = step + 10
+        current[class_id] = value
+
+        for other in neighbours[class_id] | {class_id}:
+            if clashes(other, current[other][0]):
+                conflicted.add(other)
+            else:
+                conflicted.discard(other)
+        if len(conflicted) < len(best_conflicted):
+            best, best_conflicted = dict(current), set(conflicted)
+
+    return best, best_conflicted
+
+
+def generate_timetable(requests, grid=None, time_budget=5.0, seed=0):
+    """Place every requested class on the grid without double-booking anyone.
+
+    Each connected group of classes (linked by a shared teacher or student)
+    is first solved by backtracking; groups that do not finish in their
+    share of the budget are repaired by min-conflicts local search until
+    the deadline. Returns a Solution; classes that could not be placed
+    without a clash are left out of `placements` and listed in `unscheduled`.
+    """
+    grid = grid or SlotGrid()
+    started = time.monotonic()
+    deadline = started + time_budget
+    rng = random.Random(seed)
+
+    requests = [r._replace(duration=r.duration or grid.period) for r in requests]
+    by_id = {r.class_id: r for r in requests}
+    domains = {r.class_id: grid.candidates(r) for r in requests}
+
+    # Classes that share a teacher or a student may not overlap
+    sharing = {}
+    for request in requests:
+        for resource in request.resources:
+            sharing.setdefault(resource, []).append(request.class_id)
+    neighbours = {class_id: set() for class_id in domains}
+    for class_ids in sharing.values():
+        for class_id in class_ids:
+            neighbours[class_id].update(class_ids)
+    for class_id in neighbours:
+        neighbours[class_id].discard(class_id)
+
+    # Classes with no possible placement are reported rather than searched
+    placeable = sorted(c for c, values in domains.items() if values)
+    for class_id in placeable:
+        neighbours[class_id] = {other for other in neighbours[class_id] if domains[other]}
+
+    chosen, unsolved = {}, []
+    for component in _components(placeable, neighbours):
+        share = time_budget * len(component) / (2 * len(placeable))
+        result = _backtrack(component, domains, neighbours, min(deadline, time.monotonic() + share))
+        if result is None:
+            unsolved.extend(component)
+        else:
+            chosen.update(result)
+
+    if unsolved:
+        repaired, conflicted = _local_search(unsolved, domains, neighbours, deadline, rng)
+        # Drop the most-clashing classes until the rest fit together
+        while conflicted:
+            worst = max(conflicted, key=lambda c: (sum(
+                1 for other in neighbours[c] if other in repaired and repaired[other][0] & repaired[c][0]), c))
+            del repaired[worst]
+            conflicted = {c for c in repaired if any(
+                other in repaired and repaired[other][0] & repaired[c][0] for other in neighbours[c])}
+        chosen.update(repaired)
+
+    placements = {}
+    for class_id, (_, weekdays, start) in chosen.items():
+        start_minute = grid.start_minute(start)
+        placements[class_id] = Placement(weekdays, start_minute, start_minute + by_id[class_id].duration)
+    unscheduled = sorted(c for c in by_id if c not in placements)
+
+    return Solution(placements, unscheduled, not unscheduled, time.monotonic() - started)
+
+
+def apply_timetable(conn, solution, updated_by=None):
+    """Write placements to classes and class_sessions in one transaction; returns classes updated
+
+    Only complete solutions are written: unscheduled classes keep their old
+    slots, which the solver never treated as taken, so a partial timetable
+    could clash with them. Raises ValueError instead.
+    """
+    if solution.unscheduled:
+        raise ValueError(f'{len(solution.unscheduled)} classes could not be placed without a clash')
+    cur = conn.cursor()
+    try:
+        for class_id, placement in sorted(solution.placements.items()):
+            days = json.dumps([timetable.WEEKDAYS[day] for day in placement.weekdays])
+            start_time = timetable.format_minutes(placement.start_minute)
+            end_time = timetable.format_minutes(placement.end_minute)
+            cur.execute('''
+                UPDATE classes
+                SET schedule_days = ?, schedule_time_start = ?, schedule_time_end = ?,
+                    updated_by = ?, updated_on = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (days, start_time, end_time, updated_by, class_id))
+            timetable.replace_class_sessions(cur, class_id, days, start_time, end_time)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(solution.placements)
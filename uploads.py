@@ -0,0 +1,494 @@
+"""
+Chunked, resumable file uploads
+Large files (lecture recordings, scanned homework) are sent as a series of
+small PUT requests instead of one multipart POST. No request holds a worker
+for more than one chunk, and no chunk is buffered in memory: each one is
+streamed from the socket to a partial file and into a running SHA-256.
+
+    POST   /uploads                  start: kind, target_id, filename, size
+    GET    /uploads/<id>             how many bytes the server has (resume)
+    PUT    /uploads/<id>             body = next chunk, Upload-Offset header
+    DELETE /uploads/<id>             abandon
+
+Chunks must arrive in order: a PUT whose Upload-Offset is not the number of
+bytes already received gets 409 and the current offset, so the client can
+resume after a dropped connection. When the last byte arrives the partial
+file is fsynced, attached to its homework submission or class resource,
+and atomically renamed into place. Resources go through the
+content-addressed blob store, so a file shared with several classes is
+stored once. A file that can no longer be attached (say the due date passed
+during the upload) is deleted, and the upload is marked failed for good.
+
+Hash state lives in process memory. If a chunk lands on a different worker
+or after a restart, the bytes received so far are re-hashed once from disk.
+Partial uploads idle for longer than STALE_SECONDS are removed by a
+background sweeper.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import jsonify, request, session
+from werkzeug.utils import secure_filename
+
+import blobstore
+import homework as homework_store
+import teacher_access
+
+DATABASE = 'users.db'
+UPLOAD_ROOT = 'uploads'
+
+# Largest accepted file per upload kind (bytes)
+MAX_FILE_SIZE = {
+    'submission': 50 * 1024 * 1024,
+    'resource': 500 * 1024 * 1024,
+}
+# Chunk size suggested to clients, and the most one PUT may carry
+CHUNK_SIZE = 4 * 1024 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+# Bytes read from the request stream / disk at a time
+BLOCK_SIZE = 64 * 1024
+# Partial uploads untouched for this long are deleted
+STALE_SECONDS = 24 * 60 * 60
+CLEANUP_INTERVAL = 60 * 60
+
+RESOURCE_TYPES = ('document', 'video', 'audio', 'image', 'other')
+
+
+class UploadError(Exception):
+    """An upload request that cannot be honoured; carries the HTTP status"""
+
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+class UploadFailed(UploadError):
+    """The finished file cannot be attached (e.g. the homework closed); the upload is over for good"""
+
+    def __init__(self, message):
+        super().__init__(message, 409, failed=True)
+
+
+def partial_path(upload_id):
+    return os.path.join(UPLOAD_ROOT, 'partial', upload_id)
+
+
+def final_directory(kind):
+    return os.path.join(UPLOAD_ROOT, f'{kind}s')
+
+
+class HashRegistry:
+    """Running SHA-256 per in-progress upload, keyed by upload id"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hashers = {}
+
+    def resume(self, upload_id, offset):
+        """Hasher positioned at `offset`, re-hashing the partial file if we have no live state"""
+        with self._lock:
+            entry = self._hashers.pop(upload_id, None)
+        if entry is not None and entry[0] == offset:
+            return entry[1]
+
+        hasher = hashlib.sha256()
+        remaining = offset
+        with open(partial_path(upload_id), 'rb') as partial:
+            while remaining:
+                block = partial.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    raise UploadError('Partial upload is shorter than recorded', 409)
+                hasher.update(block)
+                remaining -= len(block)
+        return hasher
+
+    def keep(self, upload_id, offset, hasher):
+        with self._lock:
+            self._hashers[upload_id] = (offset, hasher)
+
+    def discard(self, upload_id):
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._hashers)
+
+
+hashes = HashRegistry()
+
+
+def _load(cur, upload_id, user_id):
+    cur.execute('''
+        SELECT kind, target_id, filename, content_type, total_size, received, status, user_id
+        FROM uploads WHERE id = ?
+    ''', (upload_id,))
+    row = cur.fetchone()
+    if row is None or row[7] != user_id:
+        raise UploadError('Upload not found', 404)
+    return dict(zip(('kind', 'target_id', 'filename', 'content_type', 'total_size', 'received', 'status'), row))
+
+
+def check_target(conn, kind, target_id, user_id, role):
+    """Make sure the user may upload this kind of file for this homework or class"""
+    cur = conn.cursor()
+    if kind == 'submission':
+        if role != 'student':
+            raise UploadError('Only students submit homework', 403)
+        cur.execute('''
+            SELECT 1 FROM homework h
+            JOIN student_class_map scm ON scm.class_id = h.class_id
+            WHERE h.id = ? AND scm.student_id = ? AND scm.status = 'active' AND h.status = 'active'
+        ''', (target_id, user_id))
+        if cur.fetchone() is None:
+            raise UploadError('Homework not found', 404)
+    elif kind == 'resource':
+        if role == 'teacher':
+            if not teacher_access.has_class_access(user_id, target_id):
+                raise UploadError('You can only add resources to your own classes', 403)
+        elif role != 'admin':
+            raise UploadError('Only teachers and admins add class resources', 403)
+    else:
+        raise UploadError(f'Unknown upload kind: {kind}')
+
+
+def start_upload(conn, user_id, role, kind, target_id, filename, size, content_type=None):
+    """Register an upload and create its empty partial file; the caller commits"""
+    try:
+        size = int(size)
+        target_id = int(target_id)
+    except (TypeError, ValueError):
+        raise UploadError('size and target_id must be integers')
+    filename = secure_filename(filename or '')
+    if not filename:
+        raise UploadError('A filename is required')
+    if kind not in MAX_FILE_SIZE:
+        raise UploadError(f'Unknown upload kind: {kind}')
+    if size <= 0:
+        raise UploadError('Empty files cannot be uploaded')
+    if size > MAX_FILE_SIZE[kind]:
+        raise UploadError(f'File is larger than the {MAX_FILE_SIZE[kind] // (1024 * 1024)} MB limit', 413)
+    check_target(conn, kind, target_id, user_id, role)
+
+    upload_id = uuid.uuid4().hex
+    os.makedirs(os.path.dirname(partial_path(upload_id)), exist_ok=True)
+    open(partial_path(upload_id), 'wb').close()
+    conn.execute('''
+        INSERT INTO uploads (id, user_id, kind, target_id, filename, content_type, total_size)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (upload_id, user_id, kind, target_id, filename, content_type or 'application/octet-stream', size))
+    ensure_cleanup_thread()
+    return upload_id
+
+
+def upload_status(conn, upload_id, user_id):
+    upload = _load(conn.cursor(), upload_id, user_id)
+    return {'upload_id': upload_id, 'received': upload['received'], 'size': upload['total_size'],
+            'complete': upload['status'] == 'complete', 'failed': upload['status'] == 'failed'}
+
+
+def write_chunk(conn, upload_id, user_id, offset, stream, length):
+    """Append one chunk from `stream` at `offset`; completes the upload on the last byte.
+
+    Returns the upload status, plus the attached record once complete.
+    """
+    cur = conn.cursor()
+    upload = _load(cur, upload_id, user_id)
+    if upload['status'] != 'pending':
+        raise UploadError(f"Upload is {upload['status']}", 409, received=upload['received'])
+    if offset != upload['received']:
+        raise UploadError('Chunk does not continue the upload', 409, received=upload['received'])
+    if length is None:
+        raise UploadError('Content-Length is required', 411)
+    if length <= 0 or length > MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunks must be between 1 and {MAX_CHUNK_SIZE} bytes', 413)
+    if offset + length > upload['total_size']:
+        raise UploadError('Chunk runs past the declared file size', 413)
+
+    hasher = hashes.resume(upload_id, offset)
+    written = 0
+    try:
+        with open(partial_path(upload_id), 'r+b') as partial:
+            partial.seek(offset)
+            while written < length:
+                block = stream.read(min(BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                partial.write(block)
+                hasher.update(block)
+                written += len(block)
+            # Drop anything left over from an earlier interrupted attempt
+            partial.truncate()
+    except Exception:
+        hashes.discard(upload_id)
+        raise
+    if written != length:
+        # The client went away mid-chunk; it will resend from `offset`
+        hashes.discard(upload_id)
+        raise UploadError('Chunk ended early', 400, received=offset)
+
+    received = offset + length
+    cur.execute("UPDATE uploads SET received = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND received = ?",
+                (received, upload_id, offset))
+    if cur.rowcount != 1:
+        hashes.discard(upload_id)
+        raise UploadError('Chunk was written concurrently', 409)
+
+    status = {'upload_id': upload_id, 'received': received, 'size': upload['total_size'], 'complete': False}
+    if received < upload['total_size']:
+        hashes.keep(upload_id, received, hasher)
+        return status
+
+    hashes.discard(upload_id)
+    status.update(complete_upload(conn, upload_id, upload, user_id, hasher.hexdigest()))
+    status['complete'] = True
+    return status
+
+
+def complete_upload(conn, upload_id, upload, user_id, sha256):
+    """Attach the finished file and move it into place; the caller commits.
+
+    Raises UploadFailed if it cannot be attached. The partial file is then
+    deleted, and the caller records the upload as failed.
+    """
+    source = partial_path(upload_id)
+    with open(source, 'rb') as partial:
+        os.fsync(partial.fileno())
+
+    try:
+        if upload['kind'] == 'resource':
+            # Class resources are shared and deduplicated; an unreferenced blob is garbage collected
+            destination = blobstore.store_file(conn, source, sha256, upload['content_type'])
+            attached = attach(conn, upload, user_id, destination, sha256)
+        else:
+            # Attach first, so a submission the homework no longer accepts never moves the file
+            directory = final_directory(upload['kind'])
+            destination = os.path.join(directory, f"{upload_id}_{upload['filename']}")
+            attached = attach(conn, upload, user_id, destination, sha256)
+            os.makedirs(directory, exist_ok=True)
+            os.replace(source, destination)
+    except ValueError as e:
+        if os.path.exists(source):
+            os.remove(source)
+        raise UploadFailed(str(e))
+
+    conn.execute('''
+        UPDATE uploads SET status = 'complete', sha256 = ?, file_path = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', (sha256, destination, upload_id))
+    attached['sha256'] = sha256
+    return attached
+
+
+def attach(conn, upload, user_id, file_path, sha256):
+    """Link a completed file to its homework submission or class resource"""
+    if upload['kind'] == 'submission':
+        submission_id = homework_store.submit(conn, upload['target_id'], user_id, file_path=file_path)
+        return {'submission_id': submission_id}
+
+    resource_type = resource_type_for(upload['content_type'])
+    cur = conn.cursor()
+    cur.execute('''
+        INSERT INTO resources (class_id, uploader_id, type, filename, file_path, content_type, size_bytes, sha256)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (upload['target_id'], user_id, resource_type, upload['filename'], file_path,
+          upload['content_type'], upload['total_size'], sha256))
+    return {'resource_id': cur.lastrowid}
+
+
+def resource_type_for(content_type):
+    major = (content_type or '').split('/', 1)[0]
+    if major in ('video', 'audio', 'image'):
+        return major
+    if content_type in ('application/pdf', 'application/msword', 'text/plain') or 'document' in (content_type or ''):
+        return 'document'
+    return 'other'
+
+
+def mark_failed(conn, upload_id):
+    """Record an upload that can no longer complete; the caller commits"""
+    hashes.discard(upload_id)
+    conn.execute("UPDATE uploads SET status = 'failed', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                 (upload_id,))
+
+
+def cancel_upload(conn, upload_id, user_id):
+    upload = _load(conn.cursor(), upload_id, user_id)
+    if upload['status'] == 'complete':
+        raise UploadError('Upload is already complete', 409)
+    hashes.discard(upload_id)
+    if os.path.exists(partial_path(upload_id)):
+        os.remove(partial_path(upload_id))
+    conn.execute('DELETE FROM uploads WHERE id = ?', (upload_id,))
+
+
+def save_file(stream, directory, filename, max_size):
+    """Stream a single-request upload to disk with a size cap and an atomic rename.
+
+    Returns (path, sha256). For small forms such as the class schedule PDF.
+    """
+    filename = secure_filename(filename or '')
+    if not filename:
+        raise ValueError('A filename is required')
+    os.makedirs(directory, exist_ok=True)
+    destination = os.path.join(directory, f'{uuid.uuid4()}_{filename}')
+    temporary = destination + '.part'
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(temporary, 'wb') as target:
+            while True:
+                block = stream.read(BLOCK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_size:
+                    raise ValueError(f'File is larger than the {max_size // (1024 * 1024)} MB limit')
+                target.write(block)
+                hasher.update(block)
+            target.flush()
+            os.fsync(target.fileno())
+        os.replace(temporary, destination)
+    except Exception:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return destination, hasher.hexdigest()
+
+
+def cleanup_stale_uploads(conn, max_age=STALE_SECONDS, now=None):
+    """Delete partial uploads idle for more than max_age seconds, and orphaned partial files.
+
+    Returns the number of uploads removed; the caller commits.
+    """
+    now = now or time.time()
+    cutoff = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now - max_age))
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM uploads WHERE status != 'complete' AND updated_at < ?", (cutoff,))
+    stale = [row[0] for row in cur.fetchall()]
+    for upload_id in stale:
+        hashes.discard(upload_id)
+        if os.path.exists(partial_path(upload_id)):
+            os.remove(partial_path(upload_id))
+    cur.executemany('DELETE FROM uploads WHERE id = ?', [(upload_id,) for upload_id in stale])
+
+    # Partial files whose row is gone (e.g. a crash between the two writes)
+    directory = os.path.join(UPLOAD_ROOT, 'partial')
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.getmtime(path) < now - max_age:
+                cur.execute('SELECT 1 FROM uploads WHERE id = ?', (name,))
+                if cur.fetchone() is None:
+                    os.remove(path)
+    return len(stale)
+
+
+_cleanup_thread = None
+_cleanup_lock = threading.Lock()
+
+
+def _cleanup_loop(interval):
+    while True:
+        time.sleep(interval)
+        conn = sqlite3.connect(DATABASE)
+        try:
+            cleanup_stale_uploads(conn)
+            conn.commit()
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+
+
+def ensure_cleanup_thread(interval=CLEANUP_INTERVAL):
+    """Start the stale-upload sweeper once per process"""
+    global _cleanup_thread
+    with _cleanup_lock:
+        if _cleanup_thread is None or not _cleanup_thread.is_alive():
+            _cleanup_thread = threading.Thread(target=_cleanup_loop, args=(interval,),
+                                               name='upload-cleanup', daemon=True)
+            _cleanup_thread.start()
+
+
+def _error_response(error):
+    body = {'error': str(error)}
+    body.update(error.extra)
+    response = jsonify(body)
+    if 'received' in error.extra:
+        response.headers['Upload-Offset'] = str(error.extra['received'])
+    return response, error.status
+
+
+def _with_offset(status, code=200):
+    response = jsonify(status)
+    response.headers['Upload-Offset'] = str(status['received'])
+    return response, code
+
+
+def create_view():
+    """View for POST /uploads (JSON)"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    data = request.get_json(silent=True) or {}
+    conn = sqlite3.connect(DATABASE)
+    try:
+        upload_id = start_upload(conn, session['user_id'], session.get('role'), data.get('kind'),
+                                 data.get('target_id'), data.get('filename'), data.get('size'),
+                                 data.get('content_type'))
+        conn.commit()
+        return _with_offset({'upload_id': upload_id, 'received': 0, 'size': int(data['size']),
+                             'complete': False, 'chunk_size': CHUNK_SIZE}, 201)
+    except UploadError as e:
+        conn.rollback()
+        return _error_response(e)
+    finally:
+        conn.close()
+
+
+def upload_view(upload_id):
+    """View for GET/PUT/DELETE /uploads/<id>"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    conn = sqlite3.connect(DATABASE)
+    try:
+        if request.method == 'GET':
+            return _with_offset(upload_status(conn, upload_id, session['user_id']))
+        if request.method == 'DELETE':
+            cancel_upload(conn, upload_id, session['user_id'])
+            conn.commit()
+            return jsonify({'success': True})
+
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            raise UploadError('Upload-Offset header is required')
+        status = write_chunk(conn, upload_id, session['user_id'], offset, request.stream, request.content_length)
+        conn.commit()
+        return _with_offset(status)
+    except UploadFailed as e:
+        # Undo the attach attempt but keep the failure, so the client does not try to resume
+        conn.rollback()
+        mark_failed(conn, upload_id)
+        conn.commit()
+        return _error_response(e)
+    except UploadError as e:
+        conn.rollback()
+        return _error_response(e)
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    """Register the chunked upload endpoints"""
+    app.add_url_rule('/uploads', 'uploads_create', create_view, methods=['POST'])
+    app.add_url_rule('/uploads/<upload_id>', 'uploads_chunk', upload_view, methods=['GET', 'PUT', 'DELETE'])